@@ -0,0 +1,36 @@
+"""Create domain_patterns (patrones de email confirmados por dominio).
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-16
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "domain_patterns",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("domain", sa.String(255), nullable=False),
+        sa.Column("pattern", sa.String(100), nullable=False),
+        sa.Column("confirmed_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("source", sa.String(20), nullable=False, server_default="verified"),
+        sa.Column("last_confirmed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("domain", "pattern", name="uq_domain_patterns_domain_pattern"),
+    )
+    op.create_index("ix_domain_patterns_domain", "domain_patterns", ["domain"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_domain_patterns_domain", table_name="domain_patterns")
+    op.drop_table("domain_patterns")
@@ -0,0 +1,50 @@
+"""Create domains (base de conocimiento por dominio: DNS, catch-all, patrón, latencia).
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "domains",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("domain", sa.String(255), nullable=False),
+        sa.Column("mx", sa.JSON(), nullable=True),
+        sa.Column("mx_error", sa.String(100), nullable=False, server_default=""),
+        sa.Column("provider", sa.String(50), nullable=False, server_default="other"),
+        sa.Column("hosted_provider", sa.String(50), nullable=True),
+        sa.Column("spf_present", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column("dmarc_present", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column("dns_checked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("catch_all", sa.Boolean(), nullable=True),
+        sa.Column("catch_all_reason", sa.Text(), nullable=False, server_default=""),
+        sa.Column("catch_all_checked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("pattern", sa.String(100), nullable=True),
+        sa.Column("smtp_latency_ms", sa.Integer(), nullable=True),
+        sa.Column("last_probe_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("leads_verified", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_verified_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_domains_domain", "domains", ["domain"], unique=True)
+    # Refresco de dominios caducados (Celery Beat)
+    op.create_index("ix_domains_dns_checked_at", "domains", ["dns_checked_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_domains_dns_checked_at", table_name="domains")
+    op.drop_index("ix_domains_domain", table_name="domains")
+    op.drop_table("domains")
@@ -0,0 +1,59 @@
+"""Scope domain_patterns por workspace (patrones personalizados y semillas no se comparten).
+
+Los patrones comunes confirmados por verificación siguen compartidos (workspace_id = 0); los
+patrones personalizados y las semillas pertenecen al workspace que los aportó. Las filas de esos
+tipos ya existentes no tienen workspace conocido y se borran: se vuelven a aprender.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# COMMON_PATTERNS (app.services.email_patterns) en el momento de la migración
+COMMON_PATTERNS = (
+    "{first}@{domain}",
+    "{last}@{domain}",
+    "{first}.{last}@{domain}",
+    "{f}.{last}@{domain}",
+    "{f}{last}@{domain}",
+    "{first}{last}@{domain}",
+    "{last}.{first}@{domain}",
+    "{last}{f}@{domain}",
+    "{first}_{last}@{domain}",
+    "{last}_{first}@{domain}",
+)
+
+
+def upgrade() -> None:
+    op.add_column("domain_patterns", sa.Column("workspace_id", sa.Integer(), nullable=False, server_default="0"))
+    domain_patterns = sa.table("domain_patterns", sa.column("pattern", sa.String), sa.column("source", sa.String))
+    op.execute(
+        domain_patterns.delete().where(
+            sa.or_(domain_patterns.c.source == "seed", domain_patterns.c.pattern.not_in(COMMON_PATTERNS))
+        )
+    )
+    op.drop_constraint("uq_domain_patterns_domain_pattern", "domain_patterns", type_="unique")
+    op.create_unique_constraint(
+        "uq_domain_patterns_scope_pattern", "domain_patterns", ["workspace_id", "domain", "pattern", "source"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_domain_patterns_scope_pattern", "domain_patterns", type_="unique")
+    domain_patterns = sa.table(
+        "domain_patterns", sa.column("workspace_id", sa.Integer), sa.column("source", sa.String)
+    )
+    op.execute(
+        domain_patterns.delete().where(sa.or_(domain_patterns.c.workspace_id != 0, domain_patterns.c.source == "seed"))
+    )
+    op.create_unique_constraint("uq_domain_patterns_domain_pattern", "domain_patterns", ["domain", "pattern"])
+    op.drop_column("domain_patterns", "workspace_id")
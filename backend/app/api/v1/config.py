@@ -18,11 +18,14 @@ from app.schemas.config import (
     MAX_PATTERN_LENGTH,
     MAX_TIMEOUT_SECONDS,
     MIN_PATTERNS_ENABLED,
+    MIN_TIME_BUDGET_SECONDS,
     MIN_TIMEOUT_SECONDS,
     PATTERN_COUNT,
     ConfigUpdate,
 )
 from app.services.serper_usage import get_serper_usage_async
+from app.services.verification.domain_context import STOP_POLICIES
+from app.services.verification.provider_policy import parse_provider_policies
 from app.services.workspace_config import merge_config_for_response
 
 router = APIRouter()
@@ -110,6 +113,28 @@ async def update_config(
             await set_entry("custom_patterns", valid_patterns[:MAX_CUSTOM_PATTERNS])
         else:
             await set_entry("custom_patterns", None)  # Borrar si lista vacía
+    if body.stop_policy is not None:
+        v = body.stop_policy.strip().lower()
+        if v and v not in STOP_POLICIES:
+            return APIResponse.err(
+                ErrorCode.VALIDATION_ERROR.value,
+                f"stop_policy must be one of: {', '.join(STOP_POLICIES)} or empty.",
+                {"stop_policy": v},
+            )
+        await set_entry("stop_policy", v if v else None)
+    if body.max_candidates is not None:
+        await set_entry("max_candidates", str(body.max_candidates) if body.max_candidates else None)
+    if body.provider_policies is not None:
+        try:
+            policies = parse_provider_policies(body.provider_policies)
+        except ValueError as e:
+            return APIResponse.err(
+                ErrorCode.VALIDATION_ERROR.value, str(e), {"provider_policies": body.provider_policies}
+            )
+        await set_entry("provider_policies", json.dumps(policies) if policies else None)
+    if body.lead_time_budget_seconds is not None:
+        budget = body.lead_time_budget_seconds
+        await set_entry("lead_time_budget_seconds", str(max(MIN_TIME_BUDGET_SECONDS, budget)) if budget else None)
 
     await db.commit()
     r = await db.execute(select(WorkspaceConfigEntry).where(WorkspaceConfigEntry.workspace_id == workspace.id))
@@ -0,0 +1,90 @@
+"""Domain knowledge base (superadmin): what verifications learned per domain, staleness and refresh."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, require_scope, require_superadmin
+from app.core.config import settings
+from app.core.error_codes import ErrorCode
+from app.models import Domain, User
+from app.schemas.common import APIResponse
+from app.schemas.domain import DomainResponse
+from app.services.domain_knowledge import is_catch_all_fresh, is_dns_fresh
+
+router = APIRouter()
+
+
+def _domain_to_response(row: Domain, now: datetime) -> dict:
+    return (
+        DomainResponse.model_validate(row)
+        .model_copy(
+            update={"dns_stale": not is_dns_fresh(row, now), "catch_all_stale": not is_catch_all_fresh(row, now)}
+        )
+        .model_dump()
+    )
+
+
+async def _get_domain(db: AsyncSession, domain: str) -> Domain | None:
+    r = await db.execute(select(Domain).where(Domain.domain == domain.strip().lower()))
+    return r.scalars().one_or_none()
+
+
+@router.get("", response_model=APIResponse, dependencies=[require_scope("leads:read")])
+async def list_domains(
+    page: int = 1,
+    page_size: int = Query(50, ge=1, le=500),
+    search: str | None = None,
+    provider: str | None = None,
+    stale_only: bool = Query(False, description="If true, only domains whose DNS signals are stale"),
+    db: AsyncSession = Depends(get_db),
+    _superadmin: User = Depends(require_superadmin()),
+) -> APIResponse:
+    """Known domains, most recently verified first."""
+    now = datetime.now(UTC)
+    q = select(Domain)
+    if search:
+        q = q.where(Domain.domain.ilike(f"%{search}%"))
+    if provider:
+        q = q.where(Domain.provider == provider)
+    if stale_only:
+        stale_before = now - timedelta(seconds=settings.domain_knowledge_ttl_seconds)
+        q = q.where(or_(Domain.dns_checked_at.is_(None), Domain.dns_checked_at < stale_before))
+    total = (await db.execute(select(func.count()).select_from(q.subquery()))).scalar() or 0
+    q = q.order_by(Domain.last_verified_at.desc()).offset((page - 1) * page_size).limit(page_size)
+    rows = (await db.execute(q)).scalars().all()
+    items = [_domain_to_response(row, now) for row in rows]
+    return APIResponse.ok({"items": items}, meta={"page": page, "page_size": page_size, "total": total})
+
+
+@router.get("/{domain}", response_model=APIResponse, dependencies=[require_scope("leads:read")])
+async def get_domain(
+    domain: str,
+    db: AsyncSession = Depends(get_db),
+    _superadmin: User = Depends(require_superadmin()),
+) -> APIResponse:
+    row = await _get_domain(db, domain)
+    if not row:
+        return APIResponse.err(ErrorCode.RESOURCE_NOT_FOUND.value, "Domain not found", {"domain": domain})
+    return APIResponse.ok(_domain_to_response(row, datetime.now(UTC)))
+
+
+@router.post("/{domain}/refresh", response_model=APIResponse, dependencies=[require_scope("leads:read")])
+async def refresh_domain(
+    domain: str,
+    db: AsyncSession = Depends(get_db),
+    _superadmin: User = Depends(require_superadmin()),
+) -> APIResponse:
+    """Mark a domain stale: its next lead runs the DNS checks and the catch-all probe again."""
+    row = await _get_domain(db, domain)
+    if not row:
+        return APIResponse.err(ErrorCode.RESOURCE_NOT_FOUND.value, "Domain not found", {"domain": domain})
+    row.dns_checked_at = None
+    row.catch_all_checked_at = None
+    await db.commit()
+    await db.refresh(row)
+    return APIResponse.ok(_domain_to_response(row, datetime.now(UTC)))
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -19,7 +19,7 @@ from app.api.deps import (
 from app.core.error_codes import ErrorCode
 from app.models import Job, JobLogLine, Lead, User
 from app.schemas.common import APIResponse
-from app.schemas.lead import LeadBulkRequest, LeadCreate, LeadResponse, LeadUpdate
+from app.schemas.lead import LeadBulkRequest, LeadCreate, LeadResponse, LeadUpdate, LeadVerifyBatchRequest
 from app.services.utils import utc_now_iso
 
 router = APIRouter()
@@ -217,9 +217,46 @@ async def bulk_upsert_leads(
     return APIResponse.ok({"created": created, "updated": updated, "ids": ids})
 
 
+@router.post("/verify-batch", response_model=APIResponse, dependencies=[require_scope("verify:run")])
+async def enqueue_verify_batch(
+    body: LeadVerifyBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    workspace_required: tuple = Depends(get_workspace_required),
+) -> APIResponse:
+    """
+    Enqueue one job verifying many leads, grouped by domain so each domain's DNS checks and
+    SMTP connections are shared. Opted-out and unknown leads are skipped. Poll GET /v1/jobs/{job_id}:
+    leads not reached within the task's time limit are listed in result.unverified_lead_ids.
+    """
+    import uuid
+
+    workspace, _, _ = workspace_required
+    r = await db.execute(
+        select(Lead.id).where(Lead.id.in_(body.lead_ids), Lead.workspace_id == workspace.id, Lead.opt_out.is_(False))
+    )
+    eligible = set(r.scalars().all())
+    lead_ids = [lead_id for lead_id in dict.fromkeys(body.lead_ids) if lead_id in eligible]
+    if not lead_ids:
+        return APIResponse.err(ErrorCode.LEAD_NOT_FOUND.value, "No verifiable lead found", {"ids": body.lead_ids})
+    from app.services.usage_plan import check_verification_quota
+
+    quota_err = await check_verification_quota(db, workspace, len(lead_ids))
+    if quota_err:
+        return APIResponse.err(ErrorCode.QUOTA_VERIFICATIONS_LIMIT.value, quota_err, {"code": "quota_exceeded"})
+    job_id = str(uuid.uuid4())
+    job = Job(workspace_id=workspace.id, job_id=job_id, kind="verify_batch", status="queued", progress=0)
+    db.add(job)
+    await db.commit()
+    from app.tasks.verify import run_verify_batch
+
+    run_verify_batch.delay(lead_ids, workspace.id, job_id, max_age=body.max_age)
+    return APIResponse.ok({"job_id": job_id, "lead_ids": lead_ids, "skipped": len(body.lead_ids) - len(lead_ids)})
+
+
 @router.post("/{lead_id}/verify", response_model=APIResponse, dependencies=[require_scope("verify:run")])
 async def enqueue_verify_lead(
     lead_id: int,
+    max_age: int | None = Query(None, ge=0, description="Oldest cached result to reuse (s); 0 = probe again"),
     idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db),
     workspace_required: tuple = Depends(get_workspace_required),
@@ -247,7 +284,7 @@ async def enqueue_verify_lead(
     await db.commit()
     from app.tasks.verify import run_verify_lead
 
-    run_verify_lead.delay(lead_id, workspace.id, job_id)
+    run_verify_lead.delay(lead_id, workspace.id, job_id, max_age=max_age)
     return APIResponse.ok({"job_id": job_id})
 
 
@@ -0,0 +1,37 @@
+"""Domain patterns: seed learned patterns from known-good addresses (async job)."""
+
+from __future__ import annotations
+
+import uuid
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db, get_workspace_required, require_scope
+from app.models import Job
+from app.schemas.common import APIResponse
+from app.schemas.patterns import PatternSeedRequest
+
+router = APIRouter()
+
+
+@router.post("/seed", response_model=APIResponse, dependencies=[require_scope("leads:write")])
+async def seed_patterns(
+    body: PatternSeedRequest,
+    db: AsyncSession = Depends(get_db),
+    workspace_required: tuple = Depends(get_workspace_required),
+) -> APIResponse:
+    """
+    Seed domain patterns from (first_name, last_name, email) rows, e.g. a CRM export.
+    Seeds only reorder this workspace's candidates, after patterns confirmed by verification.
+    Returns job_id. Poll GET /jobs/{job_id}: result has rows, matched, unmatched, domains, patterns.
+    """
+    workspace, _, _ = workspace_required
+    job_id = str(uuid.uuid4())
+    job = Job(workspace_id=workspace.id, job_id=job_id, kind="seed_patterns", status="queued", progress=0)
+    db.add(job)
+    await db.commit()
+    from app.tasks.patterns import run_seed_patterns
+
+    run_seed_patterns.delay(workspace.id, job_id, [[i.first_name, i.last_name, i.email] for i in body.items])
+    return APIResponse.ok({"job_id": job_id, "rows": len(body.items)})
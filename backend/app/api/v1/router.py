@@ -2,7 +2,22 @@
 
 from fastapi import APIRouter
 
-from app.api.v1 import api_keys, auth, config, exports, i18n, jobs, leads, optout, usage, verify, webhooks, workspaces
+from app.api.v1 import (
+    api_keys,
+    auth,
+    config,
+    domains,
+    exports,
+    i18n,
+    jobs,
+    leads,
+    optout,
+    patterns,
+    usage,
+    verify,
+    webhooks,
+    workspaces,
+)
 
 api_router = APIRouter()
 
@@ -12,6 +27,8 @@ api_router.include_router(config.router, prefix="/config", tags=["config"])
 api_router.include_router(leads.router, prefix="/leads", tags=["leads"])
 api_router.include_router(verify.router, prefix="/verify", tags=["verify"])
 api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(patterns.router, prefix="/patterns", tags=["patterns"])
+api_router.include_router(domains.router, prefix="/domains", tags=["domains"])
 # POST /v1/leads/{id}/verify is in leads.py
 api_router.include_router(optout.router, prefix="/optout", tags=["optout"])
 api_router.include_router(exports.router, prefix="/exports", tags=["exports"])
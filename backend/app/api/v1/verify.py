@@ -1,19 +1,117 @@
-"""Verify: stateless verify (name + domain -> candidates + best)."""
+"""Verify: stateless verify (name + domain -> candidates + best), single or streamed batch."""
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import queue
+import threading
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
 from fastapi import APIRouter, Depends, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db, get_workspace_required, require_scope
+from app.core.config import settings
 from app.core.error_codes import ErrorCode
 from app.schemas.common import APIResponse
-from app.schemas.verify import VerifyCandidate, VerifyStatelessRequest, VerifyStatelessResponse
-from app.services.usage_plan import check_verification_quota
-from app.services.verifier import verify_and_pick_best
+from app.schemas.verify import (
+    VerifyBatchItem,
+    VerifyBatchLine,
+    VerifyBatchRequest,
+    VerifyCandidate,
+    VerifyStatelessRequest,
+    VerifyStatelessResponse,
+)
+from app.services.usage_plan import check_verification_quota, increment_verification_usage
+from app.services.verification import (
+    DomainContext,
+    VerifyResult,
+    build_domain_context,
+    is_disposable_domain,
+    verify_and_pick_best,
+)
+from app.services.verify_executor import (
+    VERIFY_DEADLINE,
+    VERIFY_SATURATED,
+    VERIFY_WORKSPACE_BUSY,
+    free_batch_lanes,
+    release_when_done,
+    reserve_verification,
+    run_verification,
+    submit_batch_lane,
+)
+from app.services.workspace_config import get_workspace_config_sync
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Domains of one batch verified at the same time (items of a domain run one after another), at
+# most the batch lanes free in this process (see verify_executor)
+VERIFY_BATCH_CONCURRENT_DOMAINS = 4
+# A batch holds one workspace slot while it streams; expires even if the process dies
+VERIFY_BATCH_SLOT_TTL_SECONDS = 3600
+RETRY_AFTER_SECONDS = 5
+
+# Admission/deadline failures of the verify executor -> (HTTP status, error code, message)
+_REJECTIONS = {
+    VERIFY_SATURATED: (503, ErrorCode.INTERNAL_SERVICE_UNAVAILABLE, "Verification capacity exhausted, retry shortly"),
+    VERIFY_WORKSPACE_BUSY: (429, ErrorCode.QUOTA_CONCURRENCY_LIMIT, "Too many verifications in progress"),
+    VERIFY_DEADLINE: (504, ErrorCode.VERIFY_TIMEOUT, "Verification did not finish in time"),
+}
+
+
+def _rejection(reason: str) -> JSONResponse:
+    status, code, message = _REJECTIONS[reason]
+    headers = {"Retry-After": str(RETRY_AFTER_SECONDS)} if reason != VERIFY_DEADLINE else None
+    content = APIResponse.err(code.value, message, {"code": reason}).model_dump()
+    return JSONResponse(status_code=status, content=content, headers=headers)
+
+
+def _api_time_budget() -> float:
+    """
+    Lead budget for POST /verify: ends one SMTP timeout before the request deadline, so the
+    best result found so far is returned instead of a 504.
+    """
+    budget = max(1.0, settings.verify_api_deadline_seconds - settings.smtp_timeout_seconds)
+    lead = settings.lead_time_budget_seconds
+    return min(budget, lead) if lead else budget
+
+
+async def _probing_options(db: AsyncSession, workspace_id: int) -> dict[str, Any]:
+    """The workspace's stop policy and candidate limit, applied as in verification jobs."""
+    cfg = await db.run_sync(get_workspace_config_sync, workspace_id)
+    return {"stop_policy": cfg["stop_policy"], "max_candidates": cfg["max_candidates"] or None}
+
+
+def _candidate(best_result: VerifyResult | None) -> VerifyCandidate | None:
+    if not best_result:
+        return None
+    return VerifyCandidate(
+        email=best_result.email,
+        status=best_result.status,
+        confidence_score=best_result.confidence_score,
+        # DNS signals
+        mx_found=best_result.mx_found,
+        spf_present=getattr(best_result, "spf_present", False),
+        dmarc_present=getattr(best_result, "dmarc_present", False),
+        # SMTP signals
+        catch_all=getattr(best_result, "catch_all", None),
+        smtp_attempted=getattr(best_result, "smtp_attempted", False),
+        smtp_blocked=getattr(best_result, "smtp_blocked", False),
+        # Additional signals
+        provider=getattr(best_result, "provider", "other"),
+        web_mentioned=getattr(best_result, "web_mentioned", False),
+        # Summary
+        signals=getattr(best_result, "signals", []),
+        reason=best_result.reason,
+    )
+
 
 @router.post("", response_model=APIResponse, dependencies=[require_scope("verify:run")])
 async def verify_stateless(
@@ -21,41 +119,168 @@ async def verify_stateless(
     idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db),
     workspace_required: tuple = Depends(get_workspace_required),
-) -> APIResponse:
-    """Stateless: first_name + last_name + domain -> candidates + best."""
+) -> APIResponse | JSONResponse:
+    """
+    Stateless: first_name + last_name + domain -> candidates + best.
+
+    Candidates are probed with the workspace's stop policy and candidate limit, as in jobs.
+    Runs in the bounded verify executor (see verify_executor): 503 when this API process is
+    saturated, 429 when the workspace has too many verifications in flight, 504 past the deadline.
+    """
     workspace, _, _ = workspace_required
     quota_err = await check_verification_quota(db, workspace)
     if quota_err:
         return APIResponse.err(ErrorCode.QUOTA_VERIFICATIONS_LIMIT.value, quota_err, {"code": "quota_exceeded"})
-    candidates, best_email, best_result, _ = verify_and_pick_best(body.first_name, body.last_name, body.domain)
-    from app.services.usage_plan import increment_verification_usage
-
+    options = await _probing_options(db, workspace.id)
+    outcome, reason = await run_verification(
+        workspace.id,
+        verify_and_pick_best,
+        body.first_name,
+        body.last_name,
+        body.domain,
+        time_budget_seconds=_api_time_budget(),
+        max_age=body.max_age,
+        **options,
+    )
+    if reason:
+        return _rejection(reason)
+    candidates, best_email, best_result, _ = outcome
     await increment_verification_usage(db, workspace.id)
-    best_candidate = None
-    if best_result:
-        best_candidate = VerifyCandidate(
-            email=best_result.email,
-            status=best_result.status,
-            confidence_score=best_result.confidence_score,
-            # DNS signals
-            mx_found=best_result.mx_found,
-            spf_present=getattr(best_result, "spf_present", False),
-            dmarc_present=getattr(best_result, "dmarc_present", False),
-            # SMTP signals
-            catch_all=getattr(best_result, "catch_all", None),
-            smtp_attempted=getattr(best_result, "smtp_attempted", False),
-            smtp_blocked=getattr(best_result, "smtp_blocked", False),
-            # Additional signals
-            provider=getattr(best_result, "provider", "other"),
-            web_mentioned=getattr(best_result, "web_mentioned", False),
-            # Summary
-            signals=getattr(best_result, "signals", []),
-            reason=best_result.reason,
-        )
     return APIResponse.ok(
         VerifyStatelessResponse(
             candidates=candidates,
             best=best_email or None,
-            best_result=best_candidate,
+            best_result=_candidate(best_result),
         ).model_dump()
     )
+
+
+def _verify_domain_items(
+    domain: str,
+    items: list[tuple[int, VerifyBatchItem]],
+    emit: Callable[[VerifyBatchLine], None],
+    cancelled: threading.Event,
+    options: dict[str, Any],
+    max_age: int | None = None,
+) -> None:
+    """
+    Verify one domain's items in order over a shared domain context (runs in a batch lane).
+
+    Each item gets the API time budget of POST /verify. Failures are logged here; the item's
+    line carries only a generic error code.
+    """
+    ctx: DomainContext | None = None
+    if domain and not is_disposable_domain(domain):
+        try:
+            ctx = build_domain_context(domain, probe_catch_all=False)
+        except Exception:
+            ctx = None  # Each item builds its own context
+    for index, item in items:
+        if cancelled.is_set():
+            return
+        try:
+            candidates, best_email, best_result, _ = verify_and_pick_best(
+                item.first_name,
+                item.last_name,
+                item.domain,
+                domain_context=ctx,
+                time_budget_seconds=_api_time_budget(),
+                max_age=max_age,
+                **options,
+            )
+            line = VerifyBatchLine(
+                index=index,
+                id=item.id,
+                domain=domain,
+                candidates=candidates,
+                best=best_email or None,
+                best_result=_candidate(best_result),
+            )
+        except Exception:
+            logger.exception(f"Batch verification of item {index} ({domain}) failed")
+            line = VerifyBatchLine(index=index, id=item.id, domain=domain, error=ErrorCode.INTERNAL_ERROR.value)
+        emit(line)
+
+
+def _verify_domain_lane(
+    groups: queue.SimpleQueue[tuple[str, list[tuple[int, VerifyBatchItem]]]],
+    emit: Callable[[VerifyBatchLine], None],
+    cancelled: threading.Event,
+    options: dict[str, Any],
+    max_age: int | None = None,
+) -> None:
+    """Take domain groups until none are left (VERIFY_BATCH_CONCURRENT_DOMAINS lanes per batch)."""
+    while not cancelled.is_set():
+        try:
+            domain, items = groups.get_nowait()
+        except queue.Empty:
+            return
+        _verify_domain_items(domain, items, emit, cancelled, options, max_age)
+
+
+async def _stream_batch(
+    items: list[VerifyBatchItem],
+    workspace_id: int,
+    slot_token: str,
+    options: dict[str, Any],
+    max_age: int | None = None,
+) -> AsyncIterator[str]:
+    """One NDJSON line per item, in completion order. Stops verifying when the client goes away."""
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue[VerifyBatchLine] = asyncio.Queue()
+    cancelled = threading.Event()
+    by_domain: dict[str, list[tuple[int, VerifyBatchItem]]] = defaultdict(list)
+    for index, item in enumerate(items):
+        by_domain[item.domain.strip().lower()].append((index, item))
+    groups: queue.SimpleQueue = queue.SimpleQueue()
+    for group in by_domain.items():
+        groups.put(group)
+
+    def emit(line: VerifyBatchLine) -> None:
+        loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    lanes = [
+        submit_batch_lane(_verify_domain_lane, groups, emit, cancelled, options, max_age)
+        for _ in range(max(1, min(VERIFY_BATCH_CONCURRENT_DOMAINS, len(by_domain), free_batch_lanes())))
+    ]
+    release_when_done(workspace_id, slot_token, lanes)
+    try:
+        for _ in range(len(items)):
+            line = await lines.get()
+            yield line.model_dump_json() + "\n"
+    finally:
+        cancelled.set()
+        for lane in lanes:
+            lane.cancel()
+
+
+@router.post("/batch", response_model=None, dependencies=[require_scope("verify:run")])
+async def verify_batch(
+    body: VerifyBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    workspace_required: tuple = Depends(get_workspace_required),
+) -> StreamingResponse | APIResponse | JSONResponse:
+    """
+    Stateless batch: up to VERIFY_BATCH_MAX_ITEMS (first_name, last_name, domain) items.
+
+    Items are grouped by domain so DNS checks and the catch-all probe run once per domain.
+    The response streams one NDJSON line per item as it completes (see VerifyBatchLine);
+    use index or id to match lines to items. The whole batch counts against the quota at once.
+    Items are probed with the workspace's stop policy and candidate limit, as in jobs.
+    Batches run in their own lanes (see verify_executor): 503 when every batch lane of this
+    process is busy, 429 as POST /verify; the batch holds one workspace slot while it runs.
+    An item that fails gets a line with error INTERNAL_ERROR.
+    """
+    workspace, _, _ = workspace_required
+    quota_err = await check_verification_quota(db, workspace, count=len(body.items))
+    if quota_err:
+        return APIResponse.err(ErrorCode.QUOTA_VERIFICATIONS_LIMIT.value, quota_err, {"code": "quota_exceeded"})
+    options = await _probing_options(db, workspace.id)
+    slot_token, reason = reserve_verification(workspace.id, VERIFY_BATCH_SLOT_TTL_SECONDS, batch=True)
+    if reason:
+        return _rejection(reason)
+    await increment_verification_usage(db, workspace.id, count=len(body.items))
+    await db.commit()  # Before streaming: the session is not used afterwards
+    return StreamingResponse(
+        _stream_batch(body.items, workspace.id, slot_token, options, body.max_age), media_type=NDJSON_MEDIA_TYPE
+    )
@@ -90,8 +90,98 @@ class Settings(BaseSettings):
     # SMTP probe (puerto 25; en muchos entornos cloud/Docker está bloqueado o limitado)
     smtp_timeout_seconds: int = 5
     smtp_mail_from: str = "noreply@mailcheck.local"
+    # Nombre EHLO para las sondas SMTP (vacío = socket.getfqdn(), resuelto una vez por proceso)
+    smtp_helo_hostname: str = ""
     # DNS (MX lookup): tiempo máximo de espera por consulta
     dns_timeout_seconds: float = 5.0
+    # Servidores DNS separados por comas (vacío = resolver del sistema), p. ej. "1.1.1.1,8.8.8.8"
+    dns_nameservers: str = ""
+    # Caché DNS en proceso: nº máximo de respuestas, TTL máximo y TTL para NXDOMAIN/NoAnswer
+    dns_cache_size: int = 10000
+    dns_cache_max_ttl_seconds: int = 3600
+    dns_negative_ttl_seconds: int = 300
+    # Base de huellas de proveedores (sufijos MX e include: SPF) adicional a la incluida en el paquete:
+    # ruta a un JSON {"proveedor": {"kind": "mailbox|gateway", "mx": [...], "spf": [...]}}
+    provider_fingerprints_path: str = ""
+    # Índice binario de dominios desechables (scripts/build_disposable_index.py), mapeado en memoria
+    # y compartido entre procesos; se recarga al reemplazar el fichero. Vacío = solo la lista interna
+    disposable_domains_index_path: str = ""
+    # Caché de veredicto catch-all por dominio en Redis (compartida entre workers)
+    catch_all_cache_ttl_seconds: int = 86400
+    catch_all_inconclusive_ttl_seconds: int = 900
+    # Coalescencia (singleflight) de consultas por dominio entre workers: el primero que no encuentra
+    # MX/SPF/DMARC o el veredicto catch-all en caché los consulta con un lock en Redis y el resto espera
+    # su resultado hasta singleflight_wait_seconds (o el presupuesto del lead); si no llega, consulta.
+    # Las señales DNS se comparten domain_dns_shared_ttl_seconds
+    singleflight_enabled: bool = True
+    singleflight_wait_seconds: float = 15.0
+    singleflight_lock_ttl_seconds: int = 30
+    domain_dns_shared_ttl_seconds: int = 300
+    # Límite de conexiones SMTP salientes (token bucket GCRA en Redis, compartido entre workers):
+    # por host MX y por proveedor; SMTP_RATE_LIMITS (JSON) sobrescribe los límites por proveedor,
+    # p. ej. {"google": {"per_minute": 120, "burst": 10, "daily_cap": 50000}}
+    smtp_rate_limit_enabled: bool = True
+    smtp_rate_per_host_per_minute: float = 30
+    smtp_rate_host_burst: int = 5
+    smtp_rate_limits: str = ""
+    # Espera máxima por un token antes de dar la conexión por limitada
+    smtp_rate_max_wait_seconds: float = 10.0
+    # Copia local por proceso del flag smtp_blocked (segundos); los cambios llegan al instante por
+    # pub/sub de Redis. 0 = consultar Redis en cada llamada
+    smtp_blocked_local_ttl_seconds: float = 5.0
+    # Identidad de salida del worker para el detector smtp_blocked: los timeouts y el flag se
+    # llevan por nodo (y por proveedor dentro del nodo). Vacío = hostname. Los workers que salen
+    # por la misma IP deberían compartir el valor
+    smtp_egress_id: str = ""
+    # Pool de IPs locales de origen para las sondas SMTP (separadas por comas; vacío = interfaz por
+    # defecto). Se elige una por conexión: "lru" (la menos usada recientemente con ese MX) o
+    # "round_robin". Cada IP tiene su propio detector smtp_blocked y límites de tasa; una IP que
+    # recibe 421 o un rechazo en el saludo queda apartada smtp_source_cooldown_seconds
+    smtp_source_addresses: str = ""
+    smtp_source_selection: str = "lru"
+    smtp_source_cooldown_seconds: int = 600
+    # Timeouts SMTP adaptativos por MX (latencia observada, EWMA en Redis): media + 4 desviaciones,
+    # acotada a [min, max]. Sin historial suficiente se usa smtp_timeout_seconds
+    smtp_adaptive_timeouts: bool = True
+    smtp_adaptive_min_timeout_seconds: float = 2.0
+    smtp_adaptive_max_timeout_seconds: float = 30.0
+    # Tarpit: MX que retrasa su saludo más de smtp_tarpit_banner_seconds (o no lo envía) dos veces
+    # seguidas. Queda marcado smtp_tarpit_ttl_seconds; "skip" = no se sondea, "short" = se sondea
+    # con smtp_tarpit_timeout_seconds
+    smtp_tarpit_banner_seconds: float = 10.0
+    smtp_tarpit_action: str = "skip"
+    smtp_tarpit_timeout_seconds: float = 3.0
+    smtp_tarpit_ttl_seconds: int = 3600
+    # Verificación síncrona por API (/v1/verify): hilos por proceso y cola máxima (503 al superarla),
+    # plazo por petición (504) y verificaciones simultáneas por workspace entre todos los procesos (429)
+    verify_api_max_workers: int = 8
+    verify_api_max_queue: int = 16
+    verify_api_deadline_seconds: float = 60.0
+    verify_api_workspace_concurrency: int = 4
+    # Lotes por API (/v1/verify/batch): hilos propios por proceso (dominios verificados a la vez entre
+    # todos los lotes), aparte de los de /v1/verify; con todos ocupados un lote nuevo recibe 503
+    verify_api_batch_max_lanes: int = 4
+    # Tiempo total por lead (DNS + SMTP de todos los candidatos); al agotarse se devuelve el mejor
+    # resultado hasta el momento. Configurable por workspace. 0 = sin límite
+    lead_time_budget_seconds: float = 120.0
+    # Caché de resultados por email (Redis, compartida entre workers y la API): TTL según el estado
+    # del resultado (0 = no se guarda ese estado). Las peticiones pueden exigir frescura con max_age
+    verify_result_cache_enabled: bool = True
+    verify_result_ttl_valid_seconds: int = 604800
+    verify_result_ttl_invalid_seconds: int = 259200
+    verify_result_ttl_risky_seconds: int = 86400
+    verify_result_ttl_unknown_seconds: int = 900
+    # Base de conocimiento por dominio (tabla domains): MX, proveedor y SPF/DMARC se reutilizan sin
+    # consultar DNS durante domain_knowledge_ttl_seconds y el veredicto catch-all durante
+    # catch_all_cache_ttl_seconds. Celery Beat refresca cada hora hasta domain_refresh_batch_size
+    # dominios caducados verificados en los últimos domain_refresh_active_days días
+    domain_knowledge_enabled: bool = True
+    domain_knowledge_ttl_seconds: int = 86400
+    domain_refresh_batch_size: int = 200
+    domain_refresh_active_days: int = 30
+    # Greylisting: candidatos con 4xx en RCPT se aparcan en Redis y se reintentan (Celery Beat)
+    greylist_retry_enabled: bool = True
+    greylist_max_attempts: int = 3
 
     # Búsqueda web: ahora se configura por workspace (Dashboard → Configuración).
     # Las variables globales ya no se usan; cada workspace define su provider y API key.
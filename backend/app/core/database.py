@@ -4,8 +4,9 @@ from __future__ import annotations
 
 from collections.abc import AsyncGenerator
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 
 from app.core.config import settings
 
@@ -28,6 +29,13 @@ class Base(DeclarativeBase):
     pass
 
 
+def upsert_insert(db: Session, model: type[Base]) -> postgresql.Insert | sqlite.Insert:
+    """INSERT supporting on_conflict_do_update/do_nothing for the session's dialect (SQLite in tests)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
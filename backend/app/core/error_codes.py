@@ -51,6 +51,7 @@ class ErrorCode(str, Enum):
     QUOTA_EXCEEDED = "QUOTA_EXCEEDED"
     QUOTA_API_KEYS_LIMIT = "QUOTA_API_KEYS_LIMIT"
     QUOTA_VERIFICATIONS_LIMIT = "QUOTA_VERIFICATIONS_LIMIT"
+    QUOTA_CONCURRENCY_LIMIT = "QUOTA_CONCURRENCY_LIMIT"
 
     # Verification errors (VERIFY_*)
     VERIFY_INVALID_EMAIL = "VERIFY_INVALID_EMAIL"
@@ -106,6 +107,7 @@ ERROR_MESSAGES: dict[str, dict[str, str]] = {
         ErrorCode.QUOTA_EXCEEDED: "Quota exceeded",
         ErrorCode.QUOTA_API_KEYS_LIMIT: "Maximum API keys limit reached: {max}",
         ErrorCode.QUOTA_VERIFICATIONS_LIMIT: "Verification quota exceeded for this period",
+        ErrorCode.QUOTA_CONCURRENCY_LIMIT: "Too many verifications in progress for this workspace",
         # Verification
         ErrorCode.VERIFY_INVALID_EMAIL: "Invalid email format",
         ErrorCode.VERIFY_DOMAIN_NOT_FOUND: "Domain not found or invalid",
@@ -154,6 +156,7 @@ ERROR_MESSAGES: dict[str, dict[str, str]] = {
         ErrorCode.QUOTA_EXCEEDED: "Cuota excedida",
         ErrorCode.QUOTA_API_KEYS_LIMIT: "Límite máximo de API keys alcanzado: {max}",
         ErrorCode.QUOTA_VERIFICATIONS_LIMIT: "Cuota de verificaciones excedida para este período",
+        ErrorCode.QUOTA_CONCURRENCY_LIMIT: "Demasiadas verificaciones en curso para este workspace",
         # Verification
         ErrorCode.VERIFY_INVALID_EMAIL: "Formato de email inválido",
         ErrorCode.VERIFY_DOMAIN_NOT_FOUND: "Dominio no encontrado o inválido",
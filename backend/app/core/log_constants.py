@@ -23,6 +23,12 @@ class LogCode(str, Enum):
     VERIFY_CANDIDATE = "VERIFY_CANDIDATE"
     VERIFY_COMPLETED = "VERIFY_COMPLETED"
     VERIFY_NO_EMAIL_FOUND = "VERIFY_NO_EMAIL_FOUND"
+    VERIFY_GREYLIST_PARKED = "VERIFY_GREYLIST_PARKED"
+    VERIFY_BATCH_STARTED = "VERIFY_BATCH_STARTED"
+    VERIFY_BATCH_DOMAIN = "VERIFY_BATCH_DOMAIN"
+    VERIFY_BATCH_LEAD_FAILED = "VERIFY_BATCH_LEAD_FAILED"
+    VERIFY_BATCH_COMPLETED = "VERIFY_BATCH_COMPLETED"
+    VERIFY_BATCH_INCOMPLETE = "VERIFY_BATCH_INCOMPLETE"
 
     # Debug: MX/DNS
     DEBUG_WORKER_PROCESSING = "DEBUG_WORKER_PROCESSING"
@@ -34,6 +40,7 @@ class LogCode(str, Enum):
     DEBUG_CANDIDATE_HEADER = "DEBUG_CANDIDATE_HEADER"
     DEBUG_CANDIDATE_EMAIL = "DEBUG_CANDIDATE_EMAIL"
     DEBUG_MORE_CANDIDATES = "DEBUG_MORE_CANDIDATES"
+    DEBUG_TIME_BUDGET_EXHAUSTED = "DEBUG_TIME_BUDGET_EXHAUSTED"
     DEBUG_MX_LOOKUP = "DEBUG_MX_LOOKUP"
     DEBUG_MX_LOOKUP_FAILED = "DEBUG_MX_LOOKUP_FAILED"
     DEBUG_PROVIDER_DETECTED = "DEBUG_PROVIDER_DETECTED"
@@ -42,10 +49,18 @@ class LogCode(str, Enum):
 
     # Debug: SMTP
     DEBUG_SMTP_SKIPPED = "DEBUG_SMTP_SKIPPED"
+    DEBUG_SMTP_SKIPPED_PROVIDER = "DEBUG_SMTP_SKIPPED_PROVIDER"
+    DEBUG_SMTP_SKIPPED_PROVIDER_BLOCKED = "DEBUG_SMTP_SKIPPED_PROVIDER_BLOCKED"
     DEBUG_SMTP_DNS_RESOLVE = "DEBUG_SMTP_DNS_RESOLVE"
+    DEBUG_SMTP_SOURCE_ADDRESS = "DEBUG_SMTP_SOURCE_ADDRESS"
+    DEBUG_SMTP_NO_SOURCE_ADDRESS = "DEBUG_SMTP_NO_SOURCE_ADDRESS"
+    DEBUG_SMTP_SOURCE_THROTTLED = "DEBUG_SMTP_SOURCE_THROTTLED"
     DEBUG_SMTP_CONNECTING = "DEBUG_SMTP_CONNECTING"
     DEBUG_SMTP_RCPT_RESULT = "DEBUG_SMTP_RCPT_RESULT"
     DEBUG_SMTP_EXCEPTION = "DEBUG_SMTP_EXCEPTION"
+    DEBUG_SMTP_RATE_LIMITED = "DEBUG_SMTP_RATE_LIMITED"
+    DEBUG_SMTP_TARPIT_SKIPPED = "DEBUG_SMTP_TARPIT_SKIPPED"
+    DEBUG_SMTP_TARPIT_SHORT = "DEBUG_SMTP_TARPIT_SHORT"
     DEBUG_RCPT_VERIFYING = "DEBUG_RCPT_VERIFYING"
 
     # Debug: Catch-all
@@ -53,6 +68,8 @@ class LogCode(str, Enum):
     DEBUG_CATCHALL_TESTING = "DEBUG_CATCHALL_TESTING"
     DEBUG_CATCHALL_RESULT = "DEBUG_CATCHALL_RESULT"
     DEBUG_CATCHALL_INCONCLUSIVE = "DEBUG_CATCHALL_INCONCLUSIVE"
+    DEBUG_CATCHALL_CACHED = "DEBUG_CATCHALL_CACHED"
+    DEBUG_LOOKUP_COALESCED = "DEBUG_LOOKUP_COALESCED"
 
     # Debug: Web search
     DEBUG_WEB_SEARCHING = "DEBUG_WEB_SEARCHING"
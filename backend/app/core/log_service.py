@@ -195,6 +195,9 @@ class VerificationLogger:
     def debug_more_candidates(self, count: int) -> None:
         self._emit(LogCode.DEBUG_MORE_CANDIDATES, {LogParam.COUNT: count})
 
+    def debug_time_budget_exhausted(self, budget_seconds: float, skipped: int) -> None:
+        self._emit(LogCode.DEBUG_TIME_BUDGET_EXHAUSTED, {LogParam.TIMEOUT: budget_seconds, LogParam.COUNT: skipped})
+
     # =========================================================================
     # Debug: MX/DNS
     # =========================================================================
@@ -235,6 +238,12 @@ class VerificationLogger:
     def debug_smtp_skipped(self) -> None:
         self._emit(LogCode.DEBUG_SMTP_SKIPPED)
 
+    def debug_smtp_skipped_provider(self, provider: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_SKIPPED_PROVIDER, {LogParam.PROVIDER: provider})
+
+    def debug_smtp_skipped_provider_blocked(self, provider: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_SKIPPED_PROVIDER_BLOCKED, {LogParam.PROVIDER: provider})
+
     def debug_smtp_dns_resolve(self, host: str, ip: str | None) -> None:
         self._emit(
             LogCode.DEBUG_SMTP_DNS_RESOLVE,
@@ -244,6 +253,15 @@ class VerificationLogger:
             },
         )
 
+    def debug_smtp_source_address(self, mx_host: str, ip: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_SOURCE_ADDRESS, {LogParam.MX_HOST: mx_host, LogParam.IP: ip})
+
+    def debug_smtp_no_source_address(self, mx_host: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_NO_SOURCE_ADDRESS, {LogParam.MX_HOST: mx_host})
+
+    def debug_smtp_source_throttled(self, mx_host: str, ip: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_SOURCE_THROTTLED, {LogParam.MX_HOST: mx_host, LogParam.IP: ip})
+
     def debug_smtp_connecting(self, host: str, ip: str, timeout: int) -> None:
         self._emit(
             LogCode.DEBUG_SMTP_CONNECTING,
@@ -267,6 +285,15 @@ class VerificationLogger:
     def debug_smtp_exception(self, host: str, error: str) -> None:
         self._emit(LogCode.DEBUG_SMTP_EXCEPTION, {LogParam.MX_HOST: host, LogParam.ERROR: error})
 
+    def debug_smtp_rate_limited(self, host: str, detail: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_RATE_LIMITED, {LogParam.MX_HOST: host, LogParam.DETAIL: detail})
+
+    def debug_smtp_tarpit_skipped(self, host: str) -> None:
+        self._emit(LogCode.DEBUG_SMTP_TARPIT_SKIPPED, {LogParam.MX_HOST: host})
+
+    def debug_smtp_tarpit_short(self, host: str, timeout: float) -> None:
+        self._emit(LogCode.DEBUG_SMTP_TARPIT_SHORT, {LogParam.MX_HOST: host, LogParam.TIMEOUT: timeout})
+
     def debug_rcpt_verifying(self, email: str, mx_host: str) -> None:
         self._emit(LogCode.DEBUG_RCPT_VERIFYING, {LogParam.EMAIL: email, LogParam.MX_HOST: mx_host})
 
@@ -293,6 +320,12 @@ class VerificationLogger:
     def debug_catchall_inconclusive(self) -> None:
         self._emit(LogCode.DEBUG_CATCHALL_INCONCLUSIVE)
 
+    def debug_catchall_cached(self, domain: str, detail: str) -> None:
+        self._emit(LogCode.DEBUG_CATCHALL_CACHED, {LogParam.DOMAIN: domain, LogParam.DETAIL: detail})
+
+    def debug_lookup_coalesced(self, domain: str, lookup: str) -> None:
+        self._emit(LogCode.DEBUG_LOOKUP_COALESCED, {LogParam.DOMAIN: domain, LogParam.DETAIL: lookup})
+
     # =========================================================================
     # Debug: Web search
     # =========================================================================
@@ -2,6 +2,8 @@
 
 from app.models.api_key import ApiKey
 from app.models.audit_log import AuditLog
+from app.models.domain import Domain
+from app.models.domain_pattern import DomainPattern
 from app.models.idempotency import IdempotencyKey
 from app.models.job import Job
 from app.models.job_log_line import JobLogLine
@@ -30,4 +32,6 @@ __all__ = [
     "AuditLog",
     "Usage",
     "IdempotencyKey",
+    "DomainPattern",
+    "Domain",
 ]
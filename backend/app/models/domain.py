@@ -0,0 +1,41 @@
+"""Domain model: what verifications learned about a domain (knowledge base, see domain_knowledge)."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlalchemy import JSON, Boolean, DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class Domain(Base):
+    """DNS signals, catch-all verdict, accepted pattern and probe history of one email domain."""
+
+    __tablename__ = "domains"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    domain: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
+    # DNS signals (refreshed once dns_checked_at is older than domain_knowledge_ttl_seconds)
+    mx: Mapped[list | None] = mapped_column(JSON, nullable=True)  # [[preference, host], ...]
+    mx_error: Mapped[str] = mapped_column(String(100), nullable=False, default="")  # MX lookup failure
+    provider: Mapped[str] = mapped_column(String(50), nullable=False, default="other")
+    hosted_provider: Mapped[str | None] = mapped_column(String(50), nullable=True)  # Behind a gateway MX
+    spf_present: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    dmarc_present: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    dns_checked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+    # SMTP knowledge
+    catch_all: Mapped[bool | None] = mapped_column(Boolean, nullable=True)  # None = unknown
+    catch_all_reason: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    catch_all_checked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    pattern: Mapped[str | None] = mapped_column(String(100), nullable=True)  # Last confirmed pattern
+    smtp_latency_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Primary MX command round trip
+    last_probe_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Usage
+    leads_verified: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_verified_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC)
+    )
@@ -0,0 +1,29 @@
+"""DomainPattern model: email patterns confirmed per domain (learned from verifications or seeded)."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlalchemy import DateTime, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class DomainPattern(Base):
+    """How many times a pattern (e.g. "{f}{last}@{domain}") was confirmed for a domain."""
+
+    __tablename__ = "domain_patterns"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "domain", "pattern", "source", name="uq_domain_patterns_scope_pattern"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # 0 = shared by all workspaces (common patterns confirmed by verification), else the workspace's own
+    workspace_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    domain: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    pattern: Mapped[str] = mapped_column(String(100), nullable=False)
+    confirmed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    source: Mapped[str] = mapped_column(String(20), nullable=False, default="verified")  # verified|seed
+    last_confirmed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
@@ -21,7 +21,9 @@ class Job(Base):
         ForeignKey("leads.id", ondelete="SET NULL"), nullable=True, index=True
     )  # para jobs kind=verify
     job_id: Mapped[str] = mapped_column(String(64), unique=True, index=True, nullable=False)  # uuid
-    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # verify, export_csv, import_csv, webhook_delivery
+    kind: Mapped[str] = mapped_column(
+        String(50), nullable=False
+    )  # verify, verify_batch, export_csv, import_csv, webhook_delivery, seed_patterns
     status: Mapped[str] = mapped_column(String(50), nullable=False, default="queued")  # queued|running|succeeded|failed
     progress: Mapped[int] = mapped_column(default=0, nullable=False)  # 0-100
     result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
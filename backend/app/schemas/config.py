@@ -11,6 +11,9 @@ MIN_PATTERNS_ENABLED = 5
 PATTERN_COUNT = 10
 MAX_PATTERN_LENGTH = 100
 MAX_CUSTOM_PATTERNS = 20
+MAX_CANDIDATES_LIMIT = 15
+MIN_TIME_BUDGET_SECONDS = 10
+MAX_TIME_BUDGET_SECONDS = 600
 
 
 class ConfigResponse(BaseModel):
@@ -29,6 +32,13 @@ class ConfigResponse(BaseModel):
     allow_no_lastname: bool = False
     # Custom patterns from workspace (additional to standard ones)
     custom_patterns: list[str] = Field(default_factory=list)
+    # Candidate probing: 'first_valid' | 'exhaustive'; max_candidates 0 = adaptive
+    stop_policy: str = "first_valid"
+    max_candidates: int = Field(0, ge=0, le=MAX_CANDIDATES_LIMIT)
+    # Provider policy overrides: {provider: {probe, catch_all, max_mx_hosts, smtp_timeout_seconds}}
+    provider_policies: dict[str, dict] = Field(default_factory=dict)
+    # Total DNS + SMTP time per lead (0 = no limit, only as global setting)
+    lead_time_budget_seconds: float = Field(0, ge=0, le=MAX_TIME_BUDGET_SECONDS)
     # For frontend: pattern labels (index -> description)
     pattern_labels: list[str] | None = None
 
@@ -48,3 +58,9 @@ class ConfigUpdate(BaseModel):
     web_search_api_key: str | None = Field(None, max_length=255)  # "" or null = delete
     allow_no_lastname: bool | None = None  # Allow leads without last name
     custom_patterns: list[str] | None = Field(None, max_length=MAX_CUSTOM_PATTERNS)  # Custom patterns
+    stop_policy: str | None = Field(None, max_length=20)  # "first_valid" | "exhaustive" | "" (default)
+    max_candidates: int | None = Field(None, ge=0, le=MAX_CANDIDATES_LIMIT)  # 0 = adaptive
+    provider_policies: dict[str, dict] | None = None  # {} = built-in table only
+    lead_time_budget_seconds: float | None = Field(
+        None, ge=0, le=MAX_TIME_BUDGET_SECONDS
+    )  # 0 = use global; otherwise MIN_TIME_BUDGET_SECONDS..MAX_TIME_BUDGET_SECONDS
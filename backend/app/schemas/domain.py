@@ -0,0 +1,33 @@
+"""Domain knowledge base schemas."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+
+
+class DomainResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    domain: str
+    # DNS signals
+    mx: list[list] | None = None  # [[preference, host], ...]
+    mx_error: str = ""
+    provider: str = "other"
+    hosted_provider: str | None = None
+    spf_present: bool = False
+    dmarc_present: bool = False
+    dns_checked_at: datetime | None = None
+    dns_stale: bool = True  # DNS checks run again on the next lead (or the refresh task)
+    # SMTP knowledge
+    catch_all: bool | None = None
+    catch_all_reason: str = ""
+    catch_all_checked_at: datetime | None = None
+    catch_all_stale: bool = True
+    pattern: str | None = None
+    smtp_latency_ms: int | None = None
+    last_probe_at: datetime | None = None
+    # Usage
+    leads_verified: int = 0
+    last_verified_at: datetime | None = None
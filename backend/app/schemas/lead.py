@@ -7,6 +7,9 @@ from datetime import datetime
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
+# Leads per POST /v1/leads/verify-batch (one job, grouped by domain in the worker)
+VERIFY_BATCH_MAX_LEADS = 1000
+
 
 class LeadCompliance(BaseModel):
     source: str = Field(default="", max_length=200)
@@ -131,3 +134,9 @@ class LeadBulkItem(BaseModel):
 
 class LeadBulkRequest(BaseModel):
     leads: list[LeadBulkItem] = Field(..., max_length=100)
+
+
+class LeadVerifyBatchRequest(BaseModel):
+    lead_ids: list[int] = Field(..., min_length=1, max_length=VERIFY_BATCH_MAX_LEADS)
+    # Oldest cached result to reuse, in seconds (None = any still within its TTL, 0 = always probe)
+    max_age: int | None = Field(default=None, ge=0)
@@ -0,0 +1,18 @@
+"""Domain pattern schemas."""
+
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+# Rows per seed request (larger CRM exports are sent in several requests)
+SEED_MAX_ROWS = 10000
+
+
+class PatternSeedItem(BaseModel):
+    first_name: str = ""
+    last_name: str = ""
+    email: str
+
+
+class PatternSeedRequest(BaseModel):
+    items: list[PatternSeedItem] = Field(..., min_length=1, max_length=SEED_MAX_ROWS)
@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+# Items per batch request (larger lists are sent in several requests)
+VERIFY_BATCH_MAX_ITEMS = 1000
 
 
 class VerifyStatelessRequest(BaseModel):
     first_name: str = ""
     last_name: str = ""
     domain: str = ""
+    # Oldest cached result to reuse, in seconds (None = any still within its TTL, 0 = always probe)
+    max_age: int | None = Field(default=None, ge=0)
 
 
 class VerifyCandidate(BaseModel):
@@ -37,3 +42,25 @@ class VerifyStatelessResponse(BaseModel):
     candidates: list[str]
     best: str | None = None
     best_result: VerifyCandidate | None = None
+
+
+class VerifyBatchItem(BaseModel):
+    id: str | None = None  # Caller's reference, echoed in the item's result line
+    first_name: str = ""
+    last_name: str = ""
+    domain: str = ""
+
+
+class VerifyBatchRequest(BaseModel):
+    items: list[VerifyBatchItem] = Field(..., min_length=1, max_length=VERIFY_BATCH_MAX_ITEMS)
+    max_age: int | None = Field(default=None, ge=0)  # As in VerifyStatelessRequest, for every item
+
+
+class VerifyBatchLine(VerifyStatelessResponse):
+    """One NDJSON line of POST /verify/batch: the item's position and id, plus its result or error."""
+
+    index: int
+    id: str | None = None
+    domain: str = ""
+    candidates: list[str] = []
+    error: str | None = None
@@ -0,0 +1,201 @@
+"""Per-domain knowledge base (domains table): warm start for verifications.
+
+Every verification learns about its domain: MX set, provider, SPF/DMARC, catch-all verdict,
+accepted pattern, typical SMTP latency. Workers upsert it after each lead (or domain group of a
+batch) and read it at the start: a domain checked recently gets its context without any DNS
+query (see known_domain_context) and, while the verdict is fresh, without the catch-all probe.
+Together with the per-email result cache (see result_cache) a recently verified domain needs no
+network work at all, even after workers restart and lose their in-process caches.
+
+Staleness:
+- DNS signals are reused for domain_knowledge_ttl_seconds after dns_checked_at
+- the catch-all verdict for catch_all_cache_ttl_seconds after catch_all_checked_at
+- stale rows are ignored (the lead runs the full checks and refreshes them); refresh_stale_domains
+  (Celery Beat) re-runs the DNS checks of stale domains still in use ahead of their next lead
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import upsert_insert
+from app.core.log_service import VerificationLogger
+from app.models import Domain
+from app.services.verification.domain_context import (
+    DomainContext,
+    build_domain_context,
+    known_domain_context,
+)
+from app.services.verification.mx_latency import PHASE_COMMAND, get_mx_latency
+from app.services.verification.result import VerifyResult
+
+logger = logging.getLogger(__name__)
+
+
+def _aware(dt: datetime | None) -> datetime | None:
+    """SQLite returns naive datetimes: read them as UTC."""
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt
+
+
+def _fresh(checked_at: datetime | None, ttl_seconds: float, now: datetime) -> bool:
+    checked_at = _aware(checked_at)
+    return checked_at is not None and now - checked_at < timedelta(seconds=ttl_seconds)
+
+
+def is_dns_fresh(row: Domain, now: datetime | None = None) -> bool:
+    """True while the row's DNS signals can be used without querying DNS."""
+    return _fresh(row.dns_checked_at, settings.domain_knowledge_ttl_seconds, now or datetime.now(UTC))
+
+
+def is_catch_all_fresh(row: Domain, now: datetime | None = None) -> bool:
+    """True while the row's catch-all verdict can be used without a probe."""
+    if row.catch_all is None:
+        return False
+    return _fresh(row.catch_all_checked_at, settings.catch_all_cache_ttl_seconds, now or datetime.now(UTC))
+
+
+def get_domain_sync(db: Session, domain: str) -> Domain | None:
+    r = db.execute(select(Domain).where(Domain.domain == domain.strip().lower()))
+    return r.scalars().one_or_none()
+
+
+def load_domain_context_sync(
+    db: Session,
+    domain: str,
+    provider_policies: dict[str, dict] | None = None,
+    logger: VerificationLogger | None = None,
+) -> DomainContext | None:
+    """Context for domain from its row while the DNS signals are fresh, else None (run the checks)."""
+    if not settings.domain_knowledge_enabled or not domain:
+        return None
+    row = get_domain_sync(db, domain)
+    if row is None or not is_dns_fresh(row):
+        return None
+    return known_domain_context(
+        row.domain,
+        [(pref, host) for pref, host in row.mx or []],
+        row.spf_present,
+        row.dmarc_present,
+        hosted_provider=row.hosted_provider,
+        catch_all=(row.catch_all, row.catch_all_reason) if is_catch_all_fresh(row) else None,
+        mx_error=row.mx_error or None,
+        logger=logger,
+        provider_policies=provider_policies,
+    )
+
+
+def domain_context_sync(
+    db: Session,
+    domain: str,
+    cfg: dict,
+    logger: VerificationLogger | None = None,
+) -> DomainContext | None:
+    """
+    Context for a lead's domain: from the knowledge base when fresh, else from the DNS checks
+    (catch-all left to the first lead). None if the checks fail; the lead then builds its own.
+    """
+    ctx = load_domain_context_sync(db, domain, cfg.get("provider_policies") or None, logger=logger)
+    if ctx is not None:
+        return ctx
+    try:
+        return build_domain_context(
+            domain,
+            mail_from=cfg.get("smtp_mail_from"),
+            smtp_timeout_seconds=cfg.get("smtp_timeout_seconds"),
+            dns_timeout_seconds=cfg.get("dns_timeout_seconds"),
+            logger=logger,
+            probe_catch_all=False,
+            provider_policies=cfg.get("provider_policies") or None,
+        )
+    except Exception:
+        return None
+
+
+def _set_dns(row: Domain, ctx: DomainContext, now: datetime) -> None:
+    if not ctx.dns_answered:
+        # A timed out lookup would pin wrong signals for domain_knowledge_ttl_seconds
+        return
+    row.mx = [[pref, host] for pref, host in ctx.mx]
+    row.mx_error = (ctx.mx_error or "")[:100]
+    row.provider = ctx.provider
+    row.hosted_provider = ctx.hosted_provider
+    row.spf_present = ctx.spf_present
+    row.dmarc_present = ctx.dmarc_present
+    row.dns_checked_at = now
+
+
+def record_domain_sync(
+    db: Session,
+    ctx: DomainContext,
+    results: list[VerifyResult | None],
+    pattern: str | None = None,
+) -> Domain | None:
+    """
+    Upsert what the leads verified with ctx (results = their best results) taught about the
+    domain. DNS signals are rewritten only if they were queried (the row was stale or missing)
+    and DNS answered every lookup.
+    The row is created with INSERT ... ON CONFLICT DO NOTHING, so workers verifying a new domain
+    at the same time never collide on its unique key. Does not commit.
+    """
+    if not settings.domain_knowledge_enabled:
+        return None
+    now = datetime.now(UTC)
+    db.execute(upsert_insert(db, Domain).values(domain=ctx.domain).on_conflict_do_nothing(index_elements=["domain"]))
+    row = get_domain_sync(db, ctx.domain)
+    if row.dns_checked_at is None or not is_dns_fresh(row, now):
+        _set_dns(row, ctx, now)
+    if ctx.catch_all is not None and not (row.catch_all == ctx.catch_all and is_catch_all_fresh(row, now)):
+        row.catch_all, row.catch_all_reason = ctx.catch_all, ctx.catch_all_reason[:500]
+        row.catch_all_checked_at = now
+    if pattern:
+        row.pattern = pattern
+    if any(r is not None and r.smtp_attempted and "cached" not in r.signals for r in results):
+        row.last_probe_at = now
+        if ctx.mx_hosts:
+            avg, _, samples = get_mx_latency(ctx.mx_hosts[0]).phases.get(PHASE_COMMAND, (0.0, 0.0, 0))
+            if samples:
+                row.smtp_latency_ms = round(avg * 1000)
+    row.last_verified_at = now
+    # Incremented in SQL: concurrent workers add up instead of overwriting each other
+    db.execute(update(Domain).where(Domain.id == row.id).values(leads_verified=Domain.leads_verified + len(results)))
+    return row
+
+
+def refresh_stale_domains_sync(db: Session, limit: int | None = None) -> dict[str, int]:
+    """
+    Re-run the DNS checks of stale domains verified within domain_refresh_active_days, oldest
+    first (no SMTP: the catch-all verdict is refreshed by the next lead). Does not commit.
+    """
+    now = datetime.now(UTC)
+    stale_before = now - timedelta(seconds=settings.domain_knowledge_ttl_seconds)
+    r = db.execute(
+        select(Domain)
+        .where(
+            or_(Domain.dns_checked_at.is_(None), Domain.dns_checked_at < stale_before),
+            Domain.last_verified_at >= now - timedelta(days=settings.domain_refresh_active_days),
+        )
+        .order_by(Domain.dns_checked_at.asc())
+        .limit(limit or settings.domain_refresh_batch_size)
+    )
+    refreshed = failed = 0
+    for row in r.scalars().all():
+        try:
+            # smtp_blocked=True: DNS checks only, no SMTP state read and no catch-all probe
+            ctx = build_domain_context(row.domain, probe_catch_all=False, smtp_blocked=True)
+        except Exception as e:
+            logger.warning(f"Refreshing domain {row.domain} failed: {e}")
+            failed += 1
+            continue
+        if not ctx.dns_answered:
+            failed += 1
+            continue
+        _set_dns(row, ctx, now)
+        refreshed += 1
+    return {"refreshed": refreshed, "failed": failed}
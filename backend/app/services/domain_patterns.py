@@ -0,0 +1,184 @@
+"""Per-domain learned email patterns: recorded from verified leads, used to order candidates.
+
+Common patterns (COMMON_PATTERNS) confirmed by verification are shared by every workspace
+(workspace_id SHARED_SCOPE). Patterns only a workspace's custom_patterns produce are kept in
+that workspace's scope, so one tenant's private patterns never reorder another's candidates.
+Seeds are always private to the workspace that uploaded them and rank after every pattern
+confirmed by verification.
+Rows are written with INSERT ... ON CONFLICT: concurrent workers confirming the same pattern
+add up instead of colliding on the unique key.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Iterable
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.database import upsert_insert
+from app.models import DomainPattern
+from app.services.email_patterns import COMMON_PATTERNS, match_pattern, match_patterns_bulk
+
+# Pseudo-count added to the total when turning confirmations into a 0-100 confidence:
+# one confirmation -> 50, three -> 75, nine -> 90
+PATTERN_CONFIDENCE_PRIOR = 1
+SOURCE_VERIFIED = "verified"
+SOURCE_SEED = "seed"
+# workspace_id of the rows every workspace reads
+SHARED_SCOPE = 0
+# (domain, pattern) rows per INSERT when storing a seed batch
+SEED_INSERT_CHUNK = 500
+
+
+def pattern_scores(rows: list[tuple[str, int]]) -> dict[str, int]:
+    """(pattern, confirmed_count) rows -> {pattern: confidence 0-100}, most confirmed first."""
+    total = sum(count for _, count in rows)
+    ranked = sorted(rows, key=lambda r: r[1], reverse=True)
+    return {pattern: round(100 * count / (total + PATTERN_CONFIDENCE_PRIOR)) for pattern, count in ranked if count > 0}
+
+
+def _scopes(workspace_id: int | None) -> list[int]:
+    return [SHARED_SCOPE] if not workspace_id else [SHARED_SCOPE, workspace_id]
+
+
+def get_domain_pattern_scores_sync(db: Session, domain: str, workspace_id: int | None = None) -> dict[str, int]:
+    """
+    Learned patterns for a domain as {pattern: confidence}, ordered most likely first.
+    Shared patterns plus the workspace's own (none without workspace_id); seeded patterns come
+    after every verified one, so a large seed never outweighs verifications.
+    """
+    r = db.execute(
+        select(DomainPattern.pattern, DomainPattern.confirmed_count, DomainPattern.source).where(
+            DomainPattern.domain == domain.strip().lower(), DomainPattern.workspace_id.in_(_scopes(workspace_id))
+        )
+    )
+    verified: Counter[str] = Counter()
+    seeded: Counter[str] = Counter()
+    for pattern, count, source in r.all():
+        (seeded if source == SOURCE_SEED else verified)[pattern] += count
+    scores = pattern_scores(list(verified.items()))
+    for pattern, score in pattern_scores(list(seeded.items())).items():
+        scores.setdefault(pattern, score)
+    return scores
+
+
+def _upsert_counts(db: Session, rows: list[dict]) -> None:
+    """Insert rows or add their confirmed_count to the existing ones (one statement)."""
+    stmt = upsert_insert(db, DomainPattern).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["workspace_id", "domain", "pattern", "source"],
+            set_={
+                "confirmed_count": DomainPattern.confirmed_count + stmt.excluded.confirmed_count,
+                "last_confirmed_at": stmt.excluded.last_confirmed_at,
+            },
+        )
+    )
+
+
+def record_domain_pattern_sync(
+    db: Session,
+    domain: str,
+    pattern: str,
+    source: str = SOURCE_VERIFIED,
+    count: int = 1,
+    workspace_id: int = SHARED_SCOPE,
+) -> None:
+    """Add confirmations of a pattern for a domain in a scope (atomic upsert). Does not commit."""
+    now = datetime.now(UTC)
+    _upsert_counts(
+        db,
+        [
+            {
+                "workspace_id": workspace_id,
+                "domain": domain.strip().lower(),
+                "pattern": pattern,
+                "source": source,
+                "confirmed_count": count,
+                "last_confirmed_at": now,
+                "created_at": now,
+            }
+        ],
+    )
+
+
+def learn_pattern_from_result_sync(
+    db: Session,
+    first_name: str,
+    last_name: str,
+    email: str,
+    status: str,
+    custom_patterns: list[str] | None = None,
+    workspace_id: int | None = None,
+) -> str | None:
+    """
+    Record the pattern of a confirmed mailbox (status valid: accepted on a non catch-all domain).
+
+    A common pattern is shared; a custom one is stored in workspace_id's scope (not at all
+    without it). Returns the recorded pattern, or None if the result proves nothing or no
+    pattern matches. Does not commit.
+    """
+    if status != "valid" or not email:
+        return None
+    pattern = match_pattern(first_name, last_name, email, custom_patterns)
+    if pattern is None:
+        return None
+    if pattern in COMMON_PATTERNS:
+        scope = SHARED_SCOPE
+    elif workspace_id:
+        scope = workspace_id
+    else:
+        return None
+    record_domain_pattern_sync(db, email.split("@", 1)[1], pattern, workspace_id=scope)
+    return pattern
+
+
+def seed_domain_patterns_sync(
+    db: Session,
+    rows: Iterable[tuple[str, str, str]],
+    workspace_id: int,
+    custom_patterns: list[str] | None = None,
+) -> dict[str, int]:
+    """
+    Seed learned patterns from known-good (first_name, last_name, email) rows, e.g. CRM exports.
+
+    Rows are reverse-matched in memory, aggregated per (domain, pattern) and upserted as seed
+    rows of workspace_id, SEED_INSERT_CHUNK per statement. Seeds only reorder that workspace's
+    candidates and never touch verified rows. Does not commit. Returns counts: rows, matched,
+    unmatched, domains, patterns.
+    """
+    rows = list(rows)
+    counts: Counter[tuple[str, str]] = Counter()
+    for (_, _, email), pattern in zip(rows, match_patterns_bulk(rows, custom_patterns), strict=True):
+        if pattern is not None:
+            counts[(email.strip().lower().split("@", 1)[1], pattern)] += 1
+
+    domains = {domain for domain, _ in counts}
+    now = datetime.now(UTC)
+    # Sorted keys: concurrent seeds lock rows in the same order
+    values = [
+        {
+            "workspace_id": workspace_id,
+            "domain": domain,
+            "pattern": pattern,
+            "source": SOURCE_SEED,
+            "confirmed_count": n,
+            "last_confirmed_at": now,
+            "created_at": now,
+        }
+        for (domain, pattern), n in sorted(counts.items())
+    ]
+    for i in range(0, len(values), SEED_INSERT_CHUNK):
+        _upsert_counts(db, values[i : i + SEED_INSERT_CHUNK])
+
+    matched = sum(counts.values())
+    return {
+        "rows": len(rows),
+        "matched": matched,
+        "unmatched": len(rows) - matched,
+        "domains": len(domains),
+        "patterns": len(counts),
+    }
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterable
+
 from app.services.utils import slugify_name
 
 # Standard patterns (first name + last name)
@@ -37,20 +39,21 @@ def generate_candidates(
     enabled_pattern_indices: list[int] | None = None,
     allow_no_lastname: bool = False,
     custom_patterns: list[str] | None = None,
+    preferred_patterns: list[str] | None = None,
 ) -> list[str]:
     """
     Generate email candidates based on patterns.
     enabled_pattern_indices: indices in COMMON_PATTERNS to use (0..len-1). None = all.
     allow_no_lastname: if True and no last name, use FIRST_ONLY_PATTERNS (info@, contact@, etc.).
     custom_patterns: additional patterns defined by the workspace (added to standard ones).
+    preferred_patterns: patterns to try first, most likely first (e.g. learned for this domain
+        by get_domain_pattern_scores_sync for the same workspace).
     """
     first = slugify_name(first_name)
     last = slugify_name(last_name)
     if not domain:
         return []
     domain = domain.strip().lower()
-    f = first[:1] if first else ""
-    li = last[:1] if last else ""  # li = last initial
 
     # If no last name and allowed, use alternative patterns
     if not last:
@@ -80,21 +83,16 @@ def generate_candidates(
     if custom_patterns:
         patterns = patterns + list(custom_patterns)
 
+    # Patterns confirmed for this domain go first (even if not enabled: they are known to work here).
+    # They are common patterns or this workspace's own custom ones (see domain_patterns)
+    if preferred_patterns:
+        patterns = list(preferred_patterns) + patterns
+
     raw = []
     for pat in patterns:
-        if "{first}" in pat and not first:
-            continue
-        if "{last}" in pat and not last:
-            continue
-        if "{f}" in pat and not f:
-            continue
-        if "{l}" in pat and not li:
-            continue
-        try:
-            raw.append(pat.format(first=first, last=last, f=f, l=li, domain=domain))
-        except KeyError:
-            # Pattern with unknown placeholder, ignore
-            continue
+        email = _render_pattern(pat, first, last, domain)
+        if email:
+            raw.append(email)
 
     seen = set()
     out = []
@@ -105,3 +103,81 @@ def generate_candidates(
         if len(out) >= max_candidates:
             break
     return out
+
+
+def _render_pattern(pattern: str, first: str, last: str, domain: str) -> str | None:
+    """Format a pattern with already slugified names. None if a needed part is missing."""
+    f = first[:1] if first else ""
+    li = last[:1] if last else ""  # li = last initial
+    if "{first}" in pattern and not first:
+        return None
+    if "{last}" in pattern and not last:
+        return None
+    if "{f}" in pattern and not f:
+        return None
+    if "{l}" in pattern and not li:
+        return None
+    try:
+        return pattern.format(first=first, last=last, f=f, l=li, domain=domain)
+    except (KeyError, IndexError, ValueError):
+        # Pattern with unknown placeholder, ignore
+        return None
+
+
+def match_pattern(
+    first_name: str,
+    last_name: str,
+    email: str,
+    custom_patterns: list[str] | None = None,
+) -> str | None:
+    """
+    Reverse match: which pattern produces this email for this person.
+
+    Tries COMMON_PATTERNS, then custom_patterns, with the same slugify_name normalization
+    as generate_candidates. Returns the pattern string (e.g. "{f}{last}@{domain}") or None.
+    """
+    local, sep, domain = (email or "").strip().lower().partition("@")
+    if not sep or not local or not domain:
+        return None
+    first = slugify_name(first_name)
+    last = slugify_name(last_name)
+    target = f"{local}@{domain}"
+    for pat in [*COMMON_PATTERNS, *(custom_patterns or [])]:
+        if _render_pattern(pat, first, last, domain) == target:
+            return pat
+    return None
+
+
+def match_patterns_bulk(
+    rows: Iterable[tuple[str, str, str]],
+    custom_patterns: list[str] | None = None,
+) -> list[str | None]:
+    """
+    match_pattern over many (first_name, last_name, email) rows.
+
+    Patterns are split once into their local-part templates, so each row costs one slugify
+    per name, then one render of each pattern's local part compared with the email's local part.
+    """
+    # (pattern, template to render, compare against the local part only)
+    templates: list[tuple[str, str, bool]] = []
+    for pat in [*COMMON_PATTERNS, *(custom_patterns or [])]:
+        local_tpl, _, domain_tpl = pat.partition("@")
+        if domain_tpl == "{domain}":
+            templates.append((pat, local_tpl, True))
+        else:
+            templates.append((pat, pat, False))
+    out: list[str | None] = []
+    for first_name, last_name, email in rows:
+        local, sep, domain = (email or "").strip().lower().partition("@")
+        if not sep or not local or not domain:
+            out.append(None)
+            continue
+        first = slugify_name(first_name)
+        last = slugify_name(last_name)
+        match = None
+        for pat, tpl, local_only in templates:
+            if _render_pattern(tpl, first, last, domain) == (local if local_only else f"{local}@{domain}"):
+                match = pat
+                break
+        out.append(match)
+    return out
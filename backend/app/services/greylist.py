@@ -0,0 +1,341 @@
+"""Greylisting: park candidates that got a 4xx on RCPT and re-probe them when the server allows.
+
+A lead whose only obstacle is greylisting is parked in Redis with the retry window implied by
+the server reply, instead of ending as "unknown" or being re-verified from scratch. The
+retry_greylisted beat task claims due entries in small batches, re-probes them with one SMTP
+session per MX host and updates the lead and its VerificationLog.
+
+A claimed entry is leased, not removed: it moves to the processing set until the batch is
+committed and acknowledged (ack_greylisted). If the worker dies first, the lease expires and
+the next claim puts the entry back in the due set, so no parked lead is lost.
+
+Keys:
+    smtp:greylist:due          sorted set lead_id -> due timestamp
+    smtp:greylist:processing   sorted set lead_id -> lease expiry (claimed, not yet acknowledged)
+    smtp:greylist:entries      hash lead_id -> JSON entry (see park_greylisted)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import UTC, datetime
+from typing import Any
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.log_service import VerificationLogger
+from app.services.smtp_blocked_detector import _get_redis, is_smtp_blocked, set_catch_all_verdict
+from app.services.verification.domain_context import DomainContext, apply_rcpt_results, load_cached_catch_all
+from app.services.verification.result import VerifyResult
+from app.services.verification.smtp_checker import SMTPProbeSession, random_probe_address, smtp_probe_many
+from app.services.verification.verifier import verify_email
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_GREYLIST_DUE = "smtp:greylist:due"
+REDIS_KEY_GREYLIST_ENTRIES = "smtp:greylist:entries"
+REDIS_KEY_GREYLIST_PROCESSING = "smtp:greylist:processing"
+
+# Retry window when the reply does not state one (postgrey and most greylisters use 5 min)
+GREYLIST_DEFAULT_DELAY_SECONDS = 300
+GREYLIST_MIN_DELAY_SECONDS = 60
+GREYLIST_MAX_DELAY_SECONDS = 3600
+# Added to a stated window so the retry does not land just before it ends
+GREYLIST_MARGIN_SECONDS = 30
+GREYLIST_BATCH_SIZE = 20
+# How long a claimed entry may stay unacknowledged before it is due again (above the task time limit)
+GREYLIST_LEASE_SECONDS = 600
+SECONDS_PER_MINUTE = 60
+
+# "try again in 5 minutes", "retry after 300 seconds", "greylisted for 60s"
+_RETRY_WINDOW_RE = re.compile(r"(\d+)\s*(seconds?|secs?|s|minutes?|mins?|m)\b", re.IGNORECASE)
+_RETRY_HINT_RE = re.compile(r"grey|gray|try again|retry|later|wait", re.IGNORECASE)
+
+STATUS_RANK = {"valid": 3, "risky": 2, "unknown": 1, "invalid": 0}
+
+# Atomically lease up to ARGV[2] entries due at ARGV[1] until ARGV[1] + ARGV[3]: concurrent beat runs
+# never claim the same lead. Expired leases (worker died before acknowledging) are due again first.
+# KEYS: due, entries, processing.
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now)) do
+  redis.call('ZREM', KEYS[3], id)
+  if redis.call('HEXISTS', KEYS[2], id) == 1 and not redis.call('ZSCORE', KEYS[1], id) then
+    redis.call('ZADD', KEYS[1], now, id)
+  end
+end
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[2]))
+local out = {}
+for _, id in ipairs(ids) do
+  redis.call('ZREM', KEYS[1], id)
+  local entry = redis.call('HGET', KEYS[2], id)
+  if entry then
+    redis.call('ZADD', KEYS[3], now + tonumber(ARGV[3]), id)
+    table.insert(out, entry)
+  end
+end
+return out
+"""
+
+# Drop acknowledged leases and their entries, unless the lead was parked again meanwhile
+# (re-probed candidates still greylisted, or a new verification). KEYS: due, entries, processing.
+_ACK_SCRIPT = """
+for _, id in ipairs(ARGV) do
+  redis.call('ZREM', KEYS[3], id)
+  if not redis.call('ZSCORE', KEYS[1], id) then
+    redis.call('HDEL', KEYS[2], id)
+  end
+end
+return 0
+"""
+
+
+def is_greylisted(info: dict[str, Any]) -> bool:
+    """A probe_results entry that got a 4xx reply to RCPT (not a connection error)."""
+    return info.get("status") == "unknown" and "Temporary failure" in (info.get("detail") or "")
+
+
+def greylist_retry_delay(reply: str | None, attempt: int = 0) -> int:
+    """
+    Seconds to wait before re-probing, from the server reply ("try again in 5 minutes").
+
+    Falls back to GREYLIST_DEFAULT_DELAY_SECONDS and doubles per previous attempt,
+    clamped to [GREYLIST_MIN_DELAY_SECONDS, GREYLIST_MAX_DELAY_SECONDS].
+    """
+    delay = GREYLIST_DEFAULT_DELAY_SECONDS
+    if reply and _RETRY_HINT_RE.search(reply):
+        m = _RETRY_WINDOW_RE.search(reply)
+        if m:
+            n = int(m.group(1))
+            delay = (n * SECONDS_PER_MINUTE if m.group(2).lower().startswith("m") else n) + GREYLIST_MARGIN_SECONDS
+    delay *= 2**attempt
+    return max(GREYLIST_MIN_DELAY_SECONDS, min(GREYLIST_MAX_DELAY_SECONDS, delay))
+
+
+def park_greylisted(entry: dict[str, Any], delay_seconds: int) -> bool:
+    """
+    Park a lead's greylisted candidates for a retry in delay_seconds. Re-parking a lead replaces its entry.
+
+    entry: lead_id, workspace_id, log_id, domain, emails, mx_hosts, mail_from, smtp_timeout,
+    dns_timeout, provider, spf_present, dmarc_present, attempts.
+    """
+    try:
+        pipe = _get_redis().pipeline()
+        pipe.hset(REDIS_KEY_GREYLIST_ENTRIES, str(entry["lead_id"]), json.dumps(entry))
+        pipe.zadd(REDIS_KEY_GREYLIST_DUE, {str(entry["lead_id"]): time.time() + delay_seconds})
+        pipe.execute()
+        return True
+    except redis.RedisError as e:
+        logger.error(f"Redis error parking greylisted lead {entry.get('lead_id')}: {e}")
+        return False
+
+
+def claim_due_greylisted(limit: int = GREYLIST_BATCH_SIZE, now: float | None = None) -> list[dict[str, Any]]:
+    """
+    Lease and return up to limit entries whose retry time has come. Call ack_greylisted once
+    their results are committed; unacknowledged entries are due again after GREYLIST_LEASE_SECONDS.
+    """
+    try:
+        raw = _get_redis().eval(
+            _CLAIM_SCRIPT,
+            3,
+            REDIS_KEY_GREYLIST_DUE,
+            REDIS_KEY_GREYLIST_ENTRIES,
+            REDIS_KEY_GREYLIST_PROCESSING,
+            time.time() if now is None else now,
+            limit,
+            GREYLIST_LEASE_SECONDS,
+        )
+    except redis.RedisError as e:
+        logger.error(f"Redis error claiming greylisted leads: {e}")
+        return []
+    return [json.loads(e) for e in raw]
+
+
+def ack_greylisted(lead_ids: list[int]) -> None:
+    """Release the leases of processed entries (their results are committed)."""
+    if not lead_ids:
+        return
+    try:
+        _get_redis().eval(
+            _ACK_SCRIPT,
+            3,
+            REDIS_KEY_GREYLIST_DUE,
+            REDIS_KEY_GREYLIST_ENTRIES,
+            REDIS_KEY_GREYLIST_PROCESSING,
+            *[str(lead_id) for lead_id in lead_ids],
+        )
+    except redis.RedisError as e:
+        logger.error(f"Redis error acknowledging greylisted leads: {e}")
+
+
+def greylist_entry_for_lead(
+    lead_id: int,
+    workspace_id: int,
+    log_id: int,
+    probe_results: dict[str, Any],
+    best_result: VerifyResult | None,
+    mx_hosts: list[str],
+    mail_from: str,
+    smtp_timeout_seconds: int | None,
+    dns_timeout_seconds: float | None,
+) -> tuple[dict[str, Any], int] | None:
+    """
+    Entry and delay to park a freshly verified lead, or None when there is nothing to retry
+    (a candidate was confirmed, no candidate was greylisted, or no MX).
+    """
+    if best_result is None or best_result.status in ("valid", "risky") or not mx_hosts:
+        return None
+    greylisted = [email for email, info in probe_results.items() if is_greylisted(info)]
+    if not greylisted:
+        return None
+    entry = {
+        "lead_id": lead_id,
+        "workspace_id": workspace_id,
+        "log_id": log_id,
+        "domain": greylisted[0].split("@", 1)[1],
+        "emails": greylisted,
+        "mx_hosts": mx_hosts,
+        "mail_from": mail_from,
+        "smtp_timeout": smtp_timeout_seconds,
+        "dns_timeout": dns_timeout_seconds,
+        "provider": best_result.provider,
+        "spf_present": best_result.spf_present,
+        "dmarc_present": best_result.dmarc_present,
+        "attempts": 0,
+    }
+    return entry, greylist_retry_delay(probe_results[greylisted[0]].get("smtp_code_msg"))
+
+
+def reprobe_greylisted(
+    entries: list[dict[str, Any]], logger: VerificationLogger | None = None
+) -> list[dict[str, VerifyResult]]:
+    """
+    Re-probe parked entries; returns email -> VerifyResult per entry (same order).
+
+    Entries are grouped by (MAIL FROM, first MX host) and each group reuses one SMTP session
+    per MX host, closed before moving to the next group.
+    """
+    log = logger or VerificationLogger()
+    out: list[dict[str, VerifyResult]] = [{} for _ in entries]
+    groups: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for i, entry in enumerate(entries):
+        groups[(entry["mail_from"], entry["mx_hosts"][0])].append(i)
+
+    smtp_blocked = is_smtp_blocked()
+    for indices in groups.values():
+        sessions: dict[str, SMTPProbeSession] = {}
+        try:
+            for i in indices:
+                out[i] = _reprobe_entry(entries[i], smtp_blocked, sessions, log)
+        finally:
+            for session in sessions.values():
+                session.close()
+    return out
+
+
+def _reprobe_entry(
+    entry: dict[str, Any],
+    smtp_blocked: bool,
+    sessions: dict[str, SMTPProbeSession],
+    log: VerificationLogger,
+) -> dict[str, VerifyResult]:
+    ctx = DomainContext(
+        domain=entry["domain"],
+        mx=list(enumerate(entry["mx_hosts"])),
+        provider=entry.get("provider") or "other",
+        spf_present=bool(entry.get("spf_present")),
+        dmarc_present=bool(entry.get("dmarc_present")),
+        smtp_blocked=smtp_blocked,
+    )
+    emails = entry["emails"]
+    if not smtp_blocked:
+        # The first run was most likely greylisted on the random address too: only a definitive cached verdict counts
+        definitive = load_cached_catch_all(ctx, logger=log) and ctx.catch_all is not None
+        test_email = None if definitive else random_probe_address(ctx.domain)
+        results = smtp_probe_many(
+            ctx.mx_hosts,
+            [test_email, *emails] if test_email else emails,
+            entry["mail_from"],
+            smtp_timeout_seconds=entry.get("smtp_timeout"),
+            dns_timeout_seconds=entry.get("dns_timeout"),
+            logger=log,
+            sessions=sessions,
+        )
+        apply_rcpt_results(ctx, test_email, emails, results, logger=log)
+        if test_email:
+            set_catch_all_verdict(ctx.domain, ctx.catch_all, ctx.catch_all_reason)
+    return {
+        email: verify_email(email, mail_from=entry["mail_from"], logger=log, domain_context=ctx, max_age=0)
+        for email in emails
+    }
+
+
+def apply_greylist_results_sync(
+    db: Session,
+    entry: dict[str, Any],
+    results: dict[str, VerifyResult],
+    custom_patterns: list[str] | None = None,
+) -> bool:
+    """
+    Store re-probe outcomes in the lead's VerificationLog and, if a candidate now ranks above
+    the lead's current result, in the lead. custom_patterns (the workspace's) let a confirmed
+    mailbox teach a custom pattern, as in run_verify_lead. Returns True if the lead changed.
+    Does not commit.
+    """
+    from app.models import Lead, VerificationLog
+    from app.services.domain_patterns import learn_pattern_from_result_sync
+
+    log_row = db.execute(select(VerificationLog).where(VerificationLog.id == entry["log_id"])).scalars().one_or_none()
+    if log_row is not None:
+        probe_results = dict(log_row.probe_results or {})
+        for email, res in results.items():
+            probe_results[email] = {
+                **probe_results.get(email, {}),
+                "accepted": res.status in ("valid", "risky") and res.mx_found,
+                "detail": res.reason,
+                "status": res.status,
+                "confidence_score": res.confidence_score,
+                "smtp_code_msg": res.smtp_code_msg,
+                "greylist_attempts": entry.get("attempts", 0) + 1,
+            }
+        log_row.probe_results = probe_results  # Reassigned so the JSON column is flushed
+
+    lead = (
+        db.execute(select(Lead).where(Lead.id == entry["lead_id"], Lead.workspace_id == entry["workspace_id"]))
+        .scalars()
+        .one_or_none()
+    )
+    if not results or lead is None or lead.opt_out:
+        return False
+    best = max(results.values(), key=lambda r: (STATUS_RANK.get(r.status, 0), r.confidence_score))
+    current = (STATUS_RANK.get(lead.verification_status, 0), lead.confidence_score or 0)
+    if (STATUS_RANK.get(best.status, 0), best.confidence_score) <= current:
+        return False
+
+    if log_row is not None:
+        log_row.best_email = best.email
+        log_row.best_status = best.status
+        log_row.best_confidence = best.confidence_score
+    lead.email_best = best.email
+    lead.verification_status = best.status
+    lead.confidence_score = best.confidence_score
+    lead.catch_all = bool(best.catch_all)
+    lead.smtp_check = best.smtp_check
+    lead.notes = best.reason
+    lead.updated_at = datetime.now(UTC)
+    learn_pattern_from_result_sync(
+        db, lead.first_name, lead.last_name, best.email, best.status, custom_patterns, workspace_id=lead.workspace_id
+    )
+    return True
+
+
+def still_greylisted(results: dict[str, VerifyResult]) -> list[str]:
+    """Candidates that got a 4xx again."""
+    return [email for email, res in results.items() if is_greylisted({"status": res.status, "detail": res.reason})]
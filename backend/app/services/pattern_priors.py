@@ -0,0 +1,166 @@
+"""Global pattern priors: how often each COMMON_PATTERNS entry is the valid one, by provider and TLD.
+
+Built offline from verification_logs.probe_results (refresh_pattern_priors task), published to Redis
+as a compact JSON table and kept in memory by every worker. Used to order candidates for domains
+with no learned pattern (see domain_patterns for the per-domain store).
+
+Table format:
+    {"built_at": "...", "samples": 1234,
+     "groups": {"google|com": [["{first}.{last}@{domain}", 41], ...], "*|es": [...], "*|*": [...]}}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Lead, VerificationLog
+from app.services.email_patterns import COMMON_PATTERNS, match_pattern
+from app.services.smtp_blocked_detector import _get_redis
+from app.services.verification.dns_checker import detect_provider
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PATTERN_PRIORS = "patterns:priors"
+ANY = "*"
+# Groups with fewer confirmed addresses fall back to a broader group
+PRIORS_MIN_GROUP_SAMPLES = 20
+PRIORS_LOOKBACK_DAYS = 180
+# Workers re-read the published table at most this often
+PRIORS_RELOAD_SECONDS = 3600
+PRIORS_BUILD_BATCH = 1000
+
+_priors: dict[str, list[list]] = {}
+_loaded_at: float | None = None
+
+
+def _group_key(provider: str, tld: str) -> str:
+    return f"{provider}|{tld}"
+
+
+def domain_tld(domain: str) -> str:
+    return domain.strip().lower().rsplit(".", 1)[-1]
+
+
+def build_pattern_priors(rows: Iterable[tuple[str, str, str, list[str] | None, dict | None]]) -> dict:
+    """
+    Build the priors table.
+
+    Args:
+        rows: (first_name, last_name, domain, mx_hosts, probe_results) per verification log.
+            Every probe result with status "valid" counts one confirmation of its pattern.
+    """
+    counts: dict[str, Counter] = defaultdict(Counter)
+    samples = 0
+    for first, last, domain, mx_hosts, probe_results in rows:
+        if not probe_results or not domain:
+            continue
+        provider = detect_provider([(0, h) for h in mx_hosts or []])
+        tld = domain_tld(domain)
+        for email, info in probe_results.items():
+            if not isinstance(info, dict) or info.get("status") != "valid":
+                continue
+            pattern = match_pattern(first, last, email)
+            if pattern is None:
+                continue
+            samples += 1
+            for key in (
+                _group_key(provider, tld),
+                _group_key(provider, ANY),
+                _group_key(ANY, tld),
+                _group_key(ANY, ANY),
+            ):
+                counts[key][pattern] += 1
+
+    groups: dict[str, list[list]] = {}
+    for key, counter in counts.items():
+        total = sum(counter.values())
+        if total < PRIORS_MIN_GROUP_SAMPLES and key != _group_key(ANY, ANY):
+            continue
+        groups[key] = [[pattern, round(100 * n / total)] for pattern, n in counter.most_common()]
+    return {"built_at": datetime.now(UTC).isoformat(), "samples": samples, "groups": groups}
+
+
+def build_pattern_priors_sync(db: Session, lookback_days: int = PRIORS_LOOKBACK_DAYS) -> dict:
+    """Build the priors table from recent verification logs (streamed in batches)."""
+    cutoff = datetime.now(UTC) - timedelta(days=lookback_days)
+    stmt = (
+        select(Lead.first_name, Lead.last_name, Lead.domain, VerificationLog.mx_hosts, VerificationLog.probe_results)
+        .join(Lead, Lead.id == VerificationLog.lead_id)
+        .where(VerificationLog.created_at >= cutoff, VerificationLog.best_status == "valid")
+        .execution_options(yield_per=PRIORS_BUILD_BATCH)
+    )
+    return build_pattern_priors(tuple(row) for row in db.execute(stmt))
+
+
+def publish_pattern_priors(table: dict) -> None:
+    """Store the table in Redis for all workers and load it in this process."""
+    try:
+        _get_redis().set(REDIS_KEY_PATTERN_PRIORS, json.dumps(table, separators=(",", ":")))
+    except redis.RedisError as e:
+        logger.error(f"Redis error publishing pattern priors: {e}")
+    _set_priors(table)
+
+
+def load_pattern_priors() -> bool:
+    """(Re)load the published table from Redis. Returns True if a table was loaded."""
+    global _loaded_at
+    _loaded_at = time.monotonic()
+    try:
+        raw = _get_redis().get(REDIS_KEY_PATTERN_PRIORS)
+    except redis.RedisError as e:
+        logger.error(f"Redis error loading pattern priors: {e}")
+        return False
+    if not raw:
+        return False
+    try:
+        _set_priors(json.loads(raw))
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return True
+
+
+def _set_priors(table: dict) -> None:
+    global _priors, _loaded_at
+    groups = table.get("groups") if isinstance(table, dict) else None
+    _priors = groups if isinstance(groups, dict) else {}
+    _loaded_at = time.monotonic()
+
+
+def reset_pattern_priors() -> None:
+    """Forget the in-memory table (tests)."""
+    global _priors, _loaded_at
+    _priors = {}
+    _loaded_at = None
+
+
+def get_pattern_priors(provider: str, tld: str) -> dict[str, int]:
+    """
+    Prior for a domain as {pattern: share 0-100}, most likely first.
+
+    Most specific group with enough samples wins: provider+TLD, provider, TLD, global.
+    """
+    if _loaded_at is None or time.monotonic() - _loaded_at > PRIORS_RELOAD_SECONDS:
+        load_pattern_priors()
+    for key in (_group_key(provider, tld), _group_key(provider, ANY), _group_key(ANY, tld), _group_key(ANY, ANY)):
+        entries = _priors.get(key)
+        if entries:
+            return {pattern: int(share) for pattern, share in entries if pattern in COMMON_PATTERNS}
+    return {}
+
+
+def order_candidates_by_prior(
+    candidates: list[str], first_name: str, last_name: str, priors: dict[str, int]
+) -> list[str]:
+    """Stable sort of candidates by prior share (candidates matching no prior keep their order, last)."""
+    if not priors:
+        return candidates
+    return sorted(candidates, key=lambda c: -priors.get(match_pattern(first_name, last_name, c) or "", 0))
@@ -57,9 +57,9 @@ def get_serper_usage_sync(db: Session, workspace_id: int) -> dict[str, int]:
     }
 
 
-def increment_serper_usage_sync(db: Session, workspace_id: int) -> int:
+def increment_serper_usage_sync(db: Session, workspace_id: int, count: int = 1) -> int:
     """
-    Incrementa el contador de uso de Serper para el workspace.
+    Incrementa el contador de uso de Serper para el workspace en count búsquedas.
     Devuelve el nuevo total del mes actual.
     """
     r = db.execute(
@@ -72,7 +72,7 @@ def increment_serper_usage_sync(db: Session, workspace_id: int) -> int:
     usage_data = _parse_usage_data(entry.value if entry else None)
 
     month_key = _get_current_month_key()
-    usage_data[month_key] = usage_data.get(month_key, 0) + 1
+    usage_data[month_key] = usage_data.get(month_key, 0) + count
 
     new_value = json.dumps(usage_data)
 
@@ -2,11 +2,38 @@
 
 Detects when SMTP port 25 is blocked at the infrastructure level
 by tracking timeout errors across multiple distinct MX hosts.
+
+State is kept per egress node (settings.smtp_egress_id, else the hostname): a node whose
+port 25 is blocked falls back to DNS signals while nodes with a working egress keep probing.
+Within a node, timeouts on MX hosts of a known provider are also tracked per provider, so a
+provider that blackholes this node's IP only turns SMTP off for that provider's domains.
+Those hosts count once (as the provider) toward the node threshold. With a pool of source
+addresses (settings.smtp_source_addresses, see egress_pool) each address is its own egress,
+<node>/<address>, and the worker counts as blocked only once every address is.
+
+is_smtp_blocked() runs for every candidate, so each process keeps the flags it reads for
+smtp_blocked_local_ttl_seconds (never past the flag's own expiry). Flips are published on
+smtp:outbound_blocked:changed and drop the local copies at once: the subscription is polled
+without blocking on each call, so no thread and no extra round trip is needed.
+
+Keys (<egress> = node identity):
+    smtp:outbound_blocked:<egress>                       node flag
+    smtp:timeout_hosts:<egress>                          zset: host (or provider:<name>) -> last timeout
+    smtp:provider_blocked:<egress>:<provider>            provider flag
+    smtp:provider_timeout_hosts:<egress>:<provider>      zset: host -> last timeout
+    smtp:blocked_providers:<egress>                      zset: provider -> flag expiry (admin view)
+    smtp:egress_nodes                                    zset: egress -> last timeout (admin view)
+
+Also holds the cross-worker catch-all verdict cache (smtp:catch_all:<domain>).
 """
 
 from __future__ import annotations
 
+import json
 import logging
+import os
+import socket
+import threading
 import time
 from typing import TYPE_CHECKING
 
@@ -20,17 +47,78 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 # Redis keys
-REDIS_KEY_BLOCKED = "smtp:outbound_blocked"
-REDIS_KEY_TIMEOUT_HOSTS = "smtp:timeout_hosts"
+REDIS_KEY_BLOCKED = "smtp:outbound_blocked:{egress}"
+REDIS_KEY_TIMEOUT_HOSTS = "smtp:timeout_hosts:{egress}"
+REDIS_KEY_PROVIDER_BLOCKED = "smtp:provider_blocked:{egress}:{provider}"
+REDIS_KEY_PROVIDER_TIMEOUT_HOSTS = "smtp:provider_timeout_hosts:{egress}:{provider}"
+REDIS_KEY_BLOCKED_PROVIDERS = "smtp:blocked_providers:{egress}"
+REDIS_KEY_EGRESS_NODES = "smtp:egress_nodes"
+REDIS_KEY_CATCH_ALL_PREFIX = "smtp:catch_all:"
+REDIS_CHANNEL_BLOCKED = "smtp:outbound_blocked:changed"
+# PTTL reply for a missing key
+PTTL_NO_KEY = -2
+# Provider name for MX hosts without a fingerprint (never flagged on its own)
+UNKNOWN_PROVIDER = "other"
 
 # Detection thresholds
 THRESHOLD_HOSTS = 3  # Distinct hosts with timeout to trigger blocked flag
+PROVIDER_THRESHOLD_HOSTS = 2  # Distinct MX hosts of one provider to flag that provider
 WINDOW_SECONDS = 300  # 5 min window for tracking timeouts
 TTL_BLOCKED_SECONDS = 900  # 15 min TTL for blocked flag
 
+# Catch-all verdict cache: definitive verdicts (random address accepted/rejected) vs inconclusive probes
+TTL_CATCH_ALL_SECONDS = getattr(settings, "catch_all_cache_ttl_seconds", 86400)
+TTL_CATCH_ALL_INCONCLUSIVE_SECONDS = getattr(settings, "catch_all_inconclusive_ttl_seconds", 900)
+
+# Record a timeout for the node (and its provider), set the flags at their thresholds and
+# announce flips, in one round trip.
+# KEYS: node hosts, node flag, provider hosts, provider flag, blocked providers, egress nodes.
+# ARGV: now, host, node member, window, threshold, flag ttl, channel, egress, provider ('' = none),
+# provider threshold.
+# Returns {node distinct hosts, node flag just set, provider distinct hosts, provider flag just set}.
+_RECORD_TIMEOUT_SCRIPT = """
+local now, window, ttl = tonumber(ARGV[1]), tonumber(ARGV[4]), tonumber(ARGV[6])
+redis.call('ZADD', KEYS[6], now, ARGV[8])
+redis.call('ZREMRANGEBYSCORE', KEYS[6], '-inf', now - window - ttl)
+redis.call('EXPIRE', KEYS[6], window + ttl)
+local function track(hosts_key, member, flag_key, threshold)
+  redis.call('ZADD', hosts_key, now, member)
+  redis.call('ZREMRANGEBYSCORE', hosts_key, '-inf', now - window)
+  redis.call('EXPIRE', hosts_key, window + 60)
+  local hosts = redis.call('ZCARD', hosts_key)
+  if hosts < threshold then
+    return {hosts, 0, 0}
+  end
+  local was_blocked = redis.call('EXISTS', flag_key)
+  redis.call('SETEX', flag_key, ttl, '1')
+  if was_blocked == 0 then
+    redis.call('PUBLISH', ARGV[7], flag_key)
+  end
+  return {hosts, 1, 1 - was_blocked}
+end
+local node = track(KEYS[1], ARGV[3], KEYS[2], tonumber(ARGV[5]))
+local provider = {0, 0, 0}
+if ARGV[9] ~= '' then
+  provider = track(KEYS[3], ARGV[2], KEYS[4], tonumber(ARGV[10]))
+  if provider[2] == 1 then
+    redis.call('ZADD', KEYS[5], now + ttl, ARGV[9])
+    redis.call('EXPIRE', KEYS[5], ttl)
+  end
+end
+return {node[1], node[3], provider[1], provider[3]}
+"""
+
 # Lazy Redis connection
 _redis_client: redis.Redis | None = None
 
+# Process-local copies of the flags: Redis key -> (monotonic expiry, blocked). The generation
+# counts invalidations so a read racing with a flip does not store a stale value.
+_local_lock = threading.Lock()
+_local_flags: dict[str, tuple[float, bool]] = {}
+_local_generation = 0
+_pubsub: redis.client.PubSub | None = None
+_pubsub_pid: int | None = None
+
 
 def _get_redis() -> redis.Redis:
     """Get or create Redis connection."""
@@ -43,69 +131,251 @@ def _get_redis() -> redis.Redis:
     return _redis_client
 
 
-def record_smtp_timeout(host: str) -> None:
-    """
-    Record an SMTP timeout for a host.
+def egress_id() -> str:
+    """This worker's egress identity: settings.smtp_egress_id, else the hostname."""
+    return settings.smtp_egress_id or socket.gethostname()
 
-    If enough distinct hosts have timed out within the window,
-    sets the global smtp_blocked flag.
-    """
-    try:
-        r = _get_redis()
 
-        # Add host to sorted set with current timestamp as score
-        now = time.time()
-        r.zadd(REDIS_KEY_TIMEOUT_HOSTS, {host: now})
+def source_addresses() -> list[str]:
+    """Local addresses SMTP probes are bound to (settings.smtp_source_addresses); empty = default route."""
+    return [a.strip() for a in settings.smtp_source_addresses.split(",") if a.strip()]
 
-        # Remove old entries outside the window
-        cutoff = now - WINDOW_SECONDS
-        r.zremrangebyscore(REDIS_KEY_TIMEOUT_HOSTS, "-inf", cutoff)
 
-        # Set TTL on the set so it auto-expires if no new timeouts
-        r.expire(REDIS_KEY_TIMEOUT_HOSTS, WINDOW_SECONDS + 60)
+def source_egress_id(source_address: str | None = None) -> str:
+    """Egress identity of connections bound to source_address (None = the node's default route)."""
+    node = egress_id()
+    return f"{node}/{source_address}" if source_address else node
 
-        # Check if threshold reached
-        distinct_hosts = r.zcard(REDIS_KEY_TIMEOUT_HOSTS)
 
-        if distinct_hosts >= THRESHOLD_HOSTS:
-            # Set blocked flag with TTL
-            r.setex(REDIS_KEY_BLOCKED, TTL_BLOCKED_SECONDS, "1")
-            logger.warning(
-                f"SMTP outbound blocked detected: {distinct_hosts} distinct hosts "
-                f"with timeouts in last {WINDOW_SECONDS}s. Flag set for {TTL_BLOCKED_SECONDS}s."
-            )
+def egress_ids() -> list[str]:
+    """Egress identities this worker probes from: one per pool source address, else the node."""
+    addresses = source_addresses()
+    return [source_egress_id(a) for a in addresses] if addresses else [egress_id()]
+
+
+def _provider_keys(egress: str, provider: str) -> tuple[str, str]:
+    """(flag key, timeout hosts key) of a provider on an egress node."""
+    return (
+        REDIS_KEY_PROVIDER_BLOCKED.format(egress=egress, provider=provider),
+        REDIS_KEY_PROVIDER_TIMEOUT_HOSTS.format(egress=egress, provider=provider),
+    )
+
+
+def record_smtp_timeout(host: str, provider: str | None = None, source_address: str | None = None) -> None:
+    """
+    Record an SMTP timeout for a host, seen from this worker's egress node (or source address).
+
+    If enough distinct hosts have timed out within the window, sets the node's smtp_blocked
+    flag; if enough MX hosts of the host's provider have, sets that provider's flag for the
+    node (one atomic script; other workers are notified).
+
+    Args:
+        provider: Provider of the MX host (detect_provider); None or "other" = node only
+        source_address: Pool address the connection was bound to (None = default route)
+    """
+    egress = source_egress_id(source_address)
+    provider = provider if provider and provider != UNKNOWN_PROVIDER else ""
+    provider_flag, provider_hosts = _provider_keys(egress, provider)
+    try:
+        distinct_hosts, flipped, provider_hosts_count, provider_flipped = _get_redis().eval(
+            _RECORD_TIMEOUT_SCRIPT,
+            6,
+            REDIS_KEY_TIMEOUT_HOSTS.format(egress=egress),
+            REDIS_KEY_BLOCKED.format(egress=egress),
+            provider_hosts,
+            provider_flag,
+            REDIS_KEY_BLOCKED_PROVIDERS.format(egress=egress),
+            REDIS_KEY_EGRESS_NODES,
+            time.time(),
+            host,
+            f"provider:{provider}" if provider else host,
+            WINDOW_SECONDS,
+            THRESHOLD_HOSTS,
+            TTL_BLOCKED_SECONDS,
+            REDIS_CHANNEL_BLOCKED,
+            egress,
+            provider,
+            PROVIDER_THRESHOLD_HOSTS,
+        )
     except redis.RedisError as e:
         # Don't fail verification if Redis is down
         logger.error(f"Redis error recording SMTP timeout: {e}")
+        return
+    if flipped or provider_flipped:
+        _invalidate_local_blocked()
+    if flipped:
+        logger.warning(
+            f"SMTP outbound blocked detected on {egress}: {distinct_hosts} distinct hosts "
+            f"with timeouts in last {WINDOW_SECONDS}s. Flag set for {TTL_BLOCKED_SECONDS}s."
+        )
+    if provider_flipped:
+        logger.warning(
+            f"SMTP to {provider} blocked from {egress}: {provider_hosts_count} of its MX hosts "
+            f"timed out in last {WINDOW_SECONDS}s. Flag set for {TTL_BLOCKED_SECONDS}s."
+        )
 
 
 def is_smtp_blocked() -> bool:
     """
-    Check if SMTP outbound is currently detected as blocked.
+    Check if SMTP outbound is currently detected as blocked on this worker's egress node
+    (on every source address, with a pool).
+
+    Served from the process-local copy while it is fresh (see module docstring).
 
     Returns:
         True if SMTP port 25 appears blocked at infrastructure level.
     """
+    return all(_flag(REDIS_KEY_BLOCKED.format(egress=egress)) for egress in egress_ids())
+
+
+def is_provider_blocked(provider: str) -> bool:
+    """
+    Check if a provider's MX hosts are currently not answering this worker's egress node
+    (any of its source addresses, with a pool).
+
+    Same local caching as is_smtp_blocked(). Unknown providers ("other") are never flagged.
+    """
+    if not provider or provider == UNKNOWN_PROVIDER:
+        return False
+    return all(_flag(_provider_keys(egress, provider)[0]) for egress in egress_ids())
+
+
+def is_egress_blocked(egress: str, provider: str | None = None) -> bool:
+    """One egress identity's node flag, or its flag for provider. Same local caching."""
+    if _flag(REDIS_KEY_BLOCKED.format(egress=egress)):
+        return True
+    return bool(provider) and provider != UNKNOWN_PROVIDER and _flag(_provider_keys(egress, provider)[0])
+
+
+def _flag(key: str) -> bool:
+    """A flag's state, from the process-local copy while it is fresh, else from Redis."""
+    local_ttl = settings.smtp_blocked_local_ttl_seconds
+    if local_ttl <= 0:
+        return _read_blocked(key)[0]
+    with _local_lock:
+        _poll_invalidations()
+        cached, generation = _local_flags.get(key), _local_generation
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    blocked, flag_ttl = _read_blocked(key)
+    expires_at = time.monotonic() + (min(local_ttl, flag_ttl) if blocked else local_ttl)
+    with _local_lock:
+        if generation == _local_generation:
+            _local_flags[key] = (expires_at, blocked)
+    return blocked
+
+
+def _read_blocked(key: str) -> tuple[bool, float]:
+    """(blocked, seconds until the flag expires) from Redis. Fails open: not blocked if Redis is down."""
     try:
-        r = _get_redis()
-        return r.exists(REDIS_KEY_BLOCKED) == 1
+        pttl = _get_redis().pttl(key)
     except redis.RedisError as e:
-        # If Redis is down, assume SMTP is not blocked
         logger.error(f"Redis error checking SMTP blocked status: {e}")
-        return False
+        return False, 0.0
+    if pttl == PTTL_NO_KEY:
+        return False, 0.0
+    return True, pttl / 1000 if pttl > 0 else float(TTL_BLOCKED_SECONDS)
+
+
+def _poll_invalidations() -> None:
+    """
+    Drop the local flags if a flip was announced (non-blocking; call with _local_lock held).
+
+    Subscribes on first use and again after a fork or a lost connection; the local copies are
+    dropped then too, since flips published meanwhile were missed.
+    """
+    global _pubsub, _pubsub_pid
+    try:
+        if _pubsub is None or _pubsub_pid != os.getpid():
+            _pubsub, _pubsub_pid = None, None
+            _invalidate_locked()
+            pubsub = _get_redis().pubsub()
+            pubsub.subscribe(REDIS_CHANNEL_BLOCKED)
+            _pubsub, _pubsub_pid = pubsub, os.getpid()
+        while _pubsub.get_message(timeout=0) is not None:
+            _invalidate_locked()  # A flip or the subscribe confirmation
+    except redis.RedisError as e:
+        logger.error(f"Redis error polling SMTP blocked invalidations: {e}")
+        _pubsub, _pubsub_pid = None, None
+        _invalidate_locked()
+
+
+def _invalidate_locked() -> None:
+    global _local_generation
+    _local_flags.clear()
+    _local_generation += 1
 
 
-def clear_smtp_blocked() -> None:
+def _invalidate_local_blocked() -> None:
+    with _local_lock:
+        _invalidate_locked()
+
+
+def reset_smtp_blocked_cache() -> None:
+    """Forget the local flags and the subscription (tests, or after swapping the Redis client)."""
+    global _pubsub, _pubsub_pid
+    with _local_lock:
+        _pubsub, _pubsub_pid = None, None
+        _invalidate_locked()
+
+
+def clear_smtp_blocked(egress: str | None = None) -> None:
     """
-    Clear the SMTP blocked flag (for testing/admin use).
+    Clear an egress node's SMTP blocked flags and timeout hosts, provider ones included
+    (for testing/admin use).
+
+    Args:
+        egress: Egress identity (None = this worker's, every source address with a pool)
     """
+    targets = [egress] if egress else egress_ids()
     try:
         r = _get_redis()
-        r.delete(REDIS_KEY_BLOCKED)
-        r.delete(REDIS_KEY_TIMEOUT_HOSTS)
-        logger.info("SMTP blocked flag and timeout hosts cleared.")
+        for target in targets:
+            keys = [
+                REDIS_KEY_BLOCKED.format(egress=target),
+                REDIS_KEY_TIMEOUT_HOSTS.format(egress=target),
+                REDIS_KEY_BLOCKED_PROVIDERS.format(egress=target),
+            ]
+            for pattern in (REDIS_KEY_PROVIDER_BLOCKED, REDIS_KEY_PROVIDER_TIMEOUT_HOSTS):
+                keys.extend(r.scan_iter(match=pattern.format(egress=target, provider="*")))
+            r.delete(*keys)
+            r.zrem(REDIS_KEY_EGRESS_NODES, target)
+        r.publish(REDIS_CHANNEL_BLOCKED, "0")
+        logger.info(f"SMTP blocked flags and timeout hosts cleared for {', '.join(targets)}.")
     except redis.RedisError as e:
         logger.error(f"Redis error clearing SMTP blocked status: {e}")
+    _invalidate_local_blocked()
+
+
+def _timeout_hosts(r: redis.Redis, key: str) -> list[dict]:
+    return [{"host": host, "timestamp": score} for host, score in r.zrange(key, 0, -1, withscores=True)]
+
+
+def _node_info(r: redis.Redis, egress: str) -> dict:
+    """Flag, timeout hosts and blocked providers of one egress node."""
+    blocked_ttl = r.ttl(REDIS_KEY_BLOCKED.format(egress=egress))
+    hosts = _timeout_hosts(r, REDIS_KEY_TIMEOUT_HOSTS.format(egress=egress))
+    providers = []
+    for provider in r.zrangebyscore(REDIS_KEY_BLOCKED_PROVIDERS.format(egress=egress), time.time(), "+inf"):
+        flag_key, hosts_key = _provider_keys(egress, provider)
+        provider_ttl = r.ttl(flag_key)
+        if provider_ttl > 0:
+            providers.append(
+                {
+                    "provider": provider,
+                    "blocked_ttl_seconds": provider_ttl,
+                    "timeout_hosts": _timeout_hosts(r, hosts_key),
+                }
+            )
+    return {
+        "egress_id": egress,
+        "smtp_blocked": blocked_ttl > 0,
+        "blocked_ttl_seconds": max(blocked_ttl, 0),
+        "timeout_hosts_count": len(hosts),
+        "timeout_hosts": hosts,
+        "blocked_providers": providers,
+    }
 
 
 def get_smtp_blocked_info() -> dict:
@@ -113,23 +383,28 @@ def get_smtp_blocked_info() -> dict:
     Get detailed info about SMTP blocked status (for debugging/admin).
 
     Returns:
-        Dict with blocked status, timeout hosts, and timing info.
+        Dict with this worker's node status (blocked flag, timeout hosts, blocked providers;
+        with a source address pool only the egress id and the combined flag), its egress ids,
+        the same breakdown for every egress with recent timeouts under "nodes", and thresholds.
     """
     try:
         r = _get_redis()
-        blocked = r.exists(REDIS_KEY_BLOCKED) == 1
-        blocked_ttl = r.ttl(REDIS_KEY_BLOCKED) if blocked else 0
-
-        # Get hosts with timestamps
-        hosts_with_scores = r.zrange(REDIS_KEY_TIMEOUT_HOSTS, 0, -1, withscores=True)
-        hosts = [{"host": host, "timestamp": score} for host, score in hosts_with_scores]
+        mine = egress_ids()
+        since = time.time() - WINDOW_SECONDS - TTL_BLOCKED_SECONDS
+        nodes = r.zrangebyscore(REDIS_KEY_EGRESS_NODES, since, "+inf")
+        breakdown = [_node_info(r, node) for node in sorted(set(nodes) | set(mine))]
+        by_id = {node["egress_id"]: node for node in breakdown}
+        if len(mine) == 1:
+            this_node = by_id[mine[0]]
+        else:
+            this_node = {"egress_id": egress_id(), "smtp_blocked": all(by_id[e]["smtp_blocked"] for e in mine)}
 
         return {
-            "smtp_blocked": blocked,
-            "blocked_ttl_seconds": blocked_ttl if blocked_ttl > 0 else 0,
-            "timeout_hosts_count": len(hosts),
-            "timeout_hosts": hosts,
+            **this_node,
+            "egress_ids": mine,
+            "nodes": breakdown,
             "threshold": THRESHOLD_HOSTS,
+            "provider_threshold": PROVIDER_THRESHOLD_HOSTS,
             "window_seconds": WINDOW_SECONDS,
         }
     except redis.RedisError as e:
@@ -138,3 +413,45 @@ def get_smtp_blocked_info() -> dict:
             "smtp_blocked": False,
             "error": str(e),
         }
+
+
+def get_catch_all_verdict(domain: str) -> tuple[bool | None, str] | None:
+    """
+    Read the cached catch-all verdict for a domain.
+
+    Returns:
+        (catch_all, reason) where catch_all is None for an inconclusive probe,
+        or None if nothing is cached (or Redis is down).
+    """
+    try:
+        r = _get_redis()
+        raw = r.get(f"{REDIS_KEY_CATCH_ALL_PREFIX}{domain.lower()}")
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading catch-all verdict: {e}")
+        return None
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+        return data["catch_all"], data.get("reason", "")
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+
+def set_catch_all_verdict(domain: str, catch_all: bool | None, reason: str) -> None:
+    """
+    Cache a catch-all verdict for all workers.
+
+    Definitive verdicts live TTL_CATCH_ALL_SECONDS; inconclusive ones (catch_all=None)
+    only TTL_CATCH_ALL_INCONCLUSIVE_SECONDS so the domain is retried soon.
+    """
+    ttl = TTL_CATCH_ALL_SECONDS if catch_all is not None else TTL_CATCH_ALL_INCONCLUSIVE_SECONDS
+    try:
+        r = _get_redis()
+        r.setex(
+            f"{REDIS_KEY_CATCH_ALL_PREFIX}{domain.lower()}",
+            ttl,
+            json.dumps({"catch_all": catch_all, "reason": reason}),
+        )
+    except redis.RedisError as e:
+        logger.error(f"Redis error caching catch-all verdict: {e}")
@@ -38,17 +38,17 @@ async def get_current_usage(db: AsyncSession, workspace_id: int) -> tuple[int, i
     return (row.verifications_count, row.exports_count)
 
 
-async def increment_verification_usage(db: AsyncSession, workspace_id: int) -> int:
-    """Increment verification count for current month; return new total."""
+async def increment_verification_usage(db: AsyncSession, workspace_id: int, count: int = 1) -> int:
+    """Add count verifications to the current month (one UPDATE for a whole batch); return new total."""
     now = datetime.now(UTC)
     period = now.strftime("%Y-%m")
     result = await db.execute(select(Usage).where(Usage.workspace_id == workspace_id, Usage.period == period))
     row = result.unique().scalars().one_or_none()
     if not row:
-        row = Usage(workspace_id=workspace_id, period=period, verifications_count=1, exports_count=0)
+        row = Usage(workspace_id=workspace_id, period=period, verifications_count=count, exports_count=0)
         db.add(row)
     else:
-        row.verifications_count += 1
+        row.verifications_count += count
         row.updated_at = now
     await db.flush()
     return row.verifications_count
@@ -69,10 +69,10 @@ async def increment_export_usage(db: AsyncSession, workspace_id: int) -> int:
     return row.exports_count
 
 
-async def check_verification_quota(db: AsyncSession, workspace: Workspace) -> str | None:
-    """Returns error message if over quota, else None."""
+async def check_verification_quota(db: AsyncSession, workspace: Workspace, count: int = 1) -> str | None:
+    """Returns error message if count more verifications would exceed the quota, else None."""
     verifications, _ = await get_current_usage(db, workspace.id)
     limit, _ = get_plan_limits(workspace.plan)
-    if verifications >= limit:
+    if verifications + count > limit:
         return f"Verification quota exceeded ({verifications}/{limit} this month)"
     return None
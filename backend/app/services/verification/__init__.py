@@ -1,16 +1,35 @@
 """Email verification module."""
 
+from app.services.verification.async_engine import (
+    AsyncSMTPProbeSession,
+    AsyncVerificationEngine,
+)
+from app.services.verification.deadline import Deadline
+from app.services.verification.disposable import (
+    DisposableIndex,
+    build_disposable_index,
+    is_disposable_domain,
+)
 from app.services.verification.dns_checker import (
     DNS_TIMEOUT_SECS,
+    DNSCache,
     check_domain_spf_dmarc,
+    get_dns_cache_stats,
     mx_lookup,
     resolve_to_ip,
 )
+from app.services.verification.domain_context import (
+    DomainContext,
+    build_domain_context,
+    probe_domain_recipients,
+)
 from app.services.verification.result import DISPOSABLE_DOMAINS, VerifyResult
 from app.services.verification.smtp_checker import (
     DEFAULT_MAIL_FROM,
     SMTP_TIMEOUT_SECS,
+    SMTPProbeSession,
     detect_catch_all,
+    smtp_probe_many,
     smtp_probe_rcpt,
 )
 from app.services.verification.verifier import verify_and_pick_best, verify_email
@@ -24,13 +43,27 @@ __all__ = [
     # Result
     "VerifyResult",
     "DISPOSABLE_DOMAINS",
+    # Time budget
+    "Deadline",
+    # Disposable-domain index
+    "is_disposable_domain",
+    "build_disposable_index",
+    "DisposableIndex",
     # DNS
     "mx_lookup",
     "resolve_to_ip",
     "check_domain_spf_dmarc",
     "DNS_TIMEOUT_SECS",
+    "DNSCache",
+    "get_dns_cache_stats",
+    # Domain context
+    "DomainContext",
+    "build_domain_context",
+    "probe_domain_recipients",
     # SMTP
     "smtp_probe_rcpt",
+    "smtp_probe_many",
+    "SMTPProbeSession",
     "detect_catch_all",
     "SMTP_TIMEOUT_SECS",
     "DEFAULT_MAIL_FROM",
@@ -41,4 +74,7 @@ __all__ = [
     # Main functions
     "verify_email",
     "verify_and_pick_best",
+    # Asyncio engine
+    "AsyncVerificationEngine",
+    "AsyncSMTPProbeSession",
 ]
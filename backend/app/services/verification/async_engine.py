@@ -0,0 +1,543 @@
+"""Asyncio verification engine: same checks and VerifyResult as verifier.py, many probes in flight.
+
+The blocking path (dns.resolver + smtplib) holds a worker on one socket at a time. This engine
+speaks the same RCPT protocol over asyncio streams and resolves with dns.asyncresolver, so one
+process can keep many domains and MX sessions open concurrently. Concurrency is bounded by a
+global domain semaphore and a per-MX-host semaphore.
+
+Usage:
+    engine = AsyncVerificationEngine(max_concurrent_domains=100)
+    results = await engine.verify_many(["john@acme.com", "jane@example.org"])
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import smtplib
+from collections import defaultdict
+from typing import Any
+
+import dns.asyncresolver
+import dns.resolver
+
+from app.core.log_service import VerificationLogger
+from app.services.smtp_blocked_detector import (
+    is_provider_blocked,
+    is_smtp_blocked,
+    record_smtp_timeout,
+    set_catch_all_verdict,
+    source_addresses,
+)
+from app.services.verification.dns_checker import (
+    DNS_TIMEOUT_SECS,
+    NEGATIVE_DNS_ERRORS,
+    configured_nameservers,
+    detect_provider,
+    dns_cache,
+    is_gateway_provider,
+)
+from app.services.verification.domain_context import (
+    DomainContext,
+    apply_provider_policy,
+    apply_rcpt_results,
+    load_cached_catch_all,
+    set_hosted_provider,
+)
+from app.services.verification.egress_pool import (
+    NO_SOURCE_DETAIL,
+    SMTP_SERVICE_UNAVAILABLE,
+    is_throttle_error,
+    mark_source_throttled,
+    pick_source_address,
+)
+from app.services.verification.provider_fingerprints import parse_spf_includes
+from app.services.verification.result import VerifyResult
+from app.services.verification.smtp_checker import (
+    DEFAULT_MAIL_FROM,
+    MAX_PIPELINE_BATCH,
+    SMTP_PORT,
+    SMTP_SUCCESS_MAX,
+    SMTP_SUCCESS_MIN,
+    SMTP_TIMEOUT_SECS,
+    SMTP_TOO_MANY_RECIPIENTS,
+    _classify_rcpt_reply,
+    _local_hostname,
+    random_probe_address,
+)
+from app.services.verification.smtp_rate_limiter import acquire_smtp_token_async
+from app.services.verification.verifier import _build_result, _no_mx_result, _precheck_email
+
+MAX_CONCURRENT_DOMAINS = 50
+MAX_CONCURRENT_PER_MX = 2  # Parallel sessions to one MX host; more looks like abuse
+QUIT_TIMEOUT_SECS = 2.0
+SMTP_REPLY_CONTINUATION = "-"
+SMTP_CODE_LEN = 3
+
+_DNS_SOFT_ERRORS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout, dns.resolver.NoNameservers)
+
+_async_resolver: dns.asyncresolver.Resolver | None = None
+
+
+async def cached_resolve_async(name: str, rdtype: str, lifetime: float) -> Any:
+    """dns.asyncresolver.resolve() through the same process-wide cache as cached_resolve()."""
+    global _async_resolver
+    found, value = dns_cache.get(name, rdtype)
+    if not found:
+        nameservers = configured_nameservers()
+        try:
+            if nameservers:
+                if _async_resolver is None:
+                    _async_resolver = dns.asyncresolver.Resolver(configure=False)
+                    _async_resolver.nameservers = nameservers
+                value = await _async_resolver.resolve(name, rdtype, lifetime=lifetime)
+            else:
+                value = await dns.asyncresolver.resolve(name, rdtype, lifetime=lifetime)
+        except NEGATIVE_DNS_ERRORS as e:
+            value = e
+        dns_cache.put(name, rdtype, value)
+    if isinstance(value, BaseException):
+        raise value.with_traceback(None)
+    return value
+
+
+async def mx_lookup_async(domain: str, dns_timeout_seconds: float | None = None) -> list[tuple[int, str]]:
+    """Async mx_lookup(): list of (preference, exchange) sorted by preference. Raises like mx_lookup()."""
+    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
+    answers = await cached_resolve_async(domain, "MX", lifetime=timeout)
+    mx = [(int(r.preference), str(r.exchange).rstrip(".")) for r in answers]
+    mx.sort(key=lambda x: x[0])
+    return mx
+
+
+async def resolve_to_ip_async(host: str, dns_timeout_seconds: float | None = None) -> str | None:
+    """Async resolve_to_ip(): IP literal as-is, else first A then AAAA record, None on failure."""
+    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
+    host = host.rstrip(".")
+    if not host:
+        return None
+    try:
+        return str(ipaddress.ip_address(host))
+    except ValueError:
+        pass
+
+    for rdtype in ("A", "AAAA"):
+        try:
+            answers = await cached_resolve_async(host, rdtype, lifetime=timeout)
+            for r in answers:
+                return str(r)
+        except _DNS_SOFT_ERRORS:
+            pass
+    return None
+
+
+async def check_domain_spf_dmarc_async(domain: str, dns_timeout_seconds: float | None = None) -> tuple[bool, bool]:
+    """Async check_domain_spf_dmarc(): both TXT lookups run concurrently."""
+    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
+
+    async def has_txt(name: str, marker: str) -> bool:
+        try:
+            answers = await cached_resolve_async(name, "TXT", lifetime=timeout)
+        except _DNS_SOFT_ERRORS:
+            return False
+        return any(marker in str(r).lower() for r in answers)
+
+    has_spf, has_dmarc = await asyncio.gather(has_txt(domain, "v=spf1"), has_txt(f"_dmarc.{domain}", "v=dmarc1"))
+    return has_spf, has_dmarc
+
+
+async def spf_includes_async(domain: str, dns_timeout_seconds: float | None = None) -> list[str]:
+    """Async spf_includes()."""
+    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
+    try:
+        answers = await cached_resolve_async(domain, "TXT", lifetime=timeout)
+    except _DNS_SOFT_ERRORS:
+        return []
+    return parse_spf_includes([str(r) for r in answers])
+
+
+class AsyncSMTPProbeSession:
+    """
+    Asyncio counterpart of SMTPProbeSession: one connection, one EHLO, many RCPT TO.
+
+    Same transaction handling (MAIL FROM, pipelined RCPT batches, RSET between probes and
+    after 452) and the same (accepted, detail, short_code_msg) outcomes.
+    """
+
+    def __init__(
+        self,
+        mx_host: str,
+        mail_from: str,
+        smtp_timeout_seconds: int | None = None,
+        dns_timeout_seconds: float | None = None,
+        logger: VerificationLogger | None = None,
+        port: int = SMTP_PORT,
+    ):
+        self.mx_host = mx_host
+        self.mail_from = mail_from
+        self.smtp_timeout = smtp_timeout_seconds if smtp_timeout_seconds is not None else SMTP_TIMEOUT_SECS
+        self.dns_timeout = dns_timeout_seconds
+        self.port = port
+        self.log = logger or VerificationLogger()
+        self.error: str | None = None
+        self.pipelining = False
+        self.source_address: str | None = None  # Pool address the connection is bound to (see egress_pool)
+        self._source_throttled = False
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._in_transaction = False
+
+    async def __aenter__(self) -> AsyncSMTPProbeSession:
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def open(self) -> bool:
+        """Pick a source address, take a connection token, resolve the MX host, connect, read the banner and EHLO."""
+        if source_addresses():
+            self.source_address = await asyncio.to_thread(pick_source_address, self.mx_host)
+            if self.source_address is None:
+                self.log.debug_smtp_no_source_address(self.mx_host)
+                self.error = NO_SOURCE_DETAIL
+                return False
+            self.log.debug_smtp_source_address(self.mx_host, self.source_address)
+        limited = await acquire_smtp_token_async(self.mx_host, source_address=self.source_address)
+        if limited:
+            self.log.debug_smtp_rate_limited(self.mx_host, limited)
+            self.error = f"SMTP error: {limited}"
+            return False
+        ip = await resolve_to_ip_async(self.mx_host, dns_timeout_seconds=self.dns_timeout)
+        self.log.debug_smtp_dns_resolve(self.mx_host, ip)
+        if not ip:
+            self.error = "SMTP error: DNS timeout or no A/AAAA"
+            return False
+
+        try:
+            self.log.debug_smtp_connecting(self.mx_host, ip, self.smtp_timeout)
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    ip, self.port, local_addr=(self.source_address, 0) if self.source_address else None
+                ),
+                timeout=self.smtp_timeout,
+            )
+            code, msg = await self._read_reply()
+            if not SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX:
+                raise smtplib.SMTPConnectError(code, msg)
+            code, msg = await self._command(f"EHLO {_local_hostname()}")
+            if SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX:
+                features = msg.decode("latin-1").lower().splitlines()[1:]
+                self.pipelining = any(f.split(" ", 1)[0] == "pipelining" for f in features)
+            else:
+                code, msg = await self._command(f"HELO {_local_hostname()}")
+                if not SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX:
+                    raise smtplib.SMTPHeloError(code, msg)
+            return True
+        except OSError as e:  # asyncio/builtin TimeoutError and smtplib errors are OSError subclasses
+            await self._fail(e)
+            return False
+
+    async def close(self) -> None:
+        """QUIT and close the connection (errors ignored)."""
+        writer, self._writer = self._writer, None
+        self._in_transaction = False
+        if writer is None:
+            return
+        try:
+            writer.write(b"QUIT\r\n")
+            await asyncio.wait_for(writer.drain(), timeout=QUIT_TIMEOUT_SECS)
+        except OSError:
+            pass
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout=QUIT_TIMEOUT_SECS)
+        except OSError:
+            pass
+
+    async def probe(self, recipients: list[str]) -> dict[str, tuple[bool, str, str | None]]:
+        """RCPT TO each recipient in a fresh transaction. Same return shape as SMTPProbeSession.probe()."""
+        results: dict[str, tuple[bool, str, str | None]] = {}
+        if not recipients:
+            return results
+        if self._writer is None:
+            err = self.error or "SMTP error: not connected"
+            return {r: (False, err, None) for r in recipients}
+
+        try:
+            await self._end_transaction()
+            pending = list(recipients)
+            retried: set[str] = set()
+            while pending:
+                if not self._in_transaction:
+                    code, msg = await self._command(f"MAIL FROM:{smtplib.quoteaddr(self.mail_from)}")
+                    self._in_transaction = SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX
+                    if code == SMTP_SERVICE_UNAVAILABLE:
+                        await self._throttled()
+                    if not self._in_transaction:
+                        _, _, short = _classify_rcpt_reply(code, msg)
+                        for r in pending:
+                            results[r] = (False, f"SMTP error: MAIL FROM refused ({code})", short)
+                        break
+                batch = pending[: MAX_PIPELINE_BATCH if self.pipelining else 1]
+                pending = pending[len(batch) :]
+                requeue: list[str] = []
+                for rcpt, (code, msg) in zip(batch, await self._send_rcpts(batch), strict=True):
+                    if code == SMTP_TOO_MANY_RECIPIENTS and rcpt not in retried:
+                        retried.add(rcpt)
+                        requeue.append(rcpt)
+                        continue
+                    if code == SMTP_SERVICE_UNAVAILABLE:
+                        await self._throttled()
+                    results[rcpt] = _classify_rcpt_reply(code, msg)
+                    self.log.debug_smtp_rcpt_result(self.mail_from, rcpt, results[rcpt][2] or "")
+                if requeue:
+                    pending = requeue + pending
+                    await self._end_transaction()
+        except OSError as e:
+            err = await self._fail(e)
+            for r in recipients:
+                results.setdefault(r, (False, err, None))
+
+        return results
+
+    async def _end_transaction(self) -> None:
+        if self._writer is not None and self._in_transaction:
+            await self._command("RSET")
+        self._in_transaction = False
+
+    async def _send_rcpts(self, batch: list[str]) -> list[tuple[int, bytes]]:
+        """Write all RCPT commands of the batch at once, then read one reply per command."""
+        self._writer.write("".join(f"RCPT TO:{smtplib.quoteaddr(r)}\r\n" for r in batch).encode("ascii"))
+        await self._writer.drain()
+        return [await self._read_reply() for _ in batch]
+
+    async def _command(self, line: str) -> tuple[int, bytes]:
+        self._writer.write(f"{line}\r\n".encode("ascii"))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> tuple[int, bytes]:
+        """Read a (possibly multi-line) reply, like smtplib.SMTP.getreply()."""
+        lines: list[bytes] = []
+        code = -1
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), timeout=self.smtp_timeout)
+            if not line:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[SMTP_CODE_LEN + 1 :].strip())
+            try:
+                code = int(line[:SMTP_CODE_LEN])
+            except ValueError:
+                code = -1
+                break
+            if line[SMTP_CODE_LEN : SMTP_CODE_LEN + 1] != SMTP_REPLY_CONTINUATION.encode():
+                break
+        return code, b"\n".join(lines)
+
+    async def _throttled(self) -> None:
+        """Same as SMTPProbeSession._throttled()."""
+        if self.source_address and not self._source_throttled:
+            self._source_throttled = True
+            self.log.debug_smtp_source_throttled(self.mx_host, self.source_address)
+            await asyncio.to_thread(mark_source_throttled, self.source_address, self.mx_host)
+
+    async def _fail(self, e: OSError) -> str:
+        """Same as SMTPProbeSession._fail(); the blocked detector write runs off the event loop."""
+        err = f"SMTP error: {type(e).__name__}"
+        self.log.debug_smtp_exception(self.mx_host, err)
+        connection_error = not isinstance(e, smtplib.SMTPException) and (
+            "timed out" in str(e).lower() or "connection refused" in str(e).lower()
+        )
+        if isinstance(e, TimeoutError) or connection_error:
+            await asyncio.to_thread(
+                record_smtp_timeout, self.mx_host, detect_provider([(0, self.mx_host)]), self.source_address
+            )
+        if is_throttle_error(e):
+            await self._throttled()
+        self.error = err
+        await self.close()
+        return err
+
+
+class AsyncVerificationEngine:
+    """
+    Verify many emails concurrently with asyncio.
+
+    Emails are grouped by domain; each domain is resolved once and probed over one session
+    per MX host (catch-all address and all its mailboxes together), like verify_and_pick_best.
+
+    Args:
+        max_concurrent_domains: Domains processed at the same time
+        max_concurrent_per_mx: Simultaneous SMTP sessions to one MX host
+        smtp_port: SMTP port (25 in production; tests point it at a local server)
+        provider_policies: Workspace overrides of the provider policy table (see provider_policy)
+    """
+
+    def __init__(
+        self,
+        mail_from: str | None = None,
+        smtp_timeout_seconds: int | None = None,
+        dns_timeout_seconds: float | None = None,
+        logger: VerificationLogger | None = None,
+        max_concurrent_domains: int = MAX_CONCURRENT_DOMAINS,
+        max_concurrent_per_mx: int = MAX_CONCURRENT_PER_MX,
+        smtp_port: int = SMTP_PORT,
+        provider_policies: dict[str, dict] | None = None,
+    ):
+        self.mail_from = mail_from or DEFAULT_MAIL_FROM
+        self.smtp_timeout_seconds = smtp_timeout_seconds
+        self.dns_timeout_seconds = dns_timeout_seconds
+        self.log = logger or VerificationLogger()
+        self.smtp_port = smtp_port
+        self.provider_policies = provider_policies
+        self.max_concurrent_per_mx = max_concurrent_per_mx
+        self._domain_sem = asyncio.Semaphore(max_concurrent_domains)
+        self._mx_sems: dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max_concurrent_per_mx))
+
+    async def verify_email(self, email: str) -> VerifyResult:
+        """Async verify_email()."""
+        return (await self.verify_many([email]))[0]
+
+    async def verify_many(self, emails: list[str], smtp_blocked: bool | None = None) -> list[VerifyResult]:
+        """
+        Verify emails concurrently. Results are returned in input order.
+
+        Args:
+            smtp_blocked: Pre-computed blocked flag (None = read it from Redis once)
+        """
+        if smtp_blocked is None:
+            smtp_blocked = await asyncio.to_thread(is_smtp_blocked)
+
+        results: dict[str, VerifyResult] = {}
+        by_domain: dict[str, list[str]] = defaultdict(list)
+        for email in dict.fromkeys(emails):
+            precheck = _precheck_email(email, smtp_blocked, self.log)
+            if precheck is not None:
+                results[email] = precheck
+            else:
+                by_domain[email.split("@", 1)[1].strip().lower()].append(email)
+
+        for domain_results in await asyncio.gather(
+            *(self.verify_domain(domain, group, smtp_blocked=smtp_blocked) for domain, group in by_domain.items())
+        ):
+            results.update(domain_results)
+        return [results[email] for email in emails]
+
+    async def verify_domain(
+        self, domain: str, emails: list[str], smtp_blocked: bool = False
+    ) -> dict[str, VerifyResult]:
+        """Verify mailboxes of one (already validated) domain with a single domain context."""
+        async with self._domain_sem:
+            ctx = await self.build_domain_context(domain, smtp_blocked=smtp_blocked)
+            if not ctx.mx_found:
+                return {email: _no_mx_result(email, smtp_blocked) for email in emails}
+            await self.probe_domain_recipients(ctx, emails)
+
+        results: dict[str, VerifyResult] = {}
+        for email in emails:
+            smtp_attempted, accepted_any, detail_any, smtp_short = False, False, "", None
+            if email in ctx.rcpt_results:
+                mxh, accepted_any, detail, smtp_short = ctx.rcpt_results[email]
+                smtp_attempted = True
+                detail_any = f"{mxh}: {detail}"
+            results[email] = _build_result(
+                email,
+                ctx,
+                smtp_attempted=smtp_attempted,
+                accepted_any=accepted_any,
+                detail_any=detail_any,
+                smtp_short=smtp_short,
+            )
+        return results
+
+    async def build_domain_context(self, domain: str, smtp_blocked: bool = False) -> DomainContext:
+        """Async build_domain_context() without the catch-all probe (see probe_domain_recipients)."""
+        ctx = DomainContext(domain=domain.strip().lower(), smtp_blocked=smtp_blocked)
+        try:
+            ctx.mx = await mx_lookup_async(ctx.domain, dns_timeout_seconds=self.dns_timeout_seconds)
+        except Exception as e:
+            self.log.debug_mx_lookup_failed(ctx.domain, type(e).__name__, str(e))
+            ctx.mx_error = type(e).__name__
+            return ctx
+
+        self.log.debug_mx_lookup(ctx.domain, len(ctx.mx), ", ".join(f"{pref}={host}" for pref, host in ctx.mx))
+        ctx.provider = detect_provider(ctx.mx)
+        if ctx.provider != "other":
+            self.log.debug_provider_detected(ctx.provider)
+        apply_provider_policy(ctx, self.provider_policies, logger=self.log)
+
+        ctx.spf_present, ctx.dmarc_present = await check_domain_spf_dmarc_async(
+            ctx.domain, dns_timeout_seconds=self.dns_timeout_seconds
+        )
+        self.log.debug_dns_spf_dmarc(ctx.spf_present, ctx.dmarc_present)
+        if ctx.spf_present and is_gateway_provider(ctx.provider):
+            set_hosted_provider(ctx, await spf_includes_async(ctx.domain, self.dns_timeout_seconds), logger=self.log)
+        if ctx.smtp_blocked:
+            self.log.debug_smtp_skipped()
+        elif await asyncio.to_thread(is_provider_blocked, ctx.provider):
+            ctx.smtp_blocked = True
+            self.log.debug_smtp_skipped_provider_blocked(ctx.provider)
+        return ctx
+
+    async def probe_domain_recipients(self, ctx: DomainContext, candidates: list[str]) -> None:
+        """Async probe_domain_recipients(): catch-all address plus candidates, one session per MX."""
+        if ctx.smtp_blocked or not ctx.mx_found or not ctx.policy.probe:
+            return
+        test_email = None
+        if ctx.policy.catch_all and not await asyncio.to_thread(load_cached_catch_all, ctx, self.log):
+            test_email = random_probe_address(ctx.domain)
+            self.log.debug_catchall_checking(test_email)
+        results = await self.probe_many(
+            ctx.mx_hosts,
+            [test_email, *candidates] if test_email else candidates,
+            max_mx_hosts=ctx.policy.max_mx_hosts,
+            smtp_timeout_seconds=ctx.smtp_timeout(self.smtp_timeout_seconds),
+        )
+        apply_rcpt_results(ctx, test_email, candidates, results, logger=self.log)
+        if test_email:
+            await asyncio.to_thread(set_catch_all_verdict, ctx.domain, ctx.catch_all, ctx.catch_all_reason)
+
+    async def probe_many(
+        self,
+        mx_hosts: list[str],
+        recipients: list[str],
+        max_mx_hosts: int = 2,
+        smtp_timeout_seconds: int | None = None,
+    ) -> dict[str, tuple[str, bool, str, str | None]]:
+        """Async smtp_probe_many(): temporary failures and SMTP errors move on to the next MX host."""
+        results: dict[str, tuple[str, bool, str, str | None]] = {}
+        pending = list(dict.fromkeys(recipients))
+
+        for mx in mx_hosts[:max_mx_hosts]:
+            if not pending:
+                break
+            for r in pending:
+                self.log.debug_rcpt_verifying(r, mx)
+            async with (
+                self._mx_sems[mx.lower()],
+                AsyncSMTPProbeSession(
+                    mx,
+                    self.mail_from,
+                    smtp_timeout_seconds=smtp_timeout_seconds or self.smtp_timeout_seconds,
+                    dns_timeout_seconds=self.dns_timeout_seconds,
+                    logger=self.log,
+                    port=self.smtp_port,
+                ) as session,
+            ):
+                outcomes = await session.probe(pending)
+
+            retry: list[str] = []
+            for r in pending:
+                accepted, detail, short = outcomes[r]
+                previous_short = results[r][3] if r in results else None
+                results[r] = (mx, accepted, detail, short if short is not None else previous_short)
+                if not accepted and ("Temporary" in detail or "SMTP error" in detail):
+                    retry.append(r)
+            pending = retry
+
+        return results
@@ -0,0 +1,51 @@
+"""Per-lead time budget, propagated as an absolute deadline through DNS and SMTP calls.
+
+verify_and_pick_best creates one Deadline for the lead and passes it down. Each blocking step
+uses min(its own timeout, time left) and nothing new is started once it has passed, so a lead
+never runs much past its budget: the overshoot is bounded by the step in progress when it
+expires (a DNS query or one SMTP command). Cached DNS answers are still served after expiry.
+"""
+
+from __future__ import annotations
+
+import time
+
+# Detail of probes not sent because the lead's budget ran out ("SMTP error" = inconclusive, retry-able)
+BUDGET_EXHAUSTED_DETAIL = "SMTP error: time budget exhausted"
+
+
+class Deadline:
+    """Absolute point in time.monotonic() by which a lead's verification must finish."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_seconds(cls, seconds: float | None) -> Deadline | None:
+        """Deadline seconds from now; None (no budget) for 0 or None."""
+        if not seconds or seconds <= 0:
+            return None
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, default: float) -> float:
+        """A step's timeout capped by the time left."""
+        return min(default, self.remaining())
+
+
+def capped_timeout(default: float, deadline: Deadline | None) -> float:
+    """default, or the time left if a deadline is set and closer."""
+    return deadline.timeout(default) if deadline is not None else default
+
+
+def budget_exhausted(deadline: Deadline | None) -> bool:
+    return deadline is not None and deadline.expired
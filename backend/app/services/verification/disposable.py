@@ -0,0 +1,183 @@
+"""Disposable-domain index: a sorted, memory-mapped domain list shared by all worker processes.
+
+Disposable lists run to 100k+ domains; as a Python set that is tens of MB in every prefork child.
+scripts/build_disposable_index.py compiles a plain list into a binary file that every process
+maps read-only, so the OS page cache holds a single copy and a lookup is a binary search over
+the mapped bytes (no per-process parsing or allocation).
+
+File layout (little-endian):
+    b"DISPIDX1" | uint32 count | uint32 offsets[count + 1] | domains, sorted, concatenated
+
+A domain matches when it or any parent domain is in the index (x.mailinator.com matches
+mailinator.com). The file is re-checked every DISPOSABLE_RELOAD_CHECK_SECONDS and re-mapped when
+replaced: the build writes a temporary file and renames it, so readers never see a partial index.
+The built-in DISPOSABLE_DOMAINS set is always checked as well.
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.verification.result import DISPOSABLE_DOMAINS
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"DISPIDX1"
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<I")
+DISPOSABLE_RELOAD_CHECK_SECONDS = 30.0
+
+
+def normalize_domain(domain: str) -> str:
+    return domain.strip().lower().rstrip(".")
+
+
+def parent_domains(domain: str) -> list[str]:
+    """domain and its parents down to two labels (a.b.mailinator.com, b.mailinator.com, mailinator.com)."""
+    labels = normalize_domain(domain).split(".")
+    return [".".join(labels[i:]) for i in range(max(len(labels) - 1, 1))]
+
+
+def read_domain_list(lines: Iterable[str]) -> list[str]:
+    """Domains from a text list: one per line, blank lines and # comments ignored."""
+    out = []
+    for line in lines:
+        domain = normalize_domain(line.split("#", 1)[0])
+        if domain and "." in domain:
+            out.append(domain)
+    return out
+
+
+def build_disposable_index(domains: Iterable[str], path: str | Path) -> int:
+    """
+    Write the binary index for domains at path (atomic replace). Returns the number of domains.
+
+    Raises ValueError for a domain that is not ASCII (IDN domains must be given in punycode).
+    """
+    try:
+        encoded = sorted({normalize_domain(d).encode("ascii") for d in domains if normalize_domain(d)})
+    except UnicodeEncodeError as e:
+        raise ValueError(f"Disposable domains must be ASCII (punycode): {e}") from e
+    offsets = [0]
+    for d in encoded:
+        offsets.append(offsets[-1] + len(d))
+
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, len(encoded)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(b"".join(encoded))
+    os.replace(tmp, path)
+    return len(encoded)
+
+
+class DisposableIndex:
+    """Read-only view of an index file (see module docstring)."""
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._stat.st_size else None
+        if self._mm is None or self._mm[: len(INDEX_MAGIC)] != INDEX_MAGIC or self._stat.st_size < _HEADER.size:
+            self.close()
+            raise ValueError(f"Not a disposable-domain index: {self.path}")
+        _, self.count = _HEADER.unpack_from(self._mm, 0)
+        self._data_start = _HEADER.size + (self.count + 1) * _OFFSET.size
+        # A truncated file would make every lookup fail: refuse it so the built-in list applies
+        if self._stat.st_size < self._data_start or self._stat.st_size < self._data_start + self._offset(self.count):
+            self.close()
+            raise ValueError(f"Truncated disposable-domain index: {self.path}")
+
+    def _offset(self, i: int) -> int:
+        return _OFFSET.unpack_from(self._mm, _HEADER.size + i * _OFFSET.size)[0]
+
+    def _entry(self, i: int) -> bytes:
+        start, end = struct.unpack_from("<II", self._mm, _HEADER.size + i * _OFFSET.size)
+        return self._mm[self._data_start + start : self._data_start + end]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, domain: str) -> bool:
+        key = domain.encode("ascii", errors="replace")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            if entry == key:
+                return True
+            if entry < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return False
+
+    def is_stale(self) -> bool:
+        """True if the file at path was replaced since it was mapped."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False  # Keep serving the mapped copy
+        return (st.st_ino, st.st_mtime_ns, st.st_size) != (
+            self._stat.st_ino,
+            self._stat.st_mtime_ns,
+            self._stat.st_size,
+        )
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+
+
+_index: DisposableIndex | None = None
+_index_path: str | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _current_index() -> DisposableIndex | None:
+    """Mapped index for settings.disposable_domains_index_path, re-mapped when the file changes."""
+    global _index, _index_path, _checked_at
+    path = settings.disposable_domains_index_path
+    now = time.monotonic()
+    if path == _index_path and now - _checked_at < DISPOSABLE_RELOAD_CHECK_SECONDS:
+        return _index
+    with _lock:
+        _checked_at = now
+        if path == _index_path and _index is not None and not _index.is_stale():
+            return _index
+        _index_path = path
+        # The old map is left to the GC: a concurrent lookup may still be reading it
+        _index = None
+        if path:
+            try:
+                _index = DisposableIndex(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Cannot load disposable-domain index {path}: {e}")
+        return _index
+
+
+def reload_disposable_index() -> None:
+    """Drop the mapped index so the next lookup maps the file again."""
+    global _index, _index_path
+    with _lock:
+        _index, _index_path = None, None
+
+
+def is_disposable_domain(domain: str) -> bool:
+    """True if domain or a parent domain is disposable (built-in list or the mapped index)."""
+    candidates = parent_domains(domain)
+    if any(d in DISPOSABLE_DOMAINS for d in candidates):
+        return True
+    index = _current_index()
+    return index is not None and any(d in index for d in candidates)
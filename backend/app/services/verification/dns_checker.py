@@ -3,29 +3,156 @@
 from __future__ import annotations
 
 import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
 
 import dns.resolver
 
 from app.core.config import settings
+from app.services.verification.deadline import Deadline, capped_timeout
+from app.services.verification.provider_fingerprints import get_provider_fingerprints, parse_spf_includes
 
 DNS_TIMEOUT_SECS = getattr(settings, "dns_timeout_seconds", 5.0)
+DNS_CACHE_SIZE = getattr(settings, "dns_cache_size", 10000)
+DNS_CACHE_MAX_TTL_SECS = getattr(settings, "dns_cache_max_ttl_seconds", 3600)
+DNS_NEGATIVE_TTL_SECS = getattr(settings, "dns_negative_ttl_seconds", 300)
+# TTL for answers that carry no expiration (should not happen with real dnspython answers)
+DNS_DEFAULT_TTL_SECS = 300
 
-# Provider detection patterns based on MX hostnames
-PROVIDER_PATTERNS: dict[str, list[str]] = {
-    "google": ["google.com", "googlemail.com", "gmail-smtp-in", "aspmx.l.google"],
-    "microsoft": ["outlook.com", "protection.outlook", "hotmail", "microsoft.com"],
-    "ionos": ["ionos."],
-    "barracuda": ["barracudanetworks.com", "ess.barracuda"],
-    "proofpoint": ["pphosted.com", "proofpoint.com"],
-    "mimecast": ["mimecast.com"],
-    "ovh": ["ovh.net", "ovh.com"],
-    "zoho": ["zoho.com", "zoho.eu"],
-    "yahoo": ["yahoodns.net", "yahoo.com"],
-    "icloud": ["icloud.com", "apple.com"],
-}
-
-
-def mx_lookup(domain: str, dns_timeout_seconds: float | None = None) -> list[tuple[int, str]]:
+# Definitive "does not exist" answers, cached for DNS_NEGATIVE_TTL_SECS. Timeouts are never cached.
+NEGATIVE_DNS_ERRORS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)
+
+
+class DNSCache:
+    """
+    Process-wide LRU cache of DNS answers keyed by (name, rdtype).
+
+    Positive answers live until the record TTL expires (capped at max_ttl). NXDOMAIN/NoAnswer
+    are cached as the exception for negative_ttl seconds and re-raised on hit. Thread-safe:
+    Celery threads and the API executor share one instance.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, rdtype: str) -> tuple[str, str]:
+        return name.rstrip(".").lower(), rdtype.upper()
+
+    def get(self, name: str, rdtype: str) -> tuple[bool, Any]:
+        """Returns (found, answer_or_exception). Counts a hit or a miss."""
+        key = self._key(name, rdtype)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, name: str, rdtype: str, value: Any) -> None:
+        """Store an answer (TTL from its expiration) or a negative exception (negative_ttl)."""
+        if self.max_size <= 0:
+            return
+        if isinstance(value, NEGATIVE_DNS_ERRORS):
+            ttl = self.negative_ttl
+        else:
+            expiration = getattr(value, "expiration", None)
+            ttl = expiration - time.time() if isinstance(expiration, int | float) else DNS_DEFAULT_TTL_SECS
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        key = self._key(name, rdtype)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+dns_cache = DNSCache(DNS_CACHE_SIZE, DNS_CACHE_MAX_TTL_SECS, DNS_NEGATIVE_TTL_SECS)
+
+_resolver: dns.resolver.Resolver | None = None
+
+
+def configured_nameservers() -> list[str]:
+    """Nameservers from settings.dns_nameservers (comma-separated); empty = system resolver."""
+    return [ns.strip() for ns in getattr(settings, "dns_nameservers", "").split(",") if ns.strip()]
+
+
+def _get_resolver() -> dns.resolver.Resolver | None:
+    """Shared resolver for the configured nameservers; None = system resolver (dns.resolver.resolve)."""
+    global _resolver
+    nameservers = configured_nameservers()
+    if not nameservers:
+        return None
+    if _resolver is None:
+        _resolver = dns.resolver.Resolver(configure=False)
+        _resolver.nameservers = nameservers
+    return _resolver
+
+
+def cached_resolve(name: str, rdtype: str, lifetime: float) -> Any:
+    """
+    dns.resolver.resolve() through the process-wide cache.
+
+    Raises the same exceptions as dns.resolver.resolve(); cached NXDOMAIN/NoAnswer are re-raised.
+    """
+    found, value = dns_cache.get(name, rdtype)
+    if not found:
+        try:
+            resolver = _get_resolver()
+            if resolver is not None:
+                value = resolver.resolve(name, rdtype, lifetime=lifetime)
+            else:
+                value = dns.resolver.resolve(name, rdtype, lifetime=lifetime)
+        except NEGATIVE_DNS_ERRORS as e:
+            value = e
+        dns_cache.put(name, rdtype, value)
+    if isinstance(value, BaseException):
+        raise value.with_traceback(None)
+    return value
+
+
+def get_dns_cache_stats() -> dict[str, int]:
+    """Hit/miss counters and current size of the process-wide DNS cache."""
+    return dns_cache.stats()
+
+
+def _lifetime(dns_timeout_seconds: float | None, deadline: Deadline | None) -> float:
+    """Query lifetime: the given timeout (else the global one), capped by the lead's deadline.
+
+    Past the deadline the lifetime is 0 and dnspython raises Timeout without sending a query;
+    cached answers are still returned.
+    """
+    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
+    return capped_timeout(timeout, deadline)
+
+
+def mx_lookup(
+    domain: str, dns_timeout_seconds: float | None = None, deadline: Deadline | None = None
+) -> list[tuple[int, str]]:
     """
     Returns list of (preference, exchange) sorted by preference.
 
@@ -34,8 +161,7 @@ def mx_lookup(domain: str, dns_timeout_seconds: float | None = None) -> list[tup
         dns.resolver.NoAnswer: No MX records
         dns.resolver.Timeout: DNS query timed out
     """
-    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
-    answers = dns.resolver.resolve(domain, "MX", lifetime=timeout)
+    answers = cached_resolve(domain, "MX", lifetime=_lifetime(dns_timeout_seconds, deadline))
     mx = []
     for r in answers:
         mx.append((int(r.preference), str(r.exchange).rstrip(".")))
@@ -43,12 +169,11 @@ def mx_lookup(domain: str, dns_timeout_seconds: float | None = None) -> list[tup
     return mx
 
 
-def resolve_to_ip(host: str, dns_timeout_seconds: float | None = None) -> str | None:
+def resolve_to_ip(host: str, dns_timeout_seconds: float | None = None, deadline: Deadline | None = None) -> str | None:
     """
     Resolve hostname to IP with timeout.
     Returns IP if host is already an IP or resolution succeeds, None otherwise.
     """
-    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
     host = host.rstrip(".")
     if not host:
         return None
@@ -69,7 +194,7 @@ def resolve_to_ip(host: str, dns_timeout_seconds: float | None = None) -> str |
 
     # Try to resolve A record
     try:
-        answers = dns.resolver.resolve(host, "A", lifetime=timeout)
+        answers = cached_resolve(host, "A", lifetime=_lifetime(dns_timeout_seconds, deadline))
         for r in answers:
             return str(r)
     except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout):
@@ -79,7 +204,7 @@ def resolve_to_ip(host: str, dns_timeout_seconds: float | None = None) -> str |
 
     # Try to resolve AAAA record
     try:
-        answers = dns.resolver.resolve(host, "AAAA", lifetime=timeout)
+        answers = cached_resolve(host, "AAAA", lifetime=_lifetime(dns_timeout_seconds, deadline))
         for r in answers:
             return str(r)
     except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout):
@@ -90,46 +215,49 @@ def resolve_to_ip(host: str, dns_timeout_seconds: float | None = None) -> str |
     return None
 
 
-def check_domain_spf_dmarc(domain: str, dns_timeout_seconds: float | None = None) -> tuple[bool, bool]:
+def _has_txt(name: str, marker: str, lifetime: float) -> bool | None:
+    """True if a TXT record of name contains marker, False if none does, None if DNS did not answer."""
+    try:
+        answers = cached_resolve(name, "TXT", lifetime=lifetime)
+    except NEGATIVE_DNS_ERRORS:
+        return False
+    except (dns.resolver.Timeout, dns.resolver.NoNameservers):
+        return None
+    return any(marker in str(r).lower() for r in answers)
+
+
+def lookup_spf_dmarc(
+    domain: str, dns_timeout_seconds: float | None = None, deadline: Deadline | None = None
+) -> tuple[bool | None, bool | None]:
+    """check_domain_spf_dmarc() telling lookups that got no answer (timeout, no nameserver) apart: None."""
+    has_spf = _has_txt(domain, "v=spf1", _lifetime(dns_timeout_seconds, deadline))
+    has_dmarc = _has_txt(f"_dmarc.{domain}", "v=dmarc1", _lifetime(dns_timeout_seconds, deadline))
+    return has_spf, has_dmarc
+
+
+def check_domain_spf_dmarc(
+    domain: str, dns_timeout_seconds: float | None = None, deadline: Deadline | None = None
+) -> tuple[bool, bool]:
     """
     Check if domain has SPF (TXT with v=spf1) and DMARC (_dmarc with v=DMARC1).
     Returns (has_spf, has_dmarc). Does not block if lookup fails.
     """
-    timeout = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
-    has_spf, has_dmarc = False, False
+    has_spf, has_dmarc = lookup_spf_dmarc(domain, dns_timeout_seconds=dns_timeout_seconds, deadline=deadline)
+    return bool(has_spf), bool(has_dmarc)
 
-    # Check SPF
-    try:
-        answers = dns.resolver.resolve(domain, "TXT", lifetime=timeout)
-        for r in answers:
-            txt = str(r).lower()
-            if "v=spf1" in txt:
-                has_spf = True
-                break
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout):
-        pass
-    except dns.resolver.NoNameservers:
-        pass
 
-    # Check DMARC
+def spf_includes(domain: str, dns_timeout_seconds: float | None = None, deadline: Deadline | None = None) -> list[str]:
+    """include:/redirect= domains of the domain's SPF record ([] if none or the lookup fails)."""
     try:
-        answers = dns.resolver.resolve(f"_dmarc.{domain}", "TXT", lifetime=timeout)
-        for r in answers:
-            txt = str(r).lower()
-            if "v=dmarc1" in txt:
-                has_dmarc = True
-                break
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout):
-        pass
-    except dns.resolver.NoNameservers:
-        pass
-
-    return has_spf, has_dmarc
+        answers = cached_resolve(domain, "TXT", lifetime=_lifetime(dns_timeout_seconds, deadline))
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout, dns.resolver.NoNameservers):
+        return []
+    return parse_spf_includes([str(r) for r in answers])
 
 
 def detect_provider(mx_hosts: list[tuple[int, str]]) -> str:
     """
-    Detect email provider based on MX hostnames.
+    Detect email provider from MX hostnames (see provider_fingerprints).
 
     Args:
         mx_hosts: List of (preference, exchange) tuples from mx_lookup().
@@ -137,15 +265,25 @@ def detect_provider(mx_hosts: list[tuple[int, str]]) -> str:
     Returns:
         Provider name ("google", "microsoft", etc.) or "other" if not recognized.
     """
-    if not mx_hosts:
-        return "other"
-
+    fingerprints = get_provider_fingerprints()
     # Check all MX hosts, prioritizing by preference (already sorted)
     for _, host in mx_hosts:
-        host_lower = host.lower()
-        for provider, patterns in PROVIDER_PATTERNS.items():
-            for pattern in patterns:
-                if pattern in host_lower:
-                    return provider
+        provider = fingerprints.match_mx(host)
+        if provider:
+            return provider
+    return "other"
 
+
+def detect_provider_from_spf(spf_include_domains: list[str]) -> str:
+    """Mailbox provider authorized in SPF (first recognized include, gateways skipped) or "other"."""
+    fingerprints = get_provider_fingerprints()
+    for include in spf_include_domains:
+        provider = fingerprints.match_spf(include)
+        if provider and not fingerprints.is_gateway(provider):
+            return provider
     return "other"
+
+
+def is_gateway_provider(provider: str) -> bool:
+    """Security gateway whose MX hides the mailbox provider (Proofpoint, Mimecast...)."""
+    return get_provider_fingerprints().is_gateway(provider)
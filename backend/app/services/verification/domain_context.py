@@ -0,0 +1,443 @@
+"""Per-domain verification context: DNS signals and catch-all verdict computed once per lead."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+
+from app.core.config import settings
+from app.core.log_service import VerificationLogger
+from app.services.smtp_blocked_detector import (
+    get_catch_all_verdict,
+    is_provider_blocked,
+    is_smtp_blocked,
+    set_catch_all_verdict,
+)
+from app.services.verification.deadline import Deadline, budget_exhausted
+from app.services.verification.dns_checker import (
+    detect_provider,
+    detect_provider_from_spf,
+    is_gateway_provider,
+    lookup_spf_dmarc,
+    mx_lookup,
+    spf_includes,
+)
+from app.services.verification.provider_policy import DEFAULT_POLICY, ProviderPolicy, provider_policy
+from app.services.verification.singleflight import claim, coalesce, release
+from app.services.verification.smtp_checker import (
+    DEFAULT_MAIL_FROM,
+    SMTPProbeSession,
+    detect_catch_all,
+    random_probe_address,
+    smtp_probe_many,
+)
+
+# Stop policies for probing a lead's candidates:
+# - exhaustive: RCPT every candidate
+# - first_valid: probe in small rounds and stop at the first accept on a non catch-all domain;
+#   on catch-all domains skip per-candidate RCPT (every address would be accepted)
+STOP_POLICY_EXHAUSTIVE = "exhaustive"
+STOP_POLICY_FIRST_VALID = "first_valid"
+STOP_POLICIES = (STOP_POLICY_EXHAUSTIVE, STOP_POLICY_FIRST_VALID)
+# Policy of workspaces that did not choose one, and of callers that do not pass one
+DEFAULT_STOP_POLICY = STOP_POLICY_FIRST_VALID
+# Candidates per round with first_valid (the first round also carries the catch-all address)
+FIRST_VALID_BATCH_SIZE = 2
+# MX lookup failures that describe the domain; timeouts and server failures are transient
+DEFINITIVE_MX_ERRORS = ("NXDOMAIN", "NoAnswer")
+# Domain lookups coalesced across workers (see singleflight)
+FLIGHT_DNS = "dns"
+FLIGHT_CATCH_ALL = "catch_all"
+
+
+@dataclass
+class DomainContext:
+    """Everything about a domain that does not depend on the candidate mailbox."""
+
+    domain: str
+    mx: list[tuple[int, str]] = field(default_factory=list)  # (preference, exchange) sorted by preference
+    mx_error: str | None = None  # Set when MX lookup failed
+    provider: str = "other"
+    policy: ProviderPolicy = DEFAULT_POLICY  # See provider_policy
+    hosted_provider: str | None = None  # Mailbox provider behind a gateway MX, from SPF includes
+    spf_present: bool = False
+    dmarc_present: bool = False
+    txt_failed: bool = False  # An SPF/DMARC lookup got no answer: spf/dmarc_present may be wrong
+    smtp_blocked: bool = False
+    catch_all: bool | None = None  # None if not attempted or inconclusive
+    catch_all_reason: str = ""
+    catch_all_cached: bool = False  # Verdict read from the cross-worker cache (no random probe sent)
+    catch_all_cache_checked: bool = False
+    skip_rcpt: bool = False  # Stop or provider policy decided further RCPT probes are useless
+    stopped_early: bool = False  # A non catch-all accept was found; unprobed candidates need no verdict
+    # Candidates already probed in a shared SMTP session: email -> (mx_host, accepted, detail, short_code_msg)
+    rcpt_results: dict[str, tuple[str, bool, str, str | None]] = field(default_factory=dict)
+
+    @property
+    def mx_found(self) -> bool:
+        return bool(self.mx)
+
+    @property
+    def mx_hosts(self) -> list[str]:
+        return [h for _, h in self.mx]
+
+    @property
+    def dns_answered(self) -> bool:
+        """True when DNS answered every lookup (no transient failure): the signals can be recorded."""
+        if self.mx_error is not None and self.mx_error not in DEFINITIVE_MX_ERRORS:
+            return False
+        return not self.txt_failed
+
+    @property
+    def probe_mx_hosts(self) -> list[str]:
+        """MX hosts the provider policy allows probing."""
+        return self.mx_hosts[: self.policy.max_mx_hosts]
+
+    def smtp_timeout(self, default: int | None) -> int | None:
+        """SMTP timeout for this domain: the provider policy's, else the given one."""
+        return self.policy.smtp_timeout_seconds or default
+
+    def for_lead(self) -> DomainContext:
+        """Copy for one more lead of this domain: DNS signals and catch-all verdict kept, probe state reset."""
+        return replace(self, skip_rcpt=not self.policy.probe, stopped_early=False, rcpt_results={})
+
+    def adopt_catch_all(self, lead_ctx: DomainContext) -> None:
+        """Keep the catch-all verdict a lead's copy looked up or probed, so later leads skip it."""
+        if lead_ctx.catch_all_cache_checked and not self.catch_all_cached:
+            self.catch_all, self.catch_all_reason = lead_ctx.catch_all, lead_ctx.catch_all_reason
+            self.catch_all_cache_checked = self.catch_all_cached = True
+
+
+def build_domain_context(
+    domain: str,
+    mail_from: str | None = None,
+    smtp_timeout_seconds: int | None = None,
+    dns_timeout_seconds: float | None = None,
+    logger: VerificationLogger | None = None,
+    smtp_blocked: bool | None = None,
+    probe_catch_all: bool = True,
+    provider_policies: dict[str, dict] | None = None,
+    deadline: Deadline | None = None,
+) -> DomainContext:
+    """
+    Run the domain-level checks once: MX, provider, SPF/DMARC, SMTP blocked flag and catch-all.
+
+    Args:
+        domain: Email domain (normalized to lowercase)
+        smtp_blocked: Pre-computed blocked flag (None = read it from Redis)
+        probe_catch_all: If False, skip the catch-all SMTP probe (catch_all stays None)
+        provider_policies: Workspace overrides of the provider policy table
+        deadline: The lead's time budget (see deadline); caps every DNS and SMTP step
+    """
+    log = logger or VerificationLogger()
+    domain = domain.strip().lower()
+    ctx = DomainContext(domain=domain, smtp_blocked=is_smtp_blocked() if smtp_blocked is None else smtp_blocked)
+
+    dns = lookup_domain_dns(domain, dns_timeout_seconds=dns_timeout_seconds, deadline=deadline, logger=log)
+    if dns["mx_error"]:
+        log.debug_mx_lookup_failed(domain, dns["mx_error"], dns["mx_error_detail"])
+        ctx.mx_error = dns["mx_error"]
+        return ctx
+    ctx.mx = [(int(pref), host) for pref, host in dns["mx"]]
+
+    mx_list = ", ".join(f"{pref}={host}" for pref, host in ctx.mx)
+    log.debug_mx_lookup(domain, len(ctx.mx), mx_list)
+
+    ctx.provider = detect_provider(ctx.mx)
+    if ctx.provider != "other":
+        log.debug_provider_detected(ctx.provider)
+    apply_provider_policy(ctx, provider_policies, logger=log)
+
+    ctx.spf_present, ctx.dmarc_present = dns["spf"], dns["dmarc"]
+    ctx.txt_failed = dns.get("txt_failed", False)
+    log.debug_dns_spf_dmarc(ctx.spf_present, ctx.dmarc_present)
+    if dns["spf_includes"]:
+        set_hosted_provider(ctx, dns["spf_includes"], logger=log)
+
+    # Without a catch-all policy the verdict stays unknown: the provider accepts (or tarpits) any address
+    if check_smtp_blocked(ctx, logger=log) or not ctx.policy.catch_all:
+        return ctx
+    if load_cached_catch_all(ctx, logger=log) or not probe_catch_all or ctx.skip_rcpt:
+        return ctx
+    token = claim_catch_all_probe(ctx, logger=log, deadline=deadline)
+    if token is None:
+        return ctx
+    try:
+        catch_all_result, catch_smtp, ctx.catch_all_reason = detect_catch_all(
+            ctx.probe_mx_hosts,
+            domain,
+            mail_from or DEFAULT_MAIL_FROM,
+            smtp_timeout_seconds=ctx.smtp_timeout(smtp_timeout_seconds),
+            dns_timeout_seconds=dns_timeout_seconds,
+            logger=log,
+            deadline=deadline,
+        )
+        ctx.catch_all = catch_all_result if catch_smtp else None
+        if catch_smtp or not budget_exhausted(deadline):
+            set_catch_all_verdict(domain, ctx.catch_all, ctx.catch_all_reason)
+    finally:
+        release(FLIGHT_CATCH_ALL, domain, token)
+    return ctx
+
+
+def _lookup_dns(domain: str, dns_timeout_seconds: float | None = None, deadline: Deadline | None = None) -> dict:
+    """Query the domain's DNS signals (JSON-serializable, see lookup_domain_dns)."""
+    dns = {
+        "mx": [],
+        "mx_error": None,
+        "mx_error_detail": "",
+        "spf": False,
+        "dmarc": False,
+        "txt_failed": False,
+        "spf_includes": [],
+    }
+    try:
+        mx = mx_lookup(domain, dns_timeout_seconds=dns_timeout_seconds, deadline=deadline)
+    except Exception as e:
+        dns["mx_error"], dns["mx_error_detail"] = type(e).__name__, str(e)
+        return dns
+    dns["mx"] = [[pref, host] for pref, host in mx]
+    spf, dmarc = lookup_spf_dmarc(domain, dns_timeout_seconds=dns_timeout_seconds, deadline=deadline)
+    dns["spf"], dns["dmarc"], dns["txt_failed"] = bool(spf), bool(dmarc), spf is None or dmarc is None
+    if dns["spf"] and is_gateway_provider(detect_provider(mx)):
+        # Same TXT answer as the SPF check (DNS cache): no extra query
+        dns["spf_includes"] = spf_includes(domain, dns_timeout_seconds=dns_timeout_seconds, deadline=deadline)
+    return dns
+
+
+def lookup_domain_dns(
+    domain: str,
+    dns_timeout_seconds: float | None = None,
+    deadline: Deadline | None = None,
+    logger: VerificationLogger | None = None,
+) -> dict:
+    """
+    MX ([[preference, host]], sorted), mx_error (+ mx_error_detail), spf, dmarc (txt_failed when
+    either TXT lookup got no answer) and the SPF includes of a gateway-fronted domain. One worker
+    at a time queries them; the others reuse its answer for domain_dns_shared_ttl_seconds (see
+    singleflight). Answers with a transient MX or TXT failure are not shared.
+    """
+    dns, shared = coalesce(
+        FLIGHT_DNS,
+        domain,
+        lambda: _lookup_dns(domain, dns_timeout_seconds=dns_timeout_seconds, deadline=deadline),
+        settings.domain_dns_shared_ttl_seconds,
+        shareable=lambda d: (d["mx_error"] is None or d["mx_error"] in DEFINITIVE_MX_ERRORS) and not d["txt_failed"],
+        deadline=deadline,
+    )
+    if shared:
+        (logger or VerificationLogger()).debug_lookup_coalesced(domain, FLIGHT_DNS)
+    return dns
+
+
+def claim_catch_all_probe(
+    ctx: DomainContext, logger: VerificationLogger | None = None, deadline: Deadline | None = None
+) -> str | None:
+    """
+    Coalesce the random-address probe across workers (see singleflight). Returns the lock token
+    when this worker must send it (release it once the verdict is cached), or None when the
+    verdict of another worker's probe was filled into ctx while waiting.
+    """
+    token, verdict = claim(FLIGHT_CATCH_ALL, ctx.domain, lambda: get_catch_all_verdict(ctx.domain), deadline)
+    if verdict is None:
+        return token
+    ctx.catch_all, ctx.catch_all_reason = verdict
+    ctx.catch_all_cached = True
+    (logger or VerificationLogger()).debug_lookup_coalesced(ctx.domain, FLIGHT_CATCH_ALL)
+    return None
+
+
+def known_domain_context(
+    domain: str,
+    mx: list[tuple[int, str]],
+    spf_present: bool,
+    dmarc_present: bool,
+    hosted_provider: str | None = None,
+    catch_all: tuple[bool | None, str] | None = None,
+    mx_error: str | None = None,
+    logger: VerificationLogger | None = None,
+    smtp_blocked: bool | None = None,
+    provider_policies: dict[str, dict] | None = None,
+) -> DomainContext:
+    """
+    Context from DNS signals recorded earlier (see domain_knowledge): no DNS query is made.
+
+    The provider policy and the SMTP blocked flags are applied as in build_domain_context.
+    catch_all is a known (verdict, reason), e.g. still fresh in the domains table; without it
+    the verdict is looked up or probed later as usual.
+    """
+    log = logger or VerificationLogger()
+    ctx = DomainContext(
+        domain=domain.strip().lower(),
+        mx=sorted((int(pref), host) for pref, host in mx),
+        hosted_provider=hosted_provider,
+        spf_present=spf_present,
+        dmarc_present=dmarc_present,
+        smtp_blocked=is_smtp_blocked() if smtp_blocked is None else smtp_blocked,
+    )
+    if not ctx.mx:
+        ctx.mx_error = mx_error or "NoAnswer"
+        return ctx
+    ctx.provider = detect_provider(ctx.mx)
+    apply_provider_policy(ctx, provider_policies, logger=log)
+    check_smtp_blocked(ctx, logger=log)
+    if catch_all is not None and ctx.policy.catch_all:
+        ctx.catch_all, ctx.catch_all_reason = catch_all
+        ctx.catch_all_cache_checked = ctx.catch_all_cached = True
+    return ctx
+
+
+def check_smtp_blocked(ctx: DomainContext, logger: VerificationLogger | None = None) -> bool:
+    """Turn SMTP off for ctx if this node, or its egress to the domain's provider, is blocked."""
+    log = logger or VerificationLogger()
+    if ctx.smtp_blocked:
+        log.debug_smtp_skipped()
+    elif is_provider_blocked(ctx.provider):
+        # This node's egress is fine but the provider is not answering it: DNS signals only
+        ctx.smtp_blocked = True
+        log.debug_smtp_skipped_provider_blocked(ctx.provider)
+    return ctx.smtp_blocked
+
+
+def set_hosted_provider(
+    ctx: DomainContext, spf_include_domains: list[str], logger: VerificationLogger | None = None
+) -> None:
+    """Record the mailbox provider a gateway MX fronts, when the SPF record names one."""
+    hosted = detect_provider_from_spf(spf_include_domains)
+    if hosted != "other":
+        ctx.hosted_provider = hosted
+        (logger or VerificationLogger()).debug_provider_detected(f"{ctx.provider}>{hosted}")
+
+
+def apply_provider_policy(
+    ctx: DomainContext,
+    provider_policies: dict[str, dict] | None = None,
+    logger: VerificationLogger | None = None,
+) -> None:
+    """Set ctx.policy for the detected provider; providers not worth probing skip RCPT entirely."""
+    ctx.policy = provider_policy(ctx.provider, provider_policies)
+    if not ctx.policy.probe:
+        ctx.skip_rcpt = True
+        (logger or VerificationLogger()).debug_smtp_skipped_provider(ctx.provider)
+
+
+def load_cached_catch_all(ctx: DomainContext, logger: VerificationLogger | None = None) -> bool:
+    """Fill the catch-all verdict from the cross-worker cache (read once). Returns True on a cache hit."""
+    if ctx.catch_all_cache_checked:
+        return ctx.catch_all_cached
+    ctx.catch_all_cache_checked = True
+    cached = get_catch_all_verdict(ctx.domain)
+    if cached is None:
+        return False
+    ctx.catch_all, ctx.catch_all_reason = cached
+    ctx.catch_all_cached = True
+    (logger or VerificationLogger()).debug_catchall_cached(ctx.domain, ctx.catch_all_reason)
+    return True
+
+
+def probe_domain_recipients(
+    ctx: DomainContext,
+    candidates: list[str],
+    mail_from: str | None = None,
+    smtp_timeout_seconds: int | None = None,
+    dns_timeout_seconds: float | None = None,
+    logger: VerificationLogger | None = None,
+    stop_policy: str = STOP_POLICY_EXHAUSTIVE,
+    deadline: Deadline | None = None,
+    sessions: dict[str, SMTPProbeSession] | None = None,
+) -> None:
+    """
+    Probe the catch-all address and the candidates over one SMTP session per MX host.
+
+    Fills ctx.catch_all, ctx.catch_all_reason and ctx.rcpt_results. No-op when SMTP is blocked
+    or the domain has no MX. A cached catch-all verdict saves the random address probe.
+    With stop_policy=first_valid, candidates are probed in rounds over the same sessions
+    and probing stops as soon as it cannot change the pick (see STOP_POLICIES).
+    No new round starts once the deadline has passed: unprobed candidates stay out of rcpt_results.
+    With sessions (mx_host -> session, owned by the caller) the connections outlive this call
+    and serve the next lead; the ones no longer connected are closed and removed.
+    """
+    if ctx.smtp_blocked or not ctx.mx_found or not ctx.policy.probe:
+        return
+    log = logger or VerificationLogger()
+    test_email = None
+    catch_all_token = None
+    if ctx.policy.catch_all and not load_cached_catch_all(ctx, logger=log):
+        catch_all_token = claim_catch_all_probe(ctx, logger=log, deadline=deadline)
+    if catch_all_token is not None:
+        test_email = random_probe_address(ctx.domain)
+        log.debug_catchall_checking(test_email)
+
+    batch_size = FIRST_VALID_BATCH_SIZE if stop_policy == STOP_POLICY_FIRST_VALID else len(candidates)
+    remaining = list(candidates)
+    owned = sessions is None
+    if sessions is None:
+        sessions = {}
+    try:
+        while remaining or test_email:
+            if budget_exhausted(deadline):
+                break
+            if stop_policy == STOP_POLICY_FIRST_VALID and ctx.catch_all is True:
+                ctx.skip_rcpt = True
+                break
+            batch, remaining = remaining[:batch_size], remaining[batch_size:]
+            results = smtp_probe_many(
+                ctx.mx_hosts,
+                [test_email, *batch] if test_email else batch,
+                mail_from or DEFAULT_MAIL_FROM,
+                smtp_timeout_seconds=ctx.smtp_timeout(smtp_timeout_seconds),
+                dns_timeout_seconds=dns_timeout_seconds,
+                logger=log,
+                max_mx_hosts=ctx.policy.max_mx_hosts,
+                sessions=sessions,
+                deadline=deadline,
+            )
+            apply_rcpt_results(ctx, test_email, batch, results, logger=log)
+            # An inconclusive verdict because the budget ran out is not worth sharing
+            if test_email and (ctx.catch_all is not None or not budget_exhausted(deadline)):
+                set_catch_all_verdict(ctx.domain, ctx.catch_all, ctx.catch_all_reason)
+                test_email = None
+            if (
+                stop_policy == STOP_POLICY_FIRST_VALID
+                and ctx.catch_all is not True
+                and any(ctx.rcpt_results[c][1] for c in batch)
+            ):
+                ctx.skip_rcpt = ctx.stopped_early = bool(remaining)
+                break
+    finally:
+        if catch_all_token is not None:
+            release(FLIGHT_CATCH_ALL, ctx.domain, catch_all_token)
+        for mx, session in list(sessions.items()):
+            if owned or not session.connected:
+                session.close()
+                del sessions[mx]
+
+
+def apply_rcpt_results(
+    ctx: DomainContext,
+    test_email: str | None,
+    candidates: list[str],
+    results: dict[str, tuple[str, bool, str, str | None]],
+    logger: VerificationLogger | None = None,
+) -> None:
+    """
+    Store the candidates' RCPT outcomes and, if the random address was probed (test_email),
+    derive the catch-all verdict from it.
+    """
+    for cand in candidates:
+        ctx.rcpt_results[cand] = results[cand]
+    if test_email is None:
+        return
+
+    log = logger or VerificationLogger()
+    mx, accepted, detail, short = results[test_email]
+    log.debug_catchall_result(mx, accepted, short or detail)
+    if accepted:
+        ctx.catch_all = True
+        ctx.catch_all_reason = f"Random RCPT accepted on {mx}: {detail}"
+    elif "SMTP error" in detail or "Temporary" in detail:
+        log.debug_catchall_inconclusive()
+        ctx.catch_all = None
+        ctx.catch_all_reason = "Could not reliably probe catch-all"
+    else:
+        ctx.catch_all = False
+        ctx.catch_all_reason = f"Random RCPT rejected on {mx}: {detail}"
@@ -0,0 +1,150 @@
+"""Pool of local source addresses for SMTP probes, shared by all workers of a node.
+
+With settings.smtp_source_addresses set, every SMTP connection is bound to one address of the
+pool (smtplib source_address / asyncio local_addr), so per-IP throttles and reputation are
+spread over several IPs and the sustainable probe rate per MX grows with the pool. The address
+is chosen per MX host, round-robin or least recently used (smtp_source_selection).
+
+Health is tracked per address:
+- blocked: each address is its own egress in smtp_blocked_detector (<node>/<address>), so
+  timeouts flag it (or one provider for it) without touching the other addresses
+- throttled: a 421 reply or a refused banner puts the address in cooldown for the provider
+  (MX host when unknown) for smtp_source_cooldown_seconds
+
+Blocked and cooling-down addresses are rotated out until they recover. Any local address
+works, so 127.0.0.2, 127.0.0.3... test the pool against a server on 127.0.0.1.
+
+Keys:
+    smtp:source_rr:<mx_host>           round-robin counter
+    smtp:source_lru:<mx_host>          zset: source address -> last use
+    smtp:source_cooldown:<scope>       zset: source address -> cooldown end (scope = provider, else MX host)
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import smtplib
+import time
+
+import redis
+
+from app.core.config import settings
+from app.services.smtp_blocked_detector import (
+    UNKNOWN_PROVIDER,
+    _get_redis,
+    is_egress_blocked,
+    source_addresses,
+    source_egress_id,
+)
+from app.services.verification.dns_checker import detect_provider
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_SOURCE_RR_PREFIX = "smtp:source_rr:"
+REDIS_KEY_SOURCE_LRU_PREFIX = "smtp:source_lru:"
+REDIS_KEY_SOURCE_COOLDOWN_PREFIX = "smtp:source_cooldown:"
+TTL_SOURCE_STATE_SECONDS = 86400
+
+SOURCE_SELECTION_ROUND_ROBIN = "round_robin"
+SOURCE_SELECTION_LRU = "lru"
+
+# "421 Service not available": the usual per-IP throttle reply
+SMTP_SERVICE_UNAVAILABLE = 421
+
+# Detail of probes not sent because every pool address is blocked or cooling down
+NO_SOURCE_DETAIL = "SMTP error: no healthy source address"
+
+# Pick an address among the candidates that are not cooling down, in one round trip.
+# KEYS: selection state (counter or LRU zset), cooldowns. ARGV: now, mode, state ttl, candidates.
+# Returns the address, or nil when all are cooling down.
+_PICK_SOURCE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local healthy = {}
+for i = 4, #ARGV do
+  if tonumber(redis.call('ZSCORE', KEYS[2], ARGV[i]) or '0') <= now then
+    healthy[#healthy + 1] = ARGV[i]
+  end
+end
+if #healthy == 0 then
+  return false
+end
+local pick
+if ARGV[2] == 'round_robin' then
+  pick = healthy[(redis.call('INCR', KEYS[1]) - 1) % #healthy + 1]
+else
+  local oldest
+  for _, address in ipairs(healthy) do
+    local used = tonumber(redis.call('ZSCORE', KEYS[1], address) or '0')
+    if oldest == nil or used < oldest then
+      oldest, pick = used, address
+    end
+  end
+  redis.call('ZADD', KEYS[1], now, pick)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return pick
+"""
+
+
+def _normalize_host(mx_host: str) -> str:
+    return mx_host.strip().lower().rstrip(".")
+
+
+def _cooldown_key(host: str, provider: str) -> str:
+    return f"{REDIS_KEY_SOURCE_COOLDOWN_PREFIX}{provider if provider != UNKNOWN_PROVIDER else host}"
+
+
+def pick_source_address(mx_host: str, provider: str | None = None) -> str | None:
+    """
+    Source address for a new connection to mx_host, or None if every pool address is blocked
+    (for the host's provider too) or cooling down. Only meaningful with a pool configured.
+
+    Falls back to a random unblocked address if Redis is down.
+    """
+    host = _normalize_host(mx_host)
+    provider = provider or detect_provider([(0, host)])
+    candidates = [a for a in source_addresses() if not is_egress_blocked(source_egress_id(a), provider)]
+    if not candidates:
+        return None
+    if settings.smtp_source_selection == SOURCE_SELECTION_ROUND_ROBIN:
+        mode, state_key = SOURCE_SELECTION_ROUND_ROBIN, f"{REDIS_KEY_SOURCE_RR_PREFIX}{host}"
+    else:
+        mode, state_key = SOURCE_SELECTION_LRU, f"{REDIS_KEY_SOURCE_LRU_PREFIX}{host}"
+    try:
+        return _get_redis().eval(
+            _PICK_SOURCE_SCRIPT,
+            2,
+            state_key,
+            _cooldown_key(host, provider),
+            time.time(),
+            mode,
+            TTL_SOURCE_STATE_SECONDS,
+            *candidates,
+        )
+    except redis.RedisError as e:
+        logger.error(f"Redis error picking SMTP source address: {e}")
+        return random.choice(candidates)
+
+
+def mark_source_throttled(source_address: str, mx_host: str, provider: str | None = None) -> None:
+    """Rotate an address out for the host's provider (or the host) for smtp_source_cooldown_seconds."""
+    host = _normalize_host(mx_host)
+    key = _cooldown_key(host, provider or detect_provider([(0, host)]))
+    cooldown = settings.smtp_source_cooldown_seconds
+    try:
+        pipe = _get_redis().pipeline()
+        pipe.zadd(key, {source_address: time.time() + cooldown})
+        pipe.expire(key, cooldown)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Redis error marking SMTP source address {source_address} throttled: {e}")
+        return
+    logger.warning(f"SMTP source address {source_address} throttled by {host}, rotated out for {cooldown}s.")
+
+
+def is_throttle_error(e: OSError) -> bool:
+    """A refused banner or a 421 reply: the server is throttling or rejecting this source address."""
+    if isinstance(e, smtplib.SMTPConnectError):
+        return True
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code == SMTP_SERVICE_UNAVAILABLE
@@ -0,0 +1,136 @@
+"""Per-MX latency tracking: adaptive SMTP timeouts and tarpit detection, shared by all workers.
+
+Each SMTP session measures two phases and records them when it closes (one Redis call):
+- greeting: TCP connect + server banner
+- command: one EHLO / MAIL / RSET / RCPT round trip (a pipelined RCPT batch counts as one)
+
+Per host and phase Redis keeps an EWMA of the latency and of its deviation (as TCP does for
+its retransmission timeout, RFC 6298). Once a host has MX_LATENCY_MIN_SAMPLES samples, its
+timeout is avg + MX_LATENCY_DEV_FACTOR * dev, clamped to the adaptive min/max settings: fast
+hosts get short timeouts, slow corporate servers longer ones. Hosts without history use the
+configured SMTP timeout. A timed-out step counts as a sample of its full timeout.
+
+Tarpits delay the banner on purpose. A greeting slower than smtp_tarpit_banner_seconds, or a
+banner that never arrives after the TCP connection succeeded, is a strike; after
+TARPIT_STRIKES in a row the host is marked for smtp_tarpit_ttl_seconds and then skipped or
+probed with smtp_tarpit_timeout_seconds (smtp_tarpit_action). A prompt banner clears strikes.
+
+Keys:
+    smtp:latency:<mx_host>    hash: <phase>:avg, <phase>:dev, <phase>:n, strikes, tarpit_until
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+import redis
+
+from app.core.config import settings
+from app.services.smtp_blocked_detector import _get_redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_MX_LATENCY_PREFIX = "smtp:latency:"
+TTL_MX_LATENCY_SECONDS = 7 * 86400
+
+PHASE_GREETING = "greeting"
+PHASE_COMMAND = "command"
+
+# EWMA gains for the average and the deviation (RFC 6298 values)
+EWMA_ALPHA = 0.125
+EWMA_BETA = 0.25
+MX_LATENCY_DEV_FACTOR = 4
+MX_LATENCY_MIN_SAMPLES = 5
+TARPIT_STRIKES = 2
+
+# Tarpit strike for this session: +1 slow or missing banner, -1 prompt banner (reset), 0 unknown
+STRIKE = 1
+NO_STRIKE = 0
+CLEAR_STRIKES = -1
+
+TARPIT_ACTION_SKIP = "skip"
+TARPIT_ACTION_SHORT = "short"
+
+# Fold samples into the EWMAs and count tarpit strikes in one round trip.
+# ARGV: now, alpha, beta, ttl, strike, strikes threshold, tarpit ttl, then phase/sample pairs.
+_RECORD_LATENCY_SCRIPT = """
+local key = KEYS[1]
+local alpha, beta = tonumber(ARGV[2]), tonumber(ARGV[3])
+for i = 8, #ARGV, 2 do
+  local phase, sample = ARGV[i], tonumber(ARGV[i + 1])
+  local n = tonumber(redis.call('HGET', key, phase .. ':n') or '0')
+  local avg, dev = sample, sample / 2
+  if n > 0 then
+    avg = tonumber(redis.call('HGET', key, phase .. ':avg'))
+    dev = tonumber(redis.call('HGET', key, phase .. ':dev'))
+    dev = (1 - beta) * dev + beta * math.abs(sample - avg)
+    avg = (1 - alpha) * avg + alpha * sample
+  end
+  redis.call('HSET', key, phase .. ':avg', tostring(avg), phase .. ':dev', tostring(dev), phase .. ':n', n + 1)
+end
+local strike = tonumber(ARGV[5])
+if strike < 0 then
+  redis.call('HSET', key, 'strikes', 0)
+elseif strike > 0 and redis.call('HINCRBY', key, 'strikes', 1) >= tonumber(ARGV[6]) then
+  redis.call('HSET', key, 'strikes', 0, 'tarpit_until', tonumber(ARGV[1]) + tonumber(ARGV[7]))
+end
+redis.call('EXPIRE', key, ARGV[4])
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class MXLatency:
+    """Latency history of one MX host (empty when unknown or Redis is down)."""
+
+    phases: dict[str, tuple[float, float, int]] = field(default_factory=dict)  # phase -> (avg, dev, samples)
+    tarpit_until: float = 0.0
+
+    @property
+    def tarpit(self) -> bool:
+        return self.tarpit_until > time.time()
+
+    def timeout(self, phase: str, default: float) -> float:
+        """Adaptive timeout for phase, or default while the host has too few samples."""
+        avg, dev, samples = self.phases.get(phase, (0.0, 0.0, 0))
+        if samples < MX_LATENCY_MIN_SAMPLES:
+            return default
+        timeout = avg + MX_LATENCY_DEV_FACTOR * dev
+        return max(settings.smtp_adaptive_min_timeout_seconds, min(settings.smtp_adaptive_max_timeout_seconds, timeout))
+
+
+def get_mx_latency(mx_host: str) -> MXLatency:
+    """Read a host's latency history. Fails open (no history) if Redis is down."""
+    try:
+        raw = _get_redis().hgetall(f"{REDIS_KEY_MX_LATENCY_PREFIX}{mx_host.lower()}")
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading MX latency for {mx_host}: {e}")
+        return MXLatency()
+    phases = {}
+    for phase in (PHASE_GREETING, PHASE_COMMAND):
+        if f"{phase}:n" in raw:
+            phases[phase] = (float(raw[f"{phase}:avg"]), float(raw[f"{phase}:dev"]), int(raw[f"{phase}:n"]))
+    return MXLatency(phases=phases, tarpit_until=float(raw.get("tarpit_until", 0)))
+
+
+def record_mx_latency(mx_host: str, samples: list[tuple[str, float]], strike: int = NO_STRIKE) -> None:
+    """Fold a session's (phase, seconds) samples and its tarpit strike into the host's history."""
+    if not samples and strike == NO_STRIKE:
+        return
+    args: list[str | float] = [
+        time.time(),
+        EWMA_ALPHA,
+        EWMA_BETA,
+        TTL_MX_LATENCY_SECONDS,
+        strike,
+        TARPIT_STRIKES,
+        settings.smtp_tarpit_ttl_seconds,
+    ]
+    for phase, seconds in samples:
+        args.extend((phase, round(seconds, 4)))
+    try:
+        _get_redis().eval(_RECORD_LATENCY_SCRIPT, 1, f"{REDIS_KEY_MX_LATENCY_PREFIX}{mx_host.lower()}", *args)
+    except redis.RedisError as e:
+        logger.error(f"Redis error recording MX latency for {mx_host}: {e}")
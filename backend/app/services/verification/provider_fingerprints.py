@@ -0,0 +1,176 @@
+"""Provider fingerprint database: MX hostname suffixes and SPF include: domains per mail provider.
+
+The shipped table (data/provider_fingerprints.json) is merged with an optional, larger database
+(settings.provider_fingerprints_path) and compiled into two reversed-label suffix tries, so a
+lookup costs one dict step per hostname label whatever the size of the database. The longest
+matching suffix wins ("mail.protection.outlook.com" beats "outlook.com").
+
+kind "gateway" marks security gateways (Proofpoint, Mimecast...): their MX says nothing about the
+mailbox provider behind them, which is then read from the domain's SPF includes.
+
+Database format:
+    {"microsoft": {"kind": "mailbox", "mx": ["outlook.com", ...], "spf": ["spf.protection.outlook.com"]},
+     "proofpoint": {"kind": "gateway", "mx": ["pphosted.com"], "spf": ["pphosted.com"]}}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BUILTIN_FINGERPRINTS_PATH = Path(__file__).parent / "data" / "provider_fingerprints.json"
+KIND_MAILBOX = "mailbox"
+KIND_GATEWAY = "gateway"
+# Trie node key holding the provider (labels are never empty, so it cannot clash with one)
+_VALUE = ""
+
+
+def _labels(name: str) -> list[str]:
+    return [label for label in name.strip().lower().rstrip(".").split(".") if label]
+
+
+class SuffixTrie:
+    """Domain suffix -> value, stored as nested dicts keyed by label from the TLD down."""
+
+    __slots__ = ("_root", "size")
+
+    def __init__(self) -> None:
+        self._root: dict[str, Any] = {}
+        self.size = 0
+
+    def add(self, suffix: str, value: str) -> None:
+        labels = _labels(suffix)
+        if not labels:
+            return
+        node = self._root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        if _VALUE not in node:
+            self.size += 1
+        node[_VALUE] = value
+
+    def longest_match(self, name: str) -> str | None:
+        """Value of the longest stored suffix of name (whole labels only), or None."""
+        node = self._root
+        found = None
+        for label in reversed(_labels(name)):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(_VALUE, found)
+        return found
+
+
+class ProviderFingerprints:
+    """Compiled fingerprint database (see module docstring)."""
+
+    def __init__(self, table: dict[str, dict[str, Any]]):
+        self.mx = SuffixTrie()
+        self.spf = SuffixTrie()
+        self.kinds: dict[str, str] = {}
+        for provider, entry in table.items():
+            provider = provider.strip().lower()
+            self.kinds[provider] = entry.get("kind") or KIND_MAILBOX
+            for suffix in entry.get("mx") or []:
+                self.mx.add(suffix, provider)
+            for include in entry.get("spf") or []:
+                self.spf.add(include, provider)
+
+    def match_mx(self, host: str) -> str | None:
+        return self.mx.longest_match(host)
+
+    def match_spf(self, include: str) -> str | None:
+        return self.spf.longest_match(include)
+
+    def is_gateway(self, provider: str) -> bool:
+        return self.kinds.get(provider) == KIND_GATEWAY
+
+
+def read_fingerprint_table(path: str | Path) -> dict[str, dict[str, Any]]:
+    """Read and validate a fingerprint JSON file. Raises ValueError if it is malformed."""
+    try:
+        table = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cannot read provider fingerprints {path}: {e}") from e
+    if not isinstance(table, dict):
+        raise ValueError(f"Provider fingerprints {path} must be an object of provider -> entry")
+    for provider, entry in table.items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"Provider fingerprints {path}: {provider} must be an object")
+        if entry.get("kind", KIND_MAILBOX) not in (KIND_MAILBOX, KIND_GATEWAY):
+            raise ValueError(f"Provider fingerprints {path}: {provider}.kind must be mailbox or gateway")
+        for key in ("mx", "spf"):
+            values = entry.get(key, [])
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"Provider fingerprints {path}: {provider}.{key} must be a list of domains")
+    return table
+
+
+def merge_fingerprint_tables(*tables: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Later tables add suffixes to earlier ones; a later kind replaces an earlier one."""
+    merged: dict[str, dict[str, Any]] = {}
+    for table in tables:
+        for provider, entry in table.items():
+            provider = provider.strip().lower()
+            out = merged.setdefault(provider, {"kind": KIND_MAILBOX, "mx": [], "spf": []})
+            if "kind" in entry:
+                out["kind"] = entry["kind"]
+            out["mx"] = [*out["mx"], *entry.get("mx", [])]
+            out["spf"] = [*out["spf"], *entry.get("spf", [])]
+    return merged
+
+
+def load_provider_fingerprints(path: str | None = None) -> ProviderFingerprints:
+    """
+    Compile the shipped table plus the one at path (default settings.provider_fingerprints_path).
+
+    An unreadable extra database is logged and ignored: detection falls back to the shipped table.
+    """
+    tables = [read_fingerprint_table(BUILTIN_FINGERPRINTS_PATH)]
+    extra = settings.provider_fingerprints_path if path is None else path
+    if extra:
+        try:
+            tables.append(read_fingerprint_table(extra))
+        except ValueError as e:
+            logger.error(str(e))
+    return ProviderFingerprints(merge_fingerprint_tables(*tables))
+
+
+_fingerprints: ProviderFingerprints | None = None
+
+
+def get_provider_fingerprints() -> ProviderFingerprints:
+    """Process-wide compiled database, built on first use."""
+    global _fingerprints
+    if _fingerprints is None:
+        _fingerprints = load_provider_fingerprints()
+    return _fingerprints
+
+
+def reload_provider_fingerprints(path: str | None = None) -> ProviderFingerprints:
+    """Recompile the database (after replacing the file, or in tests with another path)."""
+    global _fingerprints
+    _fingerprints = load_provider_fingerprints(path)
+    return _fingerprints
+
+
+def parse_spf_includes(txt_records: list[str]) -> list[str]:
+    """include: and redirect= domains of the v=spf1 record among a domain's TXT strings."""
+    out: list[str] = []
+    for txt in txt_records:
+        record = txt.strip().strip('"').replace('" "', "").lower()
+        if not record.startswith("v=spf1"):
+            continue
+        for term in record.split()[1:]:
+            term = term.lstrip("+?~-")
+            if term.startswith("include:"):
+                out.append(term[len("include:") :])
+            elif term.startswith("redirect="):
+                out.append(term[len("redirect=") :])
+    return out
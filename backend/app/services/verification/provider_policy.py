@@ -0,0 +1,80 @@
+"""Per-provider SMTP policy: whether probing a provider's MX hosts is worth it, and how.
+
+Security gateways (Proofpoint, Mimecast, Barracuda) accept every RCPT or tarpit, so probing
+them costs seconds and proves nothing: those domains are scored from DNS signals alone.
+Workspaces override entries with the provider_policies config key (see workspace_config).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, fields, replace
+from typing import Any
+
+MAX_POLICY_MX_HOSTS = 5
+MAX_POLICY_TIMEOUT_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class ProviderPolicy:
+    """
+    probe: send RCPT probes at all
+    catch_all: the random-address probe tells something (False = skip it, verdict stays unknown)
+    max_mx_hosts: MX hosts tried per recipient (temporary failures move on to the next one)
+    smtp_timeout_seconds: SMTP timeout for this provider (None = workspace/global timeout)
+    """
+
+    probe: bool = True
+    catch_all: bool = True
+    max_mx_hosts: int = 2
+    smtp_timeout_seconds: int | None = None
+
+
+DEFAULT_POLICY = ProviderPolicy()
+DEFAULT_PROVIDER_POLICIES: dict[str, ProviderPolicy] = {
+    "proofpoint": ProviderPolicy(probe=False, catch_all=False),
+    "mimecast": ProviderPolicy(probe=False, catch_all=False),
+    "barracuda": ProviderPolicy(probe=False, catch_all=False),
+}
+
+
+def parse_provider_policies(value: Any) -> dict[str, dict[str, Any]]:
+    """
+    Validate workspace overrides: {provider: {probe?, catch_all?, max_mx_hosts?, smtp_timeout_seconds?}}.
+
+    Raises ValueError on unknown fields or out-of-range values.
+    """
+    if not isinstance(value, dict):
+        raise ValueError("provider_policies must be an object of provider -> policy")
+    known = {f.name for f in fields(ProviderPolicy)}
+    out: dict[str, dict[str, Any]] = {}
+    for provider, policy in value.items():
+        if not isinstance(provider, str) or not isinstance(policy, dict):
+            raise ValueError("provider_policies must be an object of provider -> policy")
+        unknown = set(policy) - known
+        if unknown:
+            raise ValueError(f"Unknown provider policy fields: {', '.join(sorted(unknown))}")
+        clean: dict[str, Any] = {}
+        for key in ("probe", "catch_all"):
+            if key in policy:
+                if not isinstance(policy[key], bool):
+                    raise ValueError(f"{provider}.{key} must be true or false")
+                clean[key] = policy[key]
+        if "max_mx_hosts" in policy:
+            n = policy["max_mx_hosts"]
+            if not isinstance(n, int) or isinstance(n, bool) or not 1 <= n <= MAX_POLICY_MX_HOSTS:
+                raise ValueError(f"{provider}.max_mx_hosts must be between 1 and {MAX_POLICY_MX_HOSTS}")
+            clean["max_mx_hosts"] = n
+        if policy.get("smtp_timeout_seconds") is not None:
+            t = policy["smtp_timeout_seconds"]
+            if not isinstance(t, int) or isinstance(t, bool) or not 1 <= t <= MAX_POLICY_TIMEOUT_SECONDS:
+                raise ValueError(f"{provider}.smtp_timeout_seconds must be between 1 and {MAX_POLICY_TIMEOUT_SECONDS}")
+            clean["smtp_timeout_seconds"] = t
+        out[provider.strip().lower()] = clean
+    return out
+
+
+def provider_policy(provider: str, overrides: dict[str, dict[str, Any]] | None = None) -> ProviderPolicy:
+    """Policy for a provider: built-in default, then the workspace override fields on top."""
+    policy = DEFAULT_PROVIDER_POLICIES.get(provider, DEFAULT_POLICY)
+    override = (overrides or {}).get(provider)
+    return replace(policy, **override) if override else policy
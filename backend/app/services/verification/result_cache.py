@@ -0,0 +1,125 @@
+"""Cross-worker cache of per-email verification results.
+
+Verifying the same address again (a re-run on a lead, duplicate leads, repeated /v1/verify
+calls for the same person) would repeat the whole DNS and SMTP pipeline. verify_email stores
+each result it computes under the normalized address; verify_email and verify_and_pick_best
+read it back before probing, so a hit costs one Redis GET (one MGET for all of a lead's
+candidates) instead of seconds of network I/O. Hits carry the "cached" signal.
+
+Freshness:
+- each status lives its own TTL (verify_result_ttl_*_seconds): a mailbox accepted by the server
+  stays valid much longer than a temporary failure stays unknown
+- callers can require a maximum age with max_age (seconds); max_age=0 never reads the cache,
+  and the fresh result replaces the cached one
+
+Only results that reflect an answer about the mailbox or the domain are stored: SMTP replies
+and missing MX. Results scored from DNS signals alone because SMTP was not attempted (blocked
+egress, provider policy), or attempted without a reply (time budget, tarpit, rate limit, no
+source address, connection errors), depend on this worker's state and are not cached.
+
+Keys:
+    verify:result:<email>       JSON: result fields + verified_at
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import asdict, fields
+
+import redis
+
+from app.core.config import settings
+from app.services.smtp_blocked_detector import _get_redis
+from app.services.verification.result import VerifyResult
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_RESULT_PREFIX = "verify:result:"
+CACHED_SIGNAL = "cached"
+
+_RESULT_FIELDS = frozenset(f.name for f in fields(VerifyResult))
+
+
+def _key(email: str) -> str:
+    return f"{REDIS_KEY_RESULT_PREFIX}{email.strip().lower()}"
+
+
+def result_ttl(result: VerifyResult) -> int:
+    """Seconds to keep a result, by status (0 = not cached)."""
+    ttls = {
+        "valid": settings.verify_result_ttl_valid_seconds,
+        "invalid": settings.verify_result_ttl_invalid_seconds,
+        "risky": settings.verify_result_ttl_risky_seconds,
+    }
+    return ttls.get(result.status, settings.verify_result_ttl_unknown_seconds)
+
+
+def is_cacheable(result: VerifyResult) -> bool:
+    """True for results that answer for the mailbox or the domain (see module docstring)."""
+    if result.smtp_blocked or CACHED_SIGNAL in result.signals:
+        return False
+    if result.smtp_attempted:
+        # Only a reply code from the server answers for the mailbox
+        return result.smtp_code_msg is not None
+    return not result.mx_found
+
+
+def _decode(raw: str | None, max_age: float | None, now: float) -> VerifyResult | None:
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+        verified_at = float(data.pop("verified_at"))
+        result = VerifyResult(**{k: v for k, v in data.items() if k in _RESULT_FIELDS})
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+    if max_age is not None and now - verified_at > max_age:
+        return None
+    result.signals = [*result.signals, CACHED_SIGNAL]
+    return result
+
+
+def get_cached_results(emails: list[str], max_age: float | None = None) -> dict[str, VerifyResult]:
+    """
+    Cached results for the given addresses (one round trip), keyed by the address as given.
+
+    max_age: Oldest acceptable result in seconds (None = any result still within its TTL,
+        0 = do not read the cache). Returns {} if the cache is disabled or Redis is down.
+    """
+    if not settings.verify_result_cache_enabled or max_age == 0 or not emails:
+        return {}
+    try:
+        raws = _get_redis().mget([_key(e) for e in emails])
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading cached verification results: {e}")
+        return {}
+    now = time.time()
+    cached = {}
+    for email, raw in zip(emails, raws, strict=True):
+        result = _decode(raw, max_age, now)
+        if result is not None:
+            result.email = email
+            cached[email] = result
+    return cached
+
+
+def get_cached_result(email: str, max_age: float | None = None) -> VerifyResult | None:
+    """Cached result for one address, or None (see get_cached_results)."""
+    return get_cached_results([email], max_age).get(email)
+
+
+def cache_result(result: VerifyResult) -> None:
+    """Store a freshly computed result for its status' TTL, if it is cacheable."""
+    if not settings.verify_result_cache_enabled or not is_cacheable(result):
+        return
+    ttl = result_ttl(result)
+    if ttl <= 0:
+        return
+    data = asdict(result)
+    data["verified_at"] = time.time()
+    try:
+        _get_redis().setex(_key(result.email), ttl, json.dumps(data))
+    except redis.RedisError as e:
+        logger.error(f"Redis error caching verification result: {e}")
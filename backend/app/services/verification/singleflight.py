@@ -0,0 +1,177 @@
+"""Cross-worker request coalescing (singleflight) for domain-level lookups.
+
+A bulk import enqueues hundreds of leads at one domain: the workers that pick them up miss the
+shared caches at the same moment and would all query the domain's DNS and send the catch-all
+probe together, which gets the probing IP throttled right at the start of the run. Instead the
+first worker to miss takes a short Redis lock and runs the lookup; the others poll the shared
+cache for its result and only run the lookup themselves if the wait times out, or if the holder
+released the lock without a result and they win the next round.
+
+- the lock expires after singleflight_lock_ttl_seconds, so a crashed holder delays the others
+  at most that long
+- waiters give up after singleflight_wait_seconds, capped by the lead's deadline
+- Redis errors fail open: the lookup runs locally
+
+Lookups with no cache of their own (the DNS signals) use coalesce(), which shares the result for
+a while; the catch-all probe keeps its verdict cache (smtp_blocked_detector) and uses claim().
+
+Keys:
+    verify:flight:<name>:<key>      lock, holds the holder's token
+    verify:shared:<name>:<key>      JSON result of a coalesced lookup
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+import redis
+
+from app.core.config import settings
+from app.services.smtp_blocked_detector import _get_redis
+from app.services.verification.deadline import Deadline, capped_timeout
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+REDIS_KEY_FLIGHT = "verify:flight:{name}:{key}"
+REDIS_KEY_SHARED = "verify:shared:{name}:{key}"
+
+# Waiters poll the shared result with exponential backoff between these bounds
+POLL_INITIAL_SECONDS = 0.05
+POLL_MAX_SECONDS = 0.5
+
+# Delete the lock only if the caller still holds it (it may have expired and been taken over)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _flight_key(name: str, key: str) -> str:
+    return REDIS_KEY_FLIGHT.format(name=name, key=key.lower())
+
+
+def _shared_key(name: str, key: str) -> str:
+    return REDIS_KEY_SHARED.format(name=name, key=key.lower())
+
+
+def _wait(r: redis.Redis, lock: str, read: Callable[[], T | None], wait_until: float) -> T | None:
+    """Poll read() until it returns a value, the lock is released or wait_until passes."""
+    delay = POLL_INITIAL_SECONDS
+    while (left := wait_until - time.monotonic()) > 0:
+        time.sleep(min(delay, left))
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+        value = read()
+        if value is not None:
+            return value
+        if not r.exists(lock):
+            return None
+    return None
+
+
+def claim(
+    name: str, key: str, read: Callable[[], T | None], deadline: Deadline | None = None
+) -> tuple[str | None, T | None]:
+    """
+    Take the lookup name for key, or wait for the worker running it.
+
+    read returns the lookup's shared result (None while there is none). Returns (token, None)
+    when the caller must run the lookup, share its result, then release(name, key, token); or
+    (None, value) when another worker's result arrived. With coalescing disabled, Redis down or
+    the wait timed out, the caller runs the lookup anyway with a token that holds no lock.
+    """
+    token = uuid.uuid4().hex
+    if not settings.singleflight_enabled:
+        return token, None
+    lock = _flight_key(name, key)
+    wait_until = time.monotonic() + capped_timeout(settings.singleflight_wait_seconds, deadline)
+    try:
+        r = _get_redis()
+        while True:
+            if r.set(lock, token, nx=True, px=int(settings.singleflight_lock_ttl_seconds * 1000)):
+                # The previous holder may have shared its result just before releasing
+                value = read()
+                if value is not None:
+                    release(name, key, token)
+                    return None, value
+                return token, None
+            value = _wait(r, lock, read, wait_until)
+            if value is not None:
+                return None, value
+            if time.monotonic() >= wait_until:
+                return token, None
+    except redis.RedisError as e:
+        logger.error(f"Redis error coalescing {name} lookup for {key}: {e}")
+        return token, None
+
+
+def release(name: str, key: str, token: str) -> None:
+    """Release the lock taken by claim() (no-op if it expired or was never held)."""
+    if not settings.singleflight_enabled:
+        return
+    try:
+        _get_redis().eval(_RELEASE_SCRIPT, 1, _flight_key(name, key), token)
+    except redis.RedisError as e:
+        logger.error(f"Redis error releasing {name} lookup for {key}: {e}")
+
+
+def get_shared(name: str, key: str) -> Any | None:
+    """Result of a coalesced lookup shared by another worker, or None."""
+    try:
+        raw = _get_redis().get(_shared_key(name, key))
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading shared {name} result: {e}")
+        return None
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+def set_shared(name: str, key: str, value: Any, ttl_seconds: int) -> None:
+    """Share a lookup's result (JSON-serializable) with the other workers for ttl_seconds."""
+    try:
+        _get_redis().setex(_shared_key(name, key), ttl_seconds, json.dumps(value))
+    except redis.RedisError as e:
+        logger.error(f"Redis error sharing {name} result: {e}")
+
+
+def coalesce(
+    name: str,
+    key: str,
+    compute: Callable[[], T],
+    ttl_seconds: int,
+    shareable: Callable[[T], bool] = lambda _: True,
+    deadline: Deadline | None = None,
+) -> tuple[T, bool]:
+    """
+    Result of compute() for key, run by one worker at a time and shared for ttl_seconds.
+
+    Returns (value, shared): shared is True when the value came from another worker. Results
+    rejected by shareable (e.g. transient failures) are returned but not shared.
+    """
+    if not settings.singleflight_enabled:
+        return compute(), False
+    value = get_shared(name, key)
+    if value is not None:
+        return value, True
+    token, value = claim(name, key, lambda: get_shared(name, key), deadline)
+    if token is None:
+        return value, True
+    try:
+        value = compute()
+        if shareable(value):
+            set_shared(name, key, value, ttl_seconds)
+    finally:
+        release(name, key, token)
+    return value, False
@@ -1,14 +1,38 @@
-"""SMTP operations: RCPT probe and catch-all detection."""
+"""SMTP operations: RCPT probe (single and session-based) and catch-all detection."""
 
 from __future__ import annotations
 
 import random
 import smtplib
+import socket
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
 
 from app.core.config import settings
 from app.core.log_service import VerificationLogger
-from app.services.smtp_blocked_detector import record_smtp_timeout
-from app.services.verification.dns_checker import resolve_to_ip
+from app.services.smtp_blocked_detector import record_smtp_timeout, source_addresses
+from app.services.verification.deadline import BUDGET_EXHAUSTED_DETAIL, Deadline, capped_timeout
+from app.services.verification.dns_checker import detect_provider, resolve_to_ip
+from app.services.verification.egress_pool import (
+    NO_SOURCE_DETAIL,
+    SMTP_SERVICE_UNAVAILABLE,
+    is_throttle_error,
+    mark_source_throttled,
+    pick_source_address,
+)
+from app.services.verification.mx_latency import (
+    CLEAR_STRIKES,
+    NO_STRIKE,
+    PHASE_COMMAND,
+    PHASE_GREETING,
+    STRIKE,
+    TARPIT_ACTION_SHORT,
+    MXLatency,
+    get_mx_latency,
+    record_mx_latency,
+)
+from app.services.verification.smtp_rate_limiter import acquire_smtp_token
 
 SMTP_TIMEOUT_SECS = getattr(settings, "smtp_timeout_seconds", 5)
 DEFAULT_MAIL_FROM = getattr(settings, "smtp_mail_from", "noreply@mailcheck.local")
@@ -18,6 +42,312 @@ SMTP_SUCCESS_MIN = 200
 SMTP_SUCCESS_MAX = 300
 SMTP_TEMP_FAILURE_MIN = 400
 SMTP_TEMP_FAILURE_MAX = 500
+SMTP_TOO_MANY_RECIPIENTS = 452
+
+SMTP_PORT = 25
+# Max RCPT commands written at once when the server supports PIPELINING
+MAX_PIPELINE_BATCH = 20
+T = TypeVar("T")
+
+# Detail of hosts not probed because they are marked as tarpits (see mx_latency)
+TARPIT_DETAIL = "SMTP error: tarpit host"
+
+_local_hostname_cache: str | None = None
+
+
+def _local_hostname() -> str:
+    """EHLO name, resolved once per process (socket.getfqdn() can block for seconds)."""
+    global _local_hostname_cache
+    if _local_hostname_cache is None:
+        _local_hostname_cache = getattr(settings, "smtp_helo_hostname", "") or socket.getfqdn() or "localhost"
+    return _local_hostname_cache
+
+
+def _classify_rcpt_reply(code: int, msg: bytes | str | None) -> tuple[bool, str, str | None]:
+    """Map an RCPT reply to (accepted, detail, short_code_msg)."""
+    text = msg.decode("utf-8", errors="replace") if isinstance(msg, bytes) else (msg or "")
+    short = f"{code} {text.strip()}" if text.strip() else str(code)
+    if SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX:
+        return True, f"RCPT accepted ({code})", short
+    if SMTP_TEMP_FAILURE_MIN <= code < SMTP_TEMP_FAILURE_MAX:
+        return False, f"Temporary failure ({code})", short
+    return False, f"Rejected ({code})", short
+
+
+class SMTPProbeSession:
+    """
+    One SMTP connection to an MX host, reused for several RCPT TO probes.
+
+    The connection, banner and EHLO are paid once. Recipients are sent as consecutive RCPT
+    commands under a single MAIL FROM, pipelined when the server advertises PIPELINING.
+    Each probe() call starts a new transaction (RSET + MAIL FROM); RCPTs are never followed
+    by DATA, so no message is sent. Step timeouts adapt to the host's observed latency and
+    tarpit hosts are skipped or probed briefly (see mx_latency). With a deadline (see deadline),
+    every step's timeout is also capped by the time left and recipients not yet sent when it
+    passes get BUDGET_EXHAUSTED_DETAIL. With a source address pool, the connection is bound to
+    an address picked for the host (see egress_pool).
+
+    Usage:
+        with SMTPProbeSession(mx_host, mail_from) as session:
+            results = session.probe([random_address, *candidates])
+    """
+
+    def __init__(
+        self,
+        mx_host: str,
+        mail_from: str,
+        smtp_timeout_seconds: int | None = None,
+        dns_timeout_seconds: float | None = None,
+        logger: VerificationLogger | None = None,
+        deadline: Deadline | None = None,
+    ):
+        self.mx_host = mx_host
+        self.mail_from = mail_from
+        self.smtp_timeout = smtp_timeout_seconds if smtp_timeout_seconds is not None else SMTP_TIMEOUT_SECS
+        self.dns_timeout = dns_timeout_seconds
+        self.log = logger or VerificationLogger()
+        self.deadline = deadline
+        self.error: str | None = None  # Connection-level error, e.g. "SMTP error: TimeoutError"
+        self.pipelining = False
+        self.source_address: str | None = None  # Pool address the connection is bound to
+        self._source_throttled = False
+        self._smtp: smtplib.SMTP | None = None
+        self._in_transaction = False
+        self.latency = MXLatency()  # Host history, read in open() when adaptive timeouts are on
+        self.tarpit = False  # Host marked as tarpit and probed with the short tarpit timeout
+        self._phase = PHASE_GREETING
+        self._timeout = float(self.smtp_timeout)  # Timeout of the step in progress
+        self._budget_capped = False  # _timeout is the deadline's, not the step's own
+        self._samples: list[tuple[str, float]] = []  # (phase, seconds), recorded on close()
+        self._strike = NO_STRIKE
+
+    def __enter__(self) -> SMTPProbeSession:
+        self.open()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._smtp is not None
+
+    def open(self) -> bool:
+        """
+        Pick a source address, take a connection token (see smtp_rate_limiter), resolve the MX
+        host, connect and EHLO. Returns False (and sets error) on failure.
+        """
+        if self.deadline is not None and self.deadline.expired:
+            self.error = BUDGET_EXHAUSTED_DETAIL
+            return False
+        if settings.smtp_adaptive_timeouts:
+            self.latency = get_mx_latency(self.mx_host)
+            if self.latency.tarpit:
+                if settings.smtp_tarpit_action != TARPIT_ACTION_SHORT:
+                    self.log.debug_smtp_tarpit_skipped(self.mx_host)
+                    self.error = TARPIT_DETAIL
+                    return False
+                self.log.debug_smtp_tarpit_short(self.mx_host, settings.smtp_tarpit_timeout_seconds)
+                self.tarpit = True
+        if source_addresses():
+            self.source_address = pick_source_address(self.mx_host)
+            if self.source_address is None:
+                self.log.debug_smtp_no_source_address(self.mx_host)
+                self.error = NO_SOURCE_DETAIL
+                return False
+            self.log.debug_smtp_source_address(self.mx_host, self.source_address)
+        limited = acquire_smtp_token(
+            self.mx_host,
+            max_wait_seconds=capped_timeout(settings.smtp_rate_max_wait_seconds, self.deadline),
+            source_address=self.source_address,
+        )
+        if limited:
+            self.log.debug_smtp_rate_limited(self.mx_host, limited)
+            self.error = f"SMTP error: {limited}"
+            return False
+        ip = resolve_to_ip(self.mx_host, dns_timeout_seconds=self.dns_timeout, deadline=self.deadline)
+        self.log.debug_smtp_dns_resolve(self.mx_host, ip)
+        if not ip:
+            self.error = "SMTP error: DNS timeout or no A/AAAA"
+            return False
+        if not self._arm(PHASE_GREETING):
+            self.error = BUDGET_EXHAUSTED_DETAIL
+            return False
+
+        try:
+            self.log.debug_smtp_connecting(self.mx_host, ip, self._timeout)
+            started = time.monotonic()
+            self._smtp = smtplib.SMTP(
+                ip,
+                SMTP_PORT,
+                timeout=self._timeout,
+                local_hostname=_local_hostname(),
+                source_address=(self.source_address, 0) if self.source_address else None,
+            )
+            greeting = time.monotonic() - started
+            self._samples.append((PHASE_GREETING, greeting))
+            self._strike = STRIKE if greeting >= settings.smtp_tarpit_banner_seconds else CLEAR_STRIKES
+            self._smtp.set_debuglevel(0)
+            self._arm(PHASE_COMMAND)
+            self._command(self._smtp.ehlo_or_helo_if_needed)
+            self.pipelining = bool(self._smtp.has_extn("pipelining"))
+            return True
+        except OSError as e:  # smtplib.SMTPException and TimeoutError are OSError subclasses
+            self._fail(e)
+            return False
+
+    def close(self) -> None:
+        """Record the session's latency samples, QUIT and close the connection (errors ignored)."""
+        samples, self._samples = self._samples, []
+        strike, self._strike = self._strike, NO_STRIKE
+        if settings.smtp_adaptive_timeouts:
+            record_mx_latency(self.mx_host, samples, strike)
+        smtp, self._smtp = self._smtp, None
+        self._in_transaction = False
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        try:
+            smtp.close()
+        except OSError:
+            pass
+
+    def probe(self, recipients: list[str]) -> dict[str, tuple[bool, str, str | None]]:
+        """
+        RCPT TO each recipient in a fresh transaction.
+
+        Returns:
+            recipient -> (accepted, detail, short_code_msg), same shape as smtp_probe_rcpt().
+        """
+        results: dict[str, tuple[bool, str, str | None]] = {}
+        if not recipients:
+            return results
+        if self._smtp is None:
+            err = self.error or "SMTP error: not connected"
+            return {r: (False, err, None) for r in recipients}
+
+        if not self._arm(PHASE_COMMAND):
+            return {r: (False, BUDGET_EXHAUSTED_DETAIL, None) for r in recipients}
+
+        try:
+            self._end_transaction()  # RSET if a previous probe() left a transaction open
+            pending = list(recipients)
+            retried: set[str] = set()
+            while pending:
+                if not self._arm(PHASE_COMMAND):
+                    for r in pending:
+                        results[r] = (False, BUDGET_EXHAUSTED_DETAIL, None)
+                    break
+                if not self._in_transaction:
+                    code, msg = self._begin_transaction()
+                    if not self._in_transaction:
+                        _, _, short = _classify_rcpt_reply(code, msg)
+                        for r in pending:
+                            results[r] = (False, f"SMTP error: MAIL FROM refused ({code})", short)
+                        break
+                batch = pending[: MAX_PIPELINE_BATCH if self.pipelining else 1]
+                pending = pending[len(batch) :]
+                requeue: list[str] = []
+                for rcpt, (code, msg) in zip(batch, self._send_rcpts(batch), strict=True):
+                    if code == SMTP_TOO_MANY_RECIPIENTS and rcpt not in retried:
+                        # Per-transaction recipient limit reached: retry in a new transaction
+                        retried.add(rcpt)
+                        requeue.append(rcpt)
+                        continue
+                    if code == SMTP_SERVICE_UNAVAILABLE:
+                        self._throttled()
+                    results[rcpt] = _classify_rcpt_reply(code, msg)
+                    self.log.debug_smtp_rcpt_result(self.mail_from, rcpt, results[rcpt][2] or "")
+                if requeue:
+                    pending = requeue + pending
+                    self._end_transaction()
+        except OSError as e:
+            err = self._fail(e)
+            for r in recipients:
+                results.setdefault(r, (False, err, None))
+
+        return results
+
+    def _arm(self, phase: str) -> bool:
+        """
+        Set the timeout of the next step: the host's adaptive one for phase (short for a tarpit),
+        capped by the deadline. Returns False once the deadline has passed.
+        """
+        timeout = self.latency.timeout(phase, self.smtp_timeout)
+        if self.tarpit:
+            timeout = min(timeout, settings.smtp_tarpit_timeout_seconds)
+        self._phase = phase
+        self._timeout = capped_timeout(timeout, self.deadline)
+        self._budget_capped = self._timeout < timeout
+        if not self._timeout:
+            return False
+        sock = getattr(self._smtp, "sock", None)
+        if sock is not None:
+            sock.settimeout(self._timeout)
+        return True
+
+    def _command(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run one SMTP round trip and keep its latency as a sample."""
+        started = time.monotonic()
+        reply = fn(*args)
+        self._samples.append((PHASE_COMMAND, time.monotonic() - started))
+        return reply
+
+    def _begin_transaction(self) -> tuple[int, bytes]:
+        """MAIL FROM; marks the transaction open if the sender was accepted."""
+        code, msg = self._command(self._smtp.mail, self.mail_from)
+        self._in_transaction = SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX
+        if code == SMTP_SERVICE_UNAVAILABLE:
+            self._throttled()
+        return code, msg
+
+    def _end_transaction(self) -> None:
+        """RSET the open transaction so the next MAIL FROM starts clean."""
+        if self._smtp is not None and self._in_transaction:
+            self._command(self._smtp.rset)
+        self._in_transaction = False
+
+    def _send_rcpts(self, batch: list[str]) -> list[tuple[int, bytes]]:
+        """Send RCPT commands; several in one write when PIPELINING is available."""
+        if len(batch) == 1:
+            return [self._command(self._smtp.rcpt, batch[0])]
+        return self._command(self._pipeline_rcpts, batch)
+
+    def _pipeline_rcpts(self, batch: list[str]) -> list[tuple[int, bytes]]:
+        self._smtp.send("".join(f"RCPT TO:{smtplib.quoteaddr(r)}\r\n" for r in batch))
+        return [self._smtp.getreply() for _ in batch]
+
+    def _throttled(self) -> None:
+        """The server is throttling this source address: rotate it out (see egress_pool)."""
+        if self.source_address and not self._source_throttled:
+            self._source_throttled = True
+            self.log.debug_smtp_source_throttled(self.mx_host, self.source_address)
+            mark_source_throttled(self.source_address, self.mx_host)
+
+    def _fail(self, e: OSError) -> str:
+        """Log a connection-level error, feed the blocked detector and drop the connection."""
+        err = f"SMTP error: {type(e).__name__}"
+        self.log.debug_smtp_exception(self.mx_host, err)
+        # Timeouts and connection-related errors (port blocked, network unreachable) feed the detector
+        connection_error = not isinstance(e, smtplib.SMTPException) and (
+            "timed out" in str(e).lower() or "connection refused" in str(e).lower()
+        )
+        # A timeout cut short by the lead's deadline says nothing about the network or the host
+        if (isinstance(e, TimeoutError) or connection_error) and not self._budget_capped:
+            record_smtp_timeout(self.mx_host, detect_provider([(0, self.mx_host)]), self.source_address)
+        if is_throttle_error(e):
+            self._throttled()
+        if isinstance(e, smtplib.SMTPServerDisconnected) and "timed out" in str(e) and not self._budget_capped:
+            # Connected but the reply never came: the step took at least its whole timeout
+            self._samples.append((self._phase, self._timeout))
+            if self._phase == PHASE_GREETING:
+                self._strike = STRIKE  # Banner withheld
+        self.error = err
+        self.close()
+        return err
 
 
 def smtp_probe_rcpt(
@@ -27,9 +357,10 @@ def smtp_probe_rcpt(
     smtp_timeout_seconds: int | None = None,
     dns_timeout_seconds: float | None = None,
     logger: VerificationLogger | None = None,
+    deadline: Deadline | None = None,
 ) -> tuple[bool, str, str | None]:
     """
-    Best-effort SMTP RCPT probe.
+    Best-effort SMTP RCPT probe (one connection, one recipient).
 
     Returns:
         (accepted, detail, short_code_msg)
@@ -37,70 +368,89 @@ def smtp_probe_rcpt(
         - detail: Human-readable detail string
         - short_code_msg: e.g. "250 OK" for logging
     """
-    log = logger or VerificationLogger()
-    smtp_to = smtp_timeout_seconds if smtp_timeout_seconds is not None else SMTP_TIMEOUT_SECS
-    ip = resolve_to_ip(mx_host, dns_timeout_seconds=dns_timeout_seconds)
+    with SMTPProbeSession(
+        mx_host,
+        mail_from,
+        smtp_timeout_seconds=smtp_timeout_seconds,
+        dns_timeout_seconds=dns_timeout_seconds,
+        logger=logger,
+        deadline=deadline,
+    ) as session:
+        return session.probe([candidate_email])[candidate_email]
 
-    log.debug_smtp_dns_resolve(mx_host, ip)
 
-    if not ip:
-        return False, "SMTP error: DNS timeout or no A/AAAA", None
+def smtp_probe_many(
+    mx_hosts: list[str],
+    recipients: list[str],
+    mail_from: str,
+    smtp_timeout_seconds: int | None = None,
+    dns_timeout_seconds: float | None = None,
+    logger: VerificationLogger | None = None,
+    max_mx_hosts: int = 2,
+    sessions: dict[str, SMTPProbeSession] | None = None,
+    deadline: Deadline | None = None,
+) -> dict[str, tuple[str, bool, str, str | None]]:
+    """
+    Probe several recipients with one SMTP session per MX host.
 
-    try:
-        log.debug_smtp_connecting(mx_host, ip, smtp_to)
+    Recipients accepted or rejected on an MX are final; temporary failures and SMTP errors
+    are retried on the next MX host (same policy as the single-recipient probe).
 
-        with smtplib.SMTP(ip, 25, timeout=smtp_to) as s:
-            s.set_debuglevel(0)
-            s.ehlo_or_helo_if_needed()
-            s.mail(mail_from)
-            code, msg = s.rcpt(candidate_email)
-            short = f"{code} {str(msg).strip()}" if msg else str(code)
+    Args:
+        sessions: Optional pool (mx_host -> session) kept open across calls, so successive
+            rounds (or leads) reuse the connection. The caller closes them; without a pool each
+            session is closed before returning.
 
-            log.debug_smtp_rcpt_result(mail_from, candidate_email, short)
+    Returns:
+        recipient -> (mx_host, accepted, detail, short_code_msg) for the last MX tried
+    """
+    log = logger or VerificationLogger()
+    results: dict[str, tuple[str, bool, str, str | None]] = {}
+    pending = list(dict.fromkeys(recipients))
 
-            if SMTP_SUCCESS_MIN <= code < SMTP_SUCCESS_MAX:
-                return True, f"RCPT accepted ({code})", short
-            if SMTP_TEMP_FAILURE_MIN <= code < SMTP_TEMP_FAILURE_MAX:
-                return False, f"Temporary failure ({code})", short
-            return False, f"Rejected ({code})", short
+    for mx in mx_hosts[:max_mx_hosts]:
+        if not pending:
+            break
+        for r in pending:
+            log.debug_rcpt_verifying(r, mx)
+        session = sessions.get(mx) if sessions is not None else None
+        if session is None:
+            session = SMTPProbeSession(
+                mx,
+                mail_from,
+                smtp_timeout_seconds=smtp_timeout_seconds,
+                dns_timeout_seconds=dns_timeout_seconds,
+                logger=log,
+                deadline=deadline,
+            )
+            session.open()
+            if sessions is not None:
+                sessions[mx] = session
+        else:
+            # Pooled session, possibly opened for an earlier lead: use this call's budget and logger
+            session.deadline, session.log = deadline, log
+        try:
+            outcomes = session.probe(pending)
+        finally:
+            if sessions is None:
+                session.close()
 
-    except smtplib.SMTPConnectError as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        return False, err, None
-    except smtplib.SMTPServerDisconnected as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        return False, err, None
-    except smtplib.SMTPHeloError as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        return False, err, None
-    except smtplib.SMTPRecipientsRefused as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        return False, err, None
-    except smtplib.SMTPSenderRefused as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        return False, err, None
-    except smtplib.SMTPDataError as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        return False, err, None
-    except TimeoutError as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        # Record timeout for SMTP blocked detection
-        record_smtp_timeout(mx_host)
-        return False, err, None
-    except OSError as e:
-        err = f"SMTP error: {type(e).__name__}"
-        log.debug_smtp_exception(mx_host, err)
-        # Record timeout for connection-related errors (port blocked, network unreachable)
-        if "timed out" in str(e).lower() or "connection refused" in str(e).lower():
-            record_smtp_timeout(mx_host)
-        return False, err, None
+        retry: list[str] = []
+        for r in pending:
+            accepted, detail, short = outcomes[r]
+            previous_short = results[r][3] if r in results else None
+            results[r] = (mx, accepted, detail, short if short is not None else previous_short)
+            if not accepted and ("Temporary" in detail or "SMTP error" in detail):
+                retry.append(r)
+        pending = retry
+
+    return results
+
+
+def random_probe_address(domain: str) -> str:
+    """Random mailbox that should not exist, used to detect catch-all domains."""
+    rnd = "".join(random.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(18))
+    return f"{rnd}@{domain}"
 
 
 def detect_catch_all(
@@ -110,6 +460,7 @@ def detect_catch_all(
     smtp_timeout_seconds: int | None = None,
     dns_timeout_seconds: float | None = None,
     logger: VerificationLogger | None = None,
+    deadline: Deadline | None = None,
 ) -> tuple[bool, bool, str]:
     """
     Detect if domain is a catch-all (accepts any mailbox).
@@ -118,8 +469,7 @@ def detect_catch_all(
         (catch_all_detected, smtp_attempted, reason)
     """
     log = logger or VerificationLogger()
-    rnd = "".join(random.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(18))
-    test_email = f"{rnd}@{domain}"
+    test_email = random_probe_address(domain)
 
     log.debug_catchall_checking(test_email)
 
@@ -133,6 +483,7 @@ def detect_catch_all(
             smtp_timeout_seconds=smtp_timeout_seconds,
             dns_timeout_seconds=dns_timeout_seconds,
             logger=log,
+            deadline=deadline,
         )
 
         log.debug_catchall_result(mx, accepted, short or detail)
@@ -0,0 +1,208 @@
+"""Outbound SMTP rate limiter shared by all workers (Redis GCRA token buckets).
+
+Every SMTP connection takes a token from the bucket of its MX host and, for known providers
+(see provider_fingerprints), from the provider bucket, so that many workers probing the same
+provider do not trigger 421/450 throttling or tarpits. Providers can also have a daily cap.
+Connections bound to a pool source address (see egress_pool) use that address's own buckets,
+since receiving servers throttle per sending IP.
+
+Keys (<scope> = mx_host or provider, suffixed with @<source address> for pool connections):
+    smtp:rate:host:<scope>                   GCRA theoretical arrival time (ms)
+    smtp:rate:provider:<scope>               GCRA theoretical arrival time (ms)
+    smtp:rate:daily:<scope>:<YYYYMMDD>       connections today (only with a daily cap)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+import redis
+
+from app.core.config import settings
+from app.services.smtp_blocked_detector import _get_redis
+from app.services.verification.dns_checker import detect_provider
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_RATE_HOST_PREFIX = "smtp:rate:host:"
+REDIS_KEY_RATE_PROVIDER_PREFIX = "smtp:rate:provider:"
+REDIS_KEY_RATE_DAILY_PREFIX = "smtp:rate:daily:"
+TTL_DAILY_SECONDS = 2 * 86400
+MS_PER_MINUTE = 60_000
+# Returned by the script when the daily cap is exhausted
+DAILY_CAP_REACHED = -1
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Connections per minute, burst allowance and daily cap (0 = no cap)."""
+
+    per_minute: float
+    burst: int = 1
+    daily_cap: int = 0
+
+    @property
+    def interval_ms(self) -> float:
+        return MS_PER_MINUTE / self.per_minute
+
+
+# Defaults per provider; override with the SMTP_RATE_LIMITS setting (JSON, same shape)
+DEFAULT_PROVIDER_RATE_LIMITS: dict[str, RateLimit] = {
+    "google": RateLimit(per_minute=120, burst=10),
+    "microsoft": RateLimit(per_minute=60, burst=5),
+    "yahoo": RateLimit(per_minute=20, burst=3),
+    "icloud": RateLimit(per_minute=20, burst=3),
+    "ionos": RateLimit(per_minute=30, burst=3),
+    "ovh": RateLimit(per_minute=30, burst=3),
+    "zoho": RateLimit(per_minute=30, burst=3),
+    "barracuda": RateLimit(per_minute=30, burst=3),
+    "proofpoint": RateLimit(per_minute=30, burst=3),
+    "mimecast": RateLimit(per_minute=30, burst=3),
+}
+
+# KEYS[1] = daily counter, KEYS[2..n] = GCRA buckets
+# ARGV[1] = now (ms), ARGV[2] = daily cap (0 = none), ARGV[3] = daily counter TTL,
+# ARGV[2*i], ARGV[2*i+1] = emission interval (ms) and burst of KEYS[i]
+# Returns 0 when a token was taken from every bucket, the wait in ms otherwise, -1 if over the daily cap.
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cap = tonumber(ARGV[2])
+if cap > 0 and tonumber(redis.call('GET', KEYS[1]) or '0') >= cap then
+  return -1
+end
+local wait = 0
+local tats = {}
+for i = 2, #KEYS do
+  local interval = tonumber(ARGV[2 * i])
+  local burst = tonumber(ARGV[2 * i + 1])
+  local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+  if tat < now then tat = now end
+  tats[i] = tat + interval
+  local allow_at = tats[i] - interval * burst
+  if allow_at > now then wait = math.max(wait, allow_at - now) end
+end
+if wait > 0 then
+  return math.ceil(wait)
+end
+for i = 2, #KEYS do
+  redis.call('SET', KEYS[i], tostring(tats[i]), 'PX', math.ceil(tats[i] - now) + 1000)
+end
+if cap > 0 then
+  redis.call('INCR', KEYS[1])
+  redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+end
+return 0
+"""
+
+
+def provider_rate_limits() -> dict[str, RateLimit]:
+    """Per-provider limits: defaults overridden by settings.smtp_rate_limits (JSON object)."""
+    limits = dict(DEFAULT_PROVIDER_RATE_LIMITS)
+    raw = settings.smtp_rate_limits.strip()
+    if not raw:
+        return limits
+    try:
+        overrides = json.loads(raw)
+        for provider, cfg in overrides.items():
+            limits[provider] = RateLimit(
+                per_minute=float(cfg["per_minute"]),
+                burst=int(cfg.get("burst", 1)),
+                daily_cap=int(cfg.get("daily_cap", 0)),
+            )
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        logger.error(f"Invalid SMTP_RATE_LIMITS, using defaults: {e}")
+        return dict(DEFAULT_PROVIDER_RATE_LIMITS)
+    return limits
+
+
+def _host_rate_limit() -> RateLimit:
+    return RateLimit(per_minute=settings.smtp_rate_per_host_per_minute, burst=settings.smtp_rate_host_burst)
+
+
+def try_acquire_smtp_token(
+    mx_host: str, provider: str | None = None, source_address: str | None = None
+) -> float | None:
+    """
+    Try to take a connection token for an MX host (and its provider), from source_address's
+    buckets when the connection is bound to a pool address.
+
+    Returns 0.0 if acquired, the seconds to wait before retrying, or None if the provider's
+    daily cap is exhausted. Fails open (0.0) when the limiter is disabled or Redis is down.
+    """
+    if not settings.smtp_rate_limit_enabled:
+        return 0.0
+    host = mx_host.strip().lower().rstrip(".")
+    provider = provider or detect_provider([(0, host)])
+    host_limit = _host_rate_limit()
+    provider_limit = provider_rate_limits().get(provider)
+
+    suffix = f"@{source_address}" if source_address else ""
+    day = datetime.now(UTC).strftime("%Y%m%d")
+    keys = [f"{REDIS_KEY_RATE_DAILY_PREFIX}{provider}{suffix}:{day}", f"{REDIS_KEY_RATE_HOST_PREFIX}{host}{suffix}"]
+    args: list[float | int] = [
+        int(time.time() * 1000),
+        provider_limit.daily_cap if provider_limit else 0,
+        TTL_DAILY_SECONDS,
+        host_limit.interval_ms,
+        host_limit.burst,
+    ]
+    if provider_limit:
+        keys.append(f"{REDIS_KEY_RATE_PROVIDER_PREFIX}{provider}{suffix}")
+        args += [provider_limit.interval_ms, provider_limit.burst]
+    try:
+        wait_ms = int(_get_redis().eval(_GCRA_SCRIPT, len(keys), *keys, *args))
+    except redis.RedisError as e:
+        logger.error(f"Redis error in SMTP rate limiter: {e}")
+        return 0.0
+    if wait_ms == DAILY_CAP_REACHED:
+        return None
+    return wait_ms / 1000
+
+
+def acquire_smtp_token(
+    mx_host: str,
+    provider: str | None = None,
+    max_wait_seconds: float | None = None,
+    source_address: str | None = None,
+) -> str | None:
+    """
+    Block until a connection token is available (up to max_wait_seconds).
+
+    Returns None when acquired, or the reason it was not ("daily cap reached", "rate limited").
+    """
+    max_wait = settings.smtp_rate_max_wait_seconds if max_wait_seconds is None else max_wait_seconds
+    deadline = time.monotonic() + max_wait
+    while True:
+        wait = try_acquire_smtp_token(mx_host, provider, source_address)
+        if wait is None:
+            return "daily cap reached"
+        if wait == 0:
+            return None
+        if time.monotonic() + wait > deadline:
+            return "rate limited"
+        time.sleep(wait)
+
+
+async def acquire_smtp_token_async(
+    mx_host: str,
+    provider: str | None = None,
+    max_wait_seconds: float | None = None,
+    source_address: str | None = None,
+) -> str | None:
+    """acquire_smtp_token for the asyncio engine: waits without holding a thread."""
+    max_wait = settings.smtp_rate_max_wait_seconds if max_wait_seconds is None else max_wait_seconds
+    deadline = time.monotonic() + max_wait
+    while True:
+        wait = await asyncio.to_thread(try_acquire_smtp_token, mx_host, provider, source_address)
+        if wait is None:
+            return "daily cap reached"
+        if wait == 0:
+            return None
+        if time.monotonic() + wait > deadline:
+            return "rate limited"
+        await asyncio.sleep(wait)
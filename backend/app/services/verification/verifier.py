@@ -5,24 +5,33 @@ from __future__ import annotations
 from collections.abc import Callable
 from typing import Any
 
+from app.core.config import settings
 from app.core.log_service import VerificationLogger
 from app.services.smtp_blocked_detector import is_smtp_blocked
-from app.services.verification.dns_checker import (
-    DNS_TIMEOUT_SECS,
-    check_domain_spf_dmarc,
-    detect_provider,
-    mx_lookup,
+from app.services.verification.deadline import Deadline, budget_exhausted
+from app.services.verification.disposable import is_disposable_domain
+from app.services.verification.dns_checker import DNS_TIMEOUT_SECS
+from app.services.verification.domain_context import (
+    DEFAULT_STOP_POLICY,
+    DomainContext,
+    build_domain_context,
+    probe_domain_recipients,
 )
-from app.services.verification.result import DISPOSABLE_DOMAINS, VerifyResult
+from app.services.verification.result import VerifyResult
+from app.services.verification.result_cache import cache_result, get_cached_result, get_cached_results
 from app.services.verification.smtp_checker import (
     DEFAULT_MAIL_FROM,
     SMTP_TIMEOUT_SECS,
-    detect_catch_all,
+    SMTPProbeSession,
     smtp_probe_rcpt,
 )
 from app.services.verification.web_search import check_email_mentioned_on_web
 
 CANDIDATES_PREVIEW_LIMIT = 10
+MAX_CANDIDATES = 15
+# Adaptive limit when SMTP cannot tell candidates apart (blocked, no MX, known catch-all):
+# only the most likely patterns are worth returning
+ADAPTIVE_MAX_CANDIDATES_NO_SMTP = 3
 
 
 def verify_email(
@@ -31,19 +40,95 @@ def verify_email(
     smtp_timeout_seconds: int | None = None,
     dns_timeout_seconds: float | None = None,
     logger: VerificationLogger | None = None,
+    domain_context: DomainContext | None = None,
+    provider_policies: dict[str, dict] | None = None,
+    deadline: Deadline | None = None,
+    max_age: float | None = None,
 ) -> VerifyResult:
     """
     Best-effort email verification: format, disposable domain, MX, SPF/DMARC, catch-all, SMTP RCPT.
 
     When SMTP port 25 is blocked at infrastructure level, uses alternative signals
     (DNS, provider detection, SPF/DMARC) to provide useful results instead of "unknown".
+
+    If domain_context is given (see build_domain_context), the domain-level checks are reused
+    and only the RCPT probe for this mailbox is performed. Providers whose policy disables
+    probing (see provider_policy) are scored from DNS signals alone. A deadline (see deadline)
+    caps every DNS and SMTP step.
+
+    A result cached for this address (see result_cache) no older than max_age seconds is returned
+    without any DNS or SMTP I/O (None = any result within its TTL, 0 = always verify). Fresh
+    results are cached.
     """
     mail_from = mail_from or DEFAULT_MAIL_FROM
     log = logger or VerificationLogger()
 
     # Check if SMTP is blocked at infrastructure level
-    smtp_blocked = is_smtp_blocked()
+    smtp_blocked = domain_context.smtp_blocked if domain_context is not None else is_smtp_blocked()
+
+    precheck = _precheck_email(email, smtp_blocked, log)
+    if precheck is not None:
+        return precheck
+    cached = get_cached_result(email, max_age)
+    if cached is not None:
+        return cached
+    domain = email.split("@", 1)[1].strip().lower()
+
+    ctx = domain_context
+    if ctx is None or ctx.domain != domain:
+        ctx = build_domain_context(
+            domain,
+            mail_from=mail_from,
+            smtp_timeout_seconds=smtp_timeout_seconds,
+            dns_timeout_seconds=dns_timeout_seconds,
+            logger=log,
+            smtp_blocked=smtp_blocked,
+            provider_policies=provider_policies,
+            deadline=deadline,
+        )
 
+    if not ctx.mx_found:
+        result = _no_mx_result(email, smtp_blocked)
+        cache_result(result)
+        return result
+
+    # Initialize SMTP-related variables
+    smtp_attempted = False
+    accepted_any = False
+    detail_any = ""
+    smtp_short: str | None = None
+
+    # Skip SMTP probes if blocked at infrastructure level (already logged by the domain context)
+    if email in ctx.rcpt_results:
+        # Already probed in the lead's shared SMTP session
+        mxh, accepted_any, detail, smtp_short = ctx.rcpt_results[email]
+        smtp_attempted = True
+        detail_any = f"{mxh}: {detail}"
+    elif not ctx.smtp_blocked and not ctx.skip_rcpt:
+        smtp_attempted, accepted_any, detail_any, smtp_short = _probe_candidate(
+            email,
+            ctx.probe_mx_hosts,
+            mail_from,
+            smtp_timeout_seconds=ctx.smtp_timeout(smtp_timeout_seconds),
+            dns_timeout_seconds=dns_timeout_seconds,
+            logger=log,
+            deadline=deadline,
+        )
+
+    result = _build_result(
+        email,
+        ctx,
+        smtp_attempted=smtp_attempted,
+        accepted_any=accepted_any,
+        detail_any=detail_any,
+        smtp_short=smtp_short,
+    )
+    cache_result(result)
+    return result
+
+
+def _precheck_email(email: str, smtp_blocked: bool, log: VerificationLogger) -> VerifyResult | None:
+    """Syntax and disposable-domain checks. Returns an invalid result, or None if the email passes."""
     # Parse email
     try:
         local, domain = email.split("@", 1)
@@ -72,7 +157,7 @@ def verify_email(
         )
 
     # Check disposable domain
-    if domain in DISPOSABLE_DOMAINS:
+    if is_disposable_domain(domain):
         log.debug_disposable_domain(domain)
         return VerifyResult(
             email=email,
@@ -83,107 +168,108 @@ def verify_email(
             smtp_blocked=smtp_blocked,
         )
 
-    # MX lookup
-    try:
-        mx = mx_lookup(domain, dns_timeout_seconds=dns_timeout_seconds)
-    except Exception as e:
-        log.debug_mx_lookup_failed(domain, type(e).__name__, str(e))
-        return VerifyResult(
-            email=email,
-            status="invalid",
-            reason="No MX records (or DNS failed)",
-            confidence_score=5,
-            mx_found=False,
-            smtp_blocked=smtp_blocked,
-        )
+    return None
 
-    mx_hosts = [h for _, h in mx]
-    mx_found = True
 
-    mx_list = ", ".join(f"{pref}={host}" for pref, host in mx)
-    log.debug_mx_lookup(domain, len(mx), mx_list)
+def _no_mx_result(email: str, smtp_blocked: bool) -> VerifyResult:
+    return VerifyResult(
+        email=email,
+        status="invalid",
+        reason="No MX records (or DNS failed)",
+        confidence_score=5,
+        mx_found=False,
+        smtp_blocked=smtp_blocked,
+    )
 
-    # Detect provider from MX
-    provider = detect_provider(mx)
-    if provider != "other":
-        log.debug_provider_detected(provider)
 
-    # Check SPF/DMARC (always, for scoring)
-    spf_present, dmarc_present = check_domain_spf_dmarc(domain, dns_timeout_seconds=dns_timeout_seconds)
-    log.debug_dns_spf_dmarc(spf_present, dmarc_present)
+def _probe_candidate(
+    email: str,
+    mx_hosts: list[str],
+    mail_from: str,
+    smtp_timeout_seconds: int | None = None,
+    dns_timeout_seconds: float | None = None,
+    logger: VerificationLogger | None = None,
+    deadline: Deadline | None = None,
+) -> tuple[bool, bool, str, str | None]:
+    """
+    RCPT probe for a single mailbox on the given MX hosts (the provider policy's share).
 
-    # Initialize SMTP-related variables
-    catch_all: bool | None = None
+    Returns:
+        (smtp_attempted, accepted_any, detail_any, smtp_short)
+    """
+    log = logger or VerificationLogger()
     smtp_attempted = False
     accepted_any = False
     detail_any = ""
     smtp_short: str | None = None
 
-    # Skip SMTP probes if blocked at infrastructure level
-    if smtp_blocked:
-        log.debug_smtp_skipped()
-    else:
-        # Detect catch-all
-        catch_all_result, catch_smtp, catch_reason = detect_catch_all(
-            mx_hosts,
-            domain,
+    for mxh in mx_hosts:
+        if smtp_attempted and budget_exhausted(deadline):
+            break
+        log.debug_rcpt_verifying(email, mxh)
+
+        accepted, detail, short = smtp_probe_rcpt(
+            mxh,
+            email,
             mail_from,
             smtp_timeout_seconds=smtp_timeout_seconds,
             dns_timeout_seconds=dns_timeout_seconds,
             logger=log,
+            deadline=deadline,
         )
-        catch_all = catch_all_result if catch_smtp else None
+        smtp_attempted = True
+        detail_any = f"{mxh}: {detail}"
 
-        # SMTP RCPT probe
-        for mxh in mx_hosts[:2]:
-            log.debug_rcpt_verifying(email, mxh)
+        if short is not None:
+            smtp_short = short
 
-            accepted, detail, short = smtp_probe_rcpt(
-                mxh,
-                email,
-                mail_from,
-                smtp_timeout_seconds=smtp_timeout_seconds,
-                dns_timeout_seconds=dns_timeout_seconds,
-                logger=log,
-            )
-            smtp_attempted = True
-            detail_any = f"{mxh}: {detail}"
+        if accepted:
+            accepted_any = True
+            break
 
-            if short is not None:
-                smtp_short = short
+        if "Temporary" in detail or "SMTP error" in detail:
+            continue
+        if "Rejected" in detail:
+            break
 
-            if accepted:
-                accepted_any = True
-                break
+    return smtp_attempted, accepted_any, detail_any, smtp_short
 
-            if "Temporary" in detail or "SMTP error" in detail:
-                continue
-            if "Rejected" in detail:
-                break
 
+def _build_result(
+    email: str,
+    ctx: DomainContext,
+    *,
+    smtp_attempted: bool,
+    accepted_any: bool,
+    detail_any: str,
+    smtp_short: str | None,
+) -> VerifyResult:
+    """Combine domain-level signals and the candidate's RCPT outcome into a VerifyResult."""
     # Build signals list
     signals: list[str] = []
-    if mx_found:
+    if ctx.mx_found:
         signals.append("mx")
-    if spf_present:
+    if ctx.spf_present:
         signals.append("spf")
-    if dmarc_present:
+    if ctx.dmarc_present:
         signals.append("dmarc")
-    if provider != "other":
-        signals.append(f"provider:{provider}")
-    if smtp_blocked:
+    if ctx.provider != "other":
+        signals.append(f"provider:{ctx.provider}")
+    if ctx.hosted_provider:
+        signals.append(f"hosted:{ctx.hosted_provider}")
+    if ctx.smtp_blocked:
         signals.append("smtp_blocked")
 
     # Calculate score and determine status using new signal-based scoring
     score, status, reason = _calculate_score_and_status(
-        mx_found=mx_found,
-        spf_present=spf_present,
-        dmarc_present=dmarc_present,
-        provider=provider,
-        smtp_blocked=smtp_blocked,
+        mx_found=ctx.mx_found,
+        spf_present=ctx.spf_present,
+        dmarc_present=ctx.dmarc_present,
+        provider=ctx.provider,
+        smtp_blocked=ctx.smtp_blocked,
         smtp_attempted=smtp_attempted,
         accepted_any=accepted_any,
-        catch_all=catch_all,
+        catch_all=ctx.catch_all,
         detail_any=detail_any,
     )
 
@@ -192,15 +278,15 @@ def verify_email(
         status=status,
         reason=reason,
         confidence_score=score,
-        mx_found=mx_found,
-        spf_present=spf_present,
-        dmarc_present=dmarc_present,
-        catch_all=catch_all,
+        mx_found=ctx.mx_found,
+        spf_present=ctx.spf_present,
+        dmarc_present=ctx.dmarc_present,
+        catch_all=ctx.catch_all,
         smtp_check=smtp_attempted,  # deprecated, kept for compatibility
         smtp_attempted=smtp_attempted,
-        smtp_blocked=smtp_blocked,
+        smtp_blocked=ctx.smtp_blocked,
         smtp_code_msg=smtp_short,
-        provider=provider,
+        provider=ctx.provider,
         signals=signals,
     )
 
@@ -304,7 +390,9 @@ def _calculate_score_and_status(
             reason_parts.append(f"SMTP rejected: {detail_any}")
             reason = " | ".join(reason_parts)
     else:
-        # SMTP not attempted (but not blocked)
+        # SMTP not attempted (but not blocked), e.g. candidates skipped on a known catch-all domain
+        if catch_all:
+            reason_parts.append("catch-all")
         reason_parts.append("SMTP not attempted")
         status = "risky" if mx_found else "unknown"
         reason = " | ".join(reason_parts)
@@ -313,6 +401,24 @@ def _calculate_score_and_status(
     return score, status, reason
 
 
+def adaptive_max_candidates(ctx: DomainContext) -> int:
+    """
+    Candidate limit for a domain when the caller asks for an adaptive one.
+
+    If SMTP cannot discriminate between mailboxes (blocked, no MX, known catch-all, provider not
+    probed) only the top patterns are kept; otherwise the full list is cheap thanks to session
+    reuse and early exit.
+    """
+    if ctx.smtp_blocked or not ctx.mx_found or ctx.catch_all is True or not ctx.policy.probe:
+        return ADAPTIVE_MAX_CANDIDATES_NO_SMTP
+    return MAX_CANDIDATES
+
+
+def _already_probed(ctx: DomainContext | None, email: str) -> bool:
+    """True if the lead's shared SMTP session already has an outcome for email (no further I/O needed)."""
+    return ctx is not None and email in ctx.rcpt_results
+
+
 def verify_and_pick_best(
     first_name: str,
     last_name: str,
@@ -327,6 +433,14 @@ def verify_and_pick_best(
     allow_no_lastname: bool = False,
     on_web_search_performed: Callable[[str], None] | None = None,
     custom_patterns: list[str] | None = None,
+    stop_policy: str = DEFAULT_STOP_POLICY,
+    max_candidates: int | None = MAX_CANDIDATES,
+    pattern_scores: dict[str, int] | None = None,
+    provider_policies: dict[str, dict] | None = None,
+    domain_context: DomainContext | None = None,
+    time_budget_seconds: float | None = None,
+    smtp_sessions: dict[str, SMTPProbeSession] | None = None,
+    max_age: float | None = None,
 ) -> tuple[list[str], str | None, VerifyResult | None, dict[str, Any]]:
     """
     Generate candidates, verify each, return (candidates, best_email, best_result, probe_results_dict).
@@ -345,22 +459,47 @@ def verify_and_pick_best(
         allow_no_lastname: If True, generate candidates even without last name
         on_web_search_performed: Callback when web search is performed (for usage tracking)
         custom_patterns: Additional patterns defined by the workspace
+        stop_policy: 'exhaustive' (probe every candidate) or 'first_valid' (stop at the first
+            non catch-all accept; no per-candidate RCPT on catch-all domains). Defaults to
+            DEFAULT_STOP_POLICY, as the workspace config does
+        max_candidates: Candidate limit (None = adaptive, see adaptive_max_candidates)
+        pattern_scores: Patterns known for this domain -> confidence 0-100, most likely first
+            (see domain_patterns). They are probed first and set pattern_confidence.
+            Without them, candidates are ordered by the global priors for the domain's
+            provider and TLD (see pattern_priors).
+        provider_policies: Workspace overrides of the provider policy table (see provider_policy)
+        domain_context: Context already built for this domain (batches of leads sharing a domain).
+            Its DNS checks are reused and it keeps the catch-all verdict found for this lead.
+        time_budget_seconds: Total time for this lead (None = global lead_time_budget_seconds,
+            0 = no budget). Every DNS and SMTP step uses only the time left (see deadline); when it
+            runs out, unprobed candidates and the web search are skipped and the best result so
+            far is returned with the budget_exhausted signal.
+        smtp_sessions: Open SMTP sessions (mx_host -> session) shared with the other leads of
+            the domain, so the connection and EHLO are paid once (see verify_batch). The caller
+            closes them; sessions the server dropped are removed so the next lead reconnects.
+        max_age: Oldest cached result to reuse, in seconds (None = any within its TTL, 0 = probe
+            everything; see result_cache). Cached candidates are not probed again, and a cached
+            valid candidate settles the lead without any DNS or SMTP I/O.
 
     Returns:
         (candidates, best_email, best_result, probe_results_dict)
     """
-    from app.services.email_patterns import generate_candidates
+    from app.services.email_patterns import generate_candidates, match_pattern
+    from app.services.pattern_priors import domain_tld, get_pattern_priors, order_candidates_by_prior
 
     log = logger or VerificationLogger()
+    budget = settings.lead_time_budget_seconds if time_budget_seconds is None else time_budget_seconds
+    deadline = Deadline.from_seconds(budget)
 
     candidates = generate_candidates(
         first_name,
         last_name,
         domain,
-        max_candidates=15,
+        max_candidates=max_candidates or MAX_CANDIDATES,
         enabled_pattern_indices=enabled_pattern_indices,
         allow_no_lastname=allow_no_lastname,
         custom_patterns=custom_patterns,
+        preferred_patterns=list(pattern_scores) if pattern_scores else None,
     )
 
     if not candidates:
@@ -371,34 +510,109 @@ def verify_and_pick_best(
     dns_to = dns_timeout_seconds if dns_timeout_seconds is not None else DNS_TIMEOUT_SECS
 
     log.debug_config(mail_from, smtp_to, dns_to)
+
+    # Candidates verified recently are not probed again; a known mailbox settles the lead
+    cached = get_cached_results(candidates, max_age)
+    settled = any(r.status == "valid" for r in cached.values())
+
+    # Domain-level checks (MX, provider, SPF/DMARC, blocked flag) are the same for every candidate:
+    # run them once, then probe the catch-all address and the candidates in one SMTP session per MX.
+    norm_domain = domain.strip().lower()
+    domain_ctx = None
+    disposable = is_disposable_domain(norm_domain)
+    if not disposable and not settled:
+        if domain_context is not None:
+            domain_ctx = domain_context.for_lead()
+        else:
+            domain_ctx = build_domain_context(
+                norm_domain,
+                mail_from=mail_from,
+                smtp_timeout_seconds=smtp_timeout_seconds,
+                dns_timeout_seconds=dns_timeout_seconds,
+                logger=log,
+                probe_catch_all=False,
+                provider_policies=provider_policies,
+                deadline=deadline,
+            )
+        if not pattern_scores:
+            # Unseen domain: try first what is most common for its provider and TLD
+            priors = get_pattern_priors(domain_ctx.provider, domain_tld(norm_domain))
+            candidates = order_candidates_by_prior(candidates, first_name, last_name, priors)
+        if max_candidates is None:
+            candidates = candidates[: adaptive_max_candidates(domain_ctx)]
+
     candidates_preview = ", ".join(candidates[:CANDIDATES_PREVIEW_LIMIT])
     suffix = "..." if len(candidates) > CANDIDATES_PREVIEW_LIMIT else ""
     log.debug_candidates_generated(domain, len(candidates), candidates_preview + suffix)
 
+    if domain_ctx is not None:
+        probe_domain_recipients(
+            domain_ctx,
+            [c for c in candidates if c not in cached],
+            mail_from=mail_from,
+            smtp_timeout_seconds=smtp_timeout_seconds,
+            dns_timeout_seconds=dns_timeout_seconds,
+            logger=log,
+            stop_policy=stop_policy,
+            deadline=deadline,
+            sessions=smtp_sessions,
+        )
+        if domain_context is not None:
+            domain_context.adopt_catch_all(domain_ctx)
+
     rank = {"valid": 3, "risky": 2, "unknown": 1, "invalid": 0}
     best_email = ""
     best_result: VerifyResult | None = None
     probe_results: dict[str, Any] = {}
     total = len(candidates)
+    out_of_time = False
 
     for i, cand in enumerate(candidates):
+        if settled and cand not in cached:
+            continue
+        if (
+            domain_ctx is not None
+            and domain_ctx.stopped_early
+            and cand not in domain_ctx.rcpt_results
+            and cand not in cached
+        ):
+            break  # Candidates after the first confirmed mailbox were not probed
+        if (
+            best_result is not None
+            and budget_exhausted(deadline)
+            and not _already_probed(domain_ctx, cand)
+            and cand not in cached
+        ):
+            # Out of time: keep the best result so far, do not start new probes
+            log.debug_time_budget_exhausted(budget, total - i)
+            out_of_time = True
+            break
         log.debug_candidate_header(i + 1, total, cand)
         log.verify_candidate(i + 1, total, cand)
 
-        res = verify_email(
+        res = cached.get(cand) or verify_email(
             cand,
             mail_from=mail_from,
             smtp_timeout_seconds=smtp_timeout_seconds,
             dns_timeout_seconds=dns_timeout_seconds,
             logger=log,
+            domain_context=domain_ctx,
+            deadline=deadline,
+            max_age=0,  # Already looked up above
         )
+        if pattern_scores:
+            pattern = match_pattern(first_name, last_name, cand, [*(custom_patterns or []), *pattern_scores])
+            res.pattern_confidence = pattern_scores.get(pattern) if pattern else None
 
         probe_results[cand] = {
             "accepted": res.status in ("valid", "risky") and res.mx_found,
             "detail": res.reason,
             "status": res.status,
             "confidence_score": res.confidence_score,
+            "smtp_code_msg": res.smtp_code_msg,
         }
+        if cand in cached:
+            probe_results[cand]["cached"] = True
 
         if best_result is None or (res.confidence_score, rank.get(res.status, 0)) > (
             best_result.confidence_score,
@@ -407,8 +621,13 @@ def verify_and_pick_best(
             best_result = res
             best_email = cand
 
+    if best_result is not None and (out_of_time or budget_exhausted(deadline)):
+        best_result.signals.append("budget_exhausted")
+        if not out_of_time:
+            log.debug_time_budget_exhausted(budget, 0)
+
     # Optional web search: if best result is unknown (or valid), search if email appears in public sources
-    if best_result and best_email:
+    if best_result and best_email and not disposable and "budget_exhausted" not in best_result.signals:
         if web_search_provider and web_search_api_key:
             log.debug_web_searching(web_search_provider)
 
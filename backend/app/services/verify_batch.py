@@ -0,0 +1,215 @@
+"""Domain-grouped bulk verification of leads (run_verify_batch task).
+
+Account-based lists hold many leads of the same company. Verifying them one task per lead
+repeats the domain's DNS checks, catch-all probe and SMTP handshakes for every lead. Here leads
+are grouped by normalized domain; each group builds its domain context once and verifies its
+leads one after another over SMTP sessions kept open between leads. Patterns confirmed by a
+lead reorder the candidates of the next ones. Each group is written back with one flush, and
+its domain's row in the knowledge base (see domain_knowledge) is read first and upserted after.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.log_service import VerificationLogger
+from app.services.domain_knowledge import domain_context_sync, record_domain_sync
+from app.services.domain_patterns import get_domain_pattern_scores_sync, learn_pattern_from_result_sync
+from app.services.greylist import greylist_entry_for_lead
+from app.services.verification.disposable import is_disposable_domain
+from app.services.verification.domain_context import DomainContext
+from app.services.verification.result import VerifyResult
+from app.services.verification.smtp_checker import DEFAULT_MAIL_FROM, SMTPProbeSession
+from app.services.verification.verifier import verify_and_pick_best
+
+if TYPE_CHECKING:
+    from app.models import Lead
+
+# Leads probed over the same SMTP sessions before they are reopened: servers cap the
+# transactions (or recipients) per connection and drop long-lived ones
+BATCH_SESSION_MAX_LEADS = 25
+
+
+@dataclass
+class LeadOutcome:
+    """verify_and_pick_best() output for one lead of a batch (error set if it raised)."""
+
+    lead: Lead
+    candidates: list[str] = field(default_factory=list)
+    best_email: str = ""
+    best_result: VerifyResult | None = None
+    probe_results: dict[str, Any] = field(default_factory=dict)
+    mx_hosts: list[str] = field(default_factory=list)
+    web_searches: list[str] = field(default_factory=list)  # Provider of each web search run (usage)
+    error: str | None = None
+
+
+def group_leads_by_domain(leads: list[Lead]) -> dict[str, list[Lead]]:
+    """Leads keyed by normalized domain, in input order."""
+    groups: dict[str, list[Lead]] = defaultdict(list)
+    for lead in leads:
+        groups[(lead.domain or "").strip().lower()].append(lead)
+    return dict(groups)
+
+
+def verify_domain_group_sync(
+    db: Session,
+    domain: str,
+    leads: list[Lead],
+    cfg: dict[str, Any],
+    logger: VerificationLogger | None = None,
+    max_age: float | None = None,
+    stop_at: float | None = None,
+) -> list[LeadOutcome]:
+    """
+    Verify one domain's leads with a shared domain context and shared SMTP sessions.
+
+    cfg is the workspace config (get_workspace_config_sync), applied as in run_verify_lead; web
+    searches are listed on each lead's outcome for usage accounting. Patterns confirmed along the way
+    are recorded and used to order the following leads' candidates; the domain's row in the
+    knowledge base is upserted at the end (nothing is committed).
+    max_age bounds the age of cached results reused (see result_cache). No lead is started
+    once time.monotonic() reaches stop_at: the leads left have no outcome.
+    """
+    log = logger or VerificationLogger()
+    ctx: DomainContext | None = None
+    if domain and not is_disposable_domain(domain):
+        ctx = domain_context_sync(db, domain, cfg, logger=log)  # None: each lead builds its own
+
+    outcomes: list[LeadOutcome] = []
+    sessions: dict[str, SMTPProbeSession] = {}
+    workspace_id = leads[0].workspace_id if leads else None
+    pattern_scores = get_domain_pattern_scores_sync(db, domain, workspace_id) if domain else None
+    pattern: str | None = None
+    try:
+        for i, lead in enumerate(leads):
+            if stop_at is not None and time.monotonic() >= stop_at:
+                break
+            if i and i % BATCH_SESSION_MAX_LEADS == 0:
+                _close_sessions(sessions)
+            outcome = LeadOutcome(lead=lead, mx_hosts=ctx.mx_hosts if ctx is not None else [])
+            try:
+                outcome.candidates, outcome.best_email, outcome.best_result, outcome.probe_results = (
+                    verify_and_pick_best(
+                        lead.first_name,
+                        lead.last_name,
+                        lead.domain,
+                        mail_from=cfg.get("smtp_mail_from"),
+                        logger=log,
+                        smtp_timeout_seconds=cfg.get("smtp_timeout_seconds"),
+                        dns_timeout_seconds=cfg.get("dns_timeout_seconds"),
+                        enabled_pattern_indices=cfg.get("enabled_pattern_indices"),
+                        web_search_provider=cfg.get("web_search_provider"),
+                        web_search_api_key=cfg.get("web_search_api_key"),
+                        allow_no_lastname=cfg.get("allow_no_lastname", False),
+                        on_web_search_performed=outcome.web_searches.append,
+                        custom_patterns=cfg.get("custom_patterns"),
+                        stop_policy=cfg["stop_policy"],
+                        max_candidates=cfg.get("max_candidates") or None,
+                        pattern_scores=pattern_scores or None,
+                        provider_policies=cfg.get("provider_policies") or None,
+                        domain_context=ctx,
+                        time_budget_seconds=cfg.get("lead_time_budget_seconds"),
+                        smtp_sessions=sessions,
+                        max_age=max_age,
+                    )
+                )
+            except Exception as e:
+                outcome.error = f"{type(e).__name__}: {e}"[:500]
+                outcomes.append(outcome)
+                continue
+            outcomes.append(outcome)
+            status = outcome.best_result.status if outcome.best_result else "unknown"
+            learned = learn_pattern_from_result_sync(
+                db,
+                lead.first_name,
+                lead.last_name,
+                outcome.best_email,
+                status,
+                cfg.get("custom_patterns"),
+                workspace_id=lead.workspace_id,
+            )
+            if learned and domain:
+                pattern_scores = get_domain_pattern_scores_sync(db, domain, workspace_id)
+                pattern = learned
+    finally:
+        _close_sessions(sessions)
+    if ctx is not None:
+        record_domain_sync(db, ctx, [o.best_result for o in outcomes if o.error is None], pattern=pattern)
+    return outcomes
+
+
+def _close_sessions(sessions: dict[str, SMTPProbeSession]) -> None:
+    for session in sessions.values():
+        session.close()
+    sessions.clear()
+
+
+def apply_batch_results_sync(
+    db: Session,
+    job_pk: int,
+    workspace_id: int,
+    outcomes: list[LeadOutcome],
+    cfg: dict[str, Any],
+) -> list[tuple[dict[str, Any], int]]:
+    """
+    Write a group's outcomes to its leads and VerificationLog rows (one flush, no commit).
+
+    Returns the greylist entries and delays to park once the rows are committed.
+    """
+    from app.models import VerificationLog
+
+    done = [o for o in outcomes if o.error is None]
+    rows = [
+        VerificationLog(
+            lead_id=o.lead.id,
+            job_id=job_pk,
+            mx_hosts=o.mx_hosts,
+            probe_results=o.probe_results,
+            best_email=o.best_email or "",
+            best_status=o.best_result.status if o.best_result else "unknown",
+            best_confidence=o.best_result.confidence_score if o.best_result else 0,
+        )
+        for o in done
+    ]
+    db.add_all(rows)
+    db.flush()
+
+    now = datetime.now(UTC)
+    greylist: list[tuple[dict[str, Any], int]] = []
+    for o, row in zip(done, rows, strict=True):
+        best = o.best_result
+        lead = o.lead
+        lead.email_candidates = o.candidates
+        lead.email_best = o.best_email or ""
+        lead.verification_status = best.status if best else "unknown"
+        lead.confidence_score = best.confidence_score if best else 0
+        lead.mx_found = best.mx_found if best else False
+        lead.catch_all = best.catch_all if best else False
+        lead.smtp_check = best.smtp_check if best else False
+        lead.notes = best.reason if best else ""
+        lead.web_mentioned = getattr(best, "web_mentioned", False) if best else False
+        lead.updated_at = now
+        if not settings.greylist_retry_enabled:
+            continue
+        entry = greylist_entry_for_lead(
+            lead.id,
+            workspace_id,
+            row.id,
+            o.probe_results,
+            best,
+            o.mx_hosts,
+            cfg.get("smtp_mail_from") or DEFAULT_MAIL_FROM,
+            cfg.get("smtp_timeout_seconds"),
+            cfg.get("dns_timeout_seconds"),
+        )
+        if entry:
+            greylist.append(entry)
+    return greylist
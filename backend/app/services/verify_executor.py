@@ -0,0 +1,211 @@
+"""Bounded executor for verifications served inline by the API (POST /v1/verify and /v1/verify/batch).
+
+verify_and_pick_best blocks on DNS and SMTP for seconds, so the API never runs it on the event
+loop: it goes to a small per-process thread pool. Three limits keep the API responsive:
+- saturation: more than verify_api_max_workers + verify_api_max_queue verifications pending in
+  this process -> rejected up front (HTTP 503)
+- per workspace: at most verify_api_workspace_concurrency in flight across all API processes,
+  counted in Redis (HTTP 429)
+- deadline: a request waits at most verify_api_deadline_seconds (HTTP 504); a queued
+  verification is dropped, a running one finishes in its thread and then frees its slot
+
+Batches run for minutes, so their domain lanes get a pool of their own
+(verify_api_batch_max_lanes threads per process, shared by every batch): however many batches
+stream, POST /verify keeps all of its workers. A batch is refused (HTTP 503) while every lane
+is busy.
+
+Keys:
+    verify:inflight:{workspace_id}    sorted set request token -> slot expiry timestamp
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar
+
+import redis
+
+from app.core.config import settings
+from app.services.smtp_blocked_detector import _get_redis
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+REDIS_KEY_VERIFY_INFLIGHT = "verify:inflight:{workspace_id}"
+VERIFY_SATURATED = "saturated"
+VERIFY_WORKSPACE_BUSY = "workspace_busy"
+VERIFY_DEADLINE = "deadline"
+# A slot outlives the request deadline by this much, so a crashed process cannot hold it forever
+SLOT_GRACE_SECONDS = 30
+
+# Drop expired slots, then take one if the workspace is under its cap. Returns 1 if taken.
+_ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[3]) - tonumber(ARGV[1])))
+return 1
+"""
+
+_executor: ThreadPoolExecutor | None = None
+_pending = 0
+_batch_executor: ThreadPoolExecutor | None = None
+_batch_pending = 0
+_lock = threading.Lock()
+
+
+def get_verify_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.verify_api_max_workers, thread_name_prefix="verify")
+    return _executor
+
+
+def pending_verifications() -> int:
+    """Verifications queued or running in this process."""
+    return _pending
+
+
+def executor_saturated() -> bool:
+    return _pending >= settings.verify_api_max_workers + settings.verify_api_max_queue
+
+
+def submit_verification(fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future[T]:
+    """Run fn in the verify executor, counted as pending until it finishes (or is cancelled in the queue)."""
+    global _pending
+    with _lock:
+        _pending += 1
+    future = get_verify_executor().submit(partial(fn, *args, **kwargs))
+    future.add_done_callback(_on_verification_done)
+    return future
+
+
+def _on_verification_done(_: Future) -> None:
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(
+            max_workers=settings.verify_api_batch_max_lanes, thread_name_prefix="verify-batch"
+        )
+    return _batch_executor
+
+
+def free_batch_lanes() -> int:
+    """Batch lanes of this process not queued or running."""
+    return max(0, settings.verify_api_batch_max_lanes - _batch_pending)
+
+
+def submit_batch_lane(fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future[T]:
+    """Run a batch lane in the batch executor, counted as pending until it finishes (or is cancelled)."""
+    global _batch_pending
+    with _lock:
+        _batch_pending += 1
+    future = get_batch_executor().submit(partial(fn, *args, **kwargs))
+    future.add_done_callback(_on_batch_lane_done)
+    return future
+
+
+def _on_batch_lane_done(_: Future) -> None:
+    global _batch_pending
+    with _lock:
+        _batch_pending -= 1
+
+
+def acquire_workspace_slot(workspace_id: int, token: str, ttl_seconds: float) -> bool:
+    """Take one of the workspace's concurrent verification slots. Fails open if Redis is down."""
+    now = time.time()
+    try:
+        return bool(
+            _get_redis().eval(
+                _ACQUIRE_SLOT_SCRIPT,
+                1,
+                REDIS_KEY_VERIFY_INFLIGHT.format(workspace_id=workspace_id),
+                now,
+                settings.verify_api_workspace_concurrency,
+                now + ttl_seconds,
+                token,
+            )
+        )
+    except redis.RedisError as e:
+        logger.error(f"Redis error acquiring verify slot for workspace {workspace_id}: {e}")
+        return True
+
+
+def release_workspace_slot(workspace_id: int, token: str) -> None:
+    try:
+        _get_redis().zrem(REDIS_KEY_VERIFY_INFLIGHT.format(workspace_id=workspace_id), token)
+    except redis.RedisError as e:
+        logger.error(f"Redis error releasing verify slot for workspace {workspace_id}: {e}")
+
+
+def release_when_done(workspace_id: int, token: str, futures: list[Future]) -> None:
+    """Free the workspace slot once every future has finished or was cancelled."""
+    remaining = len(futures)
+    lock = threading.Lock()
+
+    def done(_: Future) -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        release_workspace_slot(workspace_id, token)
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def reserve_verification(workspace_id: int, ttl_seconds: float, batch: bool = False) -> tuple[str | None, str | None]:
+    """
+    Admission check before running verifications: (slot token, None) or (None, reason).
+
+    reason is VERIFY_SATURATED (for a batch: no free batch lane) or VERIFY_WORKSPACE_BUSY. The
+    caller frees the slot with release_when_done (or release_workspace_slot if nothing was submitted).
+    """
+    saturated = free_batch_lanes() == 0 if batch else executor_saturated()
+    if saturated:
+        return None, VERIFY_SATURATED
+    token = uuid.uuid4().hex
+    if not acquire_workspace_slot(workspace_id, token, ttl_seconds):
+        return None, VERIFY_WORKSPACE_BUSY
+    return token, None
+
+
+async def run_verification(
+    workspace_id: int,
+    fn: Callable[..., T],
+    *args: Any,
+    deadline_seconds: float | None = None,
+    **kwargs: Any,
+) -> tuple[T | None, str | None]:
+    """
+    Run a blocking verification off the event loop: (result, None) or (None, reason).
+
+    reason is VERIFY_SATURATED, VERIFY_WORKSPACE_BUSY or VERIFY_DEADLINE (see module docstring).
+    """
+    deadline = deadline_seconds if deadline_seconds is not None else settings.verify_api_deadline_seconds
+    token, reason = reserve_verification(workspace_id, deadline + SLOT_GRACE_SECONDS)
+    if token is None:
+        return None, reason
+    future = submit_verification(fn, *args, **kwargs)
+    # The slot is freed when the work ends, not when the request gives up on it
+    release_when_done(workspace_id, token, [future])
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline), None
+    except TimeoutError:
+        return None, VERIFY_DEADLINE
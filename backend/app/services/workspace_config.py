@@ -11,6 +11,8 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.models import WorkspaceConfigEntry
 from app.services.email_patterns import COMMON_PATTERNS
+from app.services.verification.domain_context import DEFAULT_STOP_POLICY, STOP_POLICIES
+from app.services.verification.provider_policy import parse_provider_policies
 
 # Limits (match schemas/config.py)
 MAX_TIMEOUT_SECONDS = 30
@@ -23,11 +25,22 @@ MAX_PATTERN_LENGTH = 100
 API_KEY_MASK_THRESHOLD = 4
 API_KEY_MASK_CHARS = 8
 
+# Candidate limit per lead (0 = adaptive)
+MAX_CANDIDATES_LIMIT = 15
+
+# Total time per lead (seconds)
+MIN_TIME_BUDGET_SECONDS = 10
+MAX_TIME_BUDGET_SECONDS = 600
+
 # Known keys and how to parse the value. Add new keys here without migration.
 # web_search_provider: 'bing' | 'serper' | '' (empty = no search)
 # web_search_api_key: provider key
 # allow_no_lastname: allows generating candidates when there's no last name (info@, contact@, etc.)
 # custom_patterns: additional patterns defined by the workspace (JSON list of strings)
+# stop_policy: 'first_valid' (stop at first non catch-all accept) | 'exhaustive' (probe every candidate)
+# max_candidates: candidates per lead, 0 = adaptive (fewer when SMTP cannot discriminate)
+# provider_policies: overrides of the provider policy table (JSON object, see provider_policy)
+# lead_time_budget_seconds: total DNS + SMTP time per lead; the best result so far is kept when it runs out
 CONFIG_KEYS = {
     "smtp_timeout_seconds": {"type": int, "default": lambda: getattr(settings, "smtp_timeout_seconds", 5)},
     "dns_timeout_seconds": {"type": float, "default": lambda: getattr(settings, "dns_timeout_seconds", 5.0)},
@@ -37,6 +50,13 @@ CONFIG_KEYS = {
     "web_search_api_key": {"type": str, "default": lambda: ""},
     "allow_no_lastname": {"type": bool, "default": lambda: False},
     "custom_patterns": {"type": "json_list_str", "default": lambda: []},
+    "stop_policy": {"type": "stop_policy", "default": lambda: DEFAULT_STOP_POLICY},
+    "max_candidates": {"type": "max_candidates", "default": lambda: 0},
+    "provider_policies": {"type": "provider_policies", "default": lambda: {}},
+    "lead_time_budget_seconds": {
+        "type": "time_budget",
+        "default": lambda: getattr(settings, "lead_time_budget_seconds", 120.0),
+    },
 }
 
 
@@ -67,6 +87,24 @@ def _parse_value(key: str, raw: str) -> Any:
             if isinstance(p, str) and "@{domain}" in p and len(p) <= MAX_PATTERN_LENGTH:
                 valid.append(p.strip())
         return valid[:MAX_CUSTOM_PATTERNS]
+    if t == "stop_policy":
+        v = raw.strip().lower()
+        return v if v in STOP_POLICIES else DEFAULT_STOP_POLICY
+    if t == "max_candidates":
+        try:
+            return max(0, min(MAX_CANDIDATES_LIMIT, int(raw)))
+        except ValueError:
+            return 0
+    if t == "provider_policies":
+        try:
+            return parse_provider_policies(json.loads(raw))
+        except ValueError:  # json.JSONDecodeError is a ValueError
+            return {}
+    if t == "time_budget":
+        try:
+            return max(MIN_TIME_BUDGET_SECONDS, min(MAX_TIME_BUDGET_SECONDS, float(raw)))
+        except ValueError:
+            return spec["default"]()
     return raw
 
 
@@ -74,7 +112,9 @@ def get_workspace_config_sync(db: Session, workspace_id: int) -> dict[str, Any]:
     """
     Returns the workspace config merged with globals.
     Reads all workspace_config_entries records for that workspace and applies types/defaults.
-    Keys: smtp_timeout_seconds, dns_timeout_seconds, enabled_pattern_indices, smtp_mail_from.
+    Keys: smtp_timeout_seconds, dns_timeout_seconds, enabled_pattern_indices, smtp_mail_from,
+    web search, allow_no_lastname, custom_patterns, stop_policy, max_candidates, provider_policies,
+    lead_time_budget_seconds.
     """
     r = db.execute(select(WorkspaceConfigEntry).where(WorkspaceConfigEntry.workspace_id == workspace_id))
     entries = list(r.scalars().all())
@@ -105,6 +145,13 @@ def get_workspace_config_sync(db: Session, workspace_id: int) -> dict[str, Any]:
     custom_patterns: list[str] = []
     if "custom_patterns" in raw:
         custom_patterns = _parse_value("custom_patterns", raw["custom_patterns"])
+    # Candidate probing strategy
+    stop_policy = _parse_value("stop_policy", raw.get("stop_policy", DEFAULT_STOP_POLICY))
+    max_candidates = _parse_value("max_candidates", raw.get("max_candidates", "0"))
+    provider_policies = _parse_value("provider_policies", raw.get("provider_policies", "{}"))
+    time_budget = getattr(settings, "lead_time_budget_seconds", 120.0)
+    if "lead_time_budget_seconds" in raw:
+        time_budget = _parse_value("lead_time_budget_seconds", raw["lead_time_budget_seconds"])
 
     return {
         "smtp_timeout_seconds": smtp,
@@ -115,6 +162,10 @@ def get_workspace_config_sync(db: Session, workspace_id: int) -> dict[str, Any]:
         "web_search_api_key": web_search_api_key,
         "allow_no_lastname": allow_no_lastname,
         "custom_patterns": custom_patterns,
+        "stop_policy": stop_policy,
+        "max_candidates": max_candidates,
+        "provider_policies": provider_policies,
+        "lead_time_budget_seconds": time_budget,
     }
 
 
@@ -160,6 +211,13 @@ def merge_config_for_response(entries: list[WorkspaceConfigEntry]) -> dict[str,
     custom_patterns: list[str] = []
     if "custom_patterns" in raw:
         custom_patterns = _parse_value("custom_patterns", raw["custom_patterns"])
+    # Candidate probing strategy
+    stop_policy = _parse_value("stop_policy", raw.get("stop_policy", DEFAULT_STOP_POLICY))
+    max_candidates = _parse_value("max_candidates", raw.get("max_candidates", "0"))
+    provider_policies = _parse_value("provider_policies", raw.get("provider_policies", "{}"))
+    time_budget = getattr(settings, "lead_time_budget_seconds", 120.0)
+    if "lead_time_budget_seconds" in raw:
+        time_budget = _parse_value("lead_time_budget_seconds", raw["lead_time_budget_seconds"])
 
     return {
         "smtp_timeout_seconds": smtp,
@@ -170,5 +228,9 @@ def merge_config_for_response(entries: list[WorkspaceConfigEntry]) -> dict[str,
         "web_search_api_key": web_search_api_key_masked if web_search_api_key else "",
         "allow_no_lastname": allow_no_lastname,
         "custom_patterns": custom_patterns,
+        "stop_policy": stop_policy,
+        "max_candidates": max_candidates,
+        "provider_policies": provider_policies,
+        "lead_time_budget_seconds": time_budget,
         "pattern_labels": [COMMON_PATTERNS[i] for i in range(PATTERN_COUNT)],
     }
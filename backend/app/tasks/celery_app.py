@@ -1,6 +1,7 @@
 """Celery app configuration."""
 
 from celery import Celery
+from celery.schedules import crontab
 
 from app.core.config import settings
 
@@ -8,7 +9,15 @@ celery_app = Celery(
     "mailprobe",
     broker=settings.celery_broker_url,
     backend=settings.redis_url,
-    include=["app.tasks.verify", "app.tasks.exports", "app.tasks.webhooks", "app.tasks.retention"],
+    include=[
+        "app.tasks.verify",
+        "app.tasks.exports",
+        "app.tasks.webhooks",
+        "app.tasks.retention",
+        "app.tasks.patterns",
+        "app.tasks.domains",
+        "app.tasks.greylist",
+    ],
 )
 celery_app.conf.update(
     task_serializer="json",
@@ -19,4 +28,18 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=300,
     worker_prefetch_multiplier=1,
+    beat_schedule={
+        "refresh-pattern-priors": {
+            "task": "app.tasks.patterns.refresh_pattern_priors",
+            "schedule": crontab(hour=3, minute=30),
+        },
+        "retry-greylisted": {
+            "task": "app.tasks.greylist.retry_greylisted",
+            "schedule": 60.0,
+        },
+        "refresh-stale-domains": {
+            "task": "app.tasks.domains.refresh_stale_domains",
+            "schedule": crontab(minute=15),
+        },
+    },
 )
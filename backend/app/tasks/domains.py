@@ -0,0 +1,28 @@
+"""Celery Beat: refresh the DNS signals of stale domains in the knowledge base (see domain_knowledge)."""
+
+from __future__ import annotations
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.tasks.celery_app import celery_app
+
+engine = create_engine(settings.database_url_sync, pool_pre_ping=True)
+SessionLocal = sessionmaker(engine, autocommit=False, autoflush=False)
+
+
+@celery_app.task
+def refresh_stale_domains():
+    """Re-run the DNS checks of up to domain_refresh_batch_size stale domains still in use."""
+    from app.services.domain_knowledge import refresh_stale_domains_sync
+
+    if not settings.domain_knowledge_enabled:
+        return {"refreshed": 0, "failed": 0}
+    db = SessionLocal()
+    try:
+        stats = refresh_stale_domains_sync(db)
+        db.commit()
+    finally:
+        db.close()
+    return stats
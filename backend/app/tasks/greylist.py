@@ -0,0 +1,98 @@
+"""Celery Beat: re-probe greylisted candidates once their retry window has passed."""
+
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.tasks.celery_app import celery_app
+
+engine = create_engine(settings.database_url_sync, pool_pre_ping=True)
+SessionLocal = sessionmaker(engine, autocommit=False, autoflush=False)
+
+# No new batch is claimed after this long, so the batch in progress ends within the task time
+# limit (300 s); what is left stays due for the next run (every minute)
+GREYLIST_TASK_BUDGET_SECONDS = 120
+
+
+@celery_app.task
+def retry_greylisted():
+    """
+    Claim due greylisted leads in small batches, re-probe them and update leads and verification
+    logs. Each batch is committed, then acknowledged (see claim_due_greylisted), then notified.
+    """
+    from app.services.greylist import ack_greylisted, claim_due_greylisted
+
+    stop_at = time.monotonic() + GREYLIST_TASK_BUDGET_SECONDS
+    totals = {"claimed": 0, "updated": 0, "reparked": 0}
+    while time.monotonic() < stop_at:
+        entries = claim_due_greylisted()
+        if not entries:
+            break
+        updated, reparked, changed = _process_batch(entries)
+        ack_greylisted([entry["lead_id"] for entry in entries])
+        _notify(changed)
+        totals["claimed"] += len(entries)
+        totals["updated"] += updated
+        totals["reparked"] += reparked
+    return totals
+
+
+def _process_batch(entries: list[dict]) -> tuple[int, int, list[tuple[dict, str, str, int]]]:
+    """Re-probe and commit one claimed batch; returns (updated, reparked, changed leads)."""
+    from app.services.greylist import (
+        apply_greylist_results_sync,
+        greylist_retry_delay,
+        park_greylisted,
+        reprobe_greylisted,
+        still_greylisted,
+    )
+
+    results = reprobe_greylisted(entries)
+    updated = reparked = 0
+    changed: list[tuple[dict, str, str, int]] = []
+    db = SessionLocal()
+    try:
+        from app.models import Lead
+        from app.services.workspace_config import get_workspace_config_sync
+
+        custom_patterns: dict[int, list[str] | None] = {}
+        for entry, entry_results in zip(entries, results, strict=True):
+            workspace_id = entry["workspace_id"]
+            if workspace_id not in custom_patterns:
+                custom_patterns[workspace_id] = get_workspace_config_sync(db, workspace_id).get("custom_patterns")
+            if apply_greylist_results_sync(db, entry, entry_results, custom_patterns[workspace_id]):
+                updated += 1
+                lead = db.get(Lead, entry["lead_id"])
+                changed.append((entry, lead.email_best, lead.verification_status, lead.confidence_score))
+            pending = still_greylisted(entry_results)
+            attempts = entry.get("attempts", 0) + 1
+            if pending and attempts < settings.greylist_max_attempts:
+                reply = entry_results[pending[0]].smtp_code_msg
+                park_greylisted(
+                    {**entry, "emails": pending, "attempts": attempts}, greylist_retry_delay(reply, attempts)
+                )
+                reparked += 1
+        db.commit()
+    finally:
+        db.close()
+    return updated, reparked, changed
+
+
+def _notify(changed: list[tuple[dict, str, str, int]]) -> None:
+    from app.tasks.webhooks import dispatch_webhook_event
+
+    for entry, email_best, status, confidence in changed:
+        dispatch_webhook_event(
+            entry["workspace_id"],
+            "verification.completed",
+            {
+                "lead_id": entry["lead_id"],
+                "email_best": email_best,
+                "verification_status": status,
+                "confidence_score": confidence,
+            },
+        )
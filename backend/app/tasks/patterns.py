@@ -0,0 +1,71 @@
+"""Celery tasks for email patterns: global priors refresh (beat) and domain pattern seeding."""
+
+from __future__ import annotations
+
+from celery.signals import worker_process_init
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.tasks.celery_app import celery_app
+
+engine = create_engine(settings.database_url_sync, pool_pre_ping=True)
+SessionLocal = sessionmaker(engine, autocommit=False, autoflush=False)
+
+
+@worker_process_init.connect
+def load_priors_on_worker_start(**kwargs):
+    """Each worker process starts with the published priors table in memory."""
+    from app.services.pattern_priors import load_pattern_priors
+
+    load_pattern_priors()
+
+
+@celery_app.task
+def refresh_pattern_priors():
+    """Rebuild the priors table from recent verification logs and publish it to all workers."""
+    from app.services.pattern_priors import build_pattern_priors_sync, publish_pattern_priors
+
+    db = SessionLocal()
+    try:
+        table = build_pattern_priors_sync(db)
+    finally:
+        db.close()
+    publish_pattern_priors(table)
+    return {"samples": table["samples"], "groups": len(table["groups"])}
+
+
+@celery_app.task
+def run_seed_patterns(workspace_id: int, job_id: str, rows: list[list[str]]):
+    """Reverse-match (first_name, last_name, email) rows and store the patterns per domain."""
+    db = SessionLocal()
+    try:
+        from app.models import Job
+        from app.services.domain_patterns import seed_domain_patterns_sync
+        from app.services.workspace_config import get_workspace_config_sync
+
+        r = db.execute(select(Job).where(Job.job_id == job_id, Job.workspace_id == workspace_id))
+        job = r.scalars().one_or_none()
+        if not job:
+            return
+        job.status = "running"
+        job.progress = 10
+        db.commit()
+
+        cfg = get_workspace_config_sync(db, workspace_id)
+        try:
+            stats = seed_domain_patterns_sync(
+                db, [tuple(row) for row in rows], workspace_id, custom_patterns=cfg.get("custom_patterns") or None
+            )
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)[:500]
+            db.commit()
+            return
+        job.status = "succeeded"
+        job.progress = 100
+        job.result = stats
+        db.commit()
+    finally:
+        db.close()
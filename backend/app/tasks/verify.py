@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import time
 from datetime import UTC, datetime
 from typing import TYPE_CHECKING
 
@@ -13,7 +14,18 @@ from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings as s
 from app.core.log_constants import LogCode, LogParam
 from app.core.log_service import VerificationLogger, make_log_message
+from app.services.domain_knowledge import domain_context_sync, record_domain_sync
+from app.services.domain_patterns import get_domain_pattern_scores_sync, learn_pattern_from_result_sync
+from app.services.greylist import greylist_entry_for_lead, park_greylisted
+from app.services.verification.disposable import is_disposable_domain
+from app.services.verification.smtp_checker import DEFAULT_MAIL_FROM
 from app.services.verifier import verify_and_pick_best
+from app.services.verify_batch import (
+    LeadOutcome,
+    apply_batch_results_sync,
+    group_leads_by_domain,
+    verify_domain_group_sync,
+)
 from app.services.workspace_config import get_workspace_config_sync
 from app.tasks.celery_app import celery_app
 
@@ -24,9 +36,16 @@ engine = create_engine(s.database_url_sync, pool_pre_ping=True)
 SessionLocal = sessionmaker(engine, autocommit=False, autoflush=False)
 
 # Verification can take a while (DNS, multiple MX, SMTP per candidate). Task limit: 10 min soft, 11 min hard.
+# The lead's time budget (lead_time_budget_seconds, at most 600 s per workspace) normally ends it first.
 VERIFY_SOFT_TIME_LIMIT = 600
 VERIFY_TIME_LIMIT = 660
 MAX_LOGGED_CANDIDATES = 15
+# Batches (run_verify_batch) hold up to VERIFY_BATCH_MAX_LEADS leads: 1 h soft, 61 min hard
+VERIFY_BATCH_SOFT_TIME_LIMIT = 3600
+VERIFY_BATCH_TIME_LIMIT = 3660
+# No lead is started later than one lead budget plus this margin before the soft limit, so the
+# batch stops cleanly and reports the leads it did not reach (result.unverified_lead_ids)
+VERIFY_BATCH_WRITE_MARGIN_SECONDS = 60
 
 
 def get_sync_session() -> Session:
@@ -71,9 +90,10 @@ def _append_log(
 
 
 def _mark_job_failed(db: Session, job_id: str, workspace_id: int, reason: str, code: LogCode | None = None) -> None:
-    """Update job to failed and commit."""
+    """Roll back the failed transaction, then update job to failed and commit."""
     from app.models import Job
 
+    db.rollback()
     r = db.execute(select(Job).where(Job.job_id == job_id, Job.workspace_id == workspace_id))
     job = r.scalars().one_or_none()
     if job:
@@ -120,12 +140,41 @@ def _create_job_logger(db: Session, job: Job) -> VerificationLogger:
     return VerificationLogger(detail_callback=detail_callback, progress_callback=progress_callback)
 
 
+def _add_usage(db: Session, workspace_id: int, count: int) -> None:
+    """Add verifications to the workspace's usage for the current month (no commit)."""
+    from app.models import Usage
+
+    period = datetime.now(UTC).strftime("%Y-%m")
+    r = db.execute(select(Usage).where(Usage.workspace_id == workspace_id, Usage.period == period))
+    u = r.scalars().one_or_none()
+    if not u:
+        u = Usage(workspace_id=workspace_id, period=period, verifications_count=count, exports_count=0)
+        db.add(u)
+    else:
+        u.verifications_count += count
+
+
+def _add_web_search_usage(db: Session, job: Job, workspace_id: int, outcomes: list[LeadOutcome]) -> None:
+    """Record the web searches (Serper) run for a batch's leads, as run_verify_lead's callback does (commits)."""
+    searches = sum(o.web_searches.count("serper") for o in outcomes)
+    if not searches:
+        return
+    from app.services.serper_usage import increment_serper_usage_sync
+
+    try:
+        increment_serper_usage_sync(db, workspace_id, count=searches)
+    except Exception as e:
+        db.rollback()
+        _append_log(db, job, LogCode.DEBUG_MX_EXCEPTION, {LogParam.ERROR: str(e)}, visibility="superadmin")
+        db.commit()
+
+
 @celery_app.task(bind=True, max_retries=3, soft_time_limit=VERIFY_SOFT_TIME_LIMIT, time_limit=VERIFY_TIME_LIMIT)
-def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
+def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str, max_age: int | None = None):
     """Verify lead: generate candidates, verify best, update lead and job."""
     db = get_sync_session()
     try:
-        from app.models import Job, Lead, Usage, VerificationLog
+        from app.models import Job, Lead, VerificationLog
 
         r = db.execute(select(Job).where(Job.job_id == job_id, Job.workspace_id == workspace_id))
         job = r.scalars().one_or_none()
@@ -210,6 +259,11 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
                     _append_log(db, job, LogCode.DEBUG_MX_EXCEPTION, {LogParam.ERROR: str(e)}, visibility="superadmin")
                     db.commit()
 
+        # Warm start from the domain knowledge base; otherwise the DNS checks run once here
+        domain_ctx = None
+        if domain and not is_disposable_domain(domain):
+            domain_ctx = domain_context_sync(db, domain, cfg, logger=logger)
+
         try:
             candidates, best_email, best_result, probe_results = verify_and_pick_best(
                 first,
@@ -225,6 +279,13 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
                 allow_no_lastname=cfg.get("allow_no_lastname", False),
                 on_web_search_performed=_on_web_search,
                 custom_patterns=cfg.get("custom_patterns"),
+                stop_policy=cfg["stop_policy"],
+                max_candidates=cfg.get("max_candidates") or None,
+                pattern_scores=get_domain_pattern_scores_sync(db, domain, workspace_id) if domain else None,
+                provider_policies=cfg.get("provider_policies") or None,
+                time_budget_seconds=cfg.get("lead_time_budget_seconds"),
+                domain_context=domain_ctx,
+                max_age=max_age,
             )
         except SoftTimeLimitExceeded:
             _mark_job_failed(
@@ -252,18 +313,11 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
         )
         db.commit()
 
-        mx_hosts = []
-        try:
-            from app.services.verifier import mx_lookup
-
-            mx_hosts = [h for _, h in mx_lookup(domain, dns_timeout_seconds=cfg.get("dns_timeout_seconds"))]
-        except Exception as ex:
+        # MX hosts from the domain context (no second lookup); disposable domains have none
+        mx_hosts = domain_ctx.mx_hosts if domain_ctx is not None else []
+        if domain_ctx is not None and domain_ctx.mx_error:
             _append_log(
-                db,
-                job,
-                LogCode.DEBUG_MX_EXCEPTION,
-                {LogParam.ERROR: f"{type(ex).__name__}: {ex}"},
-                visibility="superadmin",
+                db, job, LogCode.DEBUG_MX_EXCEPTION, {LogParam.ERROR: domain_ctx.mx_error}, visibility="superadmin"
             )
         else:
             _append_log(db, job, LogCode.DEBUG_MX_LOOKUP, {LogParam.COUNT: len(mx_hosts)}, visibility="superadmin")
@@ -306,6 +360,34 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
             best_confidence=best_result.confidence_score if best_result else 0,
         )
         db.add(log)
+        db.flush()
+        greylist = None
+        if s.greylist_retry_enabled:
+            greylist = greylist_entry_for_lead(
+                lead.id,
+                workspace_id,
+                log.id,
+                probe_results,
+                best_result,
+                mx_hosts,
+                cfg.get("smtp_mail_from") or DEFAULT_MAIL_FROM,
+                cfg.get("smtp_timeout_seconds"),
+                cfg.get("dns_timeout_seconds"),
+            )
+        learned = None
+        if best_result:
+            # A confirmed mailbox teaches the domain's pattern to later leads
+            learned = learn_pattern_from_result_sync(
+                db,
+                first,
+                last,
+                best_email,
+                best_result.status,
+                custom_patterns=cfg.get("custom_patterns"),
+                workspace_id=workspace_id,
+            )
+        if domain_ctx is not None:
+            record_domain_sync(db, domain_ctx, [best_result], pattern=learned)
 
         lead.email_candidates = candidates
         lead.email_best = best_email or ""
@@ -322,6 +404,16 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
             _append_log(db, job, LogCode.VERIFY_COMPLETED, {LogParam.EMAIL: lead.email_best}, visibility="public")
         else:
             _append_log(db, job, LogCode.VERIFY_NO_EMAIL_FOUND, visibility="public")
+        if greylist and park_greylisted(*greylist):
+            # Greylisted candidates are re-probed by retry_greylisted once the server allows it
+            entry, delay = greylist
+            _append_log(
+                db,
+                job,
+                LogCode.VERIFY_GREYLIST_PARKED,
+                {LogParam.COUNT: len(entry["emails"]), LogParam.TIMEOUT: delay},
+                visibility="public",
+            )
         _append_log(db, job, LogCode.JOB_COMPLETED, {LogParam.LEAD_ID: lead_id}, visibility="public")
         job.status = "succeeded"
         job.progress = 100
@@ -332,15 +424,7 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
         }
         db.commit()
 
-        # Increment usage
-        period = datetime.now(UTC).strftime("%Y-%m")
-        r2 = db.execute(select(Usage).where(Usage.workspace_id == workspace_id, Usage.period == period))
-        u = r2.scalars().one_or_none()
-        if not u:
-            u = Usage(workspace_id=workspace_id, period=period, verifications_count=1, exports_count=0)
-            db.add(u)
-        else:
-            u.verifications_count += 1
+        _add_usage(db, workspace_id, 1)
         db.commit()
 
         # Fire webhook verification.completed
@@ -374,3 +458,140 @@ def run_verify_lead(self, lead_id: int, workspace_id: int, job_id: str):
         raise
     finally:
         db.close()
+
+
+@celery_app.task(bind=True, soft_time_limit=VERIFY_BATCH_SOFT_TIME_LIMIT, time_limit=VERIFY_BATCH_TIME_LIMIT)
+def run_verify_batch(self, lead_ids: list[int], workspace_id: int, job_id: str, max_age: int | None = None):
+    """
+    Verify many leads grouped by domain (see app.services.verify_batch); one commit per domain.
+
+    Leads not reached before the soft time limit are listed in result.unverified_lead_ids; the
+    domains committed before it keep their results and the job still succeeds.
+    """
+    started = time.monotonic()
+    db = get_sync_session()
+    try:
+        from app.models import Job, Lead
+
+        r = db.execute(select(Job).where(Job.job_id == job_id, Job.workspace_id == workspace_id))
+        job = r.scalars().one_or_none()
+        if not job or job.status == "cancelled":
+            return
+        job.status = "running"
+        job.log_lines = job.log_lines or []
+
+        r = db.execute(select(Lead).where(Lead.id.in_(lead_ids), Lead.workspace_id == workspace_id))
+        by_id = {lead.id: lead for lead in r.scalars().all()}
+        leads = []
+        for lead_id in dict.fromkeys(lead_ids):
+            lead = by_id.get(lead_id)
+            if lead is None:
+                _append_log(db, job, LogCode.ERROR_LEAD_NOT_FOUND, {LogParam.LEAD_ID: lead_id}, level="error")
+            elif lead.opt_out:
+                _append_log(db, job, LogCode.ERROR_LEAD_OPTED_OUT, {LogParam.LEAD_ID: lead_id}, level="error")
+            else:
+                leads.append(lead)
+        skipped = len(dict.fromkeys(lead_ids)) - len(leads)
+        pending_ids = [lead.id for lead in leads]
+
+        cfg = get_workspace_config_sync(db, workspace_id)
+        groups = group_leads_by_domain(leads)
+        reserve = (cfg.get("lead_time_budget_seconds") or VERIFY_SOFT_TIME_LIMIT) + VERIFY_BATCH_WRITE_MARGIN_SECONDS
+        stop_at = started + VERIFY_BATCH_SOFT_TIME_LIMIT - reserve
+        _append_log(
+            db,
+            job,
+            LogCode.JOB_STARTED,
+            {LogParam.JOB_TYPE: "verify_batch", LogParam.LEAD_ID: "", LogParam.WORKSPACE_ID: workspace_id},
+        )
+        _append_log(db, job, LogCode.VERIFY_BATCH_STARTED, {LogParam.COUNT: len(leads), LogParam.TOTAL: len(groups)})
+        db.commit()
+
+        verified = failed = 0
+        processed: set[int] = set()  # Leads whose outcome is committed
+        try:
+            for domain, group in groups.items():
+                if time.monotonic() >= stop_at:
+                    break
+                _append_log(db, job, LogCode.VERIFY_BATCH_DOMAIN, {LogParam.DOMAIN: domain, LogParam.COUNT: len(group)})
+                db.commit()
+                outcomes = verify_domain_group_sync(db, domain, group, cfg, max_age=max_age, stop_at=stop_at)
+                greylist = apply_batch_results_sync(db, job.id, workspace_id, outcomes, cfg)
+                done = [o for o in outcomes if o.error is None]
+                for o in outcomes:
+                    if o.error is not None:
+                        _append_log(
+                            db,
+                            job,
+                            LogCode.VERIFY_BATCH_LEAD_FAILED,
+                            {LogParam.LEAD_ID: o.lead.id, LogParam.ERROR: o.error},
+                            level="error",
+                        )
+                    elif o.lead.email_best:
+                        _append_log(db, job, LogCode.VERIFY_COMPLETED, {LogParam.EMAIL: o.lead.email_best})
+                    else:
+                        _append_log(db, job, LogCode.VERIFY_NO_EMAIL_FOUND)
+                verified += len(done)
+                failed += len(outcomes) - len(done)
+                job.progress = min(99, round(100 * (verified + failed) / max(len(leads), 1)))
+                _add_usage(db, workspace_id, len(done))
+                db.commit()
+                processed.update(o.lead.id for o in outcomes)
+                _add_web_search_usage(db, job, workspace_id, outcomes)
+
+                for entry, delay in greylist:
+                    if park_greylisted(entry, delay):
+                        _append_log(
+                            db,
+                            job,
+                            LogCode.VERIFY_GREYLIST_PARKED,
+                            {LogParam.COUNT: len(entry["emails"]), LogParam.TIMEOUT: delay},
+                        )
+                db.commit()
+
+                from app.tasks.webhooks import dispatch_webhook_events
+
+                dispatch_webhook_events(
+                    workspace_id,
+                    "verification.completed",
+                    [
+                        {
+                            "job_id": job_id,
+                            "lead_id": o.lead.id,
+                            "email_best": o.lead.email_best,
+                            "verification_status": o.lead.verification_status,
+                            "confidence_score": o.lead.confidence_score,
+                        }
+                        for o in done
+                    ],
+                )
+        except SoftTimeLimitExceeded:
+            db.rollback()  # The domain in progress is dropped; committed domains are kept
+
+        unverified = [lead_id for lead_id in pending_ids if lead_id not in processed]
+        if unverified:
+            _append_log(db, job, LogCode.VERIFY_BATCH_INCOMPLETE, {LogParam.COUNT: len(unverified)}, level="error")
+        _append_log(db, job, LogCode.VERIFY_BATCH_COMPLETED, {LogParam.COUNT: verified, LogParam.TOTAL: len(leads)})
+        job.status = "succeeded" if verified or not leads else "failed"
+        if job.status == "failed":
+            job.error = "No lead could be verified"
+        job.progress = 100
+        job.result = {
+            "lead_ids": lead_ids,
+            "verified": verified,
+            "failed": failed,
+            "skipped": skipped,
+            "unverified_lead_ids": unverified,
+        }
+        db.commit()
+    except SoftTimeLimitExceeded:
+        _mark_job_failed(db, job_id, workspace_id, "Execution time exceeded (timeout)", code=LogCode.JOB_TIMEOUT)
+        return
+    except Exception as e:
+        try:
+            _mark_job_failed(db, job_id, workspace_id, str(e)[:500])
+        except Exception:
+            pass
+        raise
+    finally:
+        db.close()
@@ -27,8 +27,15 @@ def get_sync_session() -> Session:
 
 def dispatch_webhook_event(workspace_id: int, event: str, payload: dict[str, Any]) -> None:
     """Enqueue webhook deliveries for all hooks subscribed to event."""
+    dispatch_webhook_events(workspace_id, event, [payload])
+
+
+def dispatch_webhook_events(workspace_id: int, event: str, payloads: list[dict[str, Any]]) -> None:
+    """Enqueue one delivery per payload for all hooks subscribed to event (hooks loaded once)."""
     from app.models import Webhook
 
+    if not payloads:
+        return
     db = get_sync_session()
     try:
         r = db.execute(select(Webhook).where(Webhook.workspace_id == workspace_id, Webhook.is_active.is_(True)))
@@ -36,7 +43,8 @@ def dispatch_webhook_event(workspace_id: int, event: str, payload: dict[str, Any
         for wh in hooks:
             events = [e.strip() for e in (wh.events or "").split(",") if e.strip()]
             if event in events:
-                send_webhook_delivery.delay(wh.id, event, payload)
+                for payload in payloads:
+                    send_webhook_delivery.delay(wh.id, event, payload)
     finally:
         db.close()
 
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Compile disposable-domain lists into the binary index read by the verifier.
+Usage: python -m scripts.build_disposable_index lists/disposable.txt [more.txt ...] --out /data/disposable.idx
+Input: one domain per line, blank lines and # comments ignored. Point DISPOSABLE_DOMAINS_INDEX_PATH
+at the output; running workers pick up a rebuilt file within a minute, no restart needed.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.verification.disposable import build_disposable_index, read_domain_list
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("lists", nargs="+", help="Text files with one domain per line")
+    ap.add_argument("--out", required=True, help="Index file to write (replaced atomically)")
+    args = ap.parse_args()
+
+    domains = []
+    for path in args.lists:
+        with open(path, encoding="utf-8") as f:
+            domains.extend(read_domain_list(f))
+    count = build_disposable_index(domains, args.out)
+    print(f"Wrote {count} domains to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
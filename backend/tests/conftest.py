@@ -11,9 +11,12 @@ import os
 from collections.abc import AsyncGenerator, Generator
 from pathlib import Path
 
+import fakeredis
 import pytest
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.api.deps import get_db
@@ -131,5 +134,45 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def sync_db() -> Generator[Session, None, None]:
+    """Sync SQLite session, like the SessionLocal used by Celery tasks."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(engine, autocommit=False, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def mock_redis(monkeypatch) -> fakeredis.FakeRedis:
+    """In-memory Redis for every test, so SMTP/catch-all state never touches a real server."""
+    from app.services import smtp_blocked_detector
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(smtp_blocked_detector, "_redis_client", client)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_caches() -> Generator[None, None, None]:
+    """In-process caches (DNS answers, pattern priors, disposable index, blocked flag) must not leak between tests."""
+    from app.services.pattern_priors import reset_pattern_priors
+    from app.services.smtp_blocked_detector import reset_smtp_blocked_cache
+    from app.services.verification.disposable import reload_disposable_index
+    from app.services.verification.dns_checker import dns_cache
+
+    dns_cache.clear()
+    reset_pattern_priors()
+    reload_disposable_index()
+    reset_smtp_blocked_cache()
+    yield
+    dns_cache.clear()
+    reset_pattern_priors()
+    reload_disposable_index()
+    reset_smtp_blocked_cache()
+
+
 # Import mocks from mocks.py
 pytest_plugins = ["tests.mocks"]
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from unittest.mock import MagicMock
 
 import pytest
@@ -28,11 +29,16 @@ class FakeDNSAnswer:
 class FakeSMTP:
     """Fake SMTP connection that accepts emails."""
 
-    def __init__(self, host: str, port: int, timeout: int = 30):
+    esmtp_features: dict[str, str] = {}
+
+    def __init__(self, host: str, port: int, timeout: int = 30, local_hostname: str | None = None, **kwargs):
         self.host = host
         self.port = port
         self.timeout = timeout
+        self.local_hostname = local_hostname
         self._debuglevel = 0
+        self._replies: list[tuple[int, bytes]] = []
+        self.commands: list[str] = []
 
     def __enter__(self):
         return self
@@ -49,9 +55,27 @@ class FakeSMTP:
     def ehlo(self):
         return (250, b"OK")
 
+    def has_extn(self, opt: str) -> bool:
+        return opt.lower() in self.esmtp_features
+
     def mail(self, sender: str):
+        self.commands.append("MAIL")
+        return (250, b"OK")
+
+    def rset(self):
+        self.commands.append("RSET")
         return (250, b"OK")
 
+    def send(self, data: str):
+        """Pipelined commands: queue one reply per RCPT line."""
+        self.commands.append(f"SEND:{data.count('RCPT TO:')}")
+        for line in data.split("\r\n"):
+            if line.upper().startswith("RCPT TO:"):
+                self._replies.append(self.rcpt(line[len("RCPT TO:") :].strip("<>")))
+
+    def getreply(self) -> tuple[int, bytes]:
+        return self._replies.pop(0)
+
     def rcpt(self, recipient: str) -> tuple[int, bytes]:
         """Accept all recipients by default."""
         return (250, b"2.1.5 OK")
@@ -59,6 +83,9 @@ class FakeSMTP:
     def quit(self):
         pass
 
+    def close(self):
+        pass
+
 
 class FakeSMTPReject(FakeSMTP):
     """Fake SMTP connection that rejects emails."""
@@ -75,6 +102,51 @@ class FakeSMTPCatchAll(FakeSMTP):
         return (250, b"2.1.5 OK")
 
 
+class FakeSMTPPipelining(FakeSMTP):
+    """Fake SMTP server advertising PIPELINING; only first.last mailboxes exist."""
+
+    esmtp_features = {"pipelining": ""}
+    instances: list[FakeSMTPPipelining] = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        FakeSMTPPipelining.instances.append(self)
+
+    def rcpt(self, recipient: str) -> tuple[int, bytes]:
+        if recipient.split("@")[0] == "john.doe":
+            return (250, b"2.1.5 OK")
+        return (550, b"5.1.1 User unknown")
+
+
+class FakeSMTPGreylist(FakeSMTP):
+    """Greylists every RCPT while greylisting is on; afterwards only first.last mailboxes exist."""
+
+    greylisting = True
+    instances: list[FakeSMTPGreylist] = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        FakeSMTPGreylist.instances.append(self)
+
+    def rcpt(self, recipient: str) -> tuple[int, bytes]:
+        self.commands.append("RCPT")
+        if FakeSMTPGreylist.greylisting:
+            return (450, b"4.2.0 Greylisted, please try again in 5 minutes")
+        if recipient.split("@")[0] == "john.doe":
+            return (250, b"2.1.5 OK")
+        return (550, b"5.1.1 User unknown")
+
+
+class CountingSMTP(FakeSMTP):
+    """Fake SMTP connection that accepts everything and counts opened connections."""
+
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingSMTP.connections += 1
+
+
 class FakeSMTPTimeout(FakeSMTP):
     """Fake SMTP connection that times out."""
 
@@ -118,6 +190,22 @@ def mock_dns_no_mx(monkeypatch):
     monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
 
 
+@pytest.fixture
+def dns_queries(monkeypatch, mock_dns_valid):
+    """Record (name, rdtype) of every DNS query made on top of mock_dns_valid."""
+    import dns.resolver
+
+    queries: list[tuple[str, str]] = []
+    inner = dns.resolver.resolve
+
+    def counting_resolve(domain: str, rdtype: str, lifetime: float = None):
+        queries.append((domain, rdtype))
+        return inner(domain, rdtype, lifetime=lifetime)
+
+    monkeypatch.setattr("dns.resolver.resolve", counting_resolve)
+    return queries
+
+
 @pytest.fixture
 def mock_smtp_valid(monkeypatch):
     """Mock SMTP to accept emails."""
@@ -136,6 +224,31 @@ def mock_smtp_catch_all(monkeypatch):
     monkeypatch.setattr("smtplib.SMTP", FakeSMTPCatchAll)
 
 
+@pytest.fixture
+def mock_smtp_counting(monkeypatch):
+    """Mock SMTP to accept emails and count connections (CountingSMTP.connections)."""
+    CountingSMTP.connections = 0
+    monkeypatch.setattr("smtplib.SMTP", CountingSMTP)
+    return CountingSMTP
+
+
+@pytest.fixture
+def mock_smtp_pipelining(monkeypatch):
+    """Mock SMTP with PIPELINING support; instances are recorded in FakeSMTPPipelining.instances."""
+    FakeSMTPPipelining.instances = []
+    monkeypatch.setattr("smtplib.SMTP", FakeSMTPPipelining)
+    return FakeSMTPPipelining
+
+
+@pytest.fixture
+def mock_smtp_greylist(monkeypatch):
+    """Mock SMTP that greylists until FakeSMTPGreylist.greylisting is set to False."""
+    FakeSMTPGreylist.greylisting = True
+    FakeSMTPGreylist.instances = []
+    monkeypatch.setattr("smtplib.SMTP", FakeSMTPGreylist)
+    return FakeSMTPGreylist
+
+
 @pytest.fixture
 def mock_smtp_timeout(monkeypatch):
     """Mock SMTP to timeout."""
@@ -146,3 +259,79 @@ def mock_smtp_timeout(monkeypatch):
 def mock_network(mock_dns_valid, mock_smtp_valid):
     """Combine DNS and SMTP mocks for full network isolation."""
     pass
+
+
+class FakeSMTPServer:
+    """Local asyncio SMTP server for the async engine; only `mailboxes` exist unless catch_all."""
+
+    def __init__(self, mailboxes: set[str], pipelining: bool = True, catch_all: bool = False):
+        self.mailboxes = mailboxes
+        self.pipelining = pipelining
+        self.catch_all = catch_all
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0  # Peak number of simultaneous sessions
+        self.commands: list[str] = []
+        self.peers: list[str] = []  # Client source address of each session
+        self.port = 0
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self.peers.append(writer.get_extra_info("peername")[0])
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)  # Let concurrent clients overlap
+        writer.write(b"220 fake ESMTP\r\n")
+        while line := await reader.readline():
+            cmd = line.decode().strip()
+            verb = cmd.split(":")[0].split(" ")[0].upper()
+            self.commands.append(verb)
+            if verb == "EHLO":
+                writer.write(b"250-fake\r\n250-PIPELINING\r\n250 8BITMIME\r\n" if self.pipelining else b"250 fake\r\n")
+            elif verb == "RCPT":
+                rcpt = cmd.split(":", 1)[1].strip().strip("<>")
+                ok = self.catch_all or rcpt in self.mailboxes
+                writer.write(b"250 2.1.5 OK\r\n" if ok else b"550 5.1.1 User unknown\r\n")
+            elif verb == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        self.active -= 1
+        writer.close()
+
+
+@pytest.fixture
+async def fake_smtp_server():
+    """Local SMTP server accepting john.doe@example.com; MX hosts must point at 127.0.0.1."""
+    server = FakeSMTPServer({"john.doe@example.com"})
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+def mock_async_dns_local(monkeypatch):
+    """Mock dns.asyncresolver: every domain has one MX at 127.0.0.1 and an SPF record."""
+    import dns.resolver
+
+    async def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+        if rdtype == "MX":
+            if domain.startswith("nomx."):
+                raise dns.resolver.NXDOMAIN()
+            return FakeDNSAnswer([FakeMXRecord(10, "127.0.0.1.")])
+        if rdtype == "TXT" and not domain.startswith("_dmarc."):
+            return FakeDNSAnswer(['"v=spf1 -all"'])
+        raise dns.resolver.NoAnswer()
+
+    monkeypatch.setattr("dns.asyncresolver.resolve", fake_resolve)
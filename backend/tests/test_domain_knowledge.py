@@ -0,0 +1,115 @@
+"""Tests for the per-domain knowledge base (domains table)."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from app.models import Domain, Lead
+from app.services.domain_knowledge import (
+    domain_context_sync,
+    get_domain_sync,
+    load_domain_context_sync,
+    record_domain_sync,
+    refresh_stale_domains_sync,
+)
+from app.services.verification.dns_checker import dns_cache
+from app.services.verification.domain_context import DomainContext
+from app.services.verify_batch import verify_domain_group_sync
+from app.services.workspace_config import get_workspace_config_sync
+
+
+def _cfg(db) -> dict:
+    return get_workspace_config_sync(db, 1)
+
+
+def _leads(db, *rows: tuple[str, str, str]) -> list[Lead]:
+    leads = [Lead(workspace_id=1, first_name=first, last_name=last, domain=domain) for first, last, domain in rows]
+    db.add_all(leads)
+    db.flush()
+    return leads
+
+
+class TestDomainKnowledge:
+    """Verifications upsert their domain's row and later ones start from it."""
+
+    def test_batch_records_domain(self, sync_db, mock_dns_valid, mock_smtp_pipelining):
+        """A verified domain group stores DNS signals, catch-all verdict and pattern."""
+        leads = _leads(sync_db, ("John", "Doe", "example.com"), ("Jane", "Roe", "example.com"))
+
+        verify_domain_group_sync(sync_db, "example.com", leads, _cfg(sync_db))
+        sync_db.flush()
+
+        row = get_domain_sync(sync_db, "example.com")
+        assert row.mx == [[10, "mail.example.com"]]
+        assert (row.mx_error, row.spf_present, row.dns_checked_at is not None) == ("", True, True)
+        assert (row.catch_all, row.catch_all_checked_at is not None) == (False, True)
+        assert row.pattern == "{first}.{last}@{domain}"
+        assert (row.leads_verified, row.last_probe_at is not None) == (2, True)
+
+    def test_fresh_row_needs_no_dns(self, sync_db, dns_queries, mock_smtp_pipelining):
+        """A fresh row yields the context (and catch-all verdict) without any DNS query."""
+        verify_domain_group_sync(sync_db, "example.com", _leads(sync_db, ("John", "Doe", "example.com")), _cfg(sync_db))
+        sync_db.flush()
+        dns_cache.clear()
+        dns_queries.clear()
+
+        ctx = domain_context_sync(sync_db, "example.com", {})
+
+        assert dns_queries == []
+        assert ctx.mx_hosts == ["mail.example.com"]
+        assert (ctx.spf_present, ctx.catch_all, ctx.catch_all_cache_checked) == (True, False, True)
+
+    def test_stale_row_is_ignored_and_refreshed(self, sync_db, mock_dns_valid):
+        """Stale rows are not used; the Beat refresh re-runs their DNS checks."""
+        old = datetime.now(UTC) - timedelta(days=3)
+        sync_db.add(Domain(domain="example.com", mx=[[5, "old.example.com"]], dns_checked_at=old, last_verified_at=old))
+        sync_db.flush()
+
+        assert load_domain_context_sync(sync_db, "example.com") is None
+        assert refresh_stale_domains_sync(sync_db) == {"refreshed": 1, "failed": 0}
+        row = get_domain_sync(sync_db, "example.com")
+        assert row.mx == [[10, "mail.example.com"]]
+        assert load_domain_context_sync(sync_db, "example.com") is not None
+
+    def test_concurrent_records_share_one_row(self, sync_db, mock_dns_valid):
+        """Two writers recording a new domain in one transaction end with one row and both counts."""
+        ctx = domain_context_sync(sync_db, "example.com", {})
+
+        record_domain_sync(sync_db, ctx, [None])
+        record_domain_sync(sync_db, ctx, [None, None])
+        sync_db.commit()
+
+        (row,) = sync_db.query(Domain).all()
+        assert (row.domain, row.leads_verified) == ("example.com", 3)
+
+    def test_transient_mx_error_not_recorded(self, sync_db):
+        """A DNS timeout says nothing about the domain: its signals are not stored."""
+        ctx = DomainContext(domain="example.com", mx_error="Timeout")
+
+        row = record_domain_sync(sync_db, ctx, [None])
+
+        assert (row.dns_checked_at, row.mx, row.leads_verified) == (None, None, 1)
+
+    def test_txt_timeout_not_recorded_or_shared(self, sync_db, mock_redis, monkeypatch):
+        """An SPF/DMARC lookup that timed out leaves the row stale and the answer unshared."""
+        import dns.resolver
+
+        from tests.mocks import FakeDNSAnswer, FakeMXRecord
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            if rdtype == "MX":
+                return FakeDNSAnswer([FakeMXRecord(10, f"mail.{domain}.")])
+            raise dns.resolver.Timeout()
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+        ctx = domain_context_sync(sync_db, "example.com", {})
+
+        row = record_domain_sync(sync_db, ctx, [None])
+
+        assert (ctx.mx_hosts, ctx.spf_present, ctx.txt_failed) == (["mail.example.com"], False, True)
+        assert (row.dns_checked_at, row.mx) == (None, None)
+        assert not mock_redis.exists("verify:shared:dns:example.com")
+
+
+# Import mocks from mocks.py
+pytest_plugins = ["tests.mocks"]
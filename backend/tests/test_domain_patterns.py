@@ -0,0 +1,185 @@
+"""Tests for the per-domain learned pattern store."""
+
+from __future__ import annotations
+
+from app.models import DomainPattern
+from app.services.domain_patterns import (
+    get_domain_pattern_scores_sync,
+    learn_pattern_from_result_sync,
+    record_domain_pattern_sync,
+    seed_domain_patterns_sync,
+)
+from app.services.email_patterns import match_pattern, match_patterns_bulk
+from app.services.pattern_priors import (
+    PRIORS_MIN_GROUP_SAMPLES,
+    build_pattern_priors,
+    get_pattern_priors,
+    publish_pattern_priors,
+    reset_pattern_priors,
+)
+from app.services.verification import verify_and_pick_best
+
+
+class TestDomainPatternStore:
+    """Recording confirmed patterns and turning them into scores."""
+
+    def test_learns_only_from_valid_results(self, sync_db):
+        """Valid results record the pattern; risky/unknown prove nothing."""
+        assert learn_pattern_from_result_sync(sync_db, "John", "Doe", "jdoe@acme.com", "valid") == "{f}{last}@{domain}"
+        assert learn_pattern_from_result_sync(sync_db, "Jane", "Roe", "jroe@acme.com", "risky") is None
+        sync_db.commit()
+
+        (row,) = sync_db.query(DomainPattern).all()
+        assert (row.domain, row.pattern, row.confirmed_count) == ("acme.com", "{f}{last}@{domain}", 1)
+
+    def test_scores_ordered_by_confirmations(self, sync_db):
+        """Most confirmed pattern first; confidence grows with confirmations."""
+        record_domain_pattern_sync(sync_db, "ACME.com", "{f}{last}@{domain}", count=3)
+        record_domain_pattern_sync(sync_db, "acme.com", "{first}@{domain}")
+        sync_db.commit()
+
+        scores = get_domain_pattern_scores_sync(sync_db, "acme.com")
+
+        assert list(scores) == ["{f}{last}@{domain}", "{first}@{domain}"]
+        assert scores == {"{f}{last}@{domain}": 60, "{first}@{domain}": 20}
+        assert get_domain_pattern_scores_sync(sync_db, "other.com") == {}
+
+    def test_concurrent_confirmations_add_up(self, sync_db):
+        """A confirmation of a row written by another session is added in SQL, not overwritten."""
+        record_domain_pattern_sync(sync_db, "acme.com", "{f}{last}@{domain}")
+        sync_db.commit()
+        record_domain_pattern_sync(sync_db, "acme.com", "{f}{last}@{domain}", count=2)
+        record_domain_pattern_sync(sync_db, "acme.com", "{f}{last}@{domain}")
+        sync_db.commit()
+
+        (row,) = sync_db.query(DomainPattern).all()
+        assert row.confirmed_count == 4
+
+    def test_custom_patterns_stay_in_their_workspace(self, sync_db):
+        """A mailbox matched by a workspace's custom pattern only reorders that workspace's candidates."""
+        custom = ["{first}-{last}@{domain}"]
+        assert (
+            learn_pattern_from_result_sync(sync_db, "John", "Doe", "john-doe@acme.com", "valid", custom, workspace_id=1)
+            == custom[0]
+        )
+        assert learn_pattern_from_result_sync(sync_db, "Jane", "Roe", "jane-roe@acme.com", "valid", custom) is None
+        learn_pattern_from_result_sync(sync_db, "Ann", "Lee", "ann.lee@acme.com", "valid", custom, workspace_id=1)
+        sync_db.commit()
+
+        assert get_domain_pattern_scores_sync(sync_db, "acme.com", 1) == {custom[0]: 33, "{first}.{last}@{domain}": 33}
+        assert get_domain_pattern_scores_sync(sync_db, "acme.com", 2) == {"{first}.{last}@{domain}": 50}
+        assert get_domain_pattern_scores_sync(sync_db, "acme.com") == {"{first}.{last}@{domain}": 50}
+
+    def test_learned_pattern_is_probed_first(self, mock_dns_valid, mock_smtp_pipelining):
+        """With first_valid, a learned pattern needs a single round and sets pattern_confidence."""
+        candidates, best_email, best_result, probe_results = verify_and_pick_best(
+            "John",
+            "Doe",
+            "example.com",
+            stop_policy="first_valid",
+            pattern_scores={"{first}.{last}@{domain}": 90},
+        )
+
+        assert candidates[0] == best_email == "john.doe@example.com"
+        assert best_result.status == "valid"
+        assert best_result.pattern_confidence == 90
+        (session,) = mock_smtp_pipelining.instances
+        assert session.commands == ["MAIL", "SEND:3"]
+        assert len(probe_results) == 2
+
+    def test_seed_aggregates_per_domain(self, sync_db):
+        """Seed rows are matched in bulk, counted per (domain, pattern) and kept apart from verified rows."""
+        record_domain_pattern_sync(sync_db, "acme.com", "{f}{last}@{domain}")
+        sync_db.commit()
+        rows = [
+            ("John", "Doe", "jdoe@acme.com"),
+            ("Jane", "Roe", "JRoe@Acme.com"),
+            ("José", "Núñez", "jose.nunez@beta.es"),
+            ("Ann", "Lee", "sales@acme.com"),
+            ("Bad", "Row", "not-an-email"),
+        ]
+
+        stats = seed_domain_patterns_sync(sync_db, rows, workspace_id=1)
+        sync_db.commit()
+
+        assert stats == {"rows": 5, "matched": 3, "unmatched": 2, "domains": 2, "patterns": 2}
+        by_key = {
+            (r.workspace_id, r.domain, r.pattern, r.source): r.confirmed_count for r in sync_db.query(DomainPattern)
+        }
+        assert by_key == {
+            (0, "acme.com", "{f}{last}@{domain}", "verified"): 1,
+            (1, "acme.com", "{f}{last}@{domain}", "seed"): 2,
+            (1, "beta.es", "{first}.{last}@{domain}", "seed"): 1,
+        }
+        assert get_domain_pattern_scores_sync(sync_db, "beta.es", 2) == {}
+
+    def test_seeds_rank_after_verified_patterns(self, sync_db):
+        """However large, a seed never outranks a pattern confirmed by verification."""
+        record_domain_pattern_sync(sync_db, "acme.com", "{first}.{last}@{domain}")
+        seed_domain_patterns_sync(sync_db, [("John", "Doe", "jdoe@acme.com")] * 50, workspace_id=1)
+        sync_db.commit()
+
+        assert list(get_domain_pattern_scores_sync(sync_db, "acme.com", 1)) == [
+            "{first}.{last}@{domain}",
+            "{f}{last}@{domain}",
+        ]
+
+    def test_bulk_match_agrees_with_match_pattern(self):
+        """Bulk matching returns what match_pattern returns row by row, custom patterns included."""
+        custom = ["{first}-{last}@{domain}", "{last}{first}@{domain}"]
+        rows = [
+            ("John", "Doe", "john-doe@acme.com"),
+            ("John", "Doe", "doejohn@acme.com"),
+            ("John", "Doe", "doe@acme.com"),
+            ("", "Doe", "doe@acme.com"),
+            ("John", "Doe", "someone@acme.com"),
+        ]
+
+        assert match_patterns_bulk(rows, custom) == [match_pattern(*row, custom) for row in rows]
+        assert match_patterns_bulk(rows, custom)[:3] == [*custom, "{last}@{domain}"]
+
+
+class TestPatternPriors:
+    """Global priors by provider and TLD for domains with no learned pattern."""
+
+    @staticmethod
+    def _rows(n: int, email_fmt: str, domain: str, mx_host: str) -> list[tuple]:
+        return [
+            ("John", "Doe", domain, [mx_host], {email_fmt.format(domain=domain): {"status": "valid"}}) for _ in range(n)
+        ]
+
+    def test_build_groups_and_fallback(self):
+        """Groups below the sample minimum are dropped; lookups fall back to broader groups."""
+        rows = [
+            *self._rows(PRIORS_MIN_GROUP_SAMPLES, "jdoe@{domain}", "acme.es", "aspmx.l.google.com"),
+            *self._rows(5, "john.doe@{domain}", "beta.de", "mx.beta.de"),
+            ("John", "Doe", "gamma.com", [], {"info@gamma.com": {"status": "valid"}, "x@gamma.com": {}}),
+        ]
+        table = build_pattern_priors(rows)
+
+        assert table["samples"] == PRIORS_MIN_GROUP_SAMPLES + 5
+        assert set(table["groups"]) == {"google|es", "google|*", "*|es", "*|*"}
+        publish_pattern_priors(table)
+
+        assert get_pattern_priors("google", "es") == {"{f}{last}@{domain}": 100}
+        assert list(get_pattern_priors("other", "de")) == ["{f}{last}@{domain}", "{first}.{last}@{domain}"]
+
+    def test_workers_load_published_table(self):
+        """A fresh process reads the table another worker published to Redis."""
+        publish_pattern_priors(build_pattern_priors(self._rows(3, "jdoe@{domain}", "acme.com", "mx.acme.com")))
+        reset_pattern_priors()
+
+        assert get_pattern_priors("other", "com") == {"{f}{last}@{domain}": 100}
+
+    def test_unseen_domain_probes_prior_first(self, mock_dns_valid, mock_smtp_pipelining):
+        """Without learned patterns, the most common pattern for the provider/TLD is probed first."""
+        publish_pattern_priors(build_pattern_priors(self._rows(3, "john.doe@{domain}", "acme.com", "mx.acme.com")))
+
+        candidates, best_email, _, _ = verify_and_pick_best("John", "Doe", "example.com", stop_policy="first_valid")
+
+        assert candidates[0] == best_email == "john.doe@example.com"
+        assert mock_smtp_pipelining.instances[0].commands == ["MAIL", "SEND:3"]
+
+
+# Import mocks from mocks.py
+pytest_plugins = ["tests.mocks"]
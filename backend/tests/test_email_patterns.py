@@ -1,6 +1,6 @@
 """Unit tests for email pattern generation."""
 
-from app.services.email_patterns import generate_candidates
+from app.services.email_patterns import generate_candidates, match_pattern
 
 
 class TestGenerateCandidates:
@@ -91,3 +91,25 @@ class TestGenerateCandidates:
         candidates = generate_candidates("John", "Doe", "example.com")
 
         assert len(candidates) == len(set(candidates))
+
+
+class TestPatternMatching:
+    """Reverse matching and preferred (learned) patterns."""
+
+    def test_match_pattern_common(self):
+        """Should find the pattern that produces the email, with slugify normalization."""
+        assert match_pattern("José", "Núñez", "jnunez@acme.es") == "{f}{last}@{domain}"
+        assert match_pattern("John", "Doe", "John.Doe@Example.com") == "{first}.{last}@{domain}"
+
+    def test_match_pattern_custom_and_unknown(self):
+        """Custom patterns are tried after the common ones; no match returns None."""
+        assert match_pattern("John", "Doe", "doe-j@acme.com") is None
+        assert match_pattern("John", "Doe", "doe-j@acme.com", ["{last}-{f}@{domain}"]) == "{last}-{f}@{domain}"
+        assert match_pattern("John", "Doe", "not-an-email") is None
+
+    def test_preferred_patterns_come_first(self):
+        """Learned patterns are probed first, without duplicates."""
+        candidates = generate_candidates("John", "Doe", "example.com", preferred_patterns=["{f}{last}@{domain}"])
+
+        assert candidates[0] == "jdoe@example.com"
+        assert candidates.count("jdoe@example.com") == 1
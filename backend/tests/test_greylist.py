@@ -0,0 +1,129 @@
+"""Tests for greylisted candidate parking and re-probing."""
+
+from __future__ import annotations
+
+import time
+
+from app.core.config import settings
+from app.models import Lead, VerificationLog
+from app.services.greylist import (
+    GREYLIST_LEASE_SECONDS,
+    ack_greylisted,
+    apply_greylist_results_sync,
+    claim_due_greylisted,
+    greylist_entry_for_lead,
+    greylist_retry_delay,
+    park_greylisted,
+    reprobe_greylisted,
+    still_greylisted,
+)
+from app.services.verification import verify_and_pick_best
+
+
+class TestGreylistScheduling:
+    """Retry windows and the Redis parking lot."""
+
+    def test_retry_delay_from_reply(self):
+        """The server's stated window wins (plus a margin); otherwise 5 min, doubled per attempt."""
+        assert greylist_retry_delay("450 4.2.0 Greylisted, please try again in 5 minutes") == 330
+        assert greylist_retry_delay("451 4.7.1 Greylisting in action, retry after 120 seconds") == 150
+        assert greylist_retry_delay("451 4.7.1 Please try again later") == 300
+        assert greylist_retry_delay(None, attempt=2) == 1200
+        assert greylist_retry_delay("450 try again in 600 minutes") == 3600
+
+    def test_claim_returns_only_due_entries_once(self):
+        """Due entries are claimed atomically; re-parking replaces a lead's entry."""
+        park_greylisted({"lead_id": 1, "emails": ["a@x.com"]}, 60)
+        park_greylisted({"lead_id": 1, "emails": ["b@x.com"]}, 60)
+        park_greylisted({"lead_id": 2, "emails": ["c@y.com"]}, 600)
+
+        assert claim_due_greylisted(now=time.time()) == []
+        assert claim_due_greylisted(now=time.time() + 120) == [{"lead_id": 1, "emails": ["b@x.com"]}]
+        assert claim_due_greylisted(now=time.time() + 120) == []
+        ack_greylisted([1])
+        assert [e["lead_id"] for e in claim_due_greylisted(now=time.time() + 900)] == [2]
+
+    def test_unacknowledged_claim_is_due_again(self, mock_redis):
+        """A worker dying before acknowledging loses nothing: the lease expires and the entry is claimed again."""
+        park_greylisted({"lead_id": 1, "emails": ["a@x.com"]}, 60)
+        park_greylisted({"lead_id": 2, "emails": ["b@x.com"]}, 60)
+        now = time.time() + 120
+
+        assert len(claim_due_greylisted(now=now)) == 2
+        ack_greylisted([2])
+        assert claim_due_greylisted(now=now + GREYLIST_LEASE_SECONDS - 1) == []
+        assert claim_due_greylisted(now=now + GREYLIST_LEASE_SECONDS) == [{"lead_id": 1, "emails": ["a@x.com"]}]
+        ack_greylisted([1])
+        assert mock_redis.hlen("smtp:greylist:entries") == 0
+
+    def test_reparked_entry_survives_ack(self, mock_redis):
+        """Candidates still greylisted are parked again before the batch is acknowledged."""
+        park_greylisted({"lead_id": 1, "emails": ["a@x.com"]}, 60)
+        (entry,) = claim_due_greylisted(now=time.time() + 120)
+        park_greylisted({**entry, "attempts": 1}, 300)
+        ack_greylisted([1])
+
+        assert claim_due_greylisted(now=time.time() + 400) == [{"lead_id": 1, "emails": ["a@x.com"], "attempts": 1}]
+
+    def test_beat_tasks_are_registered(self, monkeypatch):
+        """Every task beat schedules (retry_greylisted included) is registered by the worker's modules."""
+        # Task modules build their sync engine at import; no database is needed to register tasks
+        monkeypatch.setattr(settings, "database_url_sync", "sqlite://")
+        from app.tasks.celery_app import celery_app
+
+        celery_app.loader.import_default_modules()
+        for entry in celery_app.conf.beat_schedule.values():
+            assert entry["task"] in celery_app.tasks
+
+
+class TestGreylistRetry:
+    """A greylisted lead is parked, re-probed later and updated in place."""
+
+    def test_parked_lead_is_resolved_on_retry(self, sync_db, mock_dns_valid, mock_smtp_greylist):
+        """After the window, one session re-probes the parked candidates and the lead becomes valid."""
+        lead = Lead(workspace_id=1, first_name="John", last_name="Doe", domain="example.com")
+        sync_db.add(lead)
+        sync_db.flush()
+        candidates, best_email, best_result, probe_results = verify_and_pick_best("John", "Doe", "example.com")
+        lead.verification_status = best_result.status
+        log = VerificationLog(lead_id=lead.id, probe_results=probe_results, best_status=best_result.status)
+        sync_db.add(log)
+        sync_db.commit()
+
+        assert best_result.status == "unknown"
+        entry, delay = greylist_entry_for_lead(
+            lead.id, 1, log.id, probe_results, best_result, ["mail.example.com"], "probe@test.local", None, None
+        )
+        assert entry["emails"] == candidates
+        assert delay == 330
+        park_greylisted(entry, delay)
+
+        mock_smtp_greylist.greylisting = False
+        mock_smtp_greylist.instances = []
+        (claimed,) = claim_due_greylisted(now=time.time() + delay)
+        (results,) = reprobe_greylisted([claimed])
+
+        assert len(mock_smtp_greylist.instances) == 1
+        assert still_greylisted(results) == []
+        assert apply_greylist_results_sync(sync_db, claimed, results) is True
+        sync_db.commit()
+        sync_db.refresh(lead)
+        sync_db.refresh(log)
+        assert (lead.email_best, lead.verification_status) == ("john.doe@example.com", "valid")
+        assert log.best_email == "john.doe@example.com"
+        assert log.probe_results["john.doe@example.com"]["status"] == "valid"
+        assert log.probe_results["john.doe@example.com"]["greylist_attempts"] == 1
+
+    def test_confirmed_lead_is_not_parked(self, mock_dns_valid, mock_smtp_pipelining):
+        """Nothing to retry when a candidate was already confirmed."""
+        _, _, best_result, probe_results = verify_and_pick_best("John", "Doe", "example.com")
+
+        assert best_result.status == "valid"
+        assert (
+            greylist_entry_for_lead(1, 1, 1, probe_results, best_result, ["mail.example.com"], "a@b.c", None, None)
+            is None
+        )
+
+
+# Import mocks from mocks.py
+pytest_plugins = ["tests.mocks"]
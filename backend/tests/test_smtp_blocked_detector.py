@@ -2,8 +2,18 @@
 
 from __future__ import annotations
 
+import json
+
 from app.services.verification.dns_checker import detect_provider
+from app.services.verification.domain_context import build_domain_context
+from app.services.verification.provider_fingerprints import (
+    SuffixTrie,
+    get_provider_fingerprints,
+    parse_spf_includes,
+    reload_provider_fingerprints,
+)
 from app.services.verification.result import VerifyResult
+from tests.mocks import FakeDNSAnswer, FakeMXRecord
 
 
 class TestProviderDetection:
@@ -59,6 +69,81 @@ class TestProviderDetection:
         assert result == "google"
 
 
+class TestProviderFingerprints:
+    """Tests for the fingerprint database and its suffix index."""
+
+    def test_longest_suffix_wins(self):
+        """A more specific suffix overrides a shorter one."""
+        trie = SuffixTrie()
+        trie.add("example.com", "a")
+        trie.add("mail.example.com", "b")
+
+        assert trie.longest_match("mx1.mail.example.com.") == "b"
+        assert trie.longest_match("smtp.example.com") == "a"
+        assert trie.longest_match("example.org") is None
+
+    def test_matches_whole_labels_only(self):
+        """A suffix does not match inside a label (no substring false positives)."""
+        assert detect_provider([(10, "mx.notgoogle.com")]) == "other"
+        assert detect_provider([(10, "google.com.evil.net")]) == "other"
+
+    def test_shipped_gateways(self):
+        """Gateways of the shipped table are flagged as such."""
+        fp = get_provider_fingerprints()
+
+        assert fp.match_mx("acme-com.mail.pphosted.com") == "proofpoint"
+        assert fp.is_gateway("proofpoint")
+        assert not fp.is_gateway("google")
+
+    def test_extra_database_is_merged(self, tmp_path):
+        """The configured database adds providers and suffixes to the shipped one."""
+        path = tmp_path / "fingerprints.json"
+        path.write_text(json.dumps({"acmehost": {"mx": ["mx.acmehost.net"], "spf": ["spf.acmehost.net"]}}))
+        try:
+            reload_provider_fingerprints(str(path))
+            assert detect_provider([(10, "eu1.mx.acmehost.net")]) == "acmehost"
+            assert detect_provider([(10, "aspmx.l.google.com")]) == "google"
+        finally:
+            reload_provider_fingerprints("")
+
+    def test_broken_extra_database_is_ignored(self, tmp_path):
+        """An unreadable database falls back to the shipped table."""
+        path = tmp_path / "fingerprints.json"
+        path.write_text("{not json")
+        try:
+            reload_provider_fingerprints(str(path))
+            assert detect_provider([(10, "aspmx.l.google.com")]) == "google"
+        finally:
+            reload_provider_fingerprints("")
+
+    def test_parse_spf_includes(self):
+        """include: and redirect= domains are extracted from the SPF record only."""
+        records = [
+            '"google-site-verification=abc"',
+            '"v=spf1 ip4:1.2.3.4 include:spf.protection.outlook.com ~include:_spf.google.com redirect=_spf.acme.com"',
+        ]
+
+        assert parse_spf_includes(records) == ["spf.protection.outlook.com", "_spf.google.com", "_spf.acme.com"]
+
+    def test_gateway_mx_reveals_hosted_provider(self, monkeypatch):
+        """Behind a gateway MX the mailbox provider is read from SPF includes."""
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            if rdtype == "MX":
+                return FakeDNSAnswer([FakeMXRecord(10, "mxa-001.gslb.pphosted.com.")])
+            if rdtype == "TXT" and not domain.startswith("_dmarc."):
+                return ['"v=spf1 include:spf.protection.outlook.com include:pphosted.com -all"']
+            return []
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+
+        ctx = build_domain_context("acme.com", smtp_blocked=False)
+
+        assert ctx.provider == "proofpoint"
+        assert ctx.hosted_provider == "microsoft"
+        assert ctx.skip_rcpt
+
+
 class TestVerifyResultSignals:
     """Tests for new signal fields in VerifyResult."""
 
@@ -203,6 +288,217 @@ class TestSmtpBlockedDetectorUnit:
         assert TTL_BLOCKED_SECONDS <= 1800
 
 
+class TestSmtpBlockedFlag:
+    """Atomic timeout recording and the process-local copy of the blocked flag."""
+
+    def test_record_timeout_is_one_round_trip(self, mock_redis, monkeypatch):
+        """The threshold sets the flag through a single script call per timeout."""
+        from app.services.smtp_blocked_detector import (
+            REDIS_KEY_BLOCKED,
+            THRESHOLD_HOSTS,
+            TTL_BLOCKED_SECONDS,
+            egress_id,
+            is_smtp_blocked,
+            record_smtp_timeout,
+        )
+
+        calls = []
+        monkeypatch.setattr(mock_redis, "zadd", lambda *a, **kw: calls.append("zadd"))
+        for i in range(THRESHOLD_HOSTS):
+            record_smtp_timeout(f"mx{i}.example.com")
+
+        assert calls == []
+        assert 0 < mock_redis.ttl(REDIS_KEY_BLOCKED.format(egress=egress_id())) <= TTL_BLOCKED_SECONDS
+        assert is_smtp_blocked()
+
+    def test_local_copy_until_flip_is_published(self, mock_redis):
+        """Another worker's flip is seen on the next call; an unannounced change waits for the local TTL."""
+        from app.services.smtp_blocked_detector import (
+            REDIS_CHANNEL_BLOCKED,
+            REDIS_KEY_BLOCKED,
+            clear_smtp_blocked,
+            egress_id,
+            is_smtp_blocked,
+        )
+
+        assert is_smtp_blocked() is False
+        mock_redis.setex(REDIS_KEY_BLOCKED.format(egress=egress_id()), 900, "1")
+        assert is_smtp_blocked() is False  # Served locally
+
+        mock_redis.publish(REDIS_CHANNEL_BLOCKED, "1")
+        assert is_smtp_blocked() is True
+
+        clear_smtp_blocked()
+        assert is_smtp_blocked() is False
+
+    def test_local_ttl_zero_reads_redis(self, mock_redis, monkeypatch):
+        """With smtp_blocked_local_ttl_seconds=0 every call reads Redis."""
+        from app.core.config import settings
+        from app.services.smtp_blocked_detector import REDIS_KEY_BLOCKED, egress_id, is_smtp_blocked
+
+        monkeypatch.setattr(settings, "smtp_blocked_local_ttl_seconds", 0)
+        assert is_smtp_blocked() is False
+        mock_redis.setex(REDIS_KEY_BLOCKED.format(egress=egress_id()), 900, "1")
+        assert is_smtp_blocked() is True
+
+
+class TestSmtpBlockedScopes:
+    """Blocked state kept per egress node and, within a node, per provider."""
+
+    def test_blocked_node_does_not_block_others(self, mock_redis, monkeypatch):
+        """Timeouts seen from one egress node only turn SMTP off there."""
+        from app.core.config import settings
+        from app.services.smtp_blocked_detector import THRESHOLD_HOSTS, is_smtp_blocked, record_smtp_timeout
+
+        monkeypatch.setattr(settings, "smtp_egress_id", "cloud-1")
+        for i in range(THRESHOLD_HOSTS):
+            record_smtp_timeout(f"mx{i}.example{i}.com")
+        assert is_smtp_blocked() is True
+
+        monkeypatch.setattr(settings, "smtp_egress_id", "vps-1")
+        assert is_smtp_blocked() is False
+
+    def test_provider_timeouts_flag_the_provider_only(self, mock_redis):
+        """MX hosts of one provider count once toward the node threshold but flag the provider."""
+        from app.services.smtp_blocked_detector import (
+            PROVIDER_THRESHOLD_HOSTS,
+            THRESHOLD_HOSTS,
+            is_provider_blocked,
+            is_smtp_blocked,
+            record_smtp_timeout,
+        )
+
+        for i in range(max(THRESHOLD_HOSTS, PROVIDER_THRESHOLD_HOSTS)):
+            record_smtp_timeout(f"acme{i}-com.mail.protection.outlook.com", "microsoft")
+
+        assert is_provider_blocked("microsoft") is True
+        assert is_provider_blocked("google") is False
+        assert is_provider_blocked("other") is False
+        assert is_smtp_blocked() is False
+
+    def test_info_breaks_down_per_node_and_provider(self, mock_redis, monkeypatch):
+        """The admin view lists every node with recent timeouts and its blocked providers."""
+        from app.core.config import settings
+        from app.services.smtp_blocked_detector import (
+            PROVIDER_THRESHOLD_HOSTS,
+            THRESHOLD_HOSTS,
+            clear_smtp_blocked,
+            get_smtp_blocked_info,
+            record_smtp_timeout,
+        )
+
+        monkeypatch.setattr(settings, "smtp_egress_id", "cloud-1")
+        for i in range(THRESHOLD_HOSTS):
+            record_smtp_timeout(f"mx{i}.example{i}.com")
+        monkeypatch.setattr(settings, "smtp_egress_id", "vps-1")
+        for i in range(PROVIDER_THRESHOLD_HOSTS):
+            record_smtp_timeout(f"mx{i}.mail.yahoo.com", "yahoo")
+
+        info = get_smtp_blocked_info()
+        nodes = {node["egress_id"]: node for node in info["nodes"]}
+
+        assert info["egress_id"] == "vps-1"
+        assert info["smtp_blocked"] is False
+        assert [p["provider"] for p in info["blocked_providers"]] == ["yahoo"]
+        assert len(info["blocked_providers"][0]["timeout_hosts"]) == PROVIDER_THRESHOLD_HOSTS
+        assert nodes["cloud-1"]["smtp_blocked"] is True
+        assert nodes["cloud-1"]["timeout_hosts_count"] == THRESHOLD_HOSTS
+        assert nodes["cloud-1"]["blocked_providers"] == []
+
+        clear_smtp_blocked()
+        info = get_smtp_blocked_info()
+        assert info["blocked_providers"] == []
+        assert [node["egress_id"] for node in info["nodes"]] == ["cloud-1", "vps-1"]
+
+    def test_blocked_provider_falls_back_to_dns(self, mock_redis, mock_smtp_counting, monkeypatch):
+        """A provider flagged for this node is not probed; the verdict rests on DNS signals."""
+        from app.services.smtp_blocked_detector import REDIS_KEY_PROVIDER_BLOCKED, egress_id
+        from app.services.verification import verify_email
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            if rdtype == "MX":
+                return FakeDNSAnswer([FakeMXRecord(5, "aspmx.l.google.com.")])
+            if rdtype == "TXT" and not domain.startswith("_dmarc."):
+                return ['"v=spf1 include:_spf.google.com ~all"']
+            return []
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+        mock_redis.setex(REDIS_KEY_PROVIDER_BLOCKED.format(egress=egress_id(), provider="google"), 900, "1")
+
+        result = verify_email("john@acme.com")
+
+        assert result.provider == "google"
+        assert result.smtp_blocked is True
+        assert result.smtp_attempted is False
+        assert result.status == "risky"
+        assert mock_smtp_counting.connections == 0
+
+
+class TestCatchAllVerdictCache:
+    """Cross-worker catch-all verdicts stored next to the smtp:* keys."""
+
+    def test_roundtrip_and_ttls(self, mock_redis):
+        """Definitive and inconclusive verdicts use separate TTLs."""
+        from app.services.smtp_blocked_detector import (
+            TTL_CATCH_ALL_INCONCLUSIVE_SECONDS,
+            TTL_CATCH_ALL_SECONDS,
+            get_catch_all_verdict,
+            set_catch_all_verdict,
+        )
+
+        set_catch_all_verdict("Acme.com", True, "Random RCPT accepted")
+        set_catch_all_verdict("flaky.com", None, "Could not reliably probe catch-all")
+
+        assert get_catch_all_verdict("acme.com") == (True, "Random RCPT accepted")
+        assert get_catch_all_verdict("flaky.com") == (None, "Could not reliably probe catch-all")
+        assert get_catch_all_verdict("unknown.com") is None
+        assert TTL_CATCH_ALL_SECONDS - 5 < mock_redis.ttl("smtp:catch_all:acme.com") <= TTL_CATCH_ALL_SECONDS
+        assert (
+            TTL_CATCH_ALL_INCONCLUSIVE_SECONDS - 5
+            < mock_redis.ttl("smtp:catch_all:flaky.com")
+            <= TTL_CATCH_ALL_INCONCLUSIVE_SECONDS
+        )
+
+    def test_redis_down_is_a_cache_miss(self, monkeypatch):
+        """Redis errors never fail verification."""
+        import fakeredis
+
+        from app.services import smtp_blocked_detector
+
+        server = fakeredis.FakeServer()
+        server.connected = False
+        monkeypatch.setattr(smtp_blocked_detector, "_redis_client", fakeredis.FakeRedis(server=server))
+
+        smtp_blocked_detector.set_catch_all_verdict("acme.com", False, "rejected")
+        assert smtp_blocked_detector.get_catch_all_verdict("acme.com") is None
+
+    def test_second_lead_skips_random_probe(self, mock_dns_valid, mock_smtp_pipelining):
+        """A domain seen before is not probed with a random address again."""
+        from app.services.verification import verify_and_pick_best
+
+        candidates, _, first, _ = verify_and_pick_best("John", "Doe", "example.com", stop_policy="exhaustive")
+        _, _, second, _ = verify_and_pick_best("Jane", "Roe", "example.com", stop_policy="exhaustive")
+
+        first_send, second_send = (s.commands[1] for s in mock_smtp_pipelining.instances)
+        assert first_send == f"SEND:{len(candidates) + 1}"
+        assert second_send == f"SEND:{len(candidates)}"
+        assert first.catch_all is False
+        assert second.catch_all is False
+
+    def test_verify_email_uses_cached_verdict(self, mock_dns_valid, mock_smtp_counting):
+        """verify_email reads the cache before the catch-all handshake."""
+        from app.services.smtp_blocked_detector import set_catch_all_verdict
+        from app.services.verification import verify_email
+
+        set_catch_all_verdict("example.com", True, "Random RCPT accepted on mail.example.com")
+
+        result = verify_email("john@example.com")
+
+        assert result.catch_all is True
+        assert result.status == "risky"
+        assert mock_smtp_counting.connections == 1  # Candidate RCPT only
+
+
 class TestBackwardCompatibility:
     """Tests to ensure backward compatibility for API consumers."""
 
@@ -1,8 +1,26 @@
 """Integration tests for email verification flow."""
 
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
 from app.services.verification import (
     DISPOSABLE_DOMAINS,
+    AsyncVerificationEngine,
+    Deadline,
+    DisposableIndex,
+    DNSCache,
+    DomainContext,
+    SMTPProbeSession,
     VerifyResult,
+    build_disposable_index,
+    build_domain_context,
+    get_dns_cache_stats,
+    is_disposable_domain,
+    mx_lookup,
+    smtp_probe_many,
     verify_and_pick_best,
     verify_email,
 )
@@ -191,5 +209,919 @@ class TestVerifyAndPickBest:
         assert best_result.confidence_score == max_score
 
 
+class TestDomainContext:
+    """Domain-level checks are computed once per lead, not once per candidate."""
+
+    def test_build_domain_context_collects_dns_signals(self, mock_dns_valid, mock_smtp_reject):
+        """Should resolve MX, SPF and catch-all verdict for the domain."""
+        ctx = build_domain_context("Example.com")
+
+        assert ctx.domain == "example.com"
+        assert ctx.mx_found
+        assert ctx.mx_hosts == ["mail.example.com"]
+        assert ctx.spf_present is True
+        assert ctx.catch_all is False
+
+    def test_build_domain_context_no_mx(self, mock_dns_no_mx):
+        """Should record the MX failure and skip the rest of the checks."""
+        ctx = build_domain_context("no-mx-domain.com")
+
+        assert not ctx.mx_found
+        assert ctx.mx_error == "NoAnswer"
+        assert ctx.catch_all is None
+
+    def test_verify_email_reuses_domain_context(self, dns_queries, mock_smtp_counting):
+        """With a context, verify_email should only probe RCPT (no MX/TXT queries, no catch-all)."""
+        ctx = DomainContext(domain="example.com", mx=[(10, "mail.example.com")], spf_present=True, catch_all=False)
+
+        result = verify_email("john.doe@example.com", domain_context=ctx)
+
+        assert result.status == "valid"
+        assert result.spf_present is True
+        assert not any(rdtype in ("MX", "TXT") for _, rdtype in dns_queries)
+        assert mock_smtp_counting.connections == 1
+
+    def test_pick_best_runs_domain_checks_once(self, dns_queries, mock_smtp_counting):
+        """MX/SPF/DMARC lookups and the catch-all probe should happen once per lead."""
+        candidates, _, _, _ = verify_and_pick_best(first_name="John", last_name="Doe", domain="example.com")
+
+        mx_queries = [q for q in dns_queries if q[1] == "MX"]
+        txt_queries = [q for q in dns_queries if q[1] == "TXT"]
+        assert len(mx_queries) == 1
+        assert len(txt_queries) == 2  # SPF + DMARC
+        # Catch-all address and all candidates share one SMTP session
+        assert len(candidates) > 1
+        assert mock_smtp_counting.connections == 1
+
+
+class TestSMTPProbeSession:
+    """One SMTP handshake per MX, several RCPT TO per session."""
+
+    def test_probe_many_recipients_in_one_session(self, mock_dns_valid, mock_smtp_pipelining):
+        """Should send all RCPTs in one pipelined write and classify each reply."""
+        with SMTPProbeSession("mail.example.com", "noreply@mailcheck.local") as session:
+            assert session.pipelining
+            results = session.probe(["john.doe@example.com", "jdoe@example.com", "x1@example.com"])
+
+        assert results["john.doe@example.com"][0] is True
+        assert results["jdoe@example.com"] == (False, "Rejected (550)", "550 5.1.1 User unknown")
+        assert len(mock_smtp_pipelining.instances) == 1
+        assert mock_smtp_pipelining.instances[0].commands == ["MAIL", "SEND:3"]
+
+    def test_second_probe_resets_transaction(self, mock_dns_valid, mock_smtp_valid):
+        """A new probe() on the same session should RSET before the next MAIL FROM."""
+        with SMTPProbeSession("mail.example.com", "noreply@mailcheck.local") as session:
+            session.probe(["a@example.com"])
+            session.probe(["b@example.com"])
+            commands = session._smtp.commands
+
+        assert commands == ["MAIL", "RSET", "MAIL"]
+
+    def test_too_many_recipients_starts_new_transaction(self, mock_dns_valid, monkeypatch):
+        """A 452 reply should RSET, re-issue MAIL FROM and retry the recipient."""
+        from tests.mocks import FakeSMTP
+
+        class LimitedSMTP(FakeSMTP):
+            def rcpt(self, recipient):
+                if recipient.startswith("second") and self.commands.count("MAIL") == 1:
+                    return (452, b"4.5.3 Too many recipients")
+                return (250, b"OK")
+
+        monkeypatch.setattr("smtplib.SMTP", LimitedSMTP)
+        with SMTPProbeSession("mail.example.com", "noreply@mailcheck.local") as session:
+            results = session.probe(["first@example.com", "second@example.com"])
+            commands = session._smtp.commands
+
+        assert results["second@example.com"][0] is True
+        assert commands == ["MAIL", "RSET", "MAIL"]
+
+    def test_connection_error_fails_all_recipients(self, mock_dns_valid, mock_smtp_timeout):
+        """A connection failure should mark every recipient as SMTP error (inconclusive)."""
+        results = smtp_probe_many(["mail.example.com"], ["a@example.com", "b@example.com"], "noreply@x.local")
+
+        assert set(results) == {"a@example.com", "b@example.com"}
+        assert all(not accepted and "SMTP error" in detail for _, accepted, detail, _ in results.values())
+
+    def test_pick_best_with_pipelining_server(self, mock_dns_valid, mock_smtp_pipelining):
+        """Should find the only existing mailbox with a single pipelined session."""
+        _, best_email, best_result, _ = verify_and_pick_best(first_name="John", last_name="Doe", domain="example.com")
+
+        assert best_email == "john.doe@example.com"
+        assert best_result.status == "valid"
+        assert best_result.catch_all is False
+        assert len(mock_smtp_pipelining.instances) == 1
+
+
+class TestAsyncVerificationEngine:
+    """Tests for the asyncio engine against a local SMTP server."""
+
+    async def test_verify_many_matches_blocking_semantics(self, mock_async_dns_local, fake_smtp_server):
+        """Existing mailbox is valid, unknown one invalid; one session per domain, input order kept."""
+        engine = AsyncVerificationEngine(smtp_port=fake_smtp_server.port, smtp_timeout_seconds=2)
+        emails = ["john.doe@example.com", "not-an-email", "jane@example.com", "john@nomx.example"]
+
+        results = await engine.verify_many(emails, smtp_blocked=False)
+
+        assert [r.email for r in results] == emails
+        assert [r.status for r in results] == ["valid", "invalid", "invalid", "invalid"]
+        assert results[0].catch_all is False
+        assert "spf" in results[0].signals
+        assert results[0].smtp_code_msg.startswith("250")
+        assert results[3].reason == "No MX records (or DNS failed)"
+        assert fake_smtp_server.connections == 1
+        # Catch-all address and both mailboxes pipelined in one transaction
+        assert fake_smtp_server.commands == ["EHLO", "MAIL", "RCPT", "RCPT", "RCPT", "QUIT"]
+
+    async def test_catch_all_domain_is_risky(self, mock_async_dns_local, fake_smtp_server):
+        """Accepted mailbox on a catch-all domain is risky, not valid."""
+        fake_smtp_server.catch_all = True
+        engine = AsyncVerificationEngine(smtp_port=fake_smtp_server.port, smtp_timeout_seconds=2)
+
+        result = await engine.verify_email("anyone@example.com")
+
+        assert result.catch_all is True
+        assert result.status == "risky"
+
+    async def test_smtp_blocked_skips_connections(self, mock_async_dns_local, fake_smtp_server):
+        """With SMTP blocked, only DNS signals are used."""
+        engine = AsyncVerificationEngine(smtp_port=fake_smtp_server.port)
+
+        (result,) = await engine.verify_many(["john.doe@example.com"], smtp_blocked=True)
+
+        assert result.status == "risky"
+        assert result.smtp_blocked
+        assert fake_smtp_server.connections == 0
+
+    async def test_concurrency_bounded_per_mx(self, mock_async_dns_local, fake_smtp_server):
+        """Domains sharing an MX host never exceed max_concurrent_per_mx sessions."""
+        engine = AsyncVerificationEngine(
+            smtp_port=fake_smtp_server.port, smtp_timeout_seconds=2, max_concurrent_per_mx=1
+        )
+        emails = [f"john.doe@d{i}.example" for i in range(5)]
+
+        results = await engine.verify_many(emails, smtp_blocked=False)
+
+        assert len(results) == len(emails)
+        assert fake_smtp_server.connections == len(emails)
+        assert fake_smtp_server.max_active == 1
+
+    async def test_connection_refused_is_unknown(self, mock_async_dns_local, fake_smtp_server):
+        """A dead MX gives an SMTP error (unknown), not a rejection."""
+        await fake_smtp_server.stop()
+        engine = AsyncVerificationEngine(smtp_port=fake_smtp_server.port, smtp_timeout_seconds=1)
+
+        (result,) = await engine.verify_many(["john.doe@example.com"], smtp_blocked=False)
+
+        assert result.status == "unknown"
+        assert "SMTP error" in result.reason
+
+
+class TestDNSCache:
+    """Process-wide DNS cache shared by mx_lookup, resolve_to_ip and check_domain_spf_dmarc."""
+
+    def test_same_domain_is_resolved_once(self, dns_queries, monkeypatch):
+        """Leads at the same domain reuse cached MX and TXT answers."""
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "singleflight_enabled", False)  # Process cache only, no shared answers
+        for _ in range(5):
+            build_domain_context("example.com", smtp_blocked=True)
+
+        assert dns_queries.count(("example.com", "MX")) == 1
+        assert dns_queries.count(("example.com", "TXT")) == 1
+        stats = get_dns_cache_stats()
+        assert stats["misses"] == 3  # MX, TXT, _dmarc TXT
+        assert stats["hits"] == 12
+
+    def test_negative_answers_are_cached(self, monkeypatch):
+        """NXDOMAIN/NoAnswer are cached and re-raised without a new query."""
+        import dns.resolver
+
+        calls = []
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            calls.append((domain, rdtype))
+            raise dns.resolver.NXDOMAIN()
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+
+        for _ in range(3):
+            with pytest.raises(dns.resolver.NXDOMAIN):
+                mx_lookup("gone.example")
+
+        assert calls == [("gone.example", "MX")]
+
+    def test_timeouts_are_not_cached(self, monkeypatch):
+        """Transient failures are retried on the next lookup."""
+        import dns.resolver
+
+        calls = []
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            calls.append(rdtype)
+            raise dns.resolver.LifetimeTimeout(timeout=1.0, errors=[])
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+
+        for _ in range(2):
+            with pytest.raises(dns.resolver.Timeout):
+                mx_lookup("slow.example")
+
+        assert calls == ["MX", "MX"]
+
+    def test_respects_record_ttl_and_lru_size(self):
+        """Expired answers are not stored; the least recently used entry is evicted."""
+        cache = DNSCache(max_size=2, max_ttl=3600, negative_ttl=60)
+        expired = SimpleNamespace(expiration=time.time() - 1)
+        fresh = SimpleNamespace(expiration=time.time() + 60)
+
+        cache.put("old.example", "A", expired)
+        assert cache.get("old.example", "A") == (False, None)
+
+        cache.put("a.example", "A", fresh)
+        cache.put("b.example", "A", fresh)
+        cache.get("a.example", "A")
+        cache.put("c.example", "A", fresh)
+
+        assert cache.get("a.example", "A") == (True, fresh)
+        assert cache.get("b.example", "A") == (False, None)
+        assert cache.stats()["size"] == 2
+
+    def test_configured_nameservers(self, monkeypatch):
+        """settings.dns_nameservers selects a dedicated resolver."""
+        from app.services.verification import dns_checker
+
+        monkeypatch.setattr(dns_checker.settings, "dns_nameservers", "1.1.1.1, 8.8.8.8")
+        monkeypatch.setattr(dns_checker, "_resolver", None)
+
+        resolver = dns_checker._get_resolver()
+
+        assert resolver.nameservers == ["1.1.1.1", "8.8.8.8"]
+
+
+class TestSMTPRateLimiter:
+    """Redis GCRA token buckets per MX host and per provider."""
+
+    @pytest.fixture
+    def limits(self, monkeypatch):
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "smtp_rate_per_host_per_minute", 60)
+        monkeypatch.setattr(settings, "smtp_rate_host_burst", 2)
+        monkeypatch.setattr(settings, "smtp_rate_limits", '{"google": {"per_minute": 6, "burst": 1, "daily_cap": 2}}')
+        return settings
+
+    def test_host_bucket_allows_burst_then_waits(self, limits):
+        """Burst tokens are immediate; the next one is one emission interval away."""
+        from app.services.verification.smtp_rate_limiter import try_acquire_smtp_token
+
+        assert try_acquire_smtp_token("mx.example.com") == 0
+        assert try_acquire_smtp_token("mx.example.com") == 0
+        assert 0.9 <= try_acquire_smtp_token("mx.example.com") <= 1.0
+        assert try_acquire_smtp_token("mx.other.com") == 0
+
+    def test_provider_bucket_and_daily_cap_span_hosts(self, limits, monkeypatch):
+        """All Google MX hosts share one bucket and one daily cap."""
+        from app.services.verification.smtp_rate_limiter import acquire_smtp_token, try_acquire_smtp_token
+
+        assert try_acquire_smtp_token("aspmx.l.google.com") == 0
+        assert try_acquire_smtp_token("alt1.aspmx.l.google.com") > 5
+        assert acquire_smtp_token("alt2.aspmx.l.google.com", max_wait_seconds=0) == "rate limited"
+
+        now = time.time()
+        monkeypatch.setattr("app.services.verification.smtp_rate_limiter.time.time", lambda: now + 60)
+        assert try_acquire_smtp_token("alt1.aspmx.l.google.com") == 0
+        monkeypatch.setattr("app.services.verification.smtp_rate_limiter.time.time", lambda: now + 120)
+        assert try_acquire_smtp_token("aspmx.l.google.com") is None
+        assert acquire_smtp_token("aspmx.l.google.com") == "daily cap reached"
+
+    def test_session_does_not_connect_without_token(self, limits, mock_dns_valid, mock_smtp_counting, monkeypatch):
+        """A rate-limited session fails like an SMTP error, before opening a connection."""
+        monkeypatch.setattr(limits, "smtp_rate_max_wait_seconds", 0)
+        opened = [SMTPProbeSession("mx.example.com", "probe@test.local").open() for _ in range(3)]
+
+        assert opened == [True, True, False]
+        assert mock_smtp_counting.connections == 2
+
+    def test_disabled_limiter_always_grants(self, limits, monkeypatch):
+        """SMTP_RATE_LIMIT_ENABLED=false turns the limiter off."""
+        from app.services.verification.smtp_rate_limiter import try_acquire_smtp_token
+
+        monkeypatch.setattr(limits, "smtp_rate_limit_enabled", False)
+        assert all(try_acquire_smtp_token("mx.example.com") == 0 for _ in range(5))
+
+
+class TestProviderPolicy:
+    """Provider policy table: gateways are scored from DNS alone unless the workspace overrides it."""
+
+    @pytest.fixture
+    def mock_dns_gateway(self, monkeypatch):
+        """example.com hosted behind Proofpoint."""
+        from tests.mocks import FakeDNSAnswer, FakeMXRecord
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            if rdtype == "MX":
+                return FakeDNSAnswer(
+                    [FakeMXRecord(10, "mx0a-001.pphosted.com."), FakeMXRecord(20, "mx0b-001.pphosted.com.")]
+                )
+            if rdtype == "A":
+                return ["93.184.216.34"]
+            return ['"v=spf1 include:spf.protection.outlook.com ~all"']
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+
+    def test_gateway_resolves_without_smtp(self, mock_dns_gateway, mock_smtp_counting):
+        """Proofpoint domains get no SMTP connection and only the adaptive top candidates."""
+        candidates, _, best_result, _ = verify_and_pick_best("John", "Doe", "example.com", max_candidates=None)
+
+        assert mock_smtp_counting.connections == 0
+        assert len(candidates) == 3
+        assert best_result.status == "risky"
+        assert best_result.provider == "proofpoint"
+        assert not best_result.smtp_attempted
+
+    def test_workspace_override_enables_probing(self, mock_dns_gateway, mock_smtp_pipelining):
+        """An override can re-enable RCPT (without catch-all probe) and limit MX hosts."""
+        verify_and_pick_best(
+            "John",
+            "Doe",
+            "example.com",
+            provider_policies={"proofpoint": {"probe": True, "max_mx_hosts": 1}},
+            stop_policy="exhaustive",
+        )
+
+        (session,) = mock_smtp_pipelining.instances
+        assert session.host == "93.184.216.34"
+        assert session.commands == ["MAIL", "SEND:10"]  # 10 candidates, no random address
+
+    def test_invalid_overrides_are_rejected(self):
+        """Unknown fields and out-of-range values raise; workspace config falls back to {}."""
+        from app.services.verification.provider_policy import parse_provider_policies
+        from app.services.workspace_config import _parse_value
+
+        with pytest.raises(ValueError):
+            parse_provider_policies({"mimecast": {"probe": "yes"}})
+        with pytest.raises(ValueError):
+            parse_provider_policies({"mimecast": {"max_mx_hosts": 9}})
+        with pytest.raises(ValueError):
+            parse_provider_policies({"mimecast": {"retries": 1}})
+        assert _parse_value("provider_policies", '{"Mimecast": {"probe": true}}') == {"mimecast": {"probe": True}}
+        assert _parse_value("provider_policies", "not json") == {}
+
+
+class TestStopPolicy:
+    """first_valid stop policy and adaptive candidate limit."""
+
+    def test_first_valid_stops_after_confirmed_mailbox(self, mock_dns_valid, mock_smtp_pipelining):
+        """Probing stops at the round where john.doe@ is accepted, over the same session."""
+        candidates, best_email, best_result, probe_results = verify_and_pick_best(
+            "John", "Doe", "example.com", stop_policy="first_valid"
+        )
+
+        assert best_email == "john.doe@example.com"
+        assert best_result.status == "valid"
+        # Round 1: catch-all address + 2 candidates; round 2: 2 candidates (john.doe@ is the 3rd)
+        (session,) = mock_smtp_pipelining.instances
+        assert session.commands == ["MAIL", "SEND:3", "RSET", "MAIL", "SEND:2"]
+        assert list(probe_results) == candidates[:4]
+        assert len(candidates) > len(probe_results)
+
+    def test_catch_all_domain_skips_candidate_probes(self, mock_dns_valid, mock_smtp_counting):
+        """Once the domain is known catch-all, candidates are ranked by pattern order without RCPT."""
+        candidates, best_email, best_result, probe_results = verify_and_pick_best(
+            "John", "Doe", "example.com", stop_policy="first_valid"
+        )
+
+        assert mock_smtp_counting.connections == 1  # Only the first round
+        assert best_email == candidates[0]
+        assert best_result.catch_all is True
+        assert best_result.status == "risky"
+        assert len(probe_results) == len(candidates)
+        assert "catch-all" in probe_results[candidates[-1]]["detail"]
+
+    def test_cached_catch_all_needs_no_smtp(self, mock_dns_valid, mock_smtp_counting):
+        """A cached catch-all verdict plus first_valid means no SMTP connection at all."""
+        from app.services.smtp_blocked_detector import set_catch_all_verdict
+
+        set_catch_all_verdict("example.com", True, "Random RCPT accepted")
+
+        candidates, best_email, _, _ = verify_and_pick_best(
+            "John", "Doe", "example.com", stop_policy="first_valid", max_candidates=None
+        )
+
+        assert mock_smtp_counting.connections == 0
+        assert best_email == "john@example.com"
+        assert len(candidates) == 3  # Adaptive limit: SMTP cannot discriminate
+
+    def test_first_valid_is_default(self, mock_dns_valid, mock_smtp_pipelining):
+        """Callers and workspaces without a stop policy share one default: first_valid."""
+        from app.services.verification.domain_context import DEFAULT_STOP_POLICY
+        from app.services.workspace_config import CONFIG_KEYS
+
+        _, _, _, probe_results = verify_and_pick_best("John", "Doe", "example.com")
+
+        assert DEFAULT_STOP_POLICY == CONFIG_KEYS["stop_policy"]["default"]() == "first_valid"
+        assert mock_smtp_pipelining.instances[0].commands == ["MAIL", "SEND:3", "RSET", "MAIL", "SEND:2"]
+
+    def test_exhaustive_probes_in_one_round(self, mock_dns_valid, mock_smtp_pipelining):
+        """With the exhaustive policy every candidate is probed in one round."""
+        candidates, _, _, probe_results = verify_and_pick_best("John", "Doe", "example.com", stop_policy="exhaustive")
+
+        (session,) = mock_smtp_pipelining.instances
+        assert session.commands == ["MAIL", f"SEND:{len(candidates) + 1}"]
+        assert len(probe_results) == len(candidates)
+
+    def test_workspace_config_parsing(self):
+        """Unknown policies fall back to first_valid; max_candidates is clamped."""
+        from app.services.workspace_config import _parse_value
+
+        assert _parse_value("stop_policy", "Exhaustive") == "exhaustive"
+        assert _parse_value("stop_policy", "bogus") == "first_valid"
+        assert _parse_value("max_candidates", "99") == 15
+        assert _parse_value("max_candidates", "x") == 0
+
+
+class TestDisposableIndex:
+    """Tests for the memory-mapped disposable-domain index."""
+
+    @pytest.fixture
+    def index_path(self, tmp_path, monkeypatch):
+        from app.core.config import settings
+
+        path = tmp_path / "disposable.idx"
+        build_disposable_index(["burner.io", "Temp-Box.NET.", "zz-mail.org"], path)
+        monkeypatch.setattr(settings, "disposable_domains_index_path", str(path))
+        return path
+
+    def test_lookup_and_parent_domains(self, index_path):
+        """Exact and parent-domain matches; no match inside a label."""
+        index = DisposableIndex(index_path)
+
+        assert len(index) == 3
+        assert "temp-box.net" in index
+        assert "burner.io" in index
+        assert "aaa.io" not in index
+        assert is_disposable_domain("x.y.burner.io")
+        assert is_disposable_domain("a.mailinator.com")  # Built-in list
+        assert not is_disposable_domain("notburner.io")
+        assert not is_disposable_domain("example.com")
+
+    def test_hot_reload_after_rebuild(self, index_path, monkeypatch):
+        """A rebuilt file is mapped again once the reload check is due."""
+        from app.services.verification import disposable
+
+        assert not is_disposable_domain("fresh-burner.dev")
+        build_disposable_index(["burner.io", "fresh-burner.dev"], index_path)
+        monkeypatch.setattr(disposable, "DISPOSABLE_RELOAD_CHECK_SECONDS", 0.0)
+
+        assert is_disposable_domain("fresh-burner.dev")
+        assert not is_disposable_domain("temp-box.net")
+
+    def test_bad_file_falls_back_to_builtin_list(self, tmp_path, monkeypatch):
+        """A missing or corrupt index is logged and only the built-in list applies."""
+        from app.core.config import settings
+
+        path = tmp_path / "broken.idx"
+        path.write_bytes(b"not an index")
+        monkeypatch.setattr(settings, "disposable_domains_index_path", str(path))
+
+        assert is_disposable_domain("mailinator.com")
+        assert not is_disposable_domain("burner.io")
+
+    @pytest.mark.parametrize("size", [10, 14, -3])
+    def test_truncated_file_falls_back_to_builtin_list(self, index_path, size):
+        """A header with a valid magic but missing offsets or domains is refused, not served."""
+        from app.services.verification.disposable import reload_disposable_index
+
+        index_path.write_bytes(index_path.read_bytes()[:size])
+        reload_disposable_index()
+
+        with pytest.raises(ValueError):
+            DisposableIndex(index_path)
+        assert is_disposable_domain("mailinator.com")
+        assert not is_disposable_domain("burner.io")
+
+    def test_disposable_lead_makes_no_dns_query(self, index_path, dns_queries):
+        """Disposable domains are rejected before MX/SPF lookups."""
+        _, _, best, probe_results = verify_and_pick_best("John", "Doe", "mx.burner.io")
+
+        assert dns_queries == []
+        assert best.status == "invalid"
+        assert all(info["status"] == "invalid" for info in probe_results.values())
+
+
+class TestTimeBudget:
+    """Per-lead time budget propagated as a deadline to DNS and SMTP."""
+
+    @pytest.fixture
+    def slow_smtp(self, monkeypatch):
+        from tests.mocks import FakeSMTPPipelining
+
+        class SlowSMTP(FakeSMTPPipelining):
+            esmtp_features = {}  # One RCPT per round trip
+            recipients: list[str] = []
+
+            def rcpt(self, recipient: str) -> tuple[int, bytes]:
+                time.sleep(0.1)
+                SlowSMTP.recipients.append(recipient)
+                return super().rcpt(recipient)
+
+        monkeypatch.setattr("smtplib.SMTP", SlowSMTP)
+        return SlowSMTP
+
+    def test_returns_best_so_far_when_budget_runs_out(self, mock_dns_valid, slow_smtp):
+        """No new RCPT after the deadline; probed candidates are ranked and flagged budget_exhausted."""
+        started = time.monotonic()
+        candidates, _, best_result, probe_results = verify_and_pick_best(
+            "John", "Doe", "example.com", stop_policy="first_valid", time_budget_seconds=0.25
+        )
+
+        assert time.monotonic() - started < 0.6
+        assert list(probe_results) == candidates[:2]  # john.doe@ (3rd) was never reached
+        assert "budget_exhausted" in best_result.signals
+        # Catch-all address + 2 candidates, then no new round
+        assert slow_smtp.recipients[1:] == candidates[:2]
+
+    def test_expired_deadline_opens_no_connection(self, mock_dns_valid, mock_smtp_counting):
+        """A session past its deadline fails fast without taking a token or connecting."""
+        session = SMTPProbeSession("mail.example.com", "probe@example.com", deadline=Deadline(time.monotonic()))
+
+        assert session.open() is False
+        assert session.error == "SMTP error: time budget exhausted"
+        assert mock_smtp_counting.connections == 0
+
+    def test_dns_lifetime_capped_by_deadline(self, monkeypatch):
+        """DNS queries get min(dns timeout, time left)."""
+        from tests.mocks import FakeDNSAnswer, FakeMXRecord
+
+        lifetimes: list[float] = []
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            lifetimes.append(lifetime)
+            return FakeDNSAnswer([FakeMXRecord(10, f"mail.{domain}.")])
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+        mx_lookup("example.com", dns_timeout_seconds=5, deadline=Deadline.from_seconds(1))
+
+        assert 0 < lifetimes[0] <= 1
+        assert Deadline.from_seconds(0) is None
+
+    def test_workspace_config_parsing(self):
+        """The workspace budget is clamped to 10..600 seconds."""
+        from app.services.workspace_config import _parse_value
+
+        assert _parse_value("lead_time_budget_seconds", "5") == 10
+        assert _parse_value("lead_time_budget_seconds", "9999") == 600
+        assert _parse_value("lead_time_budget_seconds", "45") == 45
+
+
+class TestAdaptiveTimeouts:
+    """Per-MX latency history (EWMA in Redis), adaptive timeouts and tarpit detection."""
+
+    def test_timeout_follows_observed_latency(self):
+        """Fast hosts get the minimum timeout, slow ones a longer one; unknown hosts keep the default."""
+        from app.services.verification.mx_latency import PHASE_COMMAND, get_mx_latency, record_mx_latency
+
+        for _ in range(6):
+            record_mx_latency("fast.example.com", [(PHASE_COMMAND, 0.05)])
+            record_mx_latency("slow.example.com", [(PHASE_COMMAND, 8.0), (PHASE_COMMAND, 9.0)])
+
+        assert get_mx_latency("fast.example.com").timeout(PHASE_COMMAND, 5) == 2.0
+        assert 9.0 < get_mx_latency("slow.example.com").timeout(PHASE_COMMAND, 5) <= 30.0
+        assert get_mx_latency("new.example.com").timeout(PHASE_COMMAND, 5) == 5
+
+    def test_session_records_and_uses_latency(self, mock_dns_valid, monkeypatch):
+        """A session records greeting and command samples and connects with the adaptive timeout."""
+        from app.services.verification.mx_latency import (
+            PHASE_COMMAND,
+            PHASE_GREETING,
+            get_mx_latency,
+            record_mx_latency,
+        )
+        from tests.mocks import FakeSMTP
+
+        timeouts: list[float] = []
+
+        class TimedSMTP(FakeSMTP):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                timeouts.append(self.timeout)
+
+        monkeypatch.setattr("smtplib.SMTP", TimedSMTP)
+        with SMTPProbeSession("mail.example.com", "probe@example.com", smtp_timeout_seconds=5) as session:
+            session.probe(["a@example.com", "b@example.com"])
+
+        latency = get_mx_latency("mail.example.com")
+        assert latency.phases[PHASE_GREETING][2] == 1
+        assert latency.phases[PHASE_COMMAND][2] == 4  # EHLO, MAIL and two RCPT round trips
+
+        for _ in range(5):
+            record_mx_latency("mail.example.com", [(PHASE_GREETING, 12.0)])
+        SMTPProbeSession("mail.example.com", "probe@example.com", smtp_timeout_seconds=5).open()
+
+        assert timeouts[0] == 5
+        assert timeouts[1] == get_mx_latency("mail.example.com").timeout(PHASE_GREETING, 5) > 5
+
+    def test_withheld_banner_marks_tarpit(self, mock_dns_valid, monkeypatch):
+        """Two banner timeouts in a row mark the host; it is then skipped without connecting."""
+        import smtplib
+
+        from app.services.verification.mx_latency import get_mx_latency
+
+        attempts: list[str] = []
+
+        def tarpit_smtp(host, *args, **kwargs):
+            attempts.append(host)
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed: timed out")
+
+        monkeypatch.setattr("smtplib.SMTP", tarpit_smtp)
+        for _ in range(2):
+            SMTPProbeSession("mail.example.com", "probe@example.com").open()
+        assert get_mx_latency("mail.example.com").tarpit
+
+        session = SMTPProbeSession("mail.example.com", "probe@example.com")
+        assert session.open() is False
+        assert session.error == "SMTP error: tarpit host"
+        assert len(attempts) == 2
+
+    def test_tarpit_short_action_caps_timeout(self, mock_dns_valid, mock_redis, monkeypatch):
+        """With smtp_tarpit_action=short a tarpit host is probed with the short timeout."""
+        from app.core.config import settings
+        from app.services.verification.mx_latency import REDIS_KEY_MX_LATENCY_PREFIX
+        from tests.mocks import FakeSMTP
+
+        monkeypatch.setattr(settings, "smtp_tarpit_action", "short")
+        mock_redis.hset(f"{REDIS_KEY_MX_LATENCY_PREFIX}mail.example.com", "tarpit_until", time.time() + 60)
+        monkeypatch.setattr("smtplib.SMTP", FakeSMTP)
+
+        session = SMTPProbeSession("mail.example.com", "probe@example.com", smtp_timeout_seconds=10)
+        assert session.open() is True
+        assert session._smtp.timeout == settings.smtp_tarpit_timeout_seconds
+
+
+class TestSourceAddressPool:
+    """SMTP connections bound to a pool of local source addresses (loopback aliases here)."""
+
+    POOL = "127.0.0.2,127.0.0.3"
+
+    def test_selection_modes(self, monkeypatch):
+        """LRU and round-robin both spread connections to one host over the pool."""
+        from app.core.config import settings
+        from app.services.verification.egress_pool import pick_source_address
+
+        monkeypatch.setattr(settings, "smtp_source_addresses", self.POOL)
+        lru = [pick_source_address("mx.example.com") for _ in range(4)]
+        monkeypatch.setattr(settings, "smtp_source_selection", "round_robin")
+        rr = [pick_source_address("mx.example.com") for _ in range(4)]
+
+        assert lru == ["127.0.0.2", "127.0.0.3", "127.0.0.2", "127.0.0.3"]
+        assert sorted(rr) == ["127.0.0.2", "127.0.0.2", "127.0.0.3", "127.0.0.3"]
+        assert rr[0] != rr[1]
+
+    def test_blocked_and_throttled_addresses_rotate_out(self, monkeypatch):
+        """An address blocked by the detector or throttled by a provider is not picked."""
+        from app.core.config import settings
+        from app.services.smtp_blocked_detector import (
+            THRESHOLD_HOSTS,
+            is_smtp_blocked,
+            record_smtp_timeout,
+        )
+        from app.services.verification.egress_pool import mark_source_throttled, pick_source_address
+
+        monkeypatch.setattr(settings, "smtp_source_addresses", self.POOL)
+        for i in range(THRESHOLD_HOSTS):
+            record_smtp_timeout(f"mx{i}.example{i}.com", source_address="127.0.0.2")
+        assert is_smtp_blocked() is False
+        assert {pick_source_address("mx.example.com") for _ in range(3)} == {"127.0.0.3"}
+
+        mark_source_throttled("127.0.0.3", "aspmx.l.google.com")
+        assert pick_source_address("alt1.aspmx.l.google.com") is None
+        assert pick_source_address("mx.example.com") == "127.0.0.3"
+
+        for i in range(THRESHOLD_HOSTS):
+            record_smtp_timeout(f"mx{i}.example{i}.com", source_address="127.0.0.3")
+        assert is_smtp_blocked() is True
+
+    def test_session_binds_and_rotates_on_421(self, mock_dns_valid, monkeypatch):
+        """The session binds smtplib to the picked address; a 421 puts that address in cooldown."""
+        from app.core.config import settings
+        from tests.mocks import FakeSMTP
+
+        bound: list[tuple[str, int] | None] = []
+
+        class ThrottlingSMTP(FakeSMTP):
+            def __init__(self, *args, source_address=None, **kwargs):
+                super().__init__(*args, **kwargs)
+                bound.append(source_address)
+
+            def mail(self, sender: str):
+                return (421, b"4.7.0 Too many connections from your IP")
+
+        monkeypatch.setattr(settings, "smtp_source_addresses", self.POOL)
+        monkeypatch.setattr("smtplib.SMTP", ThrottlingSMTP)
+        for _ in range(2):
+            with SMTPProbeSession("mail.example.com", "probe@example.com") as session:
+                results = session.probe(["a@example.com"])
+            assert "MAIL FROM refused (421)" in results["a@example.com"][1]
+        session = SMTPProbeSession("mail.example.com", "probe@example.com")
+
+        assert bound == [("127.0.0.2", 0), ("127.0.0.3", 0)]
+        assert session.open() is False  # Both addresses in cooldown
+        assert session.error == "SMTP error: no healthy source address"
+
+    async def test_async_engine_on_loopback_aliases(self, mock_async_dns_local, fake_smtp_server, monkeypatch):
+        """Real connections leave from each pool address in turn."""
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "smtp_source_addresses", self.POOL)
+        engine = AsyncVerificationEngine(smtp_port=fake_smtp_server.port, smtp_timeout_seconds=2)
+
+        for _ in range(4):
+            (result,) = await engine.verify_many(["john.doe@example.com"], smtp_blocked=False)
+            assert result.status == "valid"
+
+        assert fake_smtp_server.peers == ["127.0.0.2", "127.0.0.3", "127.0.0.2", "127.0.0.3"]
+
+
+class TestResultCache:
+    """Per-email results are reused across verifications within their freshness window."""
+
+    def test_verify_email_hit_needs_no_smtp(self, mock_dns_valid, mock_smtp_pipelining, mock_redis):
+        """The second verification of an address is answered from Redis, with the cached signal."""
+        first = verify_email("John.Doe@example.com")
+        connections = len(mock_smtp_pipelining.instances)
+        second = verify_email("john.doe@example.com")
+
+        assert len(mock_smtp_pipelining.instances) == connections
+        assert (second.email, second.status) == ("john.doe@example.com", first.status)
+        assert "cached" in second.signals and "cached" not in first.signals
+        assert 0 < mock_redis.ttl("verify:result:john.doe@example.com") <= 604800
+
+    def test_ttl_depends_on_status(self, mock_dns_valid, mock_smtp_pipelining, mock_redis):
+        """Rejected mailboxes live the invalid TTL; timeouts are not answers and live the short one."""
+        from app.services.verification.result_cache import result_ttl
+
+        assert verify_email("jane.roe@example.com").status == "invalid"
+        assert 86400 < mock_redis.ttl("verify:result:jane.roe@example.com") <= 259200
+        assert (
+            result_ttl(
+                VerifyResult(email="x@example.com", status="unknown", reason="", confidence_score=0, mx_found=True)
+            )
+            == 900
+        )
+
+    def test_max_age_forces_fresh_probe(self, mock_dns_valid, mock_smtp_pipelining, mock_redis):
+        """max_age=0 always probes; an older entry than max_age is ignored and replaced."""
+        verify_email("john.doe@example.com")
+        connections = len(mock_smtp_pipelining.instances)
+        verify_email("john.doe@example.com", max_age=0)
+        assert len(mock_smtp_pipelining.instances) > connections
+
+        connections = len(mock_smtp_pipelining.instances)
+        assert "cached" in verify_email("john.doe@example.com", max_age=60).signals
+        assert len(mock_smtp_pipelining.instances) == connections
+        time.sleep(0.05)
+        assert "cached" not in verify_email("john.doe@example.com", max_age=0.01).signals
+        assert len(mock_smtp_pipelining.instances) > connections
+
+    def test_blocked_results_are_not_cached(self, mock_dns_valid, mock_smtp_pipelining, mock_redis, monkeypatch):
+        """A result scored without SMTP because the egress is blocked depends on this worker only."""
+        monkeypatch.setattr("app.services.verification.verifier.is_smtp_blocked", lambda: True)
+
+        assert verify_email("john.doe@example.com").smtp_blocked is True
+        assert mock_redis.get("verify:result:john.doe@example.com") is None
+
+    def test_unanswered_probes_are_not_cached(self, mock_dns_valid, mock_smtp_pipelining, mock_redis):
+        """A candidate cut off by the time budget got no reply: it is probed again next time."""
+        from app.services.verification.deadline import BUDGET_EXHAUSTED_DETAIL
+
+        ctx = build_domain_context("example.com")
+        ctx.rcpt_results["john.doe@example.com"] = ("mail.example.com", False, BUDGET_EXHAUSTED_DETAIL, None)
+        result = verify_email("john.doe@example.com", domain_context=ctx)
+
+        assert (result.status, result.smtp_attempted) == ("unknown", True)
+        assert mock_redis.get("verify:result:john.doe@example.com") is None
+
+    def test_cached_valid_candidate_settles_lead(self, mock_dns_valid, mock_smtp_pipelining, dns_queries):
+        """A lead whose mailbox was confirmed before needs no DNS or SMTP at all."""
+        verify_email("john.doe@example.com")
+        mock_smtp_pipelining.instances = []
+        dns_queries.clear()
+
+        candidates, best_email, best_result, probe_results = verify_and_pick_best("John", "Doe", "example.com")
+
+        assert best_email == "john.doe@example.com"
+        assert best_result.status == "valid" and "cached" in best_result.signals
+        assert probe_results == {best_email: {**probe_results[best_email], "cached": True}}
+        assert mock_smtp_pipelining.instances == []
+        assert dns_queries == []
+
+    def test_cached_candidates_are_not_probed_again(self, mock_dns_valid, mock_smtp_pipelining, monkeypatch):
+        """Only candidates without a cached result go to the SMTP session."""
+        from app.services.verification import domain_context
+
+        probed: list[list[str]] = []
+        real_probe_many = domain_context.smtp_probe_many
+
+        def spy(mx_hosts, emails, *args, **kwargs):
+            probed.append([e for e in emails if e])
+            return real_probe_many(mx_hosts, emails, *args, **kwargs)
+
+        monkeypatch.setattr(domain_context, "smtp_probe_many", spy)
+        verify_email("jane.roe@example.com")
+
+        candidates, best_email, _, probe_results = verify_and_pick_best("Jane", "Roe", "example.com")
+
+        assert "jane.roe@example.com" in candidates
+        assert all("jane.roe@example.com" not in emails for emails in probed)
+        assert probe_results["jane.roe@example.com"]["cached"] is True
+        assert probe_results["jane.roe@example.com"]["status"] == "invalid"
+
+
+class TestSingleflight:
+    """Domain lookups missed by many workers at once are run by one and shared with the rest."""
+
+    @staticmethod
+    def _finish_elsewhere(mock_redis, name: str, publish, after: float = 0.1) -> threading.Thread:
+        """Another worker holding the lookup's lock publishes its result and releases it."""
+
+        def run():
+            time.sleep(after)
+            publish()
+            mock_redis.delete(f"verify:flight:{name}:example.com")
+
+        mock_redis.set(f"verify:flight:{name}:example.com", "other-worker")
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_dns_signals_shared_between_workers(self, dns_queries, mock_redis):
+        """The first lookup queries DNS and shares it; the next one (another worker) queries nothing."""
+        from app.services.verification.dns_checker import dns_cache
+
+        first = build_domain_context("example.com", smtp_blocked=True)
+        dns_cache.clear()
+        dns_queries.clear()
+        second = build_domain_context("example.com", smtp_blocked=True)
+
+        assert dns_queries == []
+        assert (second.mx, second.spf_present) == (first.mx, True) == ([(10, "mail.example.com")], True)
+        assert not mock_redis.exists("verify:flight:dns:example.com")
+
+    def test_waiter_reuses_holder_result(self, dns_queries, mock_redis):
+        """While another worker holds the DNS lookup, this one waits for its answer instead of querying."""
+        from app.services.verification.singleflight import set_shared
+
+        answer = {"mx": [[5, "mx.example.com"]], "mx_error": None, "mx_error_detail": "", "spf": False}
+        answer |= {"dmarc": True, "spf_includes": []}
+        thread = self._finish_elsewhere(mock_redis, "dns", lambda: set_shared("dns", "example.com", answer, 60))
+        ctx = build_domain_context("example.com", smtp_blocked=True)
+        thread.join()
+
+        assert dns_queries == []
+        assert (ctx.mx, ctx.dmarc_present) == ([(5, "mx.example.com")], True)
+
+    def test_waiter_falls_back_after_timeout(self, dns_queries, mock_redis, monkeypatch):
+        """A holder that never answers only delays the others by singleflight_wait_seconds."""
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "singleflight_wait_seconds", 0.2)
+        mock_redis.set("verify:flight:dns:example.com", "stuck-worker")
+
+        started = time.monotonic()
+        ctx = build_domain_context("example.com", smtp_blocked=True)
+
+        assert 0.2 <= time.monotonic() - started < 1
+        assert ("example.com", "MX") in dns_queries
+        assert ctx.mx == [(10, "mail.example.com")]
+
+    def test_transient_mx_error_not_shared(self, monkeypatch, mock_redis):
+        """A DNS timeout is returned to the caller but not handed to the other workers."""
+        import dns.resolver
+
+        def fake_resolve(domain: str, rdtype: str, lifetime: float = None):
+            raise dns.resolver.Timeout()
+
+        monkeypatch.setattr("dns.resolver.resolve", fake_resolve)
+
+        ctx = build_domain_context("example.com", smtp_blocked=True)
+
+        assert ctx.mx_error == "LifetimeTimeout"
+        assert not mock_redis.exists("verify:shared:dns:example.com")
+
+    def test_catch_all_probe_coalesced(self, mock_dns_valid, mock_smtp_counting, mock_redis):
+        """A worker waiting on another's catch-all probe takes its verdict and sends no random RCPT."""
+        from app.services.smtp_blocked_detector import set_catch_all_verdict
+
+        thread = self._finish_elsewhere(
+            mock_redis, "catch_all", lambda: set_catch_all_verdict("example.com", True, "Random RCPT accepted")
+        )
+        ctx = build_domain_context("example.com", smtp_blocked=False)
+        thread.join()
+
+        assert (ctx.catch_all, ctx.catch_all_reason) == (True, "Random RCPT accepted")
+        assert mock_smtp_counting.connections == 0
+
+
 # Import mocks from mocks.py
 pytest_plugins = ["tests.mocks"]
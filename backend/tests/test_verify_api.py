@@ -0,0 +1,228 @@
+"""Tests for the stateless verify endpoints and their bounded executor."""
+
+import asyncio
+import json
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from app.core.security import create_access_token
+from app.models import Usage, WorkspaceConfigEntry
+from app.services import verify_executor
+from app.services.verify_executor import (
+    REDIS_KEY_VERIFY_INFLIGHT,
+    VERIFY_DEADLINE,
+    VERIFY_SATURATED,
+    VERIFY_WORKSPACE_BUSY,
+    pending_verifications,
+    reserve_verification,
+    run_verification,
+    submit_batch_lane,
+)
+from tests.factories import create_user, create_workspace, create_workspace_user
+
+
+@pytest.fixture
+async def auth_setup(db_session):
+    """Set up authenticated user with workspace."""
+    user = await create_user(db_session, email="batch@example.com")
+    workspace = await create_workspace(db_session, name="Batch Workspace", slug="batch-ws")
+    await create_workspace_user(db_session, user=user, workspace=workspace, role="admin")
+    await db_session.commit()
+    token = create_access_token(subject=user.id)
+    return {
+        "workspace": workspace,
+        "headers": {"Authorization": f"Bearer {token}", "X-Workspace-Id": str(workspace.id)},
+    }
+
+
+class TestVerifyBatchAPI:
+    """Tests for POST /v1/verify/batch."""
+
+    @pytest.mark.asyncio
+    async def test_streams_one_line_per_item(self, client, db_session, auth_setup, dns_queries, mock_smtp_pipelining):
+        """Every item gets an NDJSON line; a domain's DNS checks run once; usage grows by the batch size."""
+        items = [
+            {"id": "a", "first_name": "John", "last_name": "Doe", "domain": "example.com"},
+            {"id": "b", "first_name": "Jane", "last_name": "Roe", "domain": "example.com"},
+            {"id": "c", "first_name": "Ann", "last_name": "Lee", "domain": "mailinator.com"},
+        ]
+        response = await client.post("/v1/verify/batch", json={"items": items}, headers=auth_setup["headers"])
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        by_id = {line["id"]: line for line in lines}
+        assert sorted(by_id) == ["a", "b", "c"]
+        assert by_id["a"]["best"] == "john.doe@example.com"
+        assert by_id["a"]["best_result"]["status"] == "valid"
+        assert by_id["c"]["best_result"]["status"] == "invalid"
+        assert {line["index"] for line in lines} == {0, 1, 2}
+        assert dns_queries.count(("example.com", "MX")) == 1
+        assert not any(name.endswith("mailinator.com") for name, _ in dns_queries)
+
+        usage = (
+            await db_session.execute(select(Usage).where(Usage.workspace_id == auth_setup["workspace"].id))
+        ).scalar_one()
+        assert usage.verifications_count == len(items)
+
+    @pytest.mark.asyncio
+    async def test_rejects_batch_over_quota(self, client, auth_setup, monkeypatch):
+        """A batch that does not fit in the remaining quota is refused as a whole."""
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "plan_free_verifications_per_month", 2)
+        items = [{"first_name": "John", "last_name": "Doe", "domain": "example.com"}] * 3
+        response = await client.post("/v1/verify/batch", json={"items": items}, headers=auth_setup["headers"])
+
+        assert response.json()["error"]["details"]["code"] == "quota_exceeded"
+
+    @pytest.mark.asyncio
+    async def test_failed_item_hides_exception(self, client, auth_setup, monkeypatch):
+        """An item that raises gets a generic error code; the exception text stays in the server log."""
+
+        def boom(*args, **kwargs):
+            raise RuntimeError("connection to 10.0.0.5 refused")
+
+        monkeypatch.setattr("app.api.v1.verify.verify_and_pick_best", boom)
+        items = [{"id": "a", "first_name": "John", "last_name": "Doe", "domain": "mailinator.com"}]
+        response = await client.post("/v1/verify/batch", json={"items": items}, headers=auth_setup["headers"])
+
+        (line,) = [json.loads(line) for line in response.text.splitlines()]
+        assert line["error"] == "INTERNAL_ERROR"
+        assert "10.0.0.5" not in response.text
+
+    @pytest.mark.asyncio
+    async def test_rejects_empty_batch(self, client, auth_setup):
+        """At least one item is required."""
+        response = await client.post("/v1/verify/batch", json={"items": []}, headers=auth_setup["headers"])
+
+        assert response.status_code == 422
+
+
+class TestVerifyStatelessAPI:
+    """Tests for POST /v1/verify."""
+
+    @pytest.mark.asyncio
+    async def test_uses_workspace_stop_policy(
+        self, client, db_session, auth_setup, mock_dns_valid, mock_smtp_pipelining
+    ):
+        """Candidates are probed with the workspace's stop policy, as in jobs (first_valid by default)."""
+        body = {"first_name": "John", "last_name": "Doe", "domain": "example.com"}
+        response = await client.post("/v1/verify", json=body, headers=auth_setup["headers"])
+        assert response.json()["data"]["best"] == "john.doe@example.com"
+        assert mock_smtp_pipelining.instances[0].commands == ["MAIL", "SEND:3", "RSET", "MAIL", "SEND:2"]
+
+        db_session.add(
+            WorkspaceConfigEntry(workspace_id=auth_setup["workspace"].id, key="stop_policy", value="exhaustive")
+        )
+        await db_session.commit()
+        mock_smtp_pipelining.instances = []
+        response = await client.post("/v1/verify", json={**body, "max_age": 0}, headers=auth_setup["headers"])
+
+        (session,) = mock_smtp_pipelining.instances
+        assert session.commands == ["MAIL", f"SEND:{len(response.json()['data']['candidates'])}"]
+
+
+class TestVerifyExecutor:
+    """Tests for admission control and deadlines of API verifications."""
+
+    @pytest.fixture
+    def limits(self, monkeypatch):
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "verify_api_max_workers", 1)
+        monkeypatch.setattr(settings, "verify_api_max_queue", 1)
+        monkeypatch.setattr(settings, "verify_api_workspace_concurrency", 1)
+        monkeypatch.setattr(settings, "verify_api_batch_max_lanes", 4)
+        monkeypatch.setattr(verify_executor, "_executor", None)
+        monkeypatch.setattr(verify_executor, "_batch_executor", None)
+        return settings
+
+    @pytest.mark.asyncio
+    async def test_runs_off_the_event_loop(self, limits):
+        """The blocking function runs in a worker thread and its result is returned."""
+        loop_thread = threading.get_ident()
+        result, reason = await run_verification(1, threading.get_ident)
+
+        assert reason is None
+        assert result != loop_thread
+
+    @pytest.mark.asyncio
+    async def test_workspace_cap_and_release(self, limits, mock_redis):
+        """A second concurrent verification of the workspace is refused; the slot frees when work ends."""
+        release = threading.Event()
+        first = asyncio.create_task(run_verification(1, release.wait, 5))
+        await asyncio.sleep(0.05)
+
+        _, reason = await run_verification(1, lambda: None)
+        other_ws = asyncio.create_task(run_verification(2, lambda: "done"))
+        release.set()
+
+        assert reason == VERIFY_WORKSPACE_BUSY
+        assert await other_ws == ("done", None)
+        assert await first == (True, None)
+        assert mock_redis.zcard(REDIS_KEY_VERIFY_INFLIGHT.format(workspace_id=1)) == 0
+
+    @pytest.mark.asyncio
+    async def test_saturated_process_is_refused(self, limits):
+        """Beyond workers + queue, verifications are refused before taking a slot."""
+        release = threading.Event()
+        running = [asyncio.create_task(run_verification(ws, release.wait, 5)) for ws in (1, 2)]
+        await asyncio.sleep(0.05)
+
+        _, reason = await run_verification(3, lambda: None)
+        release.set()
+        await asyncio.gather(*running)
+
+        assert reason == VERIFY_SATURATED
+
+    @pytest.mark.asyncio
+    async def test_batch_lanes_leave_verify_workers_free(self, limits, mock_redis):
+        """Batch lanes run in their own pool: POST /verify capacity is untouched, new batches wait for a lane."""
+        limits.verify_api_batch_max_lanes = 1
+        release = threading.Event()
+        token, reason = reserve_verification(1, 60, batch=True)
+        lane = submit_batch_lane(release.wait, 5)
+        await asyncio.sleep(0.05)
+
+        assert (token is not None, reason) == (True, None)
+        assert pending_verifications() == 0
+        assert reserve_verification(2, 60, batch=True) == (None, VERIFY_SATURATED)
+        assert await run_verification(3, lambda: "done") == ("done", None)
+        release.set()
+        await asyncio.wrap_future(lane)
+        assert reserve_verification(2, 60, batch=True)[1] is None
+
+    @pytest.mark.asyncio
+    async def test_deadline(self, limits, mock_redis):
+        """The request gives up at the deadline; the slot is held until the thread ends."""
+        release = threading.Event()
+        _, reason = await run_verification(1, release.wait, 5, deadline_seconds=0.05)
+
+        assert reason == VERIFY_DEADLINE
+        assert mock_redis.zcard(REDIS_KEY_VERIFY_INFLIGHT.format(workspace_id=1)) == 1
+        release.set()
+        await asyncio.sleep(0.05)
+        assert mock_redis.zcard(REDIS_KEY_VERIFY_INFLIGHT.format(workspace_id=1)) == 0
+
+    @pytest.mark.asyncio
+    async def test_api_returns_429_when_workspace_busy(self, client, auth_setup, limits, mock_redis):
+        """POST /v1/verify maps a busy workspace to HTTP 429 with Retry-After."""
+        key = REDIS_KEY_VERIFY_INFLIGHT.format(workspace_id=auth_setup["workspace"].id)
+        mock_redis.zadd(key, {"other-request": 9e12})
+
+        response = await client.post(
+            "/v1/verify",
+            json={"first_name": "John", "last_name": "Doe", "domain": "example.com"},
+            headers=auth_setup["headers"],
+        )
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"]
+        assert response.json()["error"]["code"] == "QUOTA_CONCURRENCY_LIMIT"
+
+
+# Import mocks from mocks.py
+pytest_plugins = ["tests.mocks"]
@@ -0,0 +1,103 @@
+"""Tests for domain-grouped bulk verification (run_verify_batch)."""
+
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import select
+
+from app.models import DomainPattern, Lead, VerificationLog
+from app.services.verify_batch import apply_batch_results_sync, group_leads_by_domain, verify_domain_group_sync
+from app.services.workspace_config import get_workspace_config_sync
+
+
+def _cfg(db) -> dict:
+    return get_workspace_config_sync(db, 1)
+
+
+def _leads(db, *rows: tuple[str, str, str]) -> list[Lead]:
+    leads = [Lead(workspace_id=1, first_name=first, last_name=last, domain=domain) for first, last, domain in rows]
+    db.add_all(leads)
+    db.flush()
+    return leads
+
+
+class TestVerifyBatch:
+    """Leads of one domain share the domain checks and the SMTP connection."""
+
+    def test_group_leads_by_domain(self, sync_db):
+        """Domains are normalized; groups and leads keep input order."""
+        a, b, c = _leads(sync_db, ("A", "B", "Example.com "), ("C", "D", "other.org"), ("E", "F", "example.com"))
+
+        assert group_leads_by_domain([a, b, c]) == {"example.com": [a, c], "other.org": [b]}
+
+    def test_domain_group_shares_one_connection(self, sync_db, mock_dns_valid, mock_smtp_pipelining):
+        """Three leads of a domain are probed over a single SMTP connection."""
+        leads = _leads(
+            sync_db, ("John", "Doe", "example.com"), ("Jane", "Roe", "example.com"), ("Ann", "Lee", "example.com")
+        )
+
+        outcomes = verify_domain_group_sync(sync_db, "example.com", leads, _cfg(sync_db))
+
+        assert [o.error for o in outcomes] == [None, None, None]
+        assert outcomes[0].best_email == "john.doe@example.com"
+        assert outcomes[0].best_result.status == "valid"
+        assert [o.best_result.status for o in outcomes[1:]] == ["invalid", "invalid"]
+        assert len(mock_smtp_pipelining.instances) == 1
+        assert outcomes[0].mx_hosts == ["mail.example.com"]
+
+    def test_confirmed_pattern_orders_next_leads(self, sync_db, mock_dns_valid, mock_smtp_pipelining):
+        """A lead confirming first.last is recorded and probed first for the following leads."""
+        leads = _leads(sync_db, ("John", "Doe", "example.com"), ("Jane", "Roe", "example.com"))
+
+        outcomes = verify_domain_group_sync(sync_db, "example.com", leads, _cfg(sync_db))
+
+        rows = sync_db.execute(select(DomainPattern.pattern, DomainPattern.confirmed_count)).all()
+        assert rows == [("{first}.{last}@{domain}", 1)]
+        assert outcomes[1].candidates[0] == "jane.roe@example.com"
+
+    def test_results_written_in_bulk(self, sync_db, mock_dns_valid, mock_smtp_pipelining):
+        """Each verified lead gets its fields and one VerificationLog row; failed leads are untouched."""
+        leads = _leads(sync_db, ("John", "Doe", "example.com"), ("Jane", "Roe", "example.com"))
+        outcomes = verify_domain_group_sync(sync_db, "example.com", leads, _cfg(sync_db))
+        outcomes[1].error = "RuntimeError: boom"
+
+        greylist = apply_batch_results_sync(sync_db, 7, 1, outcomes, {})
+        sync_db.commit()
+
+        assert greylist == []
+        assert (leads[0].email_best, leads[0].verification_status) == ("john.doe@example.com", "valid")
+        assert leads[1].verification_status != "invalid"
+        logs = sync_db.execute(select(VerificationLog)).scalars().all()
+        assert [(log.lead_id, log.job_id, log.best_email) for log in logs] == [(leads[0].id, 7, "john.doe@example.com")]
+
+    def test_stop_at_leaves_remaining_leads_unverified(self, sync_db, mock_dns_valid, mock_smtp_pipelining):
+        """Past stop_at no lead is started: the task reports them instead of failing the job."""
+        leads = _leads(sync_db, ("John", "Doe", "example.com"), ("Jane", "Roe", "example.com"))
+
+        assert (
+            verify_domain_group_sync(sync_db, "example.com", leads, _cfg(sync_db), stop_at=time.monotonic() - 1) == []
+        )
+        assert mock_smtp_pipelining.instances == []
+
+    def test_web_search_settings_and_usage(self, sync_db, mock_dns_valid, mock_smtp_pipelining, monkeypatch):
+        """The workspace's web search runs as in single-lead jobs and is listed per lead for usage."""
+        searched: list[str] = []
+
+        def fake_search(email: str, provider: str, api_key: str) -> tuple[bool, str | None]:
+            searched.append(email)
+            return email == "john.doe@example.com", None
+
+        monkeypatch.setattr("app.services.verification.verifier.check_email_mentioned_on_web", fake_search)
+        leads = _leads(sync_db, ("John", "Doe", "example.com"), ("Jane", "Roe", "example.com"))
+        cfg = {**_cfg(sync_db), "web_search_provider": "serper", "web_search_api_key": "key"}
+
+        outcomes = verify_domain_group_sync(sync_db, "example.com", leads, cfg)
+
+        assert len(searched) == 2
+        assert [o.web_searches for o in outcomes] == [["serper"], ["serper"]]
+        assert outcomes[0].best_result.web_mentioned is True
+
+
+# Import mocks from mocks.py
+pytest_plugins = ["tests.mocks"]